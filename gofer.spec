@@ -152,6 +152,8 @@ Provides gofer python lib modules.
 %dir %{python_sitelib}/%{name}/messaging/adapter
 %{python_sitelib}/%{name}/messaging/*.py*
 %{python_sitelib}/%{name}/messaging/adapter/*.py*
+%{python_sitelib}/%{name}/messaging/adapter/memory/
+%{python_sitelib}/%{name}/messaging/adapter/socket/
 %{python_sitelib}/%{name}/devel/
 %doc LICENSE
 
@@ -205,10 +207,11 @@ Requires: python-%{name} = %{version}
 Requires: python-qpid-proton >= 0.9-5
 
 %description -n python-%{name}-proton
-Provides the gofer qpid proton messaging adapter package.
+Provides the gofer qpid proton messaging adapter packages.
 
 %files -n python-%{name}-proton
 %{python_sitelib}/%{name}/messaging/adapter/proton
+%{python_sitelib}/%{name}/messaging/adapter/reactor
 %doc LICENSE
 
 
@@ -220,6 +223,7 @@ Group: Development/Languages
 BuildRequires: python
 Requires: python-%{name} = %{version}
 Requires: python-amqp >= 1.4.5
+Requires: python-amqp < 2.0
 
 %description -n python-%{name}-amqp
 Provides the gofer amqp messaging adapter package.
@@ -64,6 +64,12 @@ AGENT_SCHEMA = (
 #      The (optional) fully qualified module to be loaded from the PYTHON path.
 #   threads
 #      The (optional) number of threads for the RMI dispatcher.
+#   latency
+#      The (optional) latency (seconds) to be introduced into RMI execution.
+#   progress
+#      The (optional) maximum number of progress reports sent (per second) for each
+#      request.  Reports are coalesced and the latest is sent before the reply.
+#      Default: 10 (0=unlimited).
 #   accept
 #      Accept forwarding from.  A comma (,) separated list of plugin names (,=none|*=all).
 #   forward
@@ -83,6 +89,19 @@ AGENT_SCHEMA = (
 #      The (optional) flag indicates SSL host validation should be performed.
 #   authenticator
 #      The (optional) fully qualified Authenticator to be loaded from the PYTHON path.
+#   session
+#      The (optional) session key lifetime (seconds).  When specified, messages are
+#      authenticated using HMAC-SHA256 and session keys established using the authenticator.
+#      Default: 0 (sign each message using the authenticator).
+#   prefetch
+#      The (optional) number of request messages prefetched from the broker.
+#      (auto) sizes the window using the thread pool capacity and backlog.
+#   compression
+#      The (optional) size (bytes) above which replies are compressed.
+#      Only used when supported by the requester.  Default: 0 (never).
+#   confirms
+#      The (optional) number of sent replies permitted to be waiting for
+#      broker confirmation.  Only used by adapters that support it.  Default: 1.
 #
 # [model]
 #
@@ -106,6 +125,7 @@ PLUGIN_SCHEMA = (
             ('plugin', OPTIONAL, ANY),
             ('threads', OPTIONAL, NUMBER),
             ('latency', OPTIONAL, FLOAT),
+            ('progress', OPTIONAL, FLOAT),
             ('accept', OPTIONAL, ANY),
             ('forward', OPTIONAL, ANY),
         )
@@ -119,7 +139,11 @@ PLUGIN_SCHEMA = (
             ('clientkey', OPTIONAL, ANY),
             ('host_validation', OPTIONAL, BOOL),
             ('authenticator', OPTIONAL, ANY),
+            ('session', OPTIONAL, NUMBER),
             ('heartbeat', OPTIONAL, NUMBER),
+            ('prefetch', OPTIONAL, '(^auto$|^\d+$)'),
+            ('compression', OPTIONAL, NUMBER),
+            ('confirms', OPTIONAL, NUMBER),
         )
     ),
     ('model', OPTIONAL,
@@ -151,6 +175,7 @@ PLUGIN_DEFAULTS = {
         'enabled': '0',
         'threads': '1',
         'latency': '0',
+        'progress': '10',
         'accept': ',',
         'forward': ','
     },
@@ -273,6 +273,18 @@ class Plugin(object):
     def enabled(self):
         return get_bool(self.cfg.main.enabled)
 
+    @property
+    def prefetch(self):
+        return self.cfg.messaging.prefetch
+
+    @property
+    def compression(self):
+        return int(nvl(self.cfg.messaging.compression, 0))
+
+    @property
+    def confirms(self):
+        return int(nvl(self.cfg.messaging.confirms, 1))
+
     @property
     def connector(self):
         return Connector(self.url)
@@ -302,6 +314,10 @@ class Plugin(object):
     def latency(self):
         return float(self.cfg.main.latency)
 
+    @property
+    def progress(self):
+        return float(nvl(self.cfg.main.progress, 0))
+
     @synchronized
     def start(self):
         """
@@ -348,6 +364,7 @@ class Plugin(object):
         connector.ssl.client_key = messaging.clientkey
         connector.ssl.client_certificate = messaging.clientcert
         connector.ssl.host_validation = messaging.host_validation
+        connector.listen = True
         connector.add()
 
     @attach
@@ -441,6 +458,10 @@ class Plugin(object):
         mod = '.'.join(path[:-1])
         mod = __import__(mod, {}, {}, [path[-1]])
         self.authenticator = mod.Authenticator()
+        lifetime = int(nvl(self.cfg.messaging.session, 0))
+        if lifetime:
+            from gofer.messaging.session import SessionAuthenticator
+            self.authenticator = SessionAuthenticator(self.authenticator, lifetime)
 
     @synchronized
     def unload(self):
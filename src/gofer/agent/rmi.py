@@ -15,40 +15,225 @@
 
 from time import time, sleep
 from logging import getLogger
+from threading import RLock, current_thread
 
 from gofer.agent.builtin import Builtin
-from gofer.common import Thread, released
-from gofer.messaging import Document, Producer
+from gofer.common import Thread, synchronized
+from gofer.messaging import Document, Connection, Producer
+from gofer.messaging.auth import TAG
+from gofer.messaging.compression import ZLIB
 from gofer.metrics import Timer, timestamp
+from gofer.rmi.consumer import StatusSender
 from gofer.rmi.context import Cancelled, Context, Progress
+from gofer.rmi.dispatcher import Return, Stream
 from gofer.rmi.store import Pending, Empty
 
 
 log = getLogger(__name__)
 
 
-class Task(object):
+# seconds a pooled producer may be idle before it is reaped.
+IDLE = 300
+
+
+class Pooled(object):
     """
-    An RMI task to be scheduled on the plugin thread pool.
-    :ivar transaction: A pending transaction.
-    :type transaction: Transaction
-    :ivar ts: Timestamp
-    :type ts: float
+    A pooled producer.
+    :ivar producer: An open producer.
+    :type producer: Producer
+    :ivar connection: The (thread singleton) connection used by the producer.
+    :type connection: Connection
+    :ivar used: When last used (seconds since epoch).
+    :type used: float
+    :ivar busy: The producer is in use by a task.
+    :type busy: bool
+    """
+
+    def __init__(self, url):
+        """
+        Must be constructed by the thread that will use the producer.
+        :param url: The broker url.
+        :type url: str
+        """
+        self.producer = Producer(url)
+        self.connection = Connection(url)
+        self.used = time()
+        self.busy = False
+
+    def close(self):
+        """
+        Close the producer and the connection.
+        """
+        for thing in (self.producer, self.connection):
+            try:
+                thing.close()
+            except Exception:
+                log.debug('close failed', exc_info=1)
+
+
+class ProducerPool(object):
+    """
+    A pool of open producers.
+    Producers (and the underlying thread singleton connections) are
+    held open by each worker thread and reused across tasks.  Producers
+    that have been idle longer than the idle period are closed by
+    the reaper thread.
+    :ivar idle: The idle period (seconds).
+    :type idle: float
+    :ivar pool: Pooled producers by: (thread, url).
+    :type pool: dict
+    :ivar reaper: The reaper thread.
+    :type reaper: Reaper
     """
 
-    @staticmethod
-    def _producer(plugin):
+    def __init__(self, idle=IDLE):
+        """
+        :param idle: The idle period (seconds).
+        :type idle: float
+        """
+        self.idle = idle
+        self.pool = {}
+        self.reaper = None
+        self.__mutex = RLock()
+
+    @synchronized
+    def start(self):
+        """
+        Start the reaper thread.
         """
-        Get a configured producer.
+        if self.reaper is not None and self.reaper.isAlive():
+            return
+        self.reaper = Reaper(self)
+        self.reaper.start()
+
+    def get(self, plugin):
+        """
+        Get an open producer for the plugin.
+        The producer is busy until released or discarded.
         :param plugin: A plugin.
         :type plugin: gofer.agent.plugin.Plugin
-        :return: A producer.
+        :return: An open producer.
         :rtype: Producer
         """
-        producer = Producer(plugin.url)
+        self.start()
+        key = (current_thread(), plugin.url)
+        with self.__mutex:
+            pooled = self.pool.get(key)
+            if pooled is None:
+                pooled = Pooled(plugin.url)
+                self.pool[key] = pooled
+            pooled.busy = True
+        producer = pooled.producer
         producer.authenticator = plugin.authenticator
+        producer.window = plugin.confirms
+        try:
+            if not producer.is_open():
+                producer.open()
+        except Exception:
+            self.discard(plugin.url)
+            raise
         return producer
 
+    def release(self, url):
+        """
+        Release the producer for the specified url.
+        :param url: The broker url.
+        :type url: str
+        """
+        with self.__mutex:
+            pooled = self.pool.get((current_thread(), url))
+            if pooled is None:
+                return
+            pooled.used = time()
+            pooled.busy = False
+
+    def discard(self, url):
+        """
+        Close and discard the producer for the specified url.
+        Called when the producer has failed.  The next get()
+        will build a new producer on a new connection.
+        :param url: The broker url.
+        :type url: str
+        """
+        with self.__mutex:
+            pooled = self.pool.pop((current_thread(), url), None)
+        if pooled is not None:
+            pooled.close()
+
+    def reap(self):
+        """
+        Close and discard idle producers.
+        """
+        now = time()
+        reaped = []
+        with self.__mutex:
+            for key, pooled in self.pool.items():
+                if pooled.busy or now - pooled.used < self.idle:
+                    continue
+                del self.pool[key]
+                reaped.append(pooled)
+        for pooled in reaped:
+            pooled.close()
+        if reaped:
+            log.debug('producers reaped: %d', len(reaped))
+
+    def clear(self):
+        """
+        Close and discard all producers.
+        """
+        with self.__mutex:
+            pool = self.pool
+            self.pool = {}
+        for pooled in pool.values():
+            pooled.close()
+
+
+class Reaper(Thread):
+    """
+    Periodically reaps idle pooled producers.
+    :ivar pool: The producer pool.
+    :type pool: ProducerPool
+    """
+
+    def __init__(self, pool):
+        """
+        :param pool: The producer pool.
+        :type pool: ProducerPool
+        """
+        Thread.__init__(self, name='producer-reaper')
+        self.pool = pool
+        self.setDaemon(True)
+
+    def run(self):
+        """
+        Reap every (idle / 2) seconds.
+        """
+        while not Thread.aborted():
+            sleep(max(self.pool.idle / 2.0, 1))
+            try:
+                self.pool.reap()
+            except Exception:
+                log.exception(self.getName())
+
+
+class Task(object):
+    """
+    An RMI task to be scheduled on the plugin thread pool.
+    :cvar producers: The producer pool.
+    :type producers: ProducerPool
+    :ivar transaction: A pending transaction.
+    :type transaction: Transaction
+    :ivar failed: Indicates sending a status or reply failed.
+    :type failed: bool
+    :ivar lock: Held while using the producer, which is
+        shared with the progress reporter.
+    :type lock: RLock
+    :ivar ts: Timestamp
+    :type ts: float
+    """
+
+    producers = ProducerPool()
+
     def __init__(self, transaction):
         """
         :param transaction: A pending transaction.
@@ -56,6 +241,8 @@ class Task(object):
         """
         self.transaction = transaction
         self.producer = None
+        self.failed = False
+        self.lock = RLock()
         self.ts = time()
 
     @property
@@ -66,10 +253,11 @@ class Task(object):
     def request(self):
         return self.transaction.request
 
-    @released
     def __call__(self):
         """
         Dispatch received request.
+        The producer is borrowed from the pool and the thread
+        singleton connections are NOT released.
         """
         request = self.request
         cancelled = Cancelled(request.sn)
@@ -79,20 +267,34 @@ class Task(object):
         if not self.plugin.url or cancelled():
             self.discard()
             return
-        producer = self._producer(self.plugin)
-        progress = Progress(request, producer)
+        producer = self.producers.get(self.plugin)
+        producer.header = self.header(request)
+        progress = Progress(request, producer, self.plugin.progress, self.lock)
         context = Context(request.sn, progress, cancelled)
         Context.set(context)
-        producer.open()
         try:
             self.producer = producer
             self.send_started(request)
             result = self.plugin.dispatch(request)
             self.commit()
-            self.send_reply(request, result)
+            if isinstance(result, Stream):
+                if not request.streaming:
+                    result = result.collect()
+                else:
+                    result = self.send_partial(request, result)
+                if result is None:
+                    # interrupted
+                    return
+            self.send_reply(request, result, progress)
         finally:
-            producer.close()
+            progress.cancel()
+            producer.header = False
+            self.producer = None
             Context.set()
+            if self.failed:
+                self.producers.discard(self.plugin.url)
+            else:
+                self.producers.release(self.plugin.url)
 
     def commit(self):
         """
@@ -109,6 +311,7 @@ class Task(object):
     def send_started(self, request):
         """
         Send the a status update if requested.
+        The queued accepted status is sent first.
         :param request: The received request.
         :type request: Document
         """
@@ -117,23 +320,70 @@ class Task(object):
         address = request.replyto
         if not address:
             return
+        StatusSender(self.plugin.url).wait(sn)
         try:
-            self.producer.send(
-                address,
-                sn=sn,
-                data=data,
-                status='started',
-                timestamp=timestamp())
+            with self.lock:
+                self.producer.send(
+                    address,
+                    sn=sn,
+                    data=data,
+                    status='started',
+                    timestamp=timestamp())
         except Exception:
             log.exception('Send: started, failed')
+            self.failed = True
 
-    def send_reply(self, request, result):
+    def send_partial(self, request, stream):
+        """
+        Send each partial (streamed) result if requested.
+        The stream is consumed as the partial results are sent so
+        only one chunk is held in memory.  Sending stops on failure.
+        :param request: The received request.
+        :type request: Document
+        :param stream: The streamed result.
+        :type stream: Stream
+        :return: The final result or (None) when interrupted.
+        :rtype: Return
+        """
+        sn = request.sn
+        data = request.data
+        address = request.replyto
+        compression = self.compression(request)
+        try:
+            for seq, partial in enumerate(stream):
+                if not address:
+                    continue
+                # the lock is not held while the stream is consumed
+                # so the method may report progress
+                with self.lock:
+                    self.producer.compression = compression
+                    try:
+                        self.producer.send(
+                            address,
+                            sn=sn,
+                            data=data,
+                            status='partial',
+                            seq=seq,
+                            result=partial.encoded,
+                            timestamp=timestamp())
+                    finally:
+                        self.producer.compression = 0
+        except Exception:
+            log.exception('Send: partial, failed: %s', sn)
+            self.failed = True
+        return stream.result
+
+    def send_reply(self, request, result, progress=None):
         """
         Send the reply if requested.
+        The latest (coalesced) progress report and the
+        reply are sent together as a batch.
         :param request: The received request.
         :type request: Document
         :param result: The request result.
         :type result: object
+        :param progress: The (optional) progress reporter.
+        :type progress: gofer.rmi.context.Progress
         """
         sn = request.sn
         data = request.data
@@ -144,15 +394,55 @@ class Task(object):
         log.info('Request: %s processed in: %s', sn, duration)
         if not address:
             return
-        try:
-            self.producer.send(
-                address,
+        if isinstance(result, Return) and result.encoded:
+            # validated (encoded) by the dispatcher
+            result = result.encoded
+        documents = []
+        if progress is not None and progress.drain():
+            documents.append(progress.document())
+        documents.append(
+            dict(
                 sn=sn,
                 data=data,
                 result=result,
-                timestamp=timestamp())
+                timestamp=timestamp()))
+        try:
+            with self.lock:
+                self.producer.compression = self.compression(request)
+                try:
+                    self.producer.send_many(address, documents)
+                finally:
+                    self.producer.compression = 0
         except Exception:
             log.exception('Send: reply, failed: %s', result)
+            self.failed = True
+
+    def compression(self, request):
+        """
+        Get the reply compression threshold.
+        Replies are only compressed when the requester
+        advertised support for the codec.
+        :param request: The received request.
+        :type request: Document
+        :return: The threshold (bytes) or 0 for no compression.
+        :rtype: int
+        """
+        if ZLIB in (request.compression or ()):
+            return self.plugin.compression
+        else:
+            return 0
+
+    def header(self, request):
+        """
+        Get whether replies are signed using the header format.
+        The header format is only used when the requester
+        advertised support for it.
+        :param request: The received request.
+        :type request: Document
+        :return: True to sign using the header format.
+        :rtype: bool
+        """
+        return TAG in (request.signing or ())
 
 
 class Transaction(object):
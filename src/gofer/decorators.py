@@ -40,7 +40,7 @@ def options(fn):
     return opt
 
 
-def remote(fx=None, model=DIRECT, secret=None):
+def remote(fx=None, model=DIRECT, secret=None, stream=False):
     """
     The *remote* decorator.
     Used to expose function/methods as RMI targets.
@@ -50,11 +50,20 @@ def remote(fx=None, model=DIRECT, secret=None):
     :type model: str
     :param secret: An optional shared secret. *DEPRECATED*
     :type secret: str
+    :param stream: The (generator) function result is streamed.
+        Each yielded chunk is sent as a partial reply.
+        Only supported by the *direct* model.
+    :type stream: bool
     :return: The decorated function.
     """
+    if stream and model != DIRECT:
+        raise ValueError('stream: requires model: %s' % DIRECT)
+
     def inner(fn):
         opt = options(fn)
         opt.call.model = valid_model(model)
+        if stream:
+            opt.call.stream = True
         if secret:
             required = Options()
             required.secret = secret
@@ -88,10 +97,32 @@ def fork(fn):
     :return: The decorated function.
     """
     opt = options(fn)
+    if opt.call.stream:
+        raise ValueError('stream: requires model: %s' % DIRECT)
     opt.call.model = valid_model(FORK)
     return fn
 
 
+def progress(rate=None, aggregate=None):
+    """
+    The *progress* decorator.
+    Used to specify progress reporting options.  Reports are
+    coalesced and sent at most *rate* times per second.  Overrides
+    the plugin (progress) rate.
+    :param rate: The maximum number of reports (per second) sent (0=unlimited).
+    :type rate: float
+    :param aggregate: Reported (text) details should be aggregated
+        rather than replaced between reports.
+    :type aggregate: bool
+    :return: The decorated function.
+    """
+    def inner(fn):
+        opt = options(fn)
+        opt.progress = Options(rate=rate, aggregate=aggregate)
+        return fn
+    return inner
+
+
 def pam(user, service=None):
     """
     The *pam* decorator.
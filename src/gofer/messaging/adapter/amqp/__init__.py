@@ -14,10 +14,4 @@ from gofer.messaging.adapter.amqp.model import Exchange, Queue
 from gofer.messaging.adapter.amqp.connection import Connection
 from gofer.messaging.adapter.amqp.consumer import Reader
 from gofer.messaging.adapter.amqp.producer import Sender
-
-
-PROVIDES = [
-    'amqp-0-9-1',
-    'rabbitmq',
-    'rabbit',
-]
\ No newline at end of file
+from gofer.messaging.adapter.amqp.manifest import PROVIDES
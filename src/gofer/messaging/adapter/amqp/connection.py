@@ -10,15 +10,18 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import ssl
+import select
 
+from time import time
 from logging import getLogger
+from threading import Lock, Condition
 from socket import error as SocketError
 
 from amqp import Connection as RealConnection
 from amqp import ConnectionError
 
 from gofer.common import ThreadSingleton, utf8
-from gofer.messaging.adapter.model import Connector, BaseConnection
+from gofer.messaging.adapter.model import Connector, BaseConnection, SharedConnection
 from gofer.messaging.adapter.connect import retry
 
 
@@ -30,10 +33,339 @@ PASSWORD = 'guest'
 
 CONNECTION_EXCEPTIONS = (IOError, SocketError, ConnectionError, AttributeError)
 
+# channel.close is always permitted.
+CHANNEL_CLOSE = (20, 40)
+
+
+def serialized(lock, fn):
+    """
+    Wrap a (real) connection method so that
+    it is called while holding the lock.
+    :param lock: The connection lock.
+    :type lock: RLock
+    :param fn: The method to wrap.
+    :return: The wrapped method.
+    """
+    def _fn(*args, **kwargs):
+        with lock:
+            return fn(*args, **kwargs)
+    return _fn
+
+
+def wait(channel, timeout=None):
+    """
+    Wait for (and dispatch) the next method for the channel.
+    :param channel: The channel.
+    :type channel: amqp.channel.Channel
+    :param timeout: The (optional) timeout in seconds.
+    :type timeout: float
+    :return: True if a method was dispatched.  False when the timeout expired.
+    :rtype: bool
+    :see: Multiplexer.wait()
+    """
+    multiplexer = channel.connection.multiplexer
+    method = multiplexer.wait(channel.channel_id, None, timeout)
+    if method is None:
+        return False
+    channel.dispatch_method(*method)
+    return True
+
+
+def buffered(connection):
+    """
+    Get whether input has already been read from the socket and buffered.
+    Methods decoded by the method reader, frame data buffered by the
+    transport and records decrypted by SSL are not seen by select (or
+    epoll) so they must be checked before waiting on the socket.
+    :param connection: The real connection.
+    :type connection: RealConnection
+    :return: True if buffered.
+    :rtype: bool
+    """
+    if len(connection.method_reader.queue):
+        return True
+    transport = connection.transport
+    if getattr(transport, '_read_buffer', None):
+        return True
+    pending = getattr(transport.sock, 'pending', None)
+    if pending is not None:
+        return pending() > 0
+    return False
+
+
+def allowed(method_sig, allowed_methods):
+    """
+    Get whether a method is allowed.
+    :param method_sig: A method signature.
+    :type method_sig: tuple
+    :param allowed_methods: The allowed methods (None=all).
+    :type allowed_methods: list
+    :return: True if allowed.
+    :rtype: bool
+    """
+    return allowed_methods is None or method_sig in allowed_methods or method_sig == CHANNEL_CLOSE
+
+
+class Multiplexer(object):
+    """
+    Multiplexes reading methods on a real connection shared by all threads.
+    One thread at a time (the reader) waits for the socket to become
+    readable.  The lock is held only while each method is read so other
+    threads may send while the reader waits.  Methods read for other
+    channels are queued on the channel and the waiting owner is notified.
+    When the reader returns, waiting threads are notified so that
+    another may become the reader.
+    Uses py-amqp 1.x internals (python-amqp < 2.0 is required).
+    :ivar impl: The real connection.
+    :type impl: RealConnection
+    :ivar lock: The connection lock.
+    :type lock: RLock
+    :ivar reading: A thread is reading.
+    :type reading: bool
+    :ivar waiting: Conditions notified when a method is queued, by channel ID.
+    :type waiting: dict
+    :ivar epoll: The socket is registered on first use
+        for the lifetime of the connection.
+    :type epoll: select.epoll
+    """
+
+    def __init__(self, impl, lock):
+        """
+        :param impl: The real connection.
+        :type impl: RealConnection
+        :param lock: The connection lock.
+        :type lock: RLock
+        """
+        self.impl = impl
+        self.lock = lock
+        self.reading = False
+        self.waiting = {}
+        self.epoll = None
+        self.__mutex = Lock()
+
+    def wait(self, channel_id, allowed_methods=None, timeout=None):
+        """
+        Wait for the next method for the channel.
+        Replaces RealConnection._wait_method().  Methods already queued
+        for the channel are returned first.  Otherwise, the caller becomes
+        the reader or waits to be notified.
+        :param channel_id: The channel ID.
+        :type channel_id: int
+        :param allowed_methods: The allowed methods (None=all).
+        :type allowed_methods: list
+        :param timeout: The (optional) timeout in seconds.
+        :type timeout: float
+        :return: The method: (method_sig, args, content) or None
+            when the timeout expired.
+        :rtype: tuple
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time() + timeout
+        with self.__mutex:
+            while True:
+                method = self._dequeue(channel_id, allowed_methods)
+                if method is not None:
+                    return method
+                if not self.reading:
+                    self.reading = True
+                    break
+                if deadline is None:
+                    self._sleep(channel_id, None)
+                    continue
+                remaining = deadline - time()
+                if remaining <= 0:
+                    return None
+                self._sleep(channel_id, remaining)
+        try:
+            return self._read(channel_id, allowed_methods, deadline)
+        finally:
+            with self.__mutex:
+                self.reading = False
+                for condition in self.waiting.values():
+                    condition.notify()
+
+    def close(self):
+        """
+        Close the multiplexer.
+        """
+        epoll = self.epoll
+        self.epoll = None
+        if epoll is None:
+            return
+        try:
+            epoll.close()
+        except Exception:
+            pass
+
+    def _dequeue(self, channel_id, allowed_methods):
+        """
+        Dequeue the next allowed method queued for the channel.
+        Must be called while holding the mutex.
+        :param channel_id: The channel ID.
+        :type channel_id: int
+        :param allowed_methods: The allowed methods (None=all).
+        :type allowed_methods: list
+        :return: The method: (method_sig, args, content) or None.
+        :rtype: tuple
+        """
+        queue = self.impl.channels[channel_id].method_queue
+        for queued in queue:
+            if allowed(queued[0], allowed_methods):
+                queue.remove(queued)
+                return queued
+
+    def _sleep(self, channel_id, timeout):
+        """
+        Wait to be notified that a method has been queued for the
+        channel or that the reader has returned.
+        Must be called while holding the mutex.
+        :param channel_id: The channel ID.
+        :type channel_id: int
+        :param timeout: The (optional) timeout in seconds.
+        :type timeout: float
+        """
+        condition = Condition(self.__mutex)
+        self.waiting[channel_id] = condition
+        try:
+            condition.wait(timeout)
+        finally:
+            del self.waiting[channel_id]
+
+    def _read(self, channel_id, allowed_methods, deadline):
+        """
+        Read methods until the next allowed method for the channel is read.
+        Called by the reader.  The lock is held only while each method is read.
+        :param channel_id: The channel ID.
+        :type channel_id: int
+        :param allowed_methods: The allowed methods (None=all).
+        :type allowed_methods: list
+        :param deadline: When the wait expires (None=never).
+        :type deadline: float
+        :return: The method: (method_sig, args, content) or None
+            when the deadline has passed.
+        :rtype: tuple
+        """
+        impl = self.impl
+        while True:
+            if deadline is None:
+                timeout = -1
+            else:
+                timeout = max(deadline - time(), 0)
+            if not buffered(impl) and not self._poll(timeout):
+                if deadline is None:
+                    continue
+                return None
+            with self.lock:
+                channel, method_sig, args, content = impl.method_reader.read_method()
+            if channel == channel_id and allowed(method_sig, allowed_methods):
+                return method_sig, args, content
+            with self.__mutex:
+                impl.channels[channel].method_queue.append((method_sig, args, content))
+                condition = self.waiting.get(channel)
+                if condition is not None:
+                    condition.notify()
+            if not channel:
+                # connection (close) method.
+                impl.wait()
+            if deadline is not None and deadline <= time():
+                return None
+
+    def _poll(self, timeout):
+        """
+        Wait for the socket to become readable.
+        Called only by the reader.
+        :param timeout: The timeout in seconds (-1=forever).
+        :type timeout: float
+        :return: True if readable.
+        :rtype: bool
+        :raise SocketError: when closed.
+        """
+        if self.epoll is None:
+            epoll = select.epoll()
+            epoll.register(self.impl.sock.fileno(), select.EPOLLIN)
+            self.epoll = epoll
+        try:
+            return len(self.epoll.poll(timeout)) > 0
+        except ValueError:
+            raise SocketError('connection closed')
+
+
+class Shared(SharedConnection):
+    """
+    An AMQP connection shared by all threads.
+    The py-amqp connection is not thread-safe so writing each method
+    and reading each method is serialized by the lock.  The lock is
+    not held while waiting.  Reading is multiplexed by the Multiplexer
+    and channels are opened one at a time.
+    """
+
+    def __init__(self, url):
+        """
+        :param url: A broker URL.
+        :type url: str
+        """
+        SharedConnection.__init__(self, url)
+        self.__opening = Lock()
+
+    def connect(self):
+        """
+        Open the real connection.
+        :return: The real connection.
+        :rtype: RealConnection
+        """
+        connector = Connector.find(self.url)
+        host = ':'.join((connector.host, utf8(connector.port)))
+        virtual_host = connector.virtual_host or VIRTUAL_HOST
+        domain = Connection.ssl_domain(connector)
+        userid = connector.userid or USERID
+        password = connector.password or PASSWORD
+        log.info('open: %s', connector)
+        impl = RealConnection(
+            host=host,
+            virtual_host=virtual_host,
+            ssl=domain,
+            userid=userid,
+            password=password,
+            confirm_publish=False)
+        writer = impl.method_writer
+        writer.write_method = serialized(self.lock, writer.write_method)
+        impl.multiplexer = Multiplexer(impl, self.lock)
+        impl._wait_method = impl.multiplexer.wait
+        log.info('opened: %s', self.url)
+        return impl
+
+    def disconnect(self, impl):
+        """
+        Close the real connection.
+        :param impl: The real connection.
+        :type impl: RealConnection
+        """
+        try:
+            impl.close()
+            log.info('closed: %s', self.url)
+        except Exception, pe:
+            log.exception(utf8(pe))
+        impl.multiplexer.close()
+
+    def channel(self, impl):
+        """
+        Open a channel on the real connection.
+        Channels are opened one at a time so that channel IDs
+        are claimed uniquely.
+        :param impl: The real connection.
+        :type impl: RealConnection
+        :return: The *real* channel.
+        """
+        with self.__opening:
+            return impl.channel()
+
 
 class Connection(BaseConnection):
     """
-    An AMQP broker connection.
+    An AMQP (per-thread) broker connection.
+    The real connection is shared by all threads.
+    Publisher confirms are managed by the Sender.
     """
 
     __metaclass__ = ThreadSingleton
@@ -69,8 +401,17 @@ class Connection(BaseConnection):
         :type url: str
         """
         BaseConnection.__init__(self, url)
+        self._shared = Shared(url)
         self._impl = None
 
+    @property
+    def lock(self):
+        """
+        The lock used to serialize I/O on the shared connection.
+        :rtype: RLock
+        """
+        return self._shared.lock
+
     def is_open(self):
         """
         Get whether the connection has been opened.
@@ -87,37 +428,30 @@ class Connection(BaseConnection):
         if self.is_open():
             # already open
             return
-        connector = Connector.find(self.url)
-        host = ':'.join((connector.host, utf8(connector.port)))
-        virtual_host = connector.virtual_host or VIRTUAL_HOST
-        domain = self.ssl_domain(connector)
-        userid = connector.userid or USERID
-        password = connector.password or PASSWORD
-        log.info('open: %s', connector)
-        self._impl = RealConnection(
-            host=host,
-            virtual_host=virtual_host,
-            ssl=domain,
-            userid=userid,
-            password=password,
-            confirm_publish=True)
-        log.info('opened: %s', self.url)
+        self._impl = self._shared.acquire()
+
+    def repair(self):
+        """
+        Repair the connection.
+        The (broken) shared connection is discarded and reopened.
+        """
+        impl = self._impl
+        self._impl = None
+        self._shared.discard(impl)
+        self.open()
 
     def channel(self):
         """
         Open a channel.
         :return The *real* channel.
         """
-        return self._impl.channel()
+        return self._shared.channel(self._impl)
 
     def close(self):
         """
         Close the connection.
+        The shared connection is closed when no longer referenced.
         """
-        connection = self._impl
+        impl = self._impl
         self._impl = None
-        try:
-            connection.close()
-            log.info('closed: %s', self.url)
-        except Exception, pe:
-            log.exception(utf8(pe))
+        self._shared.release(impl)
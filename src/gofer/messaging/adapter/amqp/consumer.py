@@ -9,15 +9,14 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
-import select
-
 from Queue import Empty
 from Queue import Queue as Inbox
 from logging import getLogger
 
 from gofer.common import utf8
 from gofer.messaging.adapter.model import BaseReader, Message
-from gofer.messaging.adapter.amqp.connection import Connection
+from gofer.messaging.adapter.reliability import blocking
+from gofer.messaging.adapter.amqp.connection import Connection, wait
 from gofer.messaging.adapter.amqp.reliability import reliable
 
 
@@ -27,6 +26,9 @@ log = getLogger(__name__)
 NO_DELAY = 0
 DELIVERY_TAG = 'delivery_tag'
 
+# max number of buffered methods drained on each wakeup.
+DRAIN = 100
+
 
 class Reader(BaseReader):
     """
@@ -74,8 +76,7 @@ class Reader(BaseReader):
         :raise: NotFound
         """
         self.close()
-        self.connection.close()
-        self.connection.open()
+        self.connection.repair()
         self.channel = self.connection.channel()
         receiver = Receiver(self)
         self.receiver = receiver.open()
@@ -97,6 +98,16 @@ class Reader(BaseReader):
         except Exception:
             pass
 
+    @reliable
+    def flow(self, prefetch):
+        """
+        Set the prefetch window.
+        :param prefetch: The number of messages prefetched from the broker.
+        :type prefetch: int
+        """
+        self.channel.basic_qos(0, prefetch, False)
+
+    @blocking
     @reliable
     def get(self, timeout=None):
         """
@@ -142,29 +153,6 @@ class Receiver(object):
     :type inbox: Inbox
     """
 
-    @staticmethod
-    def _wait(fd, channel, timeout):
-        """
-        Wait on channel.
-        :param fd: The connection file descriptor.
-        :type fd: int
-        :return: The channel.
-        :rtype: amqp.channel.Channel
-        :param timeout: The read timeout in seconds.
-        :type timeout: int
-        """
-        if len(channel.method_queue):
-            channel.wait()
-            return
-        epoll = select.epoll()
-        epoll.register(fd, select.EPOLLIN)
-        try:
-            if epoll.poll(timeout):
-                channel.wait()
-        finally:
-            epoll.unregister(fd)
-            epoll.close()
-
     def __init__(self, reader):
         """
         :param reader: A message reader.
@@ -174,6 +162,26 @@ class Receiver(object):
         self.inbox = Inbox()
         self.tag = None
 
+    @staticmethod
+    def _wait(channel, timeout):
+        """
+        Wait on channel.
+        When the next method for the channel has been dispatched,
+        the methods already queued or buffered are processed (drained)
+        into the inbox.  The shared connection is read by one thread at
+        a time and the waiting thread is notified when methods are
+        queued for its channel.
+        :param channel: The channel.
+        :type channel: amqp.channel.Channel
+        :param timeout: The read timeout in seconds.
+        :type timeout: int
+        """
+        if not wait(channel, timeout):
+            return
+        for _ in range(DRAIN):
+            if not wait(channel, NO_DELAY):
+                break
+
     def channel(self):
         """
         :return: The channel.
@@ -190,6 +198,9 @@ class Receiver(object):
         fn = self.inbox.put
         channel = self.channel()
         address = self.reader.node.address
+        prefetch = self.reader.prefetch
+        if prefetch:
+            channel.basic_qos(0, prefetch, False)
         self.tag = channel.basic_consume(address, callback=fn)
         return self
 
@@ -215,6 +226,5 @@ class Receiver(object):
         inbox = self.inbox
         if inbox.empty():
             channel = self.channel()
-            fd = channel.connection.sock.fileno()
-            self._wait(fd, channel, timeout)
+            self._wait(channel, timeout)
         return inbox.get(block=False)
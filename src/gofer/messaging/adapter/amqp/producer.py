@@ -9,19 +9,66 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from time import time
 from logging import getLogger
 
 from amqp import Message
 
 from gofer.common import utf8
 from gofer.messaging.adapter.model import BaseSender
-from gofer.messaging.adapter.amqp.connection import Connection
+from gofer.messaging.adapter.amqp.connection import Connection, wait
 from gofer.messaging.adapter.amqp.reliability import reliable
 
 
 log = getLogger(__name__)
 
 
+# basic.ack & basic.nack
+CONFIRMS = [(60, 80), (60, 120)]
+
+# The number of times a nacked message is published again.
+RETRIES = 3
+
+# Seconds close() waits for outstanding publisher confirms.
+LINGER = 10
+
+
+class NotConfirmed(Exception):
+    """
+    Published messages were nacked by the broker (after retries).
+    :ivar addresses: The address of each message not confirmed.
+    :type addresses: list
+    """
+
+    DESCRIPTION = 'Published: %d message(s) not confirmed: %s'
+
+    def __init__(self, addresses):
+        """
+        :param addresses: The address of each message not confirmed.
+        :type addresses: list
+        """
+        description = self.DESCRIPTION % (len(addresses), ', '.join(sorted(set(addresses))))
+        Exception.__init__(self, description)
+        self.addresses = addresses
+
+
+def split(address):
+    """
+    Split an AMQP address into exchange and routing key.
+    :param address: An AMQP address.
+    :type address: str
+    :return: tuple of: (exchange, key)
+    :rtype: tuple
+    """
+    parts = address.split('/')
+    if len(parts) > 1:
+        exchange = parts[0]
+    else:
+        exchange = ''
+    key = parts[-1]
+    return exchange, key
+
+
 def build_message(body, ttl, durable):
     """
     Construct a message object.
@@ -47,9 +94,179 @@ def build_message(body, ttl, durable):
     return Message(body, **properties)
 
 
+class Confirms(object):
+    """
+    Tracks publisher confirms on a channel.
+    Messages are published without waiting and the broker
+    confirmations (which may be cumulative) are collected by wait().
+    Each published message is kept until confirmed.  Nacked messages
+    are published again (up to RETRIES times) and messages carried over
+    from a broken channel (the backlog) are published again before
+    any new message.
+    Published messages are tracked as: (message, exchange, key, retries).
+    :ivar channel: An AMQP channel in confirm mode.
+    :type channel: amqp.channel.Channel
+    :ivar published: The delivery tag of the last message published.
+    :type published: int
+    :ivar unconfirmed: Published messages not yet confirmed by delivery tag.
+    :type unconfirmed: dict
+    :ivar backlog: Messages to be published again.
+    :type backlog: list
+    :ivar nacked: Messages nacked by the broker.
+    :type nacked: list
+    :ivar failed: Messages nacked more than RETRIES times.
+    :type failed: list
+    """
+
+    def __init__(self, channel):
+        """
+        :param channel: An AMQP channel.
+        :type channel: amqp.channel.Channel
+        """
+        self.channel = channel
+        self.published = 0
+        self.unconfirmed = {}
+        self.backlog = []
+        self.nacked = []
+        self.failed = []
+        channel.events['basic_ack'].add(self.ack)
+        channel.events['basic_nack'].add(self.nack)
+        channel.confirm_select()
+
+    @property
+    def outstanding(self):
+        """
+        The number of messages not yet confirmed.
+        :rtype: int
+        """
+        return len(self.unconfirmed) + len(self.backlog) + len(self.nacked)
+
+    def pending(self):
+        """
+        Get the messages not yet confirmed in the order published.
+        :return: A list of: (message, exchange, key, retries).
+        :rtype: list
+        """
+        unconfirmed = [self.unconfirmed[t] for t in sorted(self.unconfirmed)]
+        return self.backlog + unconfirmed + self.nacked
+
+    def publish(self, message, exchange, key):
+        """
+        Publish a message without waiting for the confirmation.
+        The backlog and nacked messages are published first.
+        :param message: A message to publish.
+        :type message: Message
+        :param exchange: The exchange name.
+        :type exchange: str
+        :param key: The routing key.
+        :type key: str
+        """
+        self.resend()
+        self._publish((message, exchange, key, 0))
+
+    def resend(self):
+        """
+        Publish the backlog and nacked messages again.
+        Messages nacked more than RETRIES times are moved to: failed.
+        """
+        while self.backlog:
+            self._publish(self.backlog[0])
+            self.backlog.pop(0)
+        while self.nacked:
+            message, exchange, key, retries = self.nacked[0]
+            if retries < RETRIES:
+                self._publish((message, exchange, key, retries + 1))
+            else:
+                self.failed.append(self.nacked[0])
+            self.nacked.pop(0)
+
+    def _publish(self, published):
+        """
+        Publish a message.
+        :param published: A tracked message: (message, exchange, key, retries).
+        :type published: tuple
+        """
+        message, exchange, key, retries = published
+        self.channel.basic_publish(message, mandatory=True, exchange=exchange, routing_key=key)
+        self.published += 1
+        self.unconfirmed[self.published] = published
+
+    def confirmed(self, tag, multiple):
+        """
+        Remove confirmed delivery tags.
+        :param tag: A delivery tag.
+        :type tag: int
+        :param multiple: All tags up to and including *tag*.
+        :type multiple: bool
+        :return: The messages removed in the order published.
+        :rtype: list
+        """
+        if multiple:
+            tags = sorted(t for t in self.unconfirmed if t <= tag)
+        else:
+            tags = [t for t in self.unconfirmed if t == tag]
+        return [self.unconfirmed.pop(t) for t in tags]
+
+    def ack(self, tag, multiple=False, *unused):
+        """
+        Called on basic.ack.
+        """
+        self.confirmed(tag, multiple)
+
+    def nack(self, tag, multiple=False, *unused):
+        """
+        Called on basic.nack.
+        """
+        self.nacked.extend(self.confirmed(tag, multiple))
+
+    def wait(self, window=0, timeout=None):
+        """
+        Wait until no more than *window* messages are unconfirmed.
+        Nacked messages are published again while waiting.  The failed
+        messages are reported by address because, when the window is
+        greater than zero, they may have been sent by an earlier call.
+        :param window: The number of messages permitted to be unconfirmed.
+        :type window: int
+        :param timeout: The (optional) wait timeout in seconds.
+        :type timeout: float
+        :return: False when the timeout expired.
+        :rtype: bool
+        :raise NotConfirmed: when messages have been nacked (after retries).
+        """
+        if timeout is not None:
+            deadline = time() + timeout
+        while True:
+            self.resend()
+            failed = self.failed
+            if failed:
+                self.failed = []
+                raise NotConfirmed(['/'.join(filter(None, p[1:3])) for p in failed])
+            if self.outstanding <= window:
+                return True
+            if timeout is None:
+                self.channel.wait(CONFIRMS)
+                continue
+            remaining = deadline - time()
+            if remaining <= 0:
+                return False
+            self._read(remaining)
+
+    def _read(self, timeout):
+        """
+        Read (and dispatch) the next method for the channel.
+        :param timeout: The read timeout in seconds.
+        :type timeout: float
+        """
+        wait(self.channel, timeout)
+
+
 class Sender(BaseSender):
     """
     An AMQP message sender.
+    Messages not confirmed when the connection is repaired are
+    published again on the new channel.
+    :ivar confirms: Tracks publisher confirms.
+    :type confirms: Confirms
     """
 
     def __init__(self, url):
@@ -60,6 +277,7 @@ class Sender(BaseSender):
         BaseSender.__init__(self, url)
         self.connection = Connection(url)
         self.channel = None
+        self.confirms = None
 
     def is_open(self):
         """
@@ -79,44 +297,99 @@ class Sender(BaseSender):
             return
         self.connection.open()
         self.channel = self.connection.channel()
+        self.confirms = Confirms(self.channel)
 
     def repair(self):
         """
         Repair the reader.
+        Messages not yet confirmed are carried over to the new channel.
         """
+        confirms = self.confirms
+        self.confirms = None
         self.close()
-        self.connection.close()
-        self.connection.open()
+        self.connection.repair()
         self.channel = self.connection.channel()
+        self.confirms = Confirms(self.channel)
+        if confirms is not None:
+            self.confirms.backlog = confirms.pending()
 
     def close(self):
         """
         Close the reader.
+        Waits (up to LINGER seconds) for outstanding publisher confirms.
         """
+        confirms = self.confirms
+        self.confirms = None
         channel = self.channel
         self.channel = None
+        try:
+            if confirms is not None and not confirms.wait(timeout=LINGER):
+                log.warn('%d message(s) not confirmed', confirms.outstanding)
+        except Exception, e:
+            log.warn(utf8(e))
         try:
             channel.close()
         except Exception:
             pass
 
-    @reliable
     def send(self, address, content, ttl=None):
         """
         Send a message.
+        Returns once no more than (window - 1) messages are unconfirmed.
         :param address: An AMQP address.
         :type address: str
         :param content: The message content
         :type content: buf
         :param ttl: Time to Live (seconds)
         :type ttl: float
+        :raise NotConfirmed: when messages have been nacked (after retries).
         """
-        parts = address.split('/')
-        if len(parts) > 1:
-            exchange = parts[0]
-        else:
-            exchange = ''
-        key = parts[-1]
+        exchange, key = split(address)
         message = build_message(content, ttl, self.durable)
-        self.channel.basic_publish(message, mandatory=True, exchange=exchange, routing_key=key)
+        self._publish(message, exchange, key)
+        self._confirm(max(self.window - 1, 0))
         log.debug('sent (%s)', address)
+
+    def send_batch(self, address, contents, ttl=None):
+        """
+        Send a batch of messages.
+        The messages are published back to back and a
+        single (cumulative) confirmation is awaited.
+        :param address: An AMQP address.
+        :type address: str
+        :param contents: A list of message content.
+        :type contents: list
+        :param ttl: Time to Live (seconds)
+        :type ttl: float
+        :raise NotConfirmed: when messages have been nacked (after retries).
+        """
+        exchange, key = split(address)
+        for content in contents:
+            message = build_message(content, ttl, self.durable)
+            self._publish(message, exchange, key)
+        self._confirm(0)
+        log.debug('sent (%s) %d messages', address, len(contents))
+
+    @reliable
+    def _publish(self, message, exchange, key):
+        """
+        Publish a message.
+        Each message is published (and retried) separately so that
+        messages already published are not duplicated on repair.
+        :param message: A message to publish.
+        :type message: Message
+        :param exchange: The exchange name.
+        :type exchange: str
+        :param key: The routing key.
+        :type key: str
+        """
+        self.confirms.publish(message, exchange, key)
+
+    @reliable
+    def _confirm(self, window):
+        """
+        Wait until no more than *window* messages are unconfirmed.
+        :param window: The number of messages permitted to be unconfirmed.
+        :type window: int
+        """
+        self.confirms.wait(window)
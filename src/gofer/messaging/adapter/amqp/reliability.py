@@ -73,8 +73,7 @@ class Endpoint(Messenger):
         self.channel = self.connection.channel()
     
     def repair(self):
-        self.connection.close()
-        self.connection.open()
+        self.connection.repair()
         self.channel = self.connection.channel()
 
     def close(self):
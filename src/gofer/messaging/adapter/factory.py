@@ -16,6 +16,8 @@
 import os
 import logging
 
+from time import time
+
 from gofer import utf8
 from gofer.messaging.model import ModelError
 from gofer.messaging.adapter.url import URL
@@ -29,6 +31,9 @@ log = logging.getLogger(__name__)
 # __package__ not supported in python 2.4
 PACKAGE = '.'.join(__name__.split('.')[:-1])
 
+# adapter manifest (read without importing the adapter)
+MANIFEST = 'manifest.py'
+
 # symbols required to be supported by all adapters
 REQUIRED = [
     'PROVIDES',
@@ -67,12 +72,95 @@ class AdapterNotFound(AdapterError):
 # --- factory ----------------------------------------------------------------
 
 
+class Manifest(object):
+    """
+    An adapter manifest.
+    Describes an adapter without importing it (or the messaging
+    library) so the adapter is imported only when selected.
+    :ivar name: The adapter name.
+    :type name: str
+    :ivar package: The adapter package (module path).
+    :type package: str
+    :ivar provides: The list of capabilities.
+    :type provides: list
+    :ivar default: The adapter may be selected when no URL
+        (or adapter) is specified.
+    :type default: bool
+    :ivar adapter: The imported adapter package.
+    :type adapter: module
+    :ivar error: The reason the import failed.
+    :type error: str
+    """
+
+    @staticmethod
+    def read(path):
+        """
+        Read the manifest for the adapter at the specified path.
+        :param path: The adapter (package) directory.
+        :type path: str
+        :return: The manifest or None when the adapter has no manifest.
+        :rtype: Manifest
+        """
+        name = os.path.basename(path)
+        path = os.path.join(path, MANIFEST)
+        if not os.path.isfile(path):
+            return None
+        namespace = {}
+        execfile(path, namespace)
+        package = '.'.join((PACKAGE, name))
+        return Manifest(
+            name,
+            package,
+            namespace['PROVIDES'],
+            namespace.get('DEFAULT', True))
+
+    def __init__(self, name, package, provides, default=True):
+        """
+        :param name: The adapter name.
+        :type name: str
+        :param package: The adapter package (module path).
+        :type package: str
+        :param provides: The list of capabilities.
+        :type provides: list
+        :param default: The adapter may be selected when no URL
+            (or adapter) is specified.
+        :type default: bool
+        """
+        self.name = name
+        self.package = package
+        self.provides = provides
+        self.default = default
+        self.adapter = None
+        self.error = None
+
+    def load(self):
+        """
+        Import the adapter.
+        A failed import is not retried.
+        :return: The adapter package or None when the import failed.
+        :rtype: module
+        """
+        if self.adapter or self.error:
+            return self.adapter
+        started = time()
+        try:
+            pkg = __import__(self.package, {}, {}, REQUIRED)
+            self.provides = pkg.PROVIDES
+            self.adapter = pkg
+            log.debug('imported: %s in %.3f seconds', self.package, time() - started)
+        except (ImportError, AttributeError), e:
+            self.error = utf8(e)
+            log.warn('Import: %s, failed: %s', self.package, self.error)
+        return self.adapter
+
+
 class Loader:
     """
-    Adapter adapter loader.
-    :ivar list: A list of loaded adapters.
+    Adapter manifest loader.
+    :ivar list: A list of adapter manifests.
     :type list: list
-    :ivar catalog: A catalog of loaded adapters by capabilities.
+    :ivar catalog: Lists of adapter manifests by name and capabilities.
+        Ordered by priority.
     :type catalog: dict
     """
 
@@ -83,7 +171,8 @@ class Loader:
     @staticmethod
     def _load():
         """
-        Load the adapters and return a list and catalog.
+        Read the adapter manifests and return a list and catalog.
+        Adapters without a manifest are imported.
         :return: A tuple of (list, dict)
         :rtype: tuple
         """
@@ -91,26 +180,25 @@ class Loader:
         catalog = {}
         _dir = os.path.dirname(__file__)
         for name in sorted(os.listdir(_dir)):
-            package = '.'.join((PACKAGE, name))
             path = os.path.join(_dir, name)
             if not os.path.isdir(path):
                 continue
-            try:
-                pkg = __import__(package, {}, {}, REQUIRED)
-                _list.append(pkg)
-                catalog[name] = pkg
-                catalog[package] = pkg
-                for capability in pkg.PROVIDES:
-                    catalog[capability] = pkg
-            except (ImportError, AttributeError), e:
-                log.warn('Import: %s, failed: %s', package, utf8(e))
+            manifest = Manifest.read(path)
+            if manifest is None:
+                package = '.'.join((PACKAGE, name))
+                manifest = Manifest(name, package, [])
+                if not manifest.load():
+                    continue
+            _list.append(manifest)
+            for key in set([name, manifest.package] + manifest.provides):
+                catalog.setdefault(key, []).insert(0, manifest)
         return _list, catalog
 
     def load(self):
         """
-        Load adapter adapters.
-        :return: The loaded adapters.
-        :rtype: dict
+        Load adapter manifests.
+        :return: The adapter manifests.
+        :rtype: tuple
         """
         if not self.list:
             _list, catalog = Loader._load()
@@ -122,7 +210,7 @@ class Loader:
 class Adapter(object):
     """
     A messaging adapter factory object.
-    :cvar bindings: A mapping of URL to adapter.
+    :cvar bindings: A mapping of URL to adapter manifests.
     :type bindings: dict
     :cvar loader: An adapter loader.
     :type loader: Loader
@@ -131,10 +219,25 @@ class Adapter(object):
     bindings = {}
     loader = Loader()
 
+    @staticmethod
+    def select(manifests):
+        """
+        Select (import) the first adapter that can be imported.
+        :param manifests: A list of adapter manifests.
+        :type manifests: list
+        :return: The adapter package or None.
+        :rtype: module
+        """
+        for manifest in manifests:
+            adapter = manifest.load()
+            if adapter:
+                return adapter
+
     @staticmethod
     def bind(url, name):
         """
         Bind (associate) a URL to an adapter.
+        The adapter is imported when the URL is first used.
         :param url: A broker URL.
         :type url: str
         :param name: An adapter name or capability.
@@ -154,6 +257,7 @@ class Adapter(object):
     def find(url=None):
         """
         Find an adapter by URL.
+        Only the selected adapter is imported.
         :param url: A broker URL.
         :type url: str
         :return: The requested adapter or the adapter with the
@@ -161,16 +265,22 @@ class Adapter(object):
         :raise: AdapterNotFound
         """
         _list, catalog = Adapter.loader.load()
+        if not url:
+            adapter = Adapter.select([m for m in _list if m.default])
+            if adapter is None:
+                raise NoAdaptersLoaded()
+            return adapter
         if not _list:
             raise NoAdaptersLoaded()
-        if not url:
-            return _list[0]
+        url = URL(url)
         try:
-            url = URL(url)
             if url.adapter:
-                return catalog[url.adapter]
+                manifests = catalog[url.adapter]
             else:
-                return Adapter.bindings[url.canonical]
+                manifests = Adapter.bindings[url.canonical]
         except KeyError:
             raise AdapterNotFound(url.adapter)
-
+        adapter = Adapter.select(manifests)
+        if adapter is None:
+            raise AdapterNotFound(url.adapter)
+        return adapter
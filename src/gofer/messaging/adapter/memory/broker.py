@@ -0,0 +1,490 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+
+"""
+An in-process (loopback) broker.
+Queues and exchanges are kept in memory and shared by all
+threads in the process so that agents and clients may run in
+the same process without an AMQP broker.
+"""
+
+from time import time
+from collections import deque
+from threading import RLock, Condition
+from logging import getLogger
+
+from gofer.common import Singleton, synchronized
+from gofer.messaging.adapter.model import NotFound, DIRECT, TOPIC
+from gofer.messaging.adapter.url import URL
+
+
+log = getLogger(__name__)
+
+
+# the default (nameless) exchange routes directly to queues.
+DEFAULT_EXCHANGE = ''
+
+# exchanges declared by the broker.
+PREDECLARED = {
+    'amq.direct': DIRECT,
+    'amq.topic': TOPIC,
+}
+
+# the host used when not specified by the URL.
+LOCALHOST = 'localhost'
+
+
+def split(address):
+    """
+    Split an AMQP address into exchange and routing key.
+    :param address: An AMQP address.
+    :type address: str
+    :return: tuple of: (exchange, key)
+    :rtype: tuple
+    """
+    parts = address.split('/')
+    if len(parts) > 1:
+        exchange = parts[0]
+    else:
+        exchange = DEFAULT_EXCHANGE
+    key = parts[-1]
+    return exchange, key
+
+
+def match(pattern, key):
+    """
+    Match a routing key using an AMQP topic pattern.
+    Words are separated by (.) and the (*) wildcard matches
+    exactly one word and (#) matches zero or more words.
+    :param pattern: A topic pattern.
+    :type pattern: str
+    :param key: A routing key.
+    :type key: str
+    :return: True if matched.
+    :rtype: bool
+    """
+    return _match(pattern.split('.'), key.split('.'))
+
+
+def _match(pattern, key):
+    """
+    Match a list of routing key words using a list of pattern words.
+    :param pattern: A list of pattern words.
+    :type pattern: list
+    :param key: A list of key words.
+    :type key: list
+    :return: True if matched.
+    :rtype: bool
+    """
+    if not pattern:
+        return not key
+    if pattern[0] == '#':
+        return _match(pattern[1:], key) or (len(key) > 0 and _match(pattern, key[1:]))
+    if not key:
+        return False
+    if pattern[0] != '*' and pattern[0] != key[0]:
+        return False
+    return _match(pattern[1:], key[1:])
+
+
+class Message(object):
+    """
+    A message (envelope).
+    :ivar body: The message body.
+    :type body: str
+    :ivar durable: The message is durable.
+    :type durable: bool
+    :ivar expiration: When the message expires (0=never).
+    :type expiration: float
+    """
+
+    __slots__ = ('body', 'durable', 'expiration')
+
+    def __init__(self, body, ttl=None, durable=True):
+        """
+        :param body: The message body.
+        :type body: str
+        :param ttl: Time to Live (seconds)
+        :type ttl: float
+        :param durable: The message is durable.
+        :type durable: bool
+        """
+        self.body = body
+        self.durable = durable
+        if ttl:
+            self.expiration = time() + ttl
+        else:
+            self.expiration = 0
+
+    def expired(self):
+        """
+        Get whether the message has expired.
+        :return: True if expired.
+        :rtype: bool
+        """
+        return self.expiration and self.expiration < time()
+
+
+class Queue(object):
+    """
+    An in-memory message queue.
+    :ivar name: The queue name.
+    :type name: str
+    :ivar durable: Indicates the queue is durable.
+    :type durable: bool
+    :ivar auto_delete: The queue is deleted when no longer used.
+    :type auto_delete: bool
+    :ivar expiration: Seconds an unused auto_delete queue is kept.
+    :type expiration: int
+    :ivar exclusive: Indicates the queue can only have one consumer.
+    :type exclusive: bool
+    :ivar messages: The queued messages.
+    :type messages: deque
+    :ivar readers: The number of open readers.
+    :type readers: int
+    :ivar used: The queue has been read.
+    :type used: bool
+    :ivar unused: When the queue was last used by a reader.
+    :type unused: float
+    """
+
+    def __init__(self, name, durable=True, auto_delete=False, expiration=0, exclusive=False):
+        """
+        :param name: The queue name.
+        :type name: str
+        :param durable: Indicates the queue is durable.
+        :type durable: bool
+        :param auto_delete: The queue is deleted when no longer used.
+        :type auto_delete: bool
+        :param expiration: Seconds an unused auto_delete queue is kept.
+        :type expiration: int
+        :param exclusive: Indicates the queue can only have one consumer.
+        :type exclusive: bool
+        """
+        self.name = name
+        self.durable = durable
+        self.auto_delete = auto_delete
+        self.expiration = expiration
+        self.exclusive = exclusive
+        self.messages = deque()
+        self.readers = 0
+        self.used = False
+        self.unused = time()
+        self.condition = Condition(RLock())
+
+    def put(self, message):
+        """
+        Append a message.
+        :param message: A message.
+        :type message: Message
+        """
+        with self.condition:
+            self.messages.append(message)
+            self.condition.notify()
+
+    def requeue(self, message):
+        """
+        Return a message to the head of the queue.
+        :param message: A message.
+        :type message: Message
+        """
+        with self.condition:
+            self.messages.appendleft(message)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Get the next (unexpired) message.
+        :param timeout: The read timeout in seconds.
+        :type timeout: float
+        :return: The next message or None.
+        :rtype: Message
+        """
+        deadline = time() + (timeout or 0)
+        with self.condition:
+            while True:
+                while self.messages:
+                    message = self.messages.popleft()
+                    if message.expired():
+                        continue
+                    return message
+                remaining = deadline - time()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def attach(self):
+        """
+        A reader has been opened.
+        """
+        with self.condition:
+            self.readers += 1
+            self.used = True
+
+    def detach(self):
+        """
+        A reader has been closed.
+        :return: True when no longer used.
+        :rtype: bool
+        """
+        with self.condition:
+            self.readers = max(self.readers - 1, 0)
+            self.unused = time()
+            return self.readers == 0
+
+    def expired(self):
+        """
+        Get whether the (auto_delete) queue has expired.
+        An auto_delete queue without an expiration is deleted
+        when the last reader is closed.  Otherwise, it is deleted
+        when not read for the expiration.
+        :return: True if expired.
+        :rtype: bool
+        """
+        if not self.auto_delete or self.readers:
+            return False
+        if self.expiration:
+            return self.unused + self.expiration < time()
+        else:
+            return self.used
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class Exchange(object):
+    """
+    An in-memory exchange.
+    :ivar name: The exchange name.
+    :type name: str
+    :ivar policy: The routing policy (direct|topic).
+    :type policy: str
+    :ivar bindings: The bound queue names (binding keys).
+    :type bindings: set
+    """
+
+    def __init__(self, name, policy=DIRECT):
+        """
+        :param name: The exchange name.
+        :type name: str
+        :param policy: The routing policy (direct|topic).
+        :type policy: str
+        """
+        self.name = name
+        self.policy = policy
+        self.bindings = set()
+
+    def route(self, key):
+        """
+        Get the names of queues bound using the routing key.
+        :param key: A routing key.
+        :type key: str
+        :return: The list of queue names.
+        :rtype: list
+        """
+        if self.policy == TOPIC:
+            return [b for b in self.bindings if match(b, key)]
+        if key in self.bindings:
+            return [key]
+        return []
+
+
+class Broker(object):
+    """
+    An in-process broker.
+    One broker per host (and port) in the URL.
+    :ivar queues: Declared queues by name.
+    :type queues: dict
+    :ivar exchanges: Declared exchanges by name.
+    :type exchanges: dict
+    """
+
+    __metaclass__ = Singleton
+
+    @staticmethod
+    def find(url):
+        """
+        Find the broker for the specified URL.
+        :param url: The broker url.
+        :type url: str
+        :return: The broker.
+        :rtype: Broker
+        """
+        url = URL(url)
+        return Broker(url.host or LOCALHOST, url.port)
+
+    def __init__(self, host, port):
+        """
+        :param host: The broker host.
+        :type host: str
+        :param port: The broker port.
+        :type port: int
+        """
+        self.host = host
+        self.port = port
+        self.queues = {}
+        self.exchanges = {}
+        for name, policy in PREDECLARED.items():
+            self.exchanges[name] = Exchange(name, policy)
+        self.__mutex = RLock()
+
+    @synchronized
+    def reap(self):
+        """
+        Delete expired (auto_delete) queues.
+        """
+        for queue in self.queues.values():
+            if queue.expired():
+                self.delete_queue(queue.name)
+
+    @synchronized
+    def declare_queue(self, name, **properties):
+        """
+        Declare a queue.
+        Declaring a queue that already exists has no effect.
+        :param name: The queue name.
+        :type name: str
+        :param properties: The queue properties.
+        :see: Queue
+        """
+        if name not in self.queues:
+            self.queues[name] = Queue(name, **properties)
+            log.debug('declared queue: %s', name)
+
+    @synchronized
+    def delete_queue(self, name):
+        """
+        Delete a queue.
+        The queue is unbound from all exchanges.
+        :param name: The queue name.
+        :type name: str
+        """
+        self.queues.pop(name, None)
+        for exchange in self.exchanges.values():
+            exchange.bindings.discard(name)
+        log.debug('deleted queue: %s', name)
+
+    @synchronized
+    def queue(self, name):
+        """
+        Find a queue by name.
+        :param name: The queue name.
+        :type name: str
+        :return: The queue.
+        :rtype: Queue
+        :raise: NotFound
+        """
+        self.reap()
+        try:
+            return self.queues[name]
+        except KeyError:
+            raise NotFound('queue: %s, not-found' % name)
+
+    @synchronized
+    def declare_exchange(self, name, policy=DIRECT):
+        """
+        Declare an exchange.
+        Declaring an exchange that already exists has no effect.
+        :param name: The exchange name.
+        :type name: str
+        :param policy: The routing policy (direct|topic).
+        :type policy: str
+        """
+        if name not in self.exchanges:
+            self.exchanges[name] = Exchange(name, policy)
+            log.debug('declared exchange: %s', name)
+
+    @synchronized
+    def delete_exchange(self, name):
+        """
+        Delete an exchange.
+        :param name: The exchange name.
+        :type name: str
+        """
+        self.exchanges.pop(name, None)
+        log.debug('deleted exchange: %s', name)
+
+    @synchronized
+    def exchange(self, name):
+        """
+        Find an exchange by name.
+        :param name: The exchange name.
+        :type name: str
+        :return: The exchange.
+        :rtype: Exchange
+        :raise: NotFound
+        """
+        try:
+            return self.exchanges[name]
+        except KeyError:
+            raise NotFound('exchange: %s, not-found' % name)
+
+    @synchronized
+    def bind(self, exchange, queue):
+        """
+        Bind a queue to an exchange.
+        The queue name is used as the binding key.
+        :param exchange: The exchange name.
+        :type exchange: str
+        :param queue: The queue name.
+        :type queue: str
+        :raise: NotFound
+        """
+        self.queue(queue)
+        self.exchange(exchange).bindings.add(queue)
+
+    @synchronized
+    def unbind(self, exchange, queue):
+        """
+        Unbind a queue from an exchange.
+        :param exchange: The exchange name.
+        :type exchange: str
+        :param queue: The queue name.
+        :type queue: str
+        :raise: NotFound
+        """
+        self.exchange(exchange).bindings.discard(queue)
+
+    @synchronized
+    def route(self, address):
+        """
+        Get the queues for an AMQP address.
+        :param address: An AMQP address.
+        :type address: str
+        :return: The list of queues.
+        :rtype: list
+        :raise: NotFound
+        """
+        self.reap()
+        exchange, key = split(address)
+        if exchange == DEFAULT_EXCHANGE:
+            names = [key]
+        else:
+            names = self.exchange(exchange).route(key)
+        return [self.queues[n] for n in names if n in self.queues]
+
+    def send(self, address, message):
+        """
+        Send a message.
+        Messages not routed to a queue are discarded.
+        :param address: An AMQP address.
+        :type address: str
+        :param message: The message.
+        :type message: Message
+        :raise: NotFound
+        """
+        queues = self.route(address)
+        if not queues:
+            log.debug('address: %s, not routed (discarded)', address)
+        for queue in queues:
+            queue.put(message)
@@ -0,0 +1,70 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+
+from logging import getLogger
+
+from gofer.common import ThreadSingleton
+from gofer.messaging.adapter.model import BaseConnection
+from gofer.messaging.adapter.memory.broker import Broker
+
+
+log = getLogger(__name__)
+
+
+class Connection(BaseConnection):
+    """
+    Represents a (per-thread) connection to the in-process broker.
+    :ivar broker: The broker (when open).
+    :type broker: Broker
+    """
+
+    __metaclass__ = ThreadSingleton
+
+    def __init__(self, url):
+        """
+        :param url: The broker url.
+        :type url: str
+        """
+        BaseConnection.__init__(self, url)
+        self.broker = None
+
+    def is_open(self):
+        """
+        Get whether the connection has been opened.
+        :return: True if open.
+        :rtype bool
+        """
+        return self.broker is not None
+
+    def open(self):
+        """
+        Open a connection to the broker.
+        """
+        if self.is_open():
+            # already open
+            return
+        self.broker = Broker.find(self.url)
+        log.debug('opened: %s', self.url)
+
+    def repair(self):
+        """
+        Repair the connection.
+        """
+        self.close()
+        self.open()
+
+    def close(self):
+        """
+        Close the connection.
+        """
+        self.broker = None
@@ -0,0 +1,150 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+
+"""
+Provides in-process message consumer classes.
+"""
+
+from logging import getLogger
+
+from gofer.messaging.adapter.model import BaseReader, Message, NotFound
+from gofer.messaging.adapter.memory.connection import Connection
+
+
+log = getLogger(__name__)
+
+
+class Reader(BaseReader):
+    """
+    An in-process message reader.
+    Messages that have been read but not acknowledged are
+    returned to the queue when rejected (requeue) or when
+    the reader is closed.
+    :ivar queue: The queue to read.
+    :type queue: gofer.messaging.adapter.memory.broker.Queue
+    :ivar unacked: Messages read but not acknowledged.
+    :type unacked: list
+    """
+
+    def __init__(self, node, url):
+        """
+        :param node: The AMQP node to read.
+        :type node: gofer.messaging.adapter.model.Node
+        :param url: The broker url.
+        :type url: str
+        :see: gofer.messaging.adapter.url.URL
+        """
+        BaseReader.__init__(self, node, url)
+        self.connection = Connection(url)
+        self.queue = None
+        self.unacked = []
+
+    def is_open(self):
+        """
+        Get whether the reader has been opened.
+        :return: True if open.
+        :rtype bool
+        """
+        return self.queue is not None
+
+    def open(self):
+        """
+        Open the reader.
+        :raise: NotFound
+        """
+        if self.is_open():
+            # already open
+            return
+        self.connection.open()
+        self.queue = self.connection.broker.queue(self.node.name)
+        self.queue.attach()
+
+    def repair(self):
+        """
+        Repair the reader.
+        :raise: NotFound
+        """
+        self.close()
+        self.connection.repair()
+        self.open()
+
+    def close(self):
+        """
+        Close the reader.
+        Unacknowledged messages are requeued.
+        """
+        queue = self.queue
+        self.queue = None
+        if queue is None:
+            return
+        unacked = self.unacked
+        self.unacked = []
+        for message in reversed(unacked):
+            queue.requeue(message)
+        queue.detach()
+        broker = self.connection.broker
+        if broker is not None:
+            broker.reap()
+
+    def flow(self, prefetch):
+        """
+        Set the prefetch window.
+        Not applicable, messages are never prefetched.
+        :param prefetch: The number of messages prefetched from the broker.
+        :type prefetch: int
+        """
+        pass
+
+    def get(self, timeout=None):
+        """
+        Get the next message from the queue.
+        :param timeout: The read timeout in seconds.
+        :type timeout: int
+        :return: The next message or None.
+        :rtype: Message
+        :raise: NotFound
+        """
+        broker = self.connection.broker
+        if broker.queues.get(self.node.name) is not self.queue:
+            raise NotFound('queue: %s, not-found' % self.node.name)
+        impl = self.queue.get(timeout)
+        if impl is None:
+            return
+        self.unacked.append(impl)
+        return Message(self, impl, impl.body)
+
+    def ack(self, message):
+        """
+        Acknowledge the specified message.
+        :param message: The message to acknowledge.
+        :type message: gofer.messaging.adapter.memory.broker.Message
+        """
+        try:
+            self.unacked.remove(message)
+        except ValueError:
+            pass
+
+    def reject(self, message, requeue=True):
+        """
+        Reject the specified message.
+        :param message: The message to reject.
+        :type message: gofer.messaging.adapter.memory.broker.Message
+        :param requeue: Requeue the message or discard it.
+        :type requeue: bool
+        """
+        try:
+            self.unacked.remove(message)
+        except ValueError:
+            return
+        if requeue:
+            self.queue.requeue(message)
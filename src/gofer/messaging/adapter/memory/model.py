@@ -0,0 +1,90 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from gofer.messaging.adapter.model import BaseExchange, BaseQueue
+from gofer.messaging.adapter.memory.broker import Broker
+
+
+class Exchange(BaseExchange):
+    """
+    An exchange on the in-process broker.
+    """
+
+    def declare(self, url):
+        """
+        Declare the exchange.
+        :param url: The broker URL.
+        :type url: str
+        """
+        broker = Broker.find(url)
+        broker.declare_exchange(self.name, self.policy)
+
+    def delete(self, url):
+        """
+        Delete the exchange.
+        :param url: The broker URL.
+        :type url: str
+        """
+        broker = Broker.find(url)
+        broker.delete_exchange(self.name)
+
+    def bind(self, queue, url):
+        """
+        Bind the specified queue.
+        :param queue: The queue to bind.
+        :type queue: BaseQueue
+        :param url: The broker URL.
+        :type url: str
+        :raise: NotFound
+        """
+        broker = Broker.find(url)
+        broker.bind(self.name, queue.name)
+
+    def unbind(self, queue, url):
+        """
+        Unbind the specified queue.
+        :param queue: The queue to unbind.
+        :type queue: BaseQueue
+        :param url: The broker URL.
+        :type url: str
+        :raise: NotFound
+        """
+        broker = Broker.find(url)
+        broker.unbind(self.name, queue.name)
+
+
+class Queue(BaseQueue):
+    """
+    A queue on the in-process broker.
+    """
+
+    def declare(self, url):
+        """
+        Declare the queue.
+        :param url: The broker URL.
+        :type url: str
+        """
+        broker = Broker.find(url)
+        broker.declare_queue(
+            self.name,
+            durable=self.durable,
+            auto_delete=self.auto_delete,
+            expiration=self.expiration,
+            exclusive=self.exclusive)
+
+    def delete(self, url):
+        """
+        Delete the queue.
+        :param url: The broker URL.
+        :type url: str
+        """
+        broker = Broker.find(url)
+        broker.delete_queue(self.name)
@@ -0,0 +1,83 @@
+#
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+
+"""
+Contains in-process message producer classes.
+"""
+
+from logging import getLogger
+
+from gofer.messaging.adapter.model import BaseSender
+from gofer.messaging.adapter.memory.broker import Message
+from gofer.messaging.adapter.memory.connection import Connection
+
+
+log = getLogger(__name__)
+
+
+class Sender(BaseSender):
+    """
+    An in-process message sender.
+    """
+
+    def __init__(self, url):
+        """
+        :param url: The broker url.
+        :type url: str
+        """
+        BaseSender.__init__(self, url)
+        self.connection = Connection(url)
+
+    def is_open(self):
+        """
+        Get whether the sender has been opened.
+        :return: True if open.
+        :rtype bool
+        """
+        return self.connection.is_open()
+
+    def open(self):
+        """
+        Open the sender.
+        """
+        self.connection.open()
+
+    def repair(self):
+        """
+        Repair the sender.
+        """
+        self.connection.repair()
+
+    def close(self):
+        """
+        Close the sender.
+        The (per-thread) connection is shared with readers
+        and is left open.
+        """
+        pass
+
+    def send(self, address, content, ttl=None):
+        """
+        Send a message.
+        :param address: An AMQP address.
+        :type address: str
+        :param content: The message content
+        :type content: buf
+        :param ttl: Time to Live (seconds)
+        :type ttl: float
+        :raise: NotFound
+        """
+        self.connection.open()
+        message = Message(content, ttl=ttl, durable=self.durable)
+        self.connection.broker.send(address, message)
+        log.debug('sent (%s)', address)
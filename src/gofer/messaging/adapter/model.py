@@ -16,13 +16,15 @@
 from logging import getLogger
 
 from uuid import uuid4
+from threading import RLock, Condition
 
-from gofer.common import Thread, valid_path, utf8
+from gofer.common import Thread, Singleton, synchronized, valid_path, utf8
 from gofer.messaging.model import VERSION, Document
 from gofer.messaging.adapter.url import URL
 from gofer.messaging.adapter.factory import Adapter
 from gofer.messaging.model import ModelError, validate
 from gofer.messaging import auth as auth
+from gofer.messaging.compression import compress, decompress
 
 
 ROUTE_ALL = '#'
@@ -45,6 +47,20 @@ def model(fn):
     return _fn
 
 
+def invalidated(fn):
+    """
+    Clear the declared node cache for the messenger's broker
+    when a node is reported as not found.
+    """
+    def _fn(messenger, *args, **keywords):
+        try:
+            return fn(messenger, *args, **keywords)
+        except NotFound:
+            Declared(messenger.url).clear()
+            raise
+    return _fn
+
+
 # --- model ------------------------------------------------------------------
 
 
@@ -54,6 +70,12 @@ class NotFound(ModelError):
     """
 
 
+class Aborted(ModelError):
+    """
+    Request aborted (the thread was aborted).
+    """
+
+
 class Model(object):
     """
     Adapter model object.
@@ -255,11 +277,15 @@ class Exchange(BaseExchange):
         :raise: ModelError
         """
         url = url or self.url
+        declared = Declared(url)
+        if self in declared:
+            return
         adapter = Adapter.find(url)
         impl = adapter.Exchange(self.name, self.policy)
         impl.durable = self.durable
         impl.auto_delete = self.auto_delete
         impl.declare(url)
+        declared.add(self)
 
     @model
     def delete(self, url=None):
@@ -273,6 +299,7 @@ class Exchange(BaseExchange):
         adapter = Adapter.find(url)
         impl = adapter.Exchange(self.name, self.policy)
         impl.delete(url)
+        Declared(url).remove(self)
 
     @model
     def bind(self, queue, url=None):
@@ -284,9 +311,17 @@ class Exchange(BaseExchange):
         :type url: str
         """
         url = url or self.url
+        declared = Declared(url)
+        if declared.bound(self, queue):
+            return
         adapter = Adapter.find(url)
         impl = adapter.Exchange(self.name, self.policy)
-        impl.bind(queue, url)
+        try:
+            impl.bind(queue, url)
+        except NotFound:
+            declared.clear()
+            raise
+        declared.bind(self, queue)
 
     @model
     def unbind(self, queue, url=None):
@@ -301,6 +336,7 @@ class Exchange(BaseExchange):
         adapter = Adapter.find(url)
         impl = adapter.Exchange(self.name, self.policy)
         impl.unbind(queue, url)
+        Declared(url).unbind(self, queue)
 
 
 class BaseQueue(Node):
@@ -359,6 +395,9 @@ class Queue(BaseQueue):
         :raise: ModelError
         """
         url = url or self.url
+        declared = Declared(url)
+        if self in declared:
+            return
         adapter = Adapter.find(url)
         impl = adapter.Queue(self.name)
         impl.durable = self.durable
@@ -366,6 +405,7 @@ class Queue(BaseQueue):
         impl.expiration = self.expiration
         impl.exclusive = self.exclusive
         impl.declare(url)
+        declared.add(self)
 
     @model
     def delete(self, url=None):
@@ -379,6 +419,7 @@ class Queue(BaseQueue):
         adapter = Adapter.find(url)
         impl = adapter.Queue(self.name)
         impl.delete(url)
+        Declared(url).remove(self)
 
     @model
     def purge(self, url=None):
@@ -516,6 +557,9 @@ class BaseReader(Messenger):
     An AMQP message reader.
     :ivar node: The AMQP node to read.
     :type node: Node
+    :ivar prefetch: The number of messages prefetched from
+        the broker (0=adapter default).
+    :type prefetch: int
     """
 
     def __init__(self, node, url):
@@ -527,6 +571,15 @@ class BaseReader(Messenger):
         """
         Messenger.__init__(self, url)
         self.node = node
+        self.prefetch = 0
+
+    def flow(self, prefetch):
+        """
+        Set the prefetch window on the open reader.
+        :param prefetch: The number of messages prefetched from the broker.
+        :type prefetch: int
+        """
+        raise NotImplementedError()
 
     def get(self, timeout=None):
         """
@@ -554,6 +607,16 @@ class BaseReader(Messenger):
         """
         raise NotImplementedError()
 
+    def ack_batch(self, messages):
+        """
+        Ack a batch of messages.
+        Adapters that support batched settlement should override.
+        :param messages: A list of messages to acknowledge.
+        :type messages: list
+        """
+        for message in messages:
+            self.ack(message)
+
 
 class Reader(BaseReader):
     """
@@ -585,14 +648,30 @@ class Reader(BaseReader):
         return self._impl.is_open()
 
     @model
+    @invalidated
     def open(self):
         """
         Open the reader.
         :raise: NotFound
         """
+        self._impl.prefetch = self.prefetch
         self._impl.open()
 
     @model
+    def flow(self, prefetch):
+        """
+        Set the prefetch window.
+        :param prefetch: The number of messages prefetched from the broker.
+        :type prefetch: int
+        :raise: ModelError
+        """
+        self.prefetch = prefetch
+        self._impl.prefetch = prefetch
+        if self._impl.is_open():
+            self._impl.flow(prefetch)
+
+    @model
+    @invalidated
     def repair(self):
         """
         Repair the reader.
@@ -609,6 +688,7 @@ class Reader(BaseReader):
         self._impl.close()
 
     @model
+    @invalidated
     def get(self, timeout=None):
         """
         Get the next message.
@@ -641,6 +721,16 @@ class Reader(BaseReader):
         """
         message.reject(requeue)
 
+    @model
+    def ack_batch(self, messages):
+        """
+        Ack a batch of messages.
+        :param messages: A list of messages to acknowledge.
+        :type messages: list
+        :raise: ModelError
+        """
+        self._impl.ack_batch([m._impl for m in messages])
+
     @model
     def next(self, timeout=90):
         """
@@ -654,7 +744,8 @@ class Reader(BaseReader):
         message = self.get(timeout)
         if message:
             try:
-                document = auth.validate(self.authenticator, message.body)
+                body = decompress(message.body)
+                document = auth.validate(self.authenticator, body)
                 validate(document)
             except ModelError:
                 message.ack()
@@ -694,6 +785,10 @@ class BaseSender(Messenger):
     """
     :ivar durable: Messages sent are marked as durable.
     :type durable: bool
+    :ivar window: The number of messages sent by send() permitted
+        to be waiting for broker confirmation.  Ignored by adapters
+        that do not support (pipelined) confirmation.
+    :type window: int
     """
 
     def __init__(self, url=None):
@@ -703,6 +798,7 @@ class BaseSender(Messenger):
         """
         Messenger.__init__(self, url)
         self.durable = True
+        self.window = 1
 
     def send(self, address, content, ttl):
         """
@@ -717,6 +813,20 @@ class BaseSender(Messenger):
         """
         raise NotImplementedError()
 
+    def send_batch(self, address, contents, ttl):
+        """
+        Send a batch of messages.
+        Adapters that support pipelined publishing should override.
+        :param address: An AMQP address.
+        :type address: str
+        :param contents: A list of message content.
+        :type contents: list
+        :param ttl: Time to Live (seconds)
+        :type ttl: float
+        """
+        for content in contents:
+            self.send(address, content, ttl)
+
 
 class Sender(BaseSender):
 
@@ -763,6 +873,7 @@ class Sender(BaseSender):
         self._impl.close()
 
     @model
+    @invalidated
     def send(self, address, content, ttl=None):
         """
         Send a message with content.
@@ -773,14 +884,43 @@ class Sender(BaseSender):
         :type ttl: float
         """
         self._impl.durable = self.durable
+        self._impl.window = self.window
         self._impl.send(address, content, ttl)
 
+    @model
+    @invalidated
+    def send_batch(self, address, contents, ttl=None):
+        """
+        Send a batch of messages.
+        :param address: An AMQP address.
+        :type address: str
+        :param contents: A list of message content.
+        :type contents: list
+        :param ttl: Time to Live (seconds)
+        :type ttl: float
+        """
+        self._impl.durable = self.durable
+        self._impl.send_batch(address, contents, ttl)
+
 
 class Producer(Messenger):
     """
     An AMQP message producer.
     :ivar authenticator: A message authenticator.
     :type authenticator: gofer.messaging.auth.Authenticator
+    :ivar compression: Messages larger than this size (bytes) are
+        compressed (0=never).  Only enable when the peer is known
+        to support compression.
+    :type compression: int
+    :ivar codec: The wire codec name (None=json).  Only use a
+        codec other than json when the peer is known to support it.
+    :type codec: str
+    :ivar header: Sign messages using the header format.  Only
+        enable when the peer is known to support it.
+    :type header: bool
+    :ivar window: The number of messages sent by send() permitted
+        to be waiting for broker confirmation.
+    :type window: int
     """
 
     def __init__(self, url=None):
@@ -792,6 +932,10 @@ class Producer(Messenger):
         adapter = Adapter.find(url)
         self._impl = adapter.Sender(url)
         self.authenticator = None
+        self.compression = 0
+        self.codec = None
+        self.header = False
+        self.window = 1
 
     @model
     def is_open(self):
@@ -839,14 +983,51 @@ class Producer(Messenger):
         :rtype: str
         :raise: ModelError
         """
+        sn, signed = self._build(address, body)
+        self._impl.window = self.window
+        self._impl.send(address, signed, ttl)
+        return sn
+
+    @model
+    def send_many(self, address, documents, ttl=None):
+        """
+        Send a batch of messages.
+        :param address: An AMQP address.
+        :type address: str
+        :param documents: A list of document bodies.
+        :type documents: list
+        :param ttl: Time to Live (seconds)
+        :type ttl: float
+        :return: The list of message serial numbers.
+        :rtype: list
+        :raise: ModelError
+        """
+        sn_list = []
+        contents = []
+        for body in documents:
+            sn, signed = self._build(address, body)
+            sn_list.append(sn)
+            contents.append(signed)
+        self._impl.send_batch(address, contents, ttl)
+        return sn_list
+
+    def _build(self, address, body):
+        """
+        Build, sign and (optionally) compress a message.
+        :param address: An AMQP address.
+        :type address: str
+        :param body: The document body.
+        :type body: dict
+        :return: tuple of: (sn, signed)
+        :rtype: tuple
+        """
         sn = utf8(uuid4())
         routing = (None, address)
         document = Document(sn=sn, version=VERSION, routing=routing)
         document += body
-        unsigned = document.dump()
-        signed = auth.sign(self.authenticator, unsigned)
-        self._impl.send(address, signed, ttl)
-        return sn
+        unsigned = document.dump(self.codec)
+        signed = auth.sign(self.authenticator, unsigned, address, self.header)
+        return sn, compress(signed, self.compression)
 
 
 # --- connection -------------------------------------------------------------
@@ -904,6 +1085,383 @@ class BaseConnection(Model):
         self.close()
 
 
+class SharedConnection(object):
+    """
+    A broker connection shared by all threads in the process.
+    Adapter (per-thread) connections hold a reference and open their
+    own channels, sessions or links.  The real connection is closed
+    when the last reference is released.  Subclassed by adapters to
+    open and close the real connection.
+    :ivar url: A broker URL.
+    :type url: str
+    :ivar impl: The real connection.
+    :ivar refs: The number of references held.
+    :type refs: int
+    :ivar lock: Used by adapters to serialize I/O when the
+        real connection is not thread-safe.
+    :type lock: RLock
+    """
+
+    __metaclass__ = Singleton
+
+    def __init__(self, url):
+        """
+        :param url: A broker URL.
+        :type url: str
+        """
+        self.url = url
+        self.impl = None
+        self.refs = 0
+        self.lock = RLock()
+        self.__mutex = RLock()
+
+    def connect(self):
+        """
+        Open the real connection.
+        :return: The real connection.
+        """
+        raise NotImplementedError()
+
+    def disconnect(self, impl):
+        """
+        Close the real connection.
+        :param impl: The real connection.
+        """
+        raise NotImplementedError()
+
+    @synchronized
+    def acquire(self):
+        """
+        Acquire a reference to the real connection.
+        The real connection is opened as needed.
+        :return: The real connection.
+        """
+        if self.impl is None:
+            self.impl = self.connect()
+            self.refs = 0
+        self.refs += 1
+        return self.impl
+
+    @synchronized
+    def release(self, impl):
+        """
+        Release a reference to the real connection.
+        References to a discarded connection are ignored.
+        :param impl: The real connection.
+        """
+        if impl is None or impl is not self.impl:
+            return
+        self.refs -= 1
+        if self.refs > 0:
+            return
+        self.impl = None
+        self.refs = 0
+        self.disconnect(impl)
+
+    @synchronized
+    def discard(self, impl):
+        """
+        Discard (and close) a broken real connection.
+        Only the current connection is discarded so that threads
+        repairing the same connection reconnect only once.
+        :param impl: The real connection.
+        """
+        if impl is None or impl is not self.impl:
+            return
+        self.impl = None
+        self.refs = 0
+        self.disconnect(impl)
+        Declared(self.url).clear()
+
+
+class Declared(object):
+    """
+    The nodes and bindings known to be declared on a broker.
+    Used to skip redundant (idempotent) declare and bind operations.
+    Auto-deleted nodes, and bindings to them, are never cached
+    because the broker may delete them at any time.  The cache is
+    cleared when the shared connection is discarded (repaired)
+    and when a node is reported as not found.
+    :ivar url: A broker URL.
+    :type url: str
+    :ivar nodes: The domain IDs of declared nodes.
+    :type nodes: set
+    :ivar bindings: Declared bindings of: (exchange, queue) name.
+    :type bindings: set
+    """
+
+    __metaclass__ = Singleton
+
+    def __init__(self, url):
+        """
+        :param url: A broker URL.
+        :type url: str
+        """
+        self.url = url
+        self.nodes = set()
+        self.bindings = set()
+        self.__mutex = RLock()
+
+    @synchronized
+    def add(self, node):
+        """
+        Add a declared node.
+        :param node: A declared node.
+        :type node: Node
+        """
+        if node.auto_delete:
+            return
+        self.nodes.add(node.domain_id)
+
+    @synchronized
+    def remove(self, node):
+        """
+        Remove a deleted node and the bindings that reference it.
+        :param node: A deleted node.
+        :type node: Node
+        """
+        self.nodes.discard(node.domain_id)
+        if isinstance(node, BaseExchange):
+            n = 0
+        else:
+            n = 1
+        for key in list(self.bindings):
+            if key[n] == node.name:
+                self.bindings.discard(key)
+
+    @synchronized
+    def bound(self, exchange, queue):
+        """
+        Get whether a binding has been declared.
+        :param exchange: An exchange.
+        :type exchange: BaseExchange
+        :param queue: A queue.
+        :type queue: BaseQueue
+        :return: True if declared.
+        :rtype: bool
+        """
+        return (exchange.name, queue.name) in self.bindings
+
+    @synchronized
+    def bind(self, exchange, queue):
+        """
+        Add a declared binding.
+        :param exchange: An exchange.
+        :type exchange: BaseExchange
+        :param queue: A queue.
+        :type queue: BaseQueue
+        """
+        if queue.auto_delete:
+            return
+        self.bindings.add((exchange.name, queue.name))
+
+    @synchronized
+    def unbind(self, exchange, queue):
+        """
+        Remove a deleted binding.
+        :param exchange: An exchange.
+        :type exchange: BaseExchange
+        :param queue: A queue.
+        :type queue: BaseQueue
+        """
+        self.bindings.discard((exchange.name, queue.name))
+
+    @synchronized
+    def clear(self):
+        """
+        Clear the cache.
+        """
+        self.nodes.clear()
+        self.bindings.clear()
+
+    @synchronized
+    def contains(self, node):
+        """
+        Get whether a node has been declared.
+        :param node: A node.
+        :type node: Node
+        :return: True if declared.
+        :rtype: bool
+        """
+        return node.domain_id in self.nodes
+
+    def __contains__(self, node):
+        return self.contains(node)
+
+
+class ManagementSession(object):
+    """
+    A (QMF) management session shared by all threads in the process.
+    Requests are sent on one long-lived sender and replies are
+    matched to the callers by correlation ID on one long-lived
+    reply receiver.  Callers take turns fetching replies and hand
+    off replies for other callers, so concurrent requests are
+    pipelined over the same links.  Subclassed by adapters to
+    manage the links.
+    :ivar url: A broker URL.
+    :type url: str
+    :ivar replies: Replies keyed by correlation ID (None=pending).
+    :type replies: dict
+    :ivar reading: Indicates a caller is fetching replies.
+    :type reading: bool
+    :ivar generation: Incremented when the session is repaired.
+        Requests sent before the repair are sent again.
+    :type generation: int
+    :cvar POLL: Seconds a caller fetches replies before
+        giving other callers a turn.
+    :type POLL: float
+    """
+
+    __metaclass__ = Singleton
+
+    POLL = 0.100
+
+    def __init__(self, url):
+        """
+        :param url: A broker URL.
+        :type url: str
+        """
+        self.url = url
+        self.replies = {}
+        self.reading = False
+        self.generation = 0
+        self.__condition = Condition()
+
+    def is_open(self):
+        """
+        Get whether the session is open.
+        :return: True if open.
+        :rtype: bool
+        """
+        raise NotImplementedError()
+
+    def open(self):
+        """
+        Open the session links.
+        """
+        raise NotImplementedError()
+
+    def repair(self):
+        """
+        Repair the session links.
+        Must call repaired().
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        Close the session links.
+        """
+        raise NotImplementedError()
+
+    def send(self, request):
+        """
+        Send a request.
+        The reply address is set by the adapter.
+        :param request: A request message.
+        """
+        raise NotImplementedError()
+
+    def fetch(self, timeout):
+        """
+        Fetch the next reply.
+        :param timeout: The read timeout in seconds.
+        :type timeout: float
+        :return: The reply or None.
+        """
+        raise NotImplementedError()
+
+    def repaired(self):
+        """
+        The session links have been repaired (replaced).
+        Pending callers are notified to send their requests again.
+        """
+        with self.__condition:
+            self.generation += 1
+            self.__condition.notify_all()
+
+    def request(self, request, sn):
+        """
+        Send a request and wait for the matching reply.
+        The request is sent again when the session is repaired
+        while waiting.  The broker may have processed the request
+        sent before the repair so callers must handle the request
+        being processed twice.
+        :param request: A request message.
+        :param sn: The request correlation ID.
+        :type sn: str
+        :return: tuple of: (reply, resent)
+        :rtype: tuple
+        :raise Aborted: when the thread is aborted.
+        """
+        resent = False
+        try:
+            while not Thread.aborted():
+                with self.__condition:
+                    self.replies[sn] = None
+                    generation = self.generation
+                self.open()
+                self.send(request)
+                reply = self.wait(sn, generation)
+                if reply is not None:
+                    return reply, resent
+                resent = True
+        except Exception:
+            # links in unknown state
+            self.close()
+            self.repaired()
+            raise
+        finally:
+            with self.__condition:
+                self.replies.pop(sn, None)
+        raise Aborted(sn)
+
+    def wait(self, sn, generation):
+        """
+        Wait for the reply matching the correlation ID.
+        :param sn: The request correlation ID.
+        :type sn: str
+        :param generation: The session generation when the request was sent.
+        :type generation: int
+        :return: The reply, or None when the session was
+            repaired or the thread is aborted.
+        """
+        while not Thread.aborted():
+            with self.__condition:
+                reply = self.replies.get(sn)
+                if reply is not None:
+                    return reply
+                if self.generation != generation:
+                    return
+                if self.reading:
+                    self.__condition.wait(self.POLL)
+                    continue
+                self.reading = True
+            reply = None
+            try:
+                self.open()
+                reply = self.fetch(self.POLL)
+            finally:
+                with self.__condition:
+                    self.reading = False
+                    self.dispatch(reply)
+                    self.__condition.notify_all()
+
+    def dispatch(self, reply):
+        """
+        Store the reply for the caller waiting on it.
+        Replies without a pending caller are discarded.
+        :param reply: A fetched reply (or None).
+        """
+        if reply is None:
+            return
+        sn = reply.correlation_id
+        if sn in self.replies:
+            self.replies[sn] = reply
+        else:
+            log.debug('reply: %s, discarded', sn)
+
+
 class Connection(BaseConnection):
     """
     An AMQP channel object.
@@ -1004,6 +1562,9 @@ class Connector(Model):
     :type heartbeat: int|None
     :ivar ssl: The SSL configuration.
     :type ssl: SSL
+    :ivar listen: Listen for connections when nothing is listening
+        on the URL (brokerless adapters).  Set by agents.
+    :type listen: bool
     """
 
     @staticmethod
@@ -1030,6 +1591,7 @@ class Connector(Model):
         self.url = URL(url or DEFAULT_URL)
         self.heartbeat = None
         self.ssl = SSL()
+        self.listen = False
 
     @property
     def domain_id(self):
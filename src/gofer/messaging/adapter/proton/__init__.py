@@ -14,10 +14,4 @@ from gofer.messaging.adapter.proton.model import Exchange, Queue
 from gofer.messaging.adapter.proton.connection import Connection
 from gofer.messaging.adapter.proton.consumer import Reader
 from gofer.messaging.adapter.proton.producer import Sender
-
-
-PROVIDES = [
-    'amqp-1-0',
-    'proton',
-    'qpid',
-]
+from gofer.messaging.adapter.proton.manifest import PROVIDES
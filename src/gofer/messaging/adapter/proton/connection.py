@@ -9,25 +9,259 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from time import time
 from uuid import uuid4
 from logging import getLogger
+from threading import RLock, Lock, Condition
 
-from proton import ConnectionException
+from proton import ConnectionException, Timeout, Delivery, Link
 from proton import SSLDomain, SSLException
-from proton.utils import BlockingConnection
+from proton.utils import BlockingConnection, SendException
 from proton.reactor import DynamicNodeProperties
 
 from gofer.common import ThreadSingleton, utf8
-from gofer.messaging.adapter.model import Connector, BaseConnection
+from gofer.messaging.adapter.model import Connector, BaseConnection, SharedConnection
 from gofer.messaging.adapter.connect import retry
 
 
 log = getLogger(__name__)
 
 
+class ConnectionLock(object):
+    """
+    The (re-entrant) lock used to serialize I/O on the shared connection.
+    Threads blocked acquiring the lock are counted and the reactor is
+    interrupted so that the thread processing events releases it promptly.
+    :ivar waiting: The number of threads waiting to acquire the lock.
+    :type waiting: int
+    :ivar interrupt: Called to interrupt the reactor (optional).
+    :type interrupt: callable
+    """
+
+    def __init__(self):
+        self.waiting = 0
+        self.interrupt = None
+        self.__lock = RLock()
+        self.__mutex = Lock()
+        self.__idle = Condition(self.__mutex)
+
+    def acquire(self):
+        """
+        Acquire the lock.
+        """
+        if self.__lock.acquire(False):
+            return
+        with self.__mutex:
+            self.waiting += 1
+            interrupt = self.interrupt
+        try:
+            if interrupt is not None:
+                interrupt()
+            self.__lock.acquire()
+        finally:
+            with self.__mutex:
+                self.waiting -= 1
+                if not self.waiting:
+                    self.__idle.notify_all()
+
+    def release(self):
+        """
+        Release the lock.
+        """
+        self.__lock.release()
+
+    def defer(self):
+        """
+        Wait (without holding the lock) until threads
+        waiting to acquire the lock have acquired it.
+        """
+        with self.__mutex:
+            while self.waiting:
+                self.__idle.wait()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *unused):
+        self.release()
+
+
+class Processor(object):
+    """
+    Processes events on a connection shared by all threads.
+    One thread at a time (the processor) runs the reactor while holding
+    the lock.  It returns from the reactor when its condition is satisfied,
+    when the condition of a waiting thread is satisfied (and notifies it)
+    or when another thread is waiting to acquire the lock.  Other threads
+    wait to be notified without holding the lock.  When the processor
+    returns, waiting threads are notified so that another may become
+    the processor.
+    :ivar impl: The real connection.
+    :type impl: BlockingConnection
+    :ivar lock: The connection lock.
+    :type lock: ConnectionLock
+    :ivar processing: A thread is processing events.
+    :type processing: bool
+    :ivar waiting: Conditions of waiting threads keyed by
+        the (threading) condition notified when satisfied.
+    :type waiting: dict
+    """
+
+    def __init__(self, impl, lock):
+        """
+        :param impl: The real connection.
+        :type impl: BlockingConnection
+        :param lock: The connection lock.
+        :type lock: ConnectionLock
+        """
+        self.impl = impl
+        self.lock = lock
+        self.processing = False
+        self.waiting = {}
+        self.__mutex = Lock()
+
+    def wait(self, condition, timeout=None):
+        """
+        Wait for the condition to be satisfied.
+        The caller becomes the processor or waits to be notified.
+        :param condition: A callable returning True when satisfied.
+        :type condition: callable
+        :param timeout: The (optional) timeout in seconds.
+        :type timeout: float
+        :raise: proton.Timeout
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time() + timeout
+        while True:
+            event = Condition(self.__mutex)
+            with self.lock:
+                if condition():
+                    return
+                if deadline is not None and deadline <= time():
+                    raise Timeout('Connection timed out')
+                with self.__mutex:
+                    if not self.processing:
+                        self.processing = True
+                        break
+                    self.waiting[event] = condition
+            with self.__mutex:
+                if event in self.waiting:
+                    if deadline is None:
+                        event.wait()
+                    else:
+                        event.wait(max(deadline - time(), 0))
+                self.waiting.pop(event, None)
+        try:
+            self._process(condition, deadline)
+        finally:
+            with self.__mutex:
+                self.processing = False
+                for event in self.waiting:
+                    event.notify()
+                self.waiting.clear()
+
+    def _process(self, condition, deadline):
+        """
+        Run the reactor until the condition is satisfied.
+        Called by the processor.  The lock is released (and the reactor
+        returns) whenever another thread is waiting to acquire it.
+        :param condition: A callable returning True when satisfied.
+        :type condition: callable
+        :param deadline: When the wait expires (None=never).
+        :type deadline: float
+        :raise: proton.Timeout
+        """
+        def done():
+            return condition() or self.lock.waiting or self._satisfied()
+        while True:
+            with self.lock:
+                if deadline is None:
+                    self.impl.wait(done, timeout=None)
+                else:
+                    self.impl.wait(done, timeout=max(deadline - time(), 0))
+                self._notify()
+                if condition():
+                    return
+            self.lock.defer()
+
+    def _satisfied(self):
+        """
+        Get whether the condition of any waiting thread is satisfied.
+        Must be called while holding the lock.
+        :rtype: bool
+        """
+        with self.__mutex:
+            for condition in self.waiting.values():
+                if condition():
+                    return True
+        return False
+
+    def _notify(self):
+        """
+        Notify waiting threads with satisfied conditions.
+        Must be called while holding the lock.
+        """
+        with self.__mutex:
+            for event, condition in self.waiting.items():
+                if condition():
+                    del self.waiting[event]
+                    event.notify()
+
+
+class Shared(SharedConnection):
+    """
+    A proton connection shared by all threads.
+    The blocking connection is not thread-safe so all links are
+    created and used while holding the lock.  The lock is not held
+    while waiting.  Processing events is done by the Processor.
+    """
+
+    def __init__(self, url):
+        """
+        :param url: A broker URL.
+        :type url: str
+        """
+        SharedConnection.__init__(self, url)
+        self.lock = ConnectionLock()
+
+    def connect(self):
+        """
+        Open the real connection.
+        :return: The real connection.
+        :rtype: BlockingConnection
+        """
+        connector = Connector.find(self.url)
+        domain = Connection.ssl_domain(connector)
+        log.info('open: %s', connector)
+        impl = BlockingConnection(
+            connector.url.canonical,
+            heartbeat=connector.heartbeat,
+            ssl_domain=domain)
+        impl.processor = Processor(impl, self.lock)
+        self.lock.interrupt = impl.container.wakeup
+        log.info('opened: %s', self.url)
+        return impl
+
+    def disconnect(self, impl):
+        """
+        Close the real connection.
+        :param impl: The real connection.
+        :type impl: BlockingConnection
+        """
+        try:
+            with self.lock:
+                impl.close()
+            log.info('closed: %s', self.url)
+        except Exception, pe:
+            log.debug(utf8(pe))
+
+
 class Connection(BaseConnection):
     """
-    Proton connection.
+    Proton (per-thread) connection.
+    The real connection is shared by all threads and
+    links are created and used while holding the lock.
     """
 
     __metaclass__ = ThreadSingleton
@@ -64,8 +298,17 @@ class Connection(BaseConnection):
         :type url: str
         """
         super(Connection, self).__init__(url)
+        self._shared = Shared(url)
         self._impl = None
 
+    @property
+    def lock(self):
+        """
+        The lock used to serialize I/O on the shared connection.
+        :rtype: ConnectionLock
+        """
+        return self._shared.lock
+
     def is_open(self):
         """
         Get whether the connection has been opened.
@@ -82,14 +325,17 @@ class Connection(BaseConnection):
         if self.is_open():
             # already open
             return
-        connector = Connector.find(self.url)
-        domain = self.ssl_domain(connector)
-        log.info('open: %s', connector)
-        self._impl = BlockingConnection(
-            connector.url.canonical,
-            heartbeat=connector.heartbeat,
-            ssl_domain=domain)
-        log.info('opened: %s', self.url)
+        self._impl = self._shared.acquire()
+
+    def repair(self):
+        """
+        Repair the connection.
+        The (broken) shared connection is discarded and reopened.
+        """
+        impl = self._impl
+        self._impl = None
+        self._shared.discard(impl)
+        self.open()
 
     def sender(self, address):
         """
@@ -100,15 +346,22 @@ class Connection(BaseConnection):
         :rtype: proton.utils.BlockingSender
         """
         name = utf8(uuid4())
-        return self._impl.create_sender(address, name=name)
+        with self.lock:
+            return self._impl.create_sender(address, name=name)
 
-    def receiver(self, address=None, dynamic=False):
+    def receiver(self, address=None, dynamic=False, credit=None, handler=None):
         """
         Get a message receiver for the specified address.
         :param address: An AMQP address.
         :type address: str
         :param dynamic: Indicates link address is dynamically assigned.
         :type dynamic: bool
+        :param credit: The (optional) link credit.
+        :type credit: int
+        :param handler: The (optional) link handler.  When specified,
+            messages are delivered to the handler and not read
+            using the returned receiver.
+        :type handler: proton.handlers.MessagingHandler
         :return: A receiver.
         :rtype: proton.utils.BlockingReceiver
         """
@@ -118,16 +371,79 @@ class Connection(BaseConnection):
             # needed by dispatch router
             options = DynamicNodeProperties({'x-opt-qd.address': unicode(address)})
             address = None
-        return self._impl.create_receiver(address, name=name, dynamic=dynamic, options=options)
+        with self.lock:
+            return self._impl.create_receiver(
+                address,
+                credit=credit,
+                name=name,
+                dynamic=dynamic,
+                handler=handler,
+                options=options)
+
+    def wait(self, condition, timeout=None):
+        """
+        Process connection events until the condition is satisfied.
+        The lock is not held while waiting.
+        :param condition: A callable returning True when satisfied.
+        :type condition: callable
+        :param timeout: The (optional) timeout in seconds.
+        :type timeout: float
+        :raise: proton.Timeout
+        :see: Processor.wait()
+        """
+        self._impl.processor.wait(condition, timeout)
+
+    def send(self, sender, message, timeout=None):
+        """
+        Send a message and wait for the delivery to be settled.
+        Same as BlockingSender.send() but the lock is not held
+        while waiting.
+        :param sender: A sender.
+        :type sender: proton.utils.BlockingSender
+        :param message: The message to send.
+        :type message: proton.Message
+        :param timeout: The (optional) timeout in seconds.
+        :type timeout: float
+        :return: The delivery.
+        :rtype: proton.Delivery
+        :raise: SendException
+        """
+        with self.lock:
+            delivery = sender.link.send(message)
+        self.wait(lambda: delivery.settled, timeout)
+        with self.lock:
+            if delivery.link.snd_settle_mode != Link.SND_SETTLED:
+                delivery.settle()
+        if delivery.remote_state in (Delivery.REJECTED, Delivery.RELEASED):
+            raise SendException(delivery.remote_state)
+        return delivery
+
+    def receive(self, receiver, timeout):
+        """
+        Receive the next message.
+        Same as BlockingReceiver.receive() but the lock is
+        not held while waiting.
+        :param receiver: A receiver.
+        :type receiver: proton.utils.BlockingReceiver
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :return: The received message.
+        :rtype: proton.Message
+        :raise: proton.Timeout
+        """
+        fetcher = receiver.fetcher
+        with self.lock:
+            if not receiver.link.credit:
+                receiver.link.flow(1)
+        self.wait(lambda: fetcher.has_message, timeout)
+        with self.lock:
+            return fetcher.pop()
 
     def close(self):
         """
         Close the connection.
+        The shared connection is closed when no longer referenced.
         """
-        connection = self._impl
+        impl = self._impl
         self._impl = None
-        try:
-            connection.close()
-            log.info('closed: %s', self.url)
-        except Exception, pe:
-            log.debug(utf8(pe))
+        self._shared.release(impl)
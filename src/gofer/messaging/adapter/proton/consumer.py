@@ -17,11 +17,15 @@
 Provides AMQP message consumer classes.
 """
 
+from collections import deque
+from itertools import count
 from logging import getLogger
 
-from proton import Timeout
+from proton import Timeout, Delivery
+from proton.handlers import MessagingHandler
 
 from gofer.messaging.adapter.model import BaseReader, Message
+from gofer.messaging.adapter.reliability import blocking
 from gofer.messaging.adapter.proton.connection import Connection
 from gofer.messaging.adapter.proton.reliability import reliable
 
@@ -32,6 +36,42 @@ log = getLogger(__name__)
 NO_DELAY = 0.010
 
 
+class Inbox(MessagingHandler):
+    """
+    The receiver link handler.
+    Each received message is queued with a key (a counter) used to
+    settle the delivery.  Unsettled deliveries are tracked by key.
+    :ivar keys: Generates message keys.
+    :type keys: itertools.count
+    :ivar messages: Received messages: (message, key).
+    :type messages: deque
+    :ivar deliveries: Unsettled deliveries by key.
+    :type deliveries: dict
+    """
+
+    def __init__(self, keys):
+        """
+        :param keys: Generates message keys.  Shared by the inboxes
+            of a reader so keys are not reused after a repair.
+        :type keys: itertools.count
+        """
+        MessagingHandler.__init__(self, prefetch=0, auto_accept=False)
+        self.keys = keys
+        self.messages = deque()
+        self.deliveries = {}
+
+    def on_message(self, event):
+        """
+        Queue the received message.
+        :param event: The message event.
+        """
+        key = next(self.keys)
+        delivery = event.delivery
+        if not delivery.settled:
+            self.deliveries[key] = delivery
+        self.messages.append((event.message, key))
+
+
 class Reader(BaseReader):
     """
     An AMQP message reader.
@@ -39,6 +79,10 @@ class Reader(BaseReader):
     :type connection: Connection
     :ivar receiver: An AMQP receiver to read.
     :type receiver: proton.utils.BlockingReceiver
+    :ivar inbox: The receiver link handler.
+    :type inbox: Inbox
+    :ivar keys: Generates message keys.
+    :type keys: itertools.count
     """
 
     def __init__(self, node, url):
@@ -52,6 +96,8 @@ class Reader(BaseReader):
         BaseReader.__init__(self, node, url)
         self.connection = Connection(url)
         self.receiver = None
+        self.inbox = None
+        self.keys = count(1)
 
     def is_open(self):
         """
@@ -70,16 +116,20 @@ class Reader(BaseReader):
             # already open
             return
         self.connection.open()
-        self.receiver = self.connection.receiver(self.node.address)
+        self.inbox = Inbox(self.keys)
+        self.receiver = self.connection.receiver(self.node.address, handler=self.inbox)
+        self.replenish()
 
     def repair(self):
         """
         Repair the reader.
+        Messages received and not settled are redelivered by the broker.
         """
         self.close()
-        self.connection.close()
-        self.connection.open()
-        self.receiver = self.connection.receiver(self.node.address)
+        self.connection.repair()
+        self.inbox = Inbox(self.keys)
+        self.receiver = self.connection.receiver(self.node.address, handler=self.inbox)
+        self.replenish()
 
     def close(self):
         """
@@ -88,45 +138,108 @@ class Reader(BaseReader):
         """
         receiver = self.receiver
         self.receiver = None
+        self.inbox = None
         try:
-            receiver.close()
+            with self.connection.lock:
+                receiver.close()
         except Exception:
             pass
 
+    @reliable
+    def flow(self, prefetch):
+        """
+        Set the prefetch window.
+        Credit is issued as messages are read to keep the link
+        replenished up to the window.  When the window is reduced,
+        credit already issued is used and not replenished.
+        :param prefetch: The number of messages prefetched from the broker.
+        :type prefetch: int
+        """
+        self.prefetch = prefetch
+        self.replenish()
+
+    def replenish(self):
+        """
+        Issue credit to refill the prefetch window.
+        The link is managed by the inbox (without a library flow
+        controller) so the window is managed here.  When no prefetch
+        is specified, credit is issued for one message at a time.
+        """
+        with self.connection.lock:
+            link = self.receiver.link
+            window = max(self.prefetch, 1)
+            credit = window - link.credit - len(self.inbox.messages)
+            if credit > 0:
+                link.flow(credit)
+
+    @blocking
     @reliable
     def get(self, timeout=None):
         """
         Get the next message from the queue.
+        The shared connection is not locked while waiting.
         :param timeout: The read timeout in seconds.
         :type timeout: int
         :return: The next message or None.
         :rtype: Message
         """
+        inbox = self.inbox
         try:
-            impl = self.receiver.receive(timeout or NO_DELAY)
-            return Message(self, impl, impl.body)
+            self.replenish()
+            if not inbox.messages:
+                self.connection.wait(lambda: len(inbox.messages), timeout or NO_DELAY)
+            impl, key = inbox.messages.popleft()
+            return Message(self, key, impl.body)
         except Timeout:
             pass
 
+    def settle(self, key, state):
+        """
+        Settle the delivery of the specified message.
+        Untracked (or already settled) messages are ignored.
+        :param key: The key of a received message.
+        :type key: int
+        :param state: The delivery state.
+        """
+        delivery = self.inbox.deliveries.pop(key, None)
+        if delivery is None:
+            return
+        with self.connection.lock:
+            delivery.update(state)
+            delivery.settle()
+
+    @reliable
+    def ack(self, key):
+        """
+        Accept the specified message.
+        :param key: The key of a received message.
+        :type key: int
+        """
+        self.settle(key, Delivery.ACCEPTED)
+
     @reliable
-    def ack(self, message):
+    def ack_batch(self, keys):
         """
-        Acknowledge all messages received on the session.
-        :param message: The message to acknowledge.
-        :type message: proton.Message
+        Accept a batch of messages.
+        The deliveries are settled in one pass while holding the
+        shared connection rather than one call (and lock) per message.
+        :param keys: A list of received message keys.
+        :type keys: list
         """
-        self.receiver.accept()
+        with self.connection.lock:
+            for key in keys:
+                self.settle(key, Delivery.ACCEPTED)
 
     @reliable
-    def reject(self, message, requeue=True):
+    def reject(self, key, requeue=True):
         """
         Reject the specified message.
-        :param message: The message to reject.
-        :type message: proton.Message
-        :param requeue: Requeue the message or discard it.
+        :param key: The key of a received message.
+        :type key: int
+        :param requeue: Requeue (release) the message or discard it.
         :type requeue: bool
         """
         if requeue:
-            self.receiver.release()
+            self.settle(key, Delivery.RELEASED)
         else:
-            self.receiver.reject()
+            self.settle(key, Delivery.REJECTED)
@@ -12,10 +12,10 @@
 from uuid import uuid4
 from logging import getLogger
 
-from proton import Message
+from proton import Message, Timeout
 
 from gofer.common import utf8
-from gofer.messaging.adapter.model import Messenger, BaseExchange, BaseQueue
+from gofer.messaging.adapter.model import ManagementSession, BaseExchange, BaseQueue
 from gofer.messaging.adapter.proton.connection import Connection
 from gofer.messaging.adapter.proton.reliability import reliable
 
@@ -28,6 +28,12 @@ ADDRESS = 'qmf.default.direct'
 
 EEXIST = 7
 
+# reported (description) when a deleted object is not found.
+NOT_FOUND = 'not-found'
+
+# reply receiver credit.
+CREDIT = 10
+
 CREATE = 'create'
 DELETE = 'delete'
 
@@ -54,7 +60,108 @@ class Error(Exception):
         self.code = code
 
 
-class Method(Messenger):
+class Session(ManagementSession):
+    """
+    A QMF management session shared by all threads.
+    :ivar connection: A broker connection.
+    :type connection: Connection
+    :ivar sender: A message sender.
+    :type sender: proton.utils.BlockingSender
+    :ivar receiver: A (dynamic) reply receiver.
+    :type receiver: proton.utils.BlockingReceiver
+    """
+
+    def __init__(self, url):
+        """
+        :param url: The broker url.
+        :type url: str
+        """
+        super(Session, self).__init__(url)
+        self.connection = Connection(url)
+        self.sender = None
+        self.receiver = None
+
+    def is_open(self):
+        """
+        Get whether the session is open.
+        :return: True if open.
+        :rtype: bool
+        """
+        return self.sender is not None
+
+    @reliable
+    def open(self):
+        """
+        Open a connection and get a sender and receiver.
+        """
+        with self.connection.lock:
+            if self.is_open():
+                # already open
+                return
+            self.connection.open()
+            self.receiver = self.connection.receiver(ADDRESS, dynamic=True, credit=CREDIT)
+            self.sender = self.connection.sender(ADDRESS)
+
+    def repair(self):
+        """
+        Repair the connection and get a sender and receiver.
+        """
+        self.close()
+        self.connection.repair()
+        self.receiver = self.connection.receiver(ADDRESS, dynamic=True, credit=CREDIT)
+        self.sender = self.connection.sender(ADDRESS)
+        self.repaired()
+
+    def close(self):
+        """
+        Close the sender and receiver.
+        """
+        sender = self.sender
+        self.sender = None
+        receiver = self.receiver
+        self.receiver = None
+        with self.connection.lock:
+            try:
+                sender.close()
+            except Exception:
+                pass
+            try:
+                receiver.close()
+            except Exception:
+                pass
+
+    @reliable
+    def send(self, request):
+        """
+        Send the request.
+        The shared connection is not locked while waiting
+        for the delivery to be settled.
+        :param request: A QMF request.
+        :type request: Message
+        """
+        with self.connection.lock:
+            request.reply_to = self.receiver.remote_source.address
+        self.connection.send(self.sender, request)
+
+    @reliable
+    def fetch(self, timeout):
+        """
+        Fetch the next reply.
+        :param timeout: The read timeout in seconds.
+        :type timeout: float
+        :return: The reply or None.
+        :rtype: Message
+        """
+        try:
+            reply = self.connection.receive(self.receiver, timeout)
+            with self.connection.lock:
+                self.receiver.accept()
+            return reply
+        except Timeout:
+            pass
+
+
+class Method(object):
     """
     QMF method.
     :ivar url: The broker url.
@@ -63,12 +170,8 @@ class Method(Messenger):
     :type name: str
     :ivar arguments: The method arguments.
     :type arguments: dict
-    :ivar connection: A broker connection.
-    :type connection: Connection
-    :ivar sender: A message sender.
-    :type sender: proton.utils.BlockingSender
-    :ivar receiver: A message sender.
-    :type receiver: proton.utils.BlockingReceiver
+    :ivar session: The shared management session.
+    :type session: Session
     """
 
     def __init__(self, url, name, arguments):
@@ -80,12 +183,10 @@ class Method(Messenger):
         :param arguments: The method arguments.
         :type arguments: dict
         """
-        super(Method, self).__init__(url)
+        self.url = url
         self.name = name
         self.arguments = arguments
-        self.connection = Connection(url)
-        self.sender = None
-        self.receiver = None
+        self.session = Session(url)
 
     @property
     def body(self):
@@ -103,18 +204,15 @@ class Method(Messenger):
             'method': 'request'
         }
 
-    def send(self, request):
-        """
-        Send the request.
-        :param request: A QMF request.
-        """
-        self.sender.send(request)
-
-    def on_reply(self, reply):
+    def on_reply(self, reply, resent=False):
         """
         Process the QMF reply.
+        A resent delete that reports not-found succeeded because the
+        object was deleted by the request sent before the repair.
         :param reply: The reply.
         :type reply: Message
+        :param resent: The request was sent again after a repair.
+        :type resent: bool
         :raise: Error on failures.
         """
         body = dict(reply.body)
@@ -127,74 +225,25 @@ class Method(Messenger):
         description = values['error_text']
         if code == EEXIST:
             return
-        raise Error(description, code)
-
-    def is_open(self):
-        """
-        Get whether the method is open.
-        :return: True if open.
-        :rtype: bool
-        """
-        return self.sender is not None
-
-    def open(self):
-        """
-        Open a connection and get a sender and receiver.
-        """
-        if self.is_open():
-            # already open
+        if resent and self.name == DELETE and NOT_FOUND in utf8(description):
+            log.debug('resent %s: %s', self.name, description)
             return
-        self.connection.open()
-        self.receiver = self.connection.receiver(ADDRESS, dynamic=True)
-        self.sender = self.connection.sender(ADDRESS)
-
-    def repair(self):
-        """
-        Repair the connection and get a sender and receiver.
-        """
-        self.close()
-        self.connection.close()
-        self.connection.open()
-        self.receiver = self.connection.receiver(ADDRESS, dynamic=True)
-        self.sender = self.connection.sender(ADDRESS)
-
-    def close(self):
-        """
-        Close the sender and receiver.
-        """
-        sender = self.sender
-        self.sender = None
-        receiver = self.receiver
-        self.receiver = None
-        try:
-            sender.close()
-        except Exception:
-            pass
-        try:
-            receiver.close()
-        except Exception:
-            pass
+        raise Error(description, code)
 
-    @reliable
     def __call__(self):
         """
         Invoke the method.
+        The request is sent on the shared session.
         :raise: Error on failure.
         """
-        self.open()
-        try:
-            reply_to = self.receiver.remote_source.address
-            request = Message(
-                body=self.body,
-                reply_to=reply_to,
-                properties=self.properties,
-                correlation_id=utf8(uuid4()),
-                subject=SUBJECT)
-            self.send(request)
-            reply = self.receiver.receive()
-            self.on_reply(reply)
-        finally:
-            self.close()
+        sn = utf8(uuid4())
+        request = Message(
+            body=self.body,
+            properties=self.properties,
+            correlation_id=sn,
+            subject=SUBJECT)
+        reply, resent = self.session.request(request, sn)
+        self.on_reply(reply, resent)
 
 
 class Exchange(BaseExchange):
@@ -9,7 +9,9 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from time import time
 from logging import getLogger
+from collections import deque
 
 from proton import Message
 
@@ -21,6 +23,13 @@ from gofer.messaging.adapter.proton.reliability import reliable
 log = getLogger(__name__)
 
 
+# max number of cached sender links.
+LINKS = 10
+
+# seconds a cached sender link may be idle before it is closed.
+IDLE = 60
+
+
 def build_message(body, ttl, durable):
     """
     Construct a message object.
@@ -38,11 +47,117 @@ def build_message(body, ttl, durable):
         return Message(body=body, durable=durable)
 
 
+class Links(object):
+    """
+    LRU cache of open sender links keyed by address.
+    :ivar size: The max number of cached links.
+    :type size: int
+    :ivar idle: Seconds a link may be idle before it is closed.
+    :type idle: int
+    :ivar links: Cached links: {address: (link, last_used)}
+    :type links: dict
+    :ivar order: Cached addresses, least recently used first.
+    :type order: deque
+    """
+
+    def __init__(self, size=LINKS, idle=IDLE):
+        """
+        :param size: The max number of cached links.
+        :type size: int
+        :param idle: Seconds a link may be idle before it is closed.
+        :type idle: int
+        """
+        self.size = size
+        self.idle = idle
+        self.links = {}
+        self.order = deque()
+
+    def find(self, address):
+        """
+        Find a cached link by address.
+        Idle links are closed first.
+        :param address: An AMQP address.
+        :type address: str
+        :return: The link or (None).
+        :rtype: proton.utils.BlockingSender
+        """
+        self.reap()
+        try:
+            link, last_used = self.links[address]
+            self.links[address] = (link, time())
+            self.order.remove(address)
+            self.order.append(address)
+            return link
+        except KeyError:
+            pass
+
+    def add(self, address, link):
+        """
+        Add a link to the cache.
+        The least recently used links are closed as needed.
+        :param address: An AMQP address.
+        :type address: str
+        :param link: A sender link.
+        :type link: proton.utils.BlockingSender
+        """
+        self.discard(address)
+        self.links[address] = (link, time())
+        self.order.append(address)
+        while len(self.links) > max(self.size, 1):
+            address = self.order.popleft()
+            link, last_used = self.links.pop(address)
+            self.close(link)
+
+    def discard(self, address):
+        """
+        Remove and close the link for the address.
+        :param address: An AMQP address.
+        :type address: str
+        """
+        entry = self.links.pop(address, None)
+        if entry:
+            self.order.remove(address)
+            self.close(entry[0])
+
+    def reap(self):
+        """
+        Close idle links.
+        """
+        now = time()
+        for address, (link, last_used) in self.links.items():
+            if now - last_used > self.idle:
+                self.discard(address)
+
+    def clear(self):
+        """
+        Close all links.
+        """
+        for address in self.links.keys():
+            self.discard(address)
+
+    @staticmethod
+    def close(link):
+        """
+        Close a link.
+        :param link: A sender link.
+        :type link: proton.utils.BlockingSender
+        """
+        try:
+            link.close()
+        except Exception:
+            log.debug('close link failed', exc_info=True)
+
+    def __len__(self):
+        return len(self.links)
+
+
 class Sender(BaseSender):
     """
     An AMQP message sender.
     :ivar connection: A proton connection.
     :type connection: Connection
+    :ivar links: Cached sender links.
+    :type links: Links
     """
 
     def __init__(self, url):
@@ -52,6 +167,7 @@ class Sender(BaseSender):
         """
         BaseSender.__init__(self, url)
         self.connection = Connection(url)
+        self.links = Links()
 
     def is_open(self):
         """
@@ -69,26 +185,29 @@ class Sender(BaseSender):
         if self.is_open():
             # already opened
             return
-        self.connection.open()
+        with self.connection.lock:
+            self.connection.open()
 
     def repair(self):
         """
         Repair the sender.
         """
         self.close()
-        self.connection.close()
-        self.connection.open()
+        self.connection.repair()
 
     def close(self):
         """
         Close the sender.
         """
-        pass
+        with self.connection.lock:
+            self.links.clear()
 
     @reliable
     def send(self, address, content, ttl=None):
         """
         Send a message.
+        The shared connection is not locked while waiting
+        for the delivery to be settled.
         :param address: An AMQP address.
         :type address: str
         :param content: The message content
@@ -96,10 +215,16 @@ class Sender(BaseSender):
         :param ttl: Time to Live (seconds)
         :type ttl: float
         """
-        sender = self.connection.sender(address)
+        with self.connection.lock:
+            sender = self.links.find(address)
+            if sender is None:
+                sender = self.connection.sender(address)
+                self.links.add(address, sender)
         try:
             message = build_message(content, ttl, self.durable)
-            sender.send(message)
+            self.connection.send(sender, message)
             log.debug('sent (%s)', address)
-        finally:
-            sender.close()
+        except Exception:
+            with self.connection.lock:
+                self.links.discard(address)
+            raise
@@ -13,10 +13,4 @@ from gofer.messaging.adapter.qpid.model import Exchange, Queue
 from gofer.messaging.adapter.qpid.connection import Connection
 from gofer.messaging.adapter.qpid.consumer import Reader
 from gofer.messaging.adapter.qpid.producer import Sender
-
-
-PROVIDES = [
-    'amqp-0-10',
-    'qpid.messaging',
-    'qpid',
-]
\ No newline at end of file
+from gofer.messaging.adapter.qpid.manifest import PROVIDES
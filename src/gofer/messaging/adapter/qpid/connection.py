@@ -24,7 +24,7 @@ from qpid.messaging.transports import TRANSPORTS
 from qpid.messaging import ConnectionError
 
 from gofer.common import ThreadSingleton, utf8
-from gofer.messaging.adapter.model import Connector, BaseConnection
+from gofer.messaging.adapter.model import Connector, BaseConnection, SharedConnection
 from gofer.messaging.adapter.connect import retry
 
 
@@ -37,9 +37,53 @@ TCP = 'tcp'
 SSL = 'ssl'
 
 
+class Shared(SharedConnection):
+    """
+    A Qpid connection shared by all threads.
+    The qpid.messaging connection is thread-safe so each
+    thread simply opens its own session.
+    """
+
+    def connect(self):
+        """
+        Open the real connection.
+        :return: The real connection.
+        :rtype: RealConnection
+        """
+        connector = Connector.find(self.url)
+        Connection.add_transports()
+        domain = Connection.ssl_domain(connector)
+        log.info('open: %s', connector)
+        impl = RealConnection(
+            host=connector.host,
+            port=connector.port,
+            tcp_nodelay=True,
+            transport=connector.url.scheme,
+            username=connector.userid,
+            password=connector.password,
+            heartbeat=connector.heartbeat,
+            **domain)
+        impl.open()
+        log.info('opened: %s', self.url)
+        return impl
+
+    def disconnect(self, impl):
+        """
+        Close the real connection.
+        :param impl: The real connection.
+        :type impl: RealConnection
+        """
+        try:
+            impl.close()
+            log.info('closed: %s', self.url)
+        except Exception, pe:
+            log.debug(utf8(pe))
+
+
 class Connection(BaseConnection):
     """
-    Represents a Qpid connection.
+    Represents a (per-thread) Qpid connection.
+    The real connection is shared by all threads.
     """
 
     __metaclass__ = ThreadSingleton
@@ -82,6 +126,7 @@ class Connection(BaseConnection):
         :type url: str
         """
         BaseConnection.__init__(self, url)
+        self._shared = Shared(url)
         self._impl = None
 
     def is_open(self):
@@ -100,22 +145,17 @@ class Connection(BaseConnection):
         if self.is_open():
             # already open
             return
-        connector = Connector.find(self.url)
-        Connection.add_transports()
-        domain = self.ssl_domain(connector)
-        log.info('open: %s', connector)
-        impl = RealConnection(
-            host=connector.host,
-            port=connector.port,
-            tcp_nodelay=True,
-            transport=connector.url.scheme,
-            username=connector.userid,
-            password=connector.password,
-            heartbeat=connector.heartbeat,
-            **domain)
-        impl.open()
-        self._impl = impl
-        log.info('opened: %s', self.url)
+        self._impl = self._shared.acquire()
+
+    def repair(self):
+        """
+        Repair the connection.
+        The (broken) shared connection is discarded and reopened.
+        """
+        impl = self._impl
+        self._impl = None
+        self._shared.discard(impl)
+        self.open()
 
     def session(self):
         """
@@ -128,11 +168,8 @@ class Connection(BaseConnection):
     def close(self):
         """
         Close the connection.
+        The shared connection is closed when no longer referenced.
         """
-        connection = self._impl
+        impl = self._impl
         self._impl = None
-        try:
-            connection.close()
-            log.info('closed: %s', self.url)
-        except Exception, pe:
-            log.debug(utf8(pe))
+        self._shared.release(impl)
@@ -54,6 +54,18 @@ class Reader(BaseReader):
         self.session = None
         self.receiver = None
 
+    @property
+    def options(self):
+        """
+        The receiver options.
+        :return: The capacity when prefetch is specified.
+        :rtype: dict
+        """
+        if self.prefetch:
+            return dict(capacity=self.prefetch)
+        else:
+            return {}
+
     def is_open(self):
         """
         Get whether the messenger has been opened.
@@ -73,7 +85,7 @@ class Reader(BaseReader):
             return
         self.connection.open()
         self.session = self.connection.session()
-        self.receiver = self.session.receiver(self.node.address)
+        self.receiver = self.session.receiver(self.node.address, **self.options)
 
     def repair(self):
         """
@@ -81,10 +93,9 @@ class Reader(BaseReader):
         :raise: NotFound
         """
         self.close()
-        self.connection.close()
-        self.connection.open()
+        self.connection.repair()
         self.session = self.connection.session()
-        self.receiver = self.session.receiver(self.node.address)
+        self.receiver = self.session.receiver(self.node.address, **self.options)
     
     def close(self):
         """
@@ -103,6 +114,15 @@ class Reader(BaseReader):
         except Exception:
             pass
 
+    @reliable
+    def flow(self, prefetch):
+        """
+        Set the prefetch window.
+        :param prefetch: The number of messages prefetched from the broker.
+        :type prefetch: int
+        """
+        self.receiver.capacity = prefetch
+
     @reliable
     def get(self, timeout=None):
         """
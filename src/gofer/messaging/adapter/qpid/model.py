@@ -12,10 +12,10 @@
 from uuid import uuid4
 from logging import getLogger
 
-from qpid.messaging import Message
+from qpid.messaging import Message, Empty
 
 from gofer.common import utf8
-from gofer.messaging.adapter.model import Messenger, BaseExchange, BaseQueue
+from gofer.messaging.adapter.model import ManagementSession, BaseExchange, BaseQueue
 from gofer.messaging.adapter.qpid.connection import Connection
 from gofer.messaging.adapter.qpid.reliability import reliable
 
@@ -27,8 +27,14 @@ SUBJECT = 'broker'
 ADDRESS = 'qmf.default.direct/broker'
 REPLY_TO = 'qmf.default.direct/%s;{node:{type:topic},link:{x-declare:{auto-delete:True,exclusive:True}}}'
 
+# reply receiver capacity.
+CAPACITY = 10
+
 EEXIST = 7
 
+# reported (description) when a deleted object is not found.
+NOT_FOUND = 'not-found'
+
 CREATE = 'create'
 DELETE = 'delete'
 
@@ -55,65 +61,42 @@ class Error(Exception):
         self.code = code
 
 
-class Method(Messenger):
+class Session(ManagementSession):
     """
-    QMF method.
-    :ivar name: The method name.
-    :type name: str
-    :ivar arguments: The method arguments.
-    :type arguments: dict
+    A QMF management session shared by all threads.
     :ivar connection: A broker connection.
     :type connection: Connection
     :ivar session: An AMQP session.
     :type session: qpid.messaging.Session.
     :ivar sender: A message sender.
     :type sender: qpid.messaging.Sender
-    :ivar receiver: A message sender.
+    :ivar receiver: A reply receiver.
     :type receiver: qpid.messaging.Receiver
+    :ivar reply_to: The reply address.
+    :type reply_to: str
     """
 
-    def __init__(self, url, name, arguments):
+    def __init__(self, url):
         """
         :param url: The broker url.
         :type url: str
-        :param name: The method name.
-        :type name: str
-        :param arguments: The method arguments.
-        :type arguments: dict
         """
-        super(Method, self).__init__(url)
-        self.name = name
-        self.arguments = arguments
+        super(Session, self).__init__(url)
         self.connection = Connection(url)
         self.session = None
         self.sender = None
         self.receiver = None
         self.reply_to = REPLY_TO % uuid4()
 
-    @property
-    def content(self):
-        return {
-            '_object_id': OBJECT_ID,
-            '_method_name': self.name,
-            '_arguments': self.arguments
-        }
-
-    @property
-    def properties(self):
-        return {
-            'qmf.opcode': '_method_request',
-            'x-amqp-0-10.app-id': 'qmf2',
-            'method': 'request'
-        }
-
     def is_open(self):
         """
-        Get whether the method is open.
+        Get whether the session is open.
         :return: True if open.
         :rtype: bool
         """
         return self.sender is not None
 
+    @reliable
     def open(self):
         """
         Open a connection and get a sender and receiver.
@@ -124,18 +107,18 @@ class Method(Messenger):
         self.connection.open()
         self.session = self.connection.session()
         self.sender = self.session.sender(ADDRESS)
-        self.receiver = self.session.receiver(self.reply_to)
+        self.receiver = self.session.receiver(self.reply_to, capacity=CAPACITY)
 
     def repair(self):
         """
         Repair the connection and get a sender and receiver.
         """
         self.close()
-        self.connection.close()
-        self.connection.open()
+        self.connection.repair()
         self.session = self.connection.session()
         self.sender = self.session.sender(ADDRESS)
-        self.receiver = self.session.receiver(self.reply_to)
+        self.receiver = self.session.receiver(self.reply_to, capacity=CAPACITY)
+        self.repaired()
 
     def close(self):
         """
@@ -160,11 +143,85 @@ class Method(Messenger):
         except Exception:
             pass
 
-    def on_reply(self, reply):
+    @reliable
+    def send(self, request):
+        """
+        Send the request.
+        :param request: A QMF request.
+        :type request: Message
+        """
+        request.reply_to = self.reply_to
+        self.sender.send(request)
+
+    @reliable
+    def fetch(self, timeout):
+        """
+        Fetch the next reply.
+        :param timeout: The read timeout in seconds.
+        :type timeout: float
+        :return: The reply or None.
+        :rtype: Message
+        """
+        try:
+            reply = self.receiver.fetch(timeout)
+            self.session.acknowledge(reply)
+            return reply
+        except Empty:
+            pass
+
+
+class Method(object):
+    """
+    QMF method.
+    :ivar url: The broker url.
+    :type url: str
+    :ivar name: The method name.
+    :type name: str
+    :ivar arguments: The method arguments.
+    :type arguments: dict
+    :ivar session: The shared management session.
+    :type session: Session
+    """
+
+    def __init__(self, url, name, arguments):
+        """
+        :param url: The broker url.
+        :type url: str
+        :param name: The method name.
+        :type name: str
+        :param arguments: The method arguments.
+        :type arguments: dict
+        """
+        self.url = url
+        self.name = name
+        self.arguments = arguments
+        self.session = Session(url)
+
+    @property
+    def content(self):
+        return {
+            '_object_id': OBJECT_ID,
+            '_method_name': self.name,
+            '_arguments': self.arguments
+        }
+
+    @property
+    def properties(self):
+        return {
+            'qmf.opcode': '_method_request',
+            'x-amqp-0-10.app-id': 'qmf2',
+            'method': 'request'
+        }
+
+    def on_reply(self, reply, resent=False):
         """
         Process the QMF reply.
+        A resent delete that reports not-found succeeded because the
+        object was deleted by the request sent before the repair.
         :param reply: The reply.
         :type reply: Message
+        :param resent: The request was sent again after a repair.
+        :type resent: bool
         :raise: Error on failures.
         """
         opcode = reply.properties['qmf.opcode']
@@ -177,28 +234,25 @@ class Method(Messenger):
         description = values['error_text']
         if code == EEXIST:
             return
+        if resent and self.name == DELETE and NOT_FOUND in utf8(description):
+            log.debug('resent %s: %s', self.name, description)
+            return
         raise Error(description, code)
 
-    @reliable
     def __call__(self):
         """
         Invoke the method.
+        The request is sent on the shared session.
         :raise: Error on failure.
         """
-        self.open()
-        try:
-            request = Message(
-                content=self.content,
-                reply_to=self.reply_to,
-                properties=self.properties,
-                correlation_id=utf8(uuid4()),
-                subject=SUBJECT)
-            self.sender.send(request)
-            reply = self.receiver.fetch()
-            self.session.acknowledge()
-            self.on_reply(reply)
-        finally:
-            self.close()
+        sn = utf8(uuid4())
+        request = Message(
+            content=self.content,
+            properties=self.properties,
+            correlation_id=sn,
+            subject=SUBJECT)
+        reply, resent = self.session.request(request, sn)
+        self.on_reply(reply, resent)
 
 
 class Exchange(BaseExchange):
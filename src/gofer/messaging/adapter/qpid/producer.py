@@ -67,8 +67,7 @@ class Sender(BaseSender):
         Repair the sender.
         """
         self.close()
-        self.connection.close()
-        self.connection.open()
+        self.connection.repair()
         self.session = self.connection.session()
 
     def close(self):
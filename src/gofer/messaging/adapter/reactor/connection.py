@@ -0,0 +1,135 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from logging import getLogger
+
+from proton import ConnectionException, SSLException
+
+from gofer.common import ThreadSingleton, utf8
+from gofer.messaging.adapter.model import BaseConnection, SharedConnection
+from gofer.messaging.adapter.connect import retry
+from gofer.messaging.adapter.reactor.loop import Loop
+
+
+log = getLogger(__name__)
+
+
+# default receiver credit.
+CREDIT = 10
+
+
+class Shared(SharedConnection):
+    """
+    A proton connection shared by all threads.
+    The connection is serviced by the event loop I/O thread
+    and links are used concurrently by all threads.
+    """
+
+    def connect(self):
+        """
+        Open the real connection.
+        :return: The event loop.
+        :rtype: Loop
+        """
+        loop = Loop(self.url)
+        loop.open()
+        return loop
+
+    def disconnect(self, impl):
+        """
+        Close the real connection.
+        :param impl: The event loop.
+        :type impl: Loop
+        """
+        try:
+            impl.close()
+            log.info('closed: %s', self.url)
+        except Exception, pe:
+            log.debug(utf8(pe))
+
+
+class Connection(BaseConnection):
+    """
+    Proton (per-thread) connection.
+    The real connection is shared by all threads.
+    """
+
+    __metaclass__ = ThreadSingleton
+
+    def __init__(self, url):
+        """
+        :param url: The connector url.
+        :type url: str
+        """
+        super(Connection, self).__init__(url)
+        self._shared = Shared(url)
+        self._impl = None
+
+    def is_open(self):
+        """
+        Get whether the connection has been opened.
+        :return: True if open.
+        :rtype bool
+        """
+        return self._impl is not None
+
+    @retry(ConnectionException, SSLException)
+    def open(self):
+        """
+        Open a connection to the broker.
+        """
+        if self.is_open():
+            # already open
+            return
+        self._impl = self._shared.acquire()
+
+    def repair(self):
+        """
+        Repair the connection.
+        The (broken) shared connection is discarded and reopened.
+        """
+        impl = self._impl
+        self._impl = None
+        self._shared.discard(impl)
+        self.open()
+
+    def sender(self, address):
+        """
+        Get a message sender for the specified address.
+        :param address: An AMQP address.
+        :type address: str
+        :return: A sender.
+        :rtype: gofer.messaging.adapter.reactor.loop.Sender
+        """
+        return self._impl.sender(address)
+
+    def receiver(self, address=None, dynamic=False, credit=None):
+        """
+        Get a message receiver for the specified address.
+        :param address: An AMQP address.
+        :type address: str
+        :param dynamic: Indicates link address is dynamically assigned.
+        :type dynamic: bool
+        :param credit: The (optional) link credit.
+        :type credit: int
+        :return: A receiver.
+        :rtype: gofer.messaging.adapter.reactor.loop.Receiver
+        """
+        return self._impl.receiver(address, credit or CREDIT, dynamic=dynamic)
+
+    def close(self):
+        """
+        Close the connection.
+        The shared connection is closed when no longer referenced.
+        """
+        impl = self._impl
+        self._impl = None
+        self._shared.release(impl)
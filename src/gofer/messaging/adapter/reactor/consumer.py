@@ -0,0 +1,167 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Provides AMQP message consumer classes.
+"""
+
+from logging import getLogger
+
+from proton import Delivery
+
+from gofer.messaging.adapter.model import BaseReader, Message
+from gofer.messaging.adapter.reliability import blocking
+from gofer.messaging.adapter.reactor.connection import Connection
+from gofer.messaging.adapter.reactor.reliability import reliable
+
+
+log = getLogger(__name__)
+
+
+class Reader(BaseReader):
+    """
+    An AMQP message reader.
+    Messages are received by the event loop and queued on the
+    receiver so reading does not block other threads.
+    :ivar connection: A proton connection
+    :type connection: Connection
+    :ivar receiver: An AMQP receiver to read.
+    :type receiver: gofer.messaging.adapter.reactor.loop.Receiver
+    """
+
+    def __init__(self, node, url):
+        """
+        :param node: The AMQP node to read.
+        :type node: gofer.messaging.adapter.model.Node
+        :param url: The broker url.
+        :type url: str
+        :see: gofer.messaging.adapter.url.URL
+        """
+        BaseReader.__init__(self, node, url)
+        self.connection = Connection(url)
+        self.receiver = None
+
+    @property
+    def credit(self):
+        """
+        The link credit.
+        :return: The prefetch or None for the default.
+        :rtype: int
+        """
+        return self.prefetch or None
+
+    def is_open(self):
+        """
+        Get whether the messenger has been opened.
+        :return: True if open.
+        :rtype bool
+        """
+        return self.receiver is not None
+
+    @reliable
+    def open(self):
+        """
+        Open the reader.
+        """
+        if self.is_open():
+            # already open
+            return
+        self.connection.open()
+        self.receiver = self.connection.receiver(self.node.address, credit=self.credit)
+
+    def repair(self):
+        """
+        Repair the reader.
+        """
+        self.close()
+        self.connection.repair()
+        self.receiver = self.connection.receiver(self.node.address, credit=self.credit)
+
+    def close(self):
+        """
+        Close the reader.
+        Unsettled messages are released by the broker.
+        """
+        receiver = self.receiver
+        self.receiver = None
+        if receiver is not None:
+            receiver.close()
+
+    @reliable
+    def flow(self, prefetch):
+        """
+        Set the prefetch window.
+        Credit is issued as messages are read to keep the
+        link replenished up to the window.
+        :param prefetch: The number of messages prefetched from the broker.
+        :type prefetch: int
+        """
+        self.receiver.flow(prefetch)
+
+    @blocking
+    @reliable
+    def get(self, timeout=None):
+        """
+        Get the next message from the queue.
+        :param timeout: The read timeout in seconds.
+        :type timeout: int
+        :return: The next message or None.
+        :rtype: Message
+        """
+        received = self.receiver.get(timeout)
+        if received is None:
+            return
+        impl, key = received
+        return Message(self, (self.receiver, key), impl.body)
+
+    def settle(self, messages, state):
+        """
+        Settle the deliveries of the specified messages.
+        The deliveries are settled together in the I/O thread.
+        Messages received on a closed receiver are ignored.
+        :param messages: A list of received messages.
+        :type messages: list
+        :param state: The delivery state.
+        """
+        batches = {}
+        for receiver, key in messages:
+            batches.setdefault(receiver, []).append(key)
+        for receiver, keys in batches.items():
+            receiver.settle(keys, state)
+
+    def ack(self, message):
+        """
+        Accept the specified message.
+        :param message: The message to acknowledge.
+        :type message: tuple
+        """
+        self.settle([message], Delivery.ACCEPTED)
+
+    def ack_batch(self, messages):
+        """
+        Accept a batch of messages.
+        :param messages: A list of messages to acknowledge.
+        :type messages: list
+        """
+        self.settle(messages, Delivery.ACCEPTED)
+
+    def reject(self, message, requeue=True):
+        """
+        Reject the specified message.
+        :param message: The message to reject.
+        :type message: tuple
+        :param requeue: Requeue (release) the message or discard it.
+        :type requeue: bool
+        """
+        if requeue:
+            self.settle([message], Delivery.RELEASED)
+        else:
+            self.settle([message], Delivery.REJECTED)
@@ -0,0 +1,703 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+The proton event loop.
+A proton container runs in a single I/O thread and multiplexes all
+of the links on one connection.  Proton objects are only used by the
+I/O thread.  Other threads inject work (tasks) into the I/O thread
+and results, received messages and errors are handed back through
+thread-safe queues.
+"""
+
+from uuid import uuid4
+from logging import getLogger
+from collections import deque
+from threading import Event
+from Queue import Queue, Empty
+
+from proton import ConnectionException
+from proton.handlers import MessagingHandler
+from proton.reactor import Container, EventInjector, ApplicationEvent
+from proton.reactor import DynamicNodeProperties
+from proton.utils import LinkDetached, ConnectionClosed, SendException
+
+from gofer.common import Thread, utf8
+from gofer.messaging.adapter.model import Connector
+from gofer.messaging.adapter.proton.connection import Connection as BlockingConnection
+
+
+log = getLogger(__name__)
+
+
+# the injected event used to run tasks.
+TASK = 'task'
+
+# seconds to wait for pending work.
+TIMEOUT = 90
+
+
+def detached(link):
+    """
+    Get the exception raised for a detached link.
+    :param link: A detached link.
+    :type link: proton.Link
+    :return: The exception.
+    :rtype: LinkDetached
+    """
+    error = LinkDetached(link)
+    # proton objects must not leak out of the I/O thread.
+    error.link = None
+    return error
+
+
+def closed(connection):
+    """
+    Get the exception raised for a closed connection.
+    :param connection: A closed connection.
+    :type connection: proton.Connection
+    :return: The exception.
+    :rtype: ConnectionClosed
+    """
+    error = ConnectionClosed(connection)
+    # proton objects must not leak out of the I/O thread.
+    error.connection = None
+    return error
+
+
+class Pending(object):
+    """
+    The pending result of work done by the I/O thread.
+    :ivar event: Set when completed.
+    :type event: Event
+    :ivar result: The result.
+    :ivar error: The exception raised.
+    :type error: Exception
+    """
+
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.error = None
+
+    def succeeded(self, result=None):
+        """
+        Complete with a result.
+        :param result: The result.
+        """
+        self.result = result
+        self.event.set()
+
+    def failed(self, error):
+        """
+        Complete with an exception.
+        :param error: The exception.
+        :type error: Exception
+        """
+        self.error = error
+        self.event.set()
+
+    def wait(self, timeout=TIMEOUT):
+        """
+        Wait for the result.
+        The I/O thread completes pending work, even when the
+        connection is lost.  The wait is bounded in case it does not.
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :return: The result.
+        :raise: ConnectionException on timeout.
+        :raise: Exception when failed.
+        """
+        self.event.wait(timeout)
+        if not self.event.isSet():
+            raise ConnectionException('timeout: %d (seconds)' % timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class Link(object):
+    """
+    A link multiplexed on the loop connection.
+    :ivar loop: The event loop.
+    :type loop: Loop
+    :ivar name: The link name.
+    :type name: str
+    :ivar impl: The proton link (I/O thread only).
+    :type impl: proton.Link
+    :ivar attaching: Completed when the link is attached.
+    :type attaching: Pending
+    """
+
+    def __init__(self, loop):
+        """
+        :param loop: The event loop.
+        :type loop: Loop
+        """
+        self.loop = loop
+        self.name = utf8(uuid4())
+        self.impl = None
+        self.attaching = Pending()
+
+    def attached(self):
+        """
+        The link has been attached (I/O thread).
+        """
+        self.attaching.succeeded(self)
+
+    def detached(self, error):
+        """
+        The link has been detached (I/O thread).
+        :param error: The reason.
+        :type error: Exception
+        """
+        self.attaching.failed(error)
+
+    def close(self):
+        """
+        Close the link.
+        Ignored when the connection has been closed.
+        """
+        try:
+            self.loop.post(self._close)
+        except ConnectionException:
+            pass
+
+    def _close(self):
+        self.loop.links.pop(self.name, None)
+        self.impl.close()
+
+
+class Receiver(Link):
+    """
+    A receiver link.
+    Received messages are queued in the inbox.  Credit is issued to
+    the broker as the inbox is drained so that no more than the
+    credit window is prefetched.
+    :ivar credit: The credit window.
+    :type credit: int
+    :ivar inbox: Received (message, key) and errors.
+    :type inbox: Queue
+    :ivar address: The (remote) source address.
+    :type address: str
+    :ivar deliveries: Unsettled deliveries by key (I/O thread only).
+    :type deliveries: dict
+    :ivar taken: Messages taken since credit was last issued.
+    :type taken: int
+    :ivar sn: The last delivery key.
+    :type sn: int
+    """
+
+    def __init__(self, loop, credit):
+        """
+        :param loop: The event loop.
+        :type loop: Loop
+        :param credit: The credit window.
+        :type credit: int
+        """
+        super(Receiver, self).__init__(loop)
+        self.credit = credit
+        self.inbox = Queue()
+        self.address = None
+        self.deliveries = {}
+        self.taken = 0
+        self.sn = 0
+
+    def attach(self, address, dynamic):
+        """
+        Create the proton link (I/O thread).
+        :param address: An AMQP address.
+        :type address: str
+        :param dynamic: Indicates link address is dynamically assigned.
+        :type dynamic: bool
+        :return: Completed when attached.
+        :rtype: Pending
+        """
+        options = None
+        if dynamic:
+            # needed by dispatch router
+            options = DynamicNodeProperties({'x-opt-qd.address': unicode(address)})
+            address = None
+        self.impl = self.loop.container.create_receiver(
+            self.loop.connection,
+            address,
+            name=self.name,
+            dynamic=dynamic,
+            options=options)
+        self.impl.flow(self.credit)
+        self.loop.links[self.name] = self
+        return self.attaching
+
+    def attached(self):
+        self.address = self.impl.remote_source.address
+        super(Receiver, self).attached()
+
+    def detached(self, error):
+        super(Receiver, self).detached(error)
+        self.deliveries.clear()
+        self.inbox.put(error)
+
+    def received(self, message, delivery):
+        """
+        A message has been received (I/O thread).
+        :param message: The received message.
+        :type message: proton.Message
+        :param delivery: The delivery.
+        :type delivery: proton.Delivery
+        """
+        self.sn += 1
+        self.deliveries[self.sn] = delivery
+        self.inbox.put((message, self.sn))
+
+    def get(self, timeout=None):
+        """
+        Get the next message.
+        :param timeout: The read timeout in seconds.
+        :type timeout: float
+        :return: tuple of: (message, key) or None.
+        :rtype: tuple
+        :raise: LinkDetached
+        :raise: ConnectionException
+        """
+        try:
+            item = self.inbox.get(timeout=timeout)
+        except Empty:
+            return
+        if isinstance(item, Exception):
+            # detached, fail subsequent reads.
+            self.inbox.put(item)
+            raise item
+        self.taken += 1
+        if self.taken >= max(1, self.credit / 2):
+            self.taken = 0
+            self.loop.post(self.replenish)
+        return item
+
+    def flow(self, credit):
+        """
+        Set the credit window.
+        :param credit: The credit window.
+        :type credit: int
+        """
+        self.credit = credit
+        self.loop.post(self.replenish)
+
+    def replenish(self):
+        """
+        Issue credit to refill the window (I/O thread).
+        """
+        credit = self.credit - self.impl.credit - self.inbox.qsize()
+        if credit > 0:
+            self.impl.flow(credit)
+
+    def settle(self, keys, state):
+        """
+        Settle deliveries.
+        Ignored when the connection has been closed because
+        unsettled messages are redelivered by the broker.
+        :param keys: The keys of received messages.
+        :type keys: list
+        :param state: The delivery state.
+        """
+        try:
+            self.loop.post(self._settle, keys, state)
+        except ConnectionException:
+            pass
+
+    def _settle(self, keys, state):
+        for key in keys:
+            delivery = self.deliveries.pop(key, None)
+            if delivery is None:
+                continue
+            delivery.update(state)
+            delivery.settle()
+
+    def _close(self):
+        super(Receiver, self)._close()
+        self.deliveries.clear()
+
+
+class Sender(Link):
+    """
+    A sender link.
+    :ivar address: The target address.
+    :type address: str
+    :ivar unsettled: Pending sends by delivery tag (I/O thread only).
+    :type unsettled: dict
+    :ivar error: The reason the link was detached.
+    :type error: Exception
+    """
+
+    def __init__(self, loop):
+        """
+        :param loop: The event loop.
+        :type loop: Loop
+        """
+        super(Sender, self).__init__(loop)
+        self.unsettled = {}
+        self.error = None
+
+    def attach(self, address):
+        """
+        Create the proton link (I/O thread).
+        :param address: An AMQP address.
+        :type address: str
+        :return: Completed when attached.
+        :rtype: Pending
+        """
+        self.impl = self.loop.container.create_sender(
+            self.loop.connection,
+            address,
+            name=self.name)
+        self.loop.links[self.name] = self
+        return self.attaching
+
+    def detached(self, error):
+        super(Sender, self).detached(error)
+        self.error = error
+        unsettled = self.unsettled
+        self.unsettled = {}
+        for pending in unsettled.values():
+            pending.failed(error)
+
+    def send(self, message):
+        """
+        Send a message.
+        Blocks until the message is settled by the broker.
+        :param message: The message to send.
+        :type message: proton.Message
+        :raise: SendException when not accepted.
+        :raise: LinkDetached
+        :raise: ConnectionException
+        """
+        self.loop.call(self._send, message)
+
+    def _send(self, message):
+        if self.error is not None:
+            raise self.error
+        delivery = self.impl.send(message)
+        pending = Pending()
+        self.unsettled[delivery.tag] = pending
+        return pending
+
+    def settled(self, delivery, error):
+        """
+        A sent message has been settled (I/O thread).
+        :param delivery: The delivery.
+        :type delivery: proton.Delivery
+        :param error: The error when not accepted.
+        :type error: Exception
+        """
+        pending = self.unsettled.pop(delivery.tag, None)
+        if pending is None:
+            return
+        if error is None:
+            pending.succeeded()
+        else:
+            pending.failed(error)
+
+
+class Handler(MessagingHandler):
+    """
+    Dispatches proton events to the loop and links.
+    Credit is issued by receivers and messages are settled
+    explicitly by readers.
+    :ivar loop: The event loop.
+    :type loop: Loop
+    """
+
+    def __init__(self, loop):
+        """
+        :param loop: The event loop.
+        :type loop: Loop
+        """
+        MessagingHandler.__init__(self, prefetch=0, auto_accept=False)
+        self.loop = loop
+
+    def on_start(self, event):
+        event.container.selectable(self.loop.injector)
+
+    def on_task(self, event):
+        self.loop.run_tasks()
+
+    def on_connection_opened(self, event):
+        self.loop.opened()
+
+    def on_connection_error(self, event):
+        self.loop.lost(closed(event.connection))
+
+    def on_transport_error(self, event):
+        condition = event.transport.condition
+        if condition:
+            description = '%s: %s' % (condition.name, condition.description)
+        else:
+            description = 'transport error'
+        self.loop.lost(ConnectionException(description))
+
+    def on_disconnected(self, event):
+        self.loop.lost(ConnectionException('disconnected: %s' % self.loop.url))
+
+    def on_link_opened(self, event):
+        link = self.loop.links.get(event.link.name)
+        if link is not None:
+            link.attached()
+
+    def on_link_error(self, event):
+        # only the link is detached, the connection remains open.
+        self.on_link_closing(event)
+
+    def on_link_closing(self, event):
+        link = self.loop.links.pop(event.link.name, None)
+        if link is not None:
+            link.detached(detached(event.link))
+
+    def on_message(self, event):
+        link = self.loop.links.get(event.receiver.name)
+        if link is not None:
+            link.received(event.message, event.delivery)
+
+    def on_accepted(self, event):
+        self.settled(event, None)
+
+    def on_rejected(self, event):
+        self.settled(event, SendException(event.delivery.remote_state))
+
+    def on_released(self, event):
+        self.settled(event, SendException(event.delivery.remote_state))
+
+    def settled(self, event, error):
+        link = self.loop.links.get(event.link.name)
+        if link is not None:
+            link.settled(event.delivery, error)
+
+
+class Loop(Thread):
+    """
+    A proton connection serviced by one I/O thread.
+    :ivar url: The broker url.
+    :type url: str
+    :ivar container: The proton container (reactor).
+    :type container: Container
+    :ivar injector: Used to wake the I/O thread.
+    :type injector: EventInjector
+    :ivar tasks: Tasks to be run in the I/O thread.
+    :type tasks: deque
+    :ivar connection: The proton connection (I/O thread only).
+    :type connection: proton.Connection
+    :ivar opening: Completed when the connection is open.
+    :type opening: Pending
+    :ivar links: Attached links by name (I/O thread only).
+    :type links: dict
+    :ivar error: The reason the connection was lost.
+    :type error: Exception
+    """
+
+    def __init__(self, url):
+        """
+        :param url: The broker url.
+        :type url: str
+        """
+        Thread.__init__(self, name='reactor:%s' % url)
+        self.url = url
+        self.container = Container(Handler(self))
+        self.injector = EventInjector()
+        self.tasks = deque()
+        self.connection = None
+        self.opening = None
+        self.links = {}
+        self.error = None
+        self.setDaemon(True)
+
+    def run(self):
+        """
+        Run the container until the connection is closed or lost.
+        Links and pending work are failed when the container stops
+        without the connection having been shutdown.
+        """
+        try:
+            self.container.run()
+        except Exception:
+            log.exception(self.url)
+        finally:
+            if self.error is None:
+                self.stopped(ConnectionException('closed: %s' % self.url))
+            self.fail_tasks()
+
+    def stopped(self, error):
+        """
+        The container has stopped unexpectedly (I/O thread).
+        :param error: The reason.
+        :type error: Exception
+        """
+        try:
+            self.shutdown(error)
+        except Exception:
+            log.exception(self.url)
+
+    def post(self, fn, *args):
+        """
+        Post a task to be run in the I/O thread.
+        :param fn: The task function.
+        :param args: The task arguments.
+        :return: Completed when the task has run.
+        :rtype: Pending
+        :raise: ConnectionException when the connection has been closed.
+        """
+        if self.error is not None:
+            raise self.error
+        pending = Pending()
+        self.tasks.append((fn, args, pending))
+        if self.error is not None:
+            # closed while posting.
+            self.fail_tasks()
+        else:
+            self.injector.trigger(ApplicationEvent(TASK))
+        return pending
+
+    def call(self, fn, *args):
+        """
+        Run a task in the I/O thread and wait for the result.
+        Tasks that wait on the broker return a Pending which
+        is also waited on.
+        :param fn: The task function.
+        :param args: The task arguments.
+        :return: The result.
+        """
+        result = self.post(fn, *args).wait()
+        if isinstance(result, Pending):
+            result = result.wait()
+        return result
+
+    def run_tasks(self):
+        """
+        Run posted tasks (I/O thread).
+        """
+        while self.tasks:
+            fn, args, pending = self.tasks.popleft()
+            if self.error is not None:
+                pending.failed(self.error)
+                continue
+            try:
+                pending.succeeded(fn(*args))
+            except Exception, e:
+                pending.failed(e)
+
+    def fail_tasks(self):
+        """
+        Fail tasks that will never be run.
+        """
+        while True:
+            try:
+                fn, args, pending = self.tasks.popleft()
+                pending.failed(self.error)
+            except IndexError:
+                break
+
+    def open(self):
+        """
+        Start the I/O thread and open the connection.
+        :raise: ConnectionException
+        """
+        self.start()
+        try:
+            self.call(self._open)
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        connector = Connector.find(self.url)
+        log.info('open: %s', connector)
+        self.connection = self.container.connect(
+            url=connector.url.canonical,
+            heartbeat=connector.heartbeat,
+            ssl_domain=BlockingConnection.ssl_domain(connector),
+            reconnect=False)
+        self.opening = Pending()
+        return self.opening
+
+    def opened(self):
+        """
+        The connection has been opened (I/O thread).
+        """
+        log.info('opened: %s', self.url)
+        opening = self.opening
+        self.opening = None
+        if opening is not None:
+            opening.succeeded()
+
+    def lost(self, error):
+        """
+        The connection has been lost (I/O thread).
+        Readers, senders and pending work are failed and the
+        I/O thread is stopped.
+        :param error: The reason.
+        :type error: Exception
+        """
+        if self.error is not None:
+            return
+        log.error('%s: %s', self.url, utf8(error))
+        self.shutdown(error)
+
+    def close(self):
+        """
+        Close the connection and stop the I/O thread.
+        """
+        try:
+            self.post(self.shutdown, ConnectionException('closed: %s' % self.url))
+        except ConnectionException:
+            pass
+
+    def shutdown(self, error):
+        """
+        Close the connection and stop the I/O thread (I/O thread).
+        :param error: Raised by subsequent use of the loop.
+        :type error: Exception
+        """
+        self.error = error
+        links = self.links
+        self.links = {}
+        for link in links.values():
+            link.detached(error)
+        if self.opening is not None:
+            self.opening.failed(error)
+            self.opening = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        self.injector.close()
+
+    def sender(self, address):
+        """
+        Attach a sender link.
+        :param address: An AMQP address.
+        :type address: str
+        :return: The attached link.
+        :rtype: Sender
+        """
+        link = Sender(self)
+        return self.call(link.attach, address)
+
+    def receiver(self, address, credit, dynamic=False):
+        """
+        Attach a receiver link.
+        :param address: An AMQP address.
+        :type address: str
+        :param credit: The credit window.
+        :type credit: int
+        :param dynamic: Indicates link address is dynamically assigned.
+        :type dynamic: bool
+        :return: The attached link.
+        :rtype: Receiver
+        """
+        link = Receiver(self, credit)
+        return self.call(link.attach, address, dynamic)
+
@@ -0,0 +1,316 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from uuid import uuid4
+from logging import getLogger
+
+from proton import Message, Delivery
+
+from gofer.common import utf8
+from gofer.messaging.adapter.model import ManagementSession, BaseExchange, BaseQueue
+from gofer.messaging.adapter.proton.model import Error, SUBJECT, ADDRESS, EEXIST, CREATE, DELETE
+from gofer.messaging.adapter.proton.model import OBJECT_ID, NOT_FOUND
+from gofer.messaging.adapter.reactor.connection import Connection
+from gofer.messaging.adapter.reactor.reliability import reliable
+
+
+log = getLogger(__name__)
+
+
+# reply receiver credit.
+CREDIT = 10
+
+
+class Session(ManagementSession):
+    """
+    A QMF management session shared by all threads.
+    :ivar connection: A broker connection.
+    :type connection: Connection
+    :ivar sender: A message sender.
+    :type sender: gofer.messaging.adapter.reactor.loop.Sender
+    :ivar receiver: A (dynamic) reply receiver.
+    :type receiver: gofer.messaging.adapter.reactor.loop.Receiver
+    """
+
+    def __init__(self, url):
+        """
+        :param url: The broker url.
+        :type url: str
+        """
+        super(Session, self).__init__(url)
+        self.connection = Connection(url)
+        self.sender = None
+        self.receiver = None
+
+    def is_open(self):
+        """
+        Get whether the session is open.
+        :return: True if open.
+        :rtype: bool
+        """
+        return self.sender is not None
+
+    @reliable
+    def open(self):
+        """
+        Open a connection and get a sender and receiver.
+        """
+        if self.is_open():
+            # already open
+            return
+        self.connection.open()
+        self.receiver = self.connection.receiver(ADDRESS, dynamic=True, credit=CREDIT)
+        self.sender = self.connection.sender(ADDRESS)
+
+    def repair(self):
+        """
+        Repair the connection and get a sender and receiver.
+        """
+        self.close()
+        self.connection.repair()
+        self.receiver = self.connection.receiver(ADDRESS, dynamic=True, credit=CREDIT)
+        self.sender = self.connection.sender(ADDRESS)
+        self.repaired()
+
+    def close(self):
+        """
+        Close the sender and receiver.
+        """
+        sender = self.sender
+        self.sender = None
+        receiver = self.receiver
+        self.receiver = None
+        for link in (sender, receiver):
+            if link is not None:
+                link.close()
+
+    @reliable
+    def send(self, request):
+        """
+        Send the request.
+        :param request: A QMF request.
+        :type request: Message
+        """
+        request.reply_to = self.receiver.address
+        self.sender.send(request)
+
+    @reliable
+    def fetch(self, timeout):
+        """
+        Fetch the next reply.
+        :param timeout: The read timeout in seconds.
+        :type timeout: float
+        :return: The reply or None.
+        :rtype: Message
+        """
+        received = self.receiver.get(timeout)
+        if received is None:
+            return
+        reply, key = received
+        self.receiver.settle([key], Delivery.ACCEPTED)
+        return reply
+
+
+class Method(object):
+    """
+    QMF method.
+    :ivar url: The broker url.
+    :type url: str
+    :ivar name: The method name.
+    :type name: str
+    :ivar arguments: The method arguments.
+    :type arguments: dict
+    :ivar session: The shared management session.
+    :type session: Session
+    """
+
+    def __init__(self, url, name, arguments):
+        """
+        :param url: The broker url.
+        :type url: str
+        :param name: The method name.
+        :type name: str
+        :param arguments: The method arguments.
+        :type arguments: dict
+        """
+        self.url = url
+        self.name = name
+        self.arguments = arguments
+        self.session = Session(url)
+
+    @property
+    def body(self):
+        return {
+            '_object_id': OBJECT_ID,
+            '_method_name': self.name,
+            '_arguments': self.arguments
+        }
+
+    @property
+    def properties(self):
+        return {
+            'qmf.opcode': '_method_request',
+            'x-amqp-0-10.app-id': 'qmf2',
+            'method': 'request'
+        }
+
+    def on_reply(self, reply, resent=False):
+        """
+        Process the QMF reply.
+        A resent delete that reports not-found succeeded because the
+        object was deleted by the request sent before the repair.
+        :param reply: The reply.
+        :type reply: Message
+        :param resent: The request was sent again after a repair.
+        :type resent: bool
+        :raise: Error on failures.
+        """
+        body = dict(reply.body)
+        opcode = reply.properties['qmf.opcode']
+        if opcode != '_exception':
+            # succeeded
+            return
+        values = body['_values']
+        code = values['error_code']
+        description = values['error_text']
+        if code == EEXIST:
+            return
+        if resent and self.name == DELETE and NOT_FOUND in utf8(description):
+            log.debug('resent %s: %s', self.name, description)
+            return
+        raise Error(description, code)
+
+    def __call__(self):
+        """
+        Invoke the method.
+        The request is sent on the shared session.
+        :raise: Error on failure.
+        """
+        sn = utf8(uuid4())
+        request = Message(
+            body=self.body,
+            properties=self.properties,
+            correlation_id=sn,
+            subject=SUBJECT)
+        reply, resent = self.session.request(request, sn)
+        self.on_reply(reply, resent)
+
+
+class Exchange(BaseExchange):
+
+    def declare(self, url):
+        """
+        Declare the exchange.
+        :param url: The broker URL.
+        :type url: str
+        :raise: Error
+        """
+        arguments = {
+            'strict': True,
+            'name': self.name,
+            'type': 'exchange',
+            'exchange-type': self.policy,
+            'properties': {
+                'auto-delete': self.auto_delete,
+                'durable': self.durable
+            }
+        }
+        method = Method(url, CREATE, arguments)
+        method()
+
+    def delete(self, url):
+        """
+        Delete the exchange.
+        :param url: The broker URL.
+        :type url: str
+        :raise: Error
+        """
+        arguments = {
+            'strict': True,
+            'name': self.name,
+            'type': 'exchange',
+            'properties': {}
+        }
+        method = Method(url, DELETE, arguments)
+        method()
+
+    def bind(self, queue, url):
+        """
+        Bind the specified queue.
+        :param queue: The queue to bind.
+        :type queue: BaseQueue
+        :param url: The broker URL.
+        :type url: str
+        :raise: Error
+        """
+        arguments = {
+            'strict': True,
+            'name': '/'.join((self.name, queue.name, queue.name)),
+            'type': 'binding',
+            'properties': {}
+        }
+        method = Method(url, CREATE, arguments)
+        method()
+
+    def unbind(self, queue, url):
+        """
+        Unbind the specified queue.
+        :param queue: The queue to unbind.
+        :type queue: BaseQueue
+        :raise Error
+        """
+        arguments = {
+            'strict': True,
+            'name': '/'.join((self.name, queue.name, queue.name)),
+            'type': 'binding',
+            'properties': {}
+        }
+        method = Method(url, DELETE, arguments)
+        method()
+
+
+class Queue(BaseQueue):
+
+    def declare(self, url):
+        """
+        Declare the queue.
+        :param url: The broker URL.
+        :type url: str
+        :raise: Error
+        """
+        arguments = {
+            'strict': True,
+            'name': self.name,
+            'type': 'queue',
+            'properties': {
+                'exclusive': self.exclusive,
+                'auto-delete': self.auto_delete,
+                'durable': self.durable
+            }
+        }
+        method = Method(url, CREATE, arguments)
+        method()
+
+    def delete(self, url):
+        """
+        Delete the queue.
+        :param url: The broker URL.
+        :type url: str
+        :raise: Error
+        """
+        arguments = {
+            'strict': True,
+            'name': self.name,
+            'type': 'queue',
+            'properties': {}
+        }
+        method = Method(url, DELETE, arguments)
+        method()
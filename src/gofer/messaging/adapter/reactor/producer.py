@@ -0,0 +1,95 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from logging import getLogger
+
+from gofer.messaging.adapter.model import BaseSender
+from gofer.messaging.adapter.proton.producer import Links, build_message
+from gofer.messaging.adapter.reactor.connection import Connection
+from gofer.messaging.adapter.reactor.reliability import reliable
+
+
+log = getLogger(__name__)
+
+
+class Sender(BaseSender):
+    """
+    An AMQP message sender.
+    Messages are sent by the event loop and the calling thread
+    waits only for the message to be settled.
+    :ivar connection: A proton connection.
+    :type connection: Connection
+    :ivar links: Cached sender links.
+    :type links: Links
+    """
+
+    def __init__(self, url):
+        """
+        :param url: The broker url.
+        :type url: str
+        """
+        BaseSender.__init__(self, url)
+        self.connection = Connection(url)
+        self.links = Links()
+
+    def is_open(self):
+        """
+        Get whether the messenger has been opened.
+        :return: True if open.
+        :rtype bool
+        """
+        return self.connection.is_open()
+
+    @reliable
+    def open(self):
+        """
+        Open the sender.
+        """
+        if self.is_open():
+            # already opened
+            return
+        self.connection.open()
+
+    def repair(self):
+        """
+        Repair the sender.
+        """
+        self.close()
+        self.connection.repair()
+
+    def close(self):
+        """
+        Close the sender.
+        """
+        self.links.clear()
+
+    @reliable
+    def send(self, address, content, ttl=None):
+        """
+        Send a message.
+        :param address: An AMQP address.
+        :type address: str
+        :param content: The message content
+        :type content: buf
+        :param ttl: Time to Live (seconds)
+        :type ttl: float
+        """
+        sender = self.links.find(address)
+        if sender is None:
+            sender = self.connection.sender(address)
+            self.links.add(address, sender)
+        try:
+            message = build_message(content, ttl, self.durable)
+            sender.send(message)
+            log.debug('sent (%s)', address)
+        except Exception:
+            self.links.discard(address)
+            raise
@@ -13,7 +13,7 @@
 # Jeff Ortel <jortel@redhat.com>
 #
 
-from time import sleep
+from time import time
 
 from gofer import Thread
 
@@ -26,24 +26,23 @@ MONTH = DAY * 30
 YEAR = DAY * 365
 
 
-DELAY = 0.0010
-MAX_DELAY = 2.0
-DELAY_MULTIPLIER = 1.2
-
-
 def blocking(fn):
+    """
+    Blocking read decorator.
+    The decorated function is expected to block on the underlying
+    socket (or library wait primitive) for up to the specified timeout.
+    When it returns without a message before the timeout has elapsed
+    (heartbeats, partial frames), it is called again with the time
+    remaining rather than sleeping between attempts.
+    """
     def _fn(reader, timeout=None):
-        delay = DELAY
         timer = float(timeout or 0)
+        deadline = time() + timer
         while not Thread.aborted():
             message = fn(reader, timer)
             if message:
                 return message
-            if timer > 0:
-                sleep(delay)
-                timer -= delay
-                if delay < MAX_DELAY:
-                    delay *= DELAY_MULTIPLIER
-            else:
+            timer = deadline - time()
+            if timer <= 0:
                 break
-    return _fn
\ No newline at end of file
+    return _fn
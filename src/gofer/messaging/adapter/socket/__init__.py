@@ -0,0 +1,16 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from gofer.messaging.adapter.socket.model import Exchange, Queue
+from gofer.messaging.adapter.socket.connection import Connection
+from gofer.messaging.adapter.socket.consumer import Reader
+from gofer.messaging.adapter.socket.producer import Sender
+from gofer.messaging.adapter.socket.manifest import PROVIDES
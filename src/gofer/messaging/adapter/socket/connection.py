@@ -0,0 +1,131 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import socket
+
+from errno import ECONNREFUSED, ENOENT
+from logging import getLogger
+
+from gofer.common import ThreadSingleton, utf8
+from gofer.messaging.adapter.model import BaseConnection, Connector, NotFound
+from gofer.messaging.adapter.connect import retry
+from gofer.messaging.adapter.socket import wire
+from gofer.messaging.adapter.socket.server import Server
+
+
+log = getLogger(__name__)
+
+
+# connect errors indicating that nothing is listening.
+NOT_LISTENING = (ECONNREFUSED, ENOENT)
+
+
+class Error(Exception):
+    """
+    A request failed on the server.
+    """
+
+
+class Connection(BaseConnection):
+    """
+    Represents a (per-thread) socket connection.
+    When nothing is listening on the socket address and the connector
+    is configured to listen (agents), this process starts listening
+    and hosts the queues.  Other processes only connect.
+    :ivar generation: Incremented each time a socket is connected.
+        Readers use it to detect that the connection was replaced.
+    :type generation: int
+    """
+
+    __metaclass__ = ThreadSingleton
+
+    def __init__(self, url):
+        """
+        :param url: The broker url.
+        :type url: str
+        """
+        BaseConnection.__init__(self, url)
+        self._impl = None
+        self.generation = 0
+
+    def is_open(self):
+        """
+        Get whether the connection has been opened.
+        :return: True if open.
+        :rtype bool
+        """
+        return self._impl is not None
+
+    @retry(socket.error)
+    def open(self):
+        """
+        Open a connection.
+        """
+        if self.is_open():
+            # already open
+            return
+        address = wire.Address.find(self.url)
+        try:
+            self._impl = address.connect()
+        except socket.error, se:
+            if se.errno not in NOT_LISTENING:
+                raise
+            if not Connector.find(self.url).listen:
+                raise
+            Server.listen(address)
+            self._impl = address.connect()
+        self.generation += 1
+        log.info('opened: %s', self.url)
+
+    def repair(self):
+        """
+        Repair the connection.
+        """
+        self.close()
+        self.open()
+
+    def close(self):
+        """
+        Close the connection.
+        """
+        impl = self._impl
+        self._impl = None
+        if impl is None:
+            return
+        try:
+            impl.close()
+            log.info('closed: %s', self.url)
+        except Exception, pe:
+            log.debug(utf8(pe))
+
+    def call(self, op, body='', **header):
+        """
+        Send a request and read the reply.
+        :param op: The requested operation.
+        :type op: str
+        :param body: The (opaque) request body.
+        :type body: str
+        :param header: The request header.
+        :return: tuple of: (header, body)
+        :rtype: tuple
+        :raise: NotFound
+        :raise: Error
+        :raise: socket.error
+        """
+        header['op'] = op
+        wire.send(self._impl, header, body)
+        reply, body = wire.recv(self._impl)
+        status = reply.pop('status')
+        if status == wire.NOT_FOUND:
+            raise NotFound(reply['description'])
+        if status != wire.OK:
+            raise Error(reply['description'])
+        return reply, body
@@ -0,0 +1,169 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Provides socket message consumer classes.
+"""
+
+from uuid import uuid4
+from logging import getLogger
+
+from gofer.common import utf8
+from gofer.messaging.adapter.model import BaseReader, Message
+from gofer.messaging.adapter.socket.connection import Connection
+from gofer.messaging.adapter.socket.reliability import reliable
+
+
+log = getLogger(__name__)
+
+
+class Reader(BaseReader):
+    """
+    A socket message reader.
+    Messages are delivered with a tag and remain unacknowledged on
+    the server until acknowledged or rejected.  Unacknowledged
+    messages are requeued when the reader is closed or the
+    connection is lost.
+    :ivar connection: A socket connection.
+    :type connection: Connection
+    :ivar cursor: The server-side reader ID (when open).
+    :type cursor: str
+    :ivar generation: The connection generation when opened.
+    :type generation: int
+    """
+
+    def __init__(self, node, url):
+        """
+        :param node: The AMQP node to read.
+        :type node: gofer.messaging.adapter.model.Node
+        :param url: The broker url.
+        :type url: str
+        :see: gofer.messaging.adapter.url.URL
+        """
+        BaseReader.__init__(self, node, url)
+        self.connection = Connection(url)
+        self.cursor = None
+        self.generation = 0
+
+    def is_open(self):
+        """
+        Get whether the reader has been opened.
+        :return: True if open.
+        :rtype bool
+        """
+        return self.cursor is not None
+
+    @reliable
+    def open(self):
+        """
+        Open the reader.
+        :raise: NotFound
+        """
+        if self.is_open():
+            # already open
+            return
+        self.connection.open()
+        cursor = utf8(uuid4())
+        self.connection.call('open', reader=cursor, queue=self.node.name)
+        self.cursor = cursor
+        self.generation = self.connection.generation
+
+    def repair(self):
+        """
+        Repair the reader.
+        :raise: NotFound
+        """
+        self.cursor = None
+        self.connection.repair()
+        self.open()
+
+    def close(self):
+        """
+        Close the reader.
+        Unacknowledged messages are requeued.
+        """
+        cursor = self.cursor
+        self.cursor = None
+        if cursor is None:
+            return
+        try:
+            self.connection.call('close', reader=cursor)
+        except Exception, e:
+            log.debug(utf8(e))
+
+    def flow(self, prefetch):
+        """
+        Set the prefetch window.
+        Not applicable, messages are fetched one at a time.
+        :param prefetch: The number of messages prefetched from the broker.
+        :type prefetch: int
+        """
+        pass
+
+    @reliable
+    def get(self, timeout=None):
+        """
+        Get the next message from the queue.
+        :param timeout: The read timeout in seconds.
+        :type timeout: int
+        :return: The next message or None.
+        :rtype: Message
+        :raise: NotFound
+        """
+        if self.generation != self.connection.generation:
+            # replaced (repaired) by another reader on this thread
+            self.cursor = None
+            self.open()
+        reply, body = self.connection.call('get', reader=self.cursor, timeout=timeout)
+        tag = reply.get('tag')
+        if tag is None:
+            return
+        return Message(self, (self.cursor, tag), body)
+
+    @reliable
+    def ack(self, message):
+        """
+        Acknowledge the specified message.
+        Messages read before the connection was lost
+        have already been requeued and are ignored.
+        :param message: The message to acknowledge.
+        :type message: tuple
+        """
+        cursor, tag = message
+        if cursor != self.cursor:
+            return
+        self.connection.call('ack', reader=cursor, tags=[tag])
+
+    @reliable
+    def ack_batch(self, messages):
+        """
+        Acknowledge a batch of messages in one request.
+        :param messages: A list of messages to acknowledge.
+        :type messages: list
+        """
+        tags = [tag for cursor, tag in messages if cursor == self.cursor]
+        if not tags:
+            return
+        self.connection.call('ack', reader=self.cursor, tags=tags)
+
+    @reliable
+    def reject(self, message, requeue=True):
+        """
+        Reject the specified message.
+        :param message: The message to reject.
+        :type message: tuple
+        :param requeue: Requeue the message or discard it.
+        :type requeue: bool
+        """
+        cursor, tag = message
+        if cursor != self.cursor:
+            return
+        self.connection.call('reject', reader=cursor, tag=tag, requeue=requeue)
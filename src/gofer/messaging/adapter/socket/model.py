@@ -0,0 +1,111 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from gofer.messaging.adapter.socket import reliability
+
+from gofer.messaging.adapter.model import BaseExchange, BaseQueue
+
+
+def reliable(fn):
+    return reliability.endpoint(reliability.reliable(fn))
+
+
+class Exchange(BaseExchange):
+    """
+    An exchange hosted by the socket server.
+    """
+
+    def declare(self, url):
+        """
+        Declare the exchange.
+        :param url: The broker URL.
+        :type url: str
+        """
+        @reliable
+        def _fn(_endpoint):
+            _endpoint.connection.call(
+                'declare_exchange',
+                name=self.name,
+                policy=self.policy)
+        _fn(url)
+
+    def delete(self, url):
+        """
+        Delete the exchange.
+        :param url: The broker URL.
+        :type url: str
+        """
+        @reliable
+        def _fn(_endpoint):
+            _endpoint.connection.call('delete_exchange', name=self.name)
+        _fn(url)
+
+    def bind(self, queue, url):
+        """
+        Bind the specified queue.
+        :param queue: The queue to bind.
+        :type queue: BaseQueue
+        :param url: The broker URL.
+        :type url: str
+        :raise: NotFound
+        """
+        @reliable
+        def _fn(_endpoint):
+            _endpoint.connection.call('bind', exchange=self.name, queue=queue.name)
+        _fn(url)
+
+    def unbind(self, queue, url):
+        """
+        Unbind the specified queue.
+        :param queue: The queue to unbind.
+        :type queue: BaseQueue
+        :param url: The broker URL.
+        :type url: str
+        :raise: NotFound
+        """
+        @reliable
+        def _fn(_endpoint):
+            _endpoint.connection.call('unbind', exchange=self.name, queue=queue.name)
+        _fn(url)
+
+
+class Queue(BaseQueue):
+    """
+    A queue hosted by the socket server.
+    """
+
+    def declare(self, url):
+        """
+        Declare the queue.
+        :param url: The broker URL.
+        :type url: str
+        """
+        @reliable
+        def _fn(_endpoint):
+            _endpoint.connection.call(
+                'declare_queue',
+                name=self.name,
+                durable=self.durable,
+                auto_delete=self.auto_delete,
+                expiration=self.expiration,
+                exclusive=self.exclusive)
+        _fn(url)
+
+    def delete(self, url):
+        """
+        Delete the queue.
+        :param url: The broker URL.
+        :type url: str
+        """
+        @reliable
+        def _fn(_endpoint):
+            _endpoint.connection.call('delete_queue', name=self.name)
+        _fn(url)
@@ -0,0 +1,66 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import socket
+
+from time import sleep
+from logging import getLogger
+
+from gofer.common import Thread, utf8
+from gofer.messaging.adapter.model import Messenger
+from gofer.messaging.adapter.socket.connection import Connection
+
+
+log = getLogger(__name__)
+
+
+DELAY = 10  # seconds
+
+
+def reliable(fn):
+    def _fn(messenger, *args, **kwargs):
+        repair = lambda: None
+        while not Thread.aborted():
+            try:
+                repair()
+                return fn(messenger, *args, **kwargs)
+            except socket.error, se:
+                log.error(utf8(se))
+                repair = messenger.repair
+                sleep(DELAY)
+    return _fn
+
+
+def endpoint(fn):
+    def _fn(url):
+        _endpoint = Endpoint(url)
+        _endpoint.open()
+        return fn(_endpoint)
+    return _fn
+
+
+class Endpoint(Messenger):
+
+    def __init__(self, url):
+        super(Endpoint, self).__init__(url)
+        self.connection = Connection(url)
+
+    def is_open(self):
+        return self.connection.is_open()
+
+    def open(self):
+        self.connection.open()
+
+    def repair(self):
+        self.connection.repair()
+
+    def close(self):
+        pass
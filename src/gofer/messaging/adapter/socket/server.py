@@ -0,0 +1,310 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Serves an in-process broker on a socket.
+The first agent to use a socket URL listens on it and hosts the
+queues in memory.  Other processes connect as clients.
+"""
+
+import socket
+
+from logging import getLogger
+from threading import RLock
+
+from gofer.common import Thread, utf8
+from gofer.messaging.adapter.model import NotFound
+from gofer.messaging.adapter.memory.broker import Broker, Message
+from gofer.messaging.adapter.socket import wire
+
+
+log = getLogger(__name__)
+
+
+class Cursor(object):
+    """
+    A reader opened by a client.
+    :ivar queue: The queue being read.
+    :type queue: gofer.messaging.adapter.memory.broker.Queue
+    :ivar unacked: Messages read but not acknowledged by tag.
+    :type unacked: dict
+    :ivar tag: The last delivery tag.
+    :type tag: int
+    """
+
+    def __init__(self, queue):
+        """
+        :param queue: The queue being read.
+        :type queue: gofer.messaging.adapter.memory.broker.Queue
+        """
+        self.queue = queue
+        self.unacked = {}
+        self.tag = 0
+
+    def get(self, timeout):
+        """
+        Get the next message.
+        :param timeout: The read timeout in seconds.
+        :type timeout: float
+        :return: tuple of: (tag, message) or None.
+        :rtype: tuple
+        """
+        message = self.queue.get(timeout)
+        if message is None:
+            return
+        self.tag += 1
+        self.unacked[self.tag] = message
+        return self.tag, message
+
+    def ack(self, tag):
+        """
+        Acknowledge a message.
+        :param tag: The delivery tag.
+        :type tag: int
+        """
+        self.unacked.pop(tag, None)
+
+    def reject(self, tag, requeue):
+        """
+        Reject a message.
+        :param tag: The delivery tag.
+        :type tag: int
+        :param requeue: Requeue the message or discard it.
+        :type requeue: bool
+        """
+        message = self.unacked.pop(tag, None)
+        if message is not None and requeue:
+            self.queue.requeue(message)
+
+    def close(self):
+        """
+        Close the cursor.
+        Unacknowledged messages are requeued in the order read.
+        """
+        unacked = self.unacked
+        self.unacked = {}
+        for tag in sorted(unacked, reverse=True):
+            self.queue.requeue(unacked[tag])
+        self.queue.detach()
+
+
+class Handler(Thread):
+    """
+    Handles requests on a client connection.
+    :ivar broker: The in-process broker.
+    :type broker: Broker
+    :ivar sock: The client socket.
+    :type sock: socket.socket
+    :ivar cursors: Open readers by ID.
+    :type cursors: dict
+    """
+
+    def __init__(self, broker, sock, peer):
+        """
+        :param broker: The in-process broker.
+        :type broker: Broker
+        :param sock: The client socket.
+        :type sock: socket.socket
+        :param peer: The client address.
+        """
+        Thread.__init__(self, name='socket:%s' % (peer or 'local',))
+        self.broker = broker
+        self.sock = sock
+        self.cursors = {}
+        self.setDaemon(True)
+
+    def run(self):
+        """
+        Process requests until the client disconnects.
+        """
+        try:
+            while not Thread.aborted():
+                header, body = wire.recv(self.sock)
+                reply, body = self.dispatch(header, body)
+                wire.send(self.sock, reply, body)
+        except socket.error, se:
+            log.debug('%s: %s', self.getName(), utf8(se))
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Close the open readers and the client socket.
+        """
+        cursors = self.cursors
+        self.cursors = {}
+        for cursor in cursors.values():
+            cursor.close()
+        self.broker.reap()
+        try:
+            self.sock.close()
+        except socket.error:
+            pass
+
+    def dispatch(self, header, body):
+        """
+        Dispatch a request.
+        :param header: The request header.
+        :type header: dict
+        :param body: The request body.
+        :type body: str
+        :return: tuple of: (header, body)
+        :rtype: tuple
+        """
+        try:
+            op = getattr(self, 'op_%s' % header.pop('op'))
+            reply = op(body=body, **header) or {}
+            body = reply.pop('body', '')
+            reply['status'] = wire.OK
+            return reply, body
+        except NotFound, e:
+            return dict(status=wire.NOT_FOUND, description=utf8(e)), ''
+        except Exception, e:
+            log.exception(self.getName())
+            return dict(status=wire.ERROR, description=utf8(e)), ''
+
+    def op_declare_queue(self, name, body, **properties):
+        self.broker.declare_queue(name, **properties)
+
+    def op_delete_queue(self, name, body):
+        self.broker.delete_queue(name)
+
+    def op_declare_exchange(self, name, policy, body):
+        self.broker.declare_exchange(name, policy)
+
+    def op_delete_exchange(self, name, body):
+        self.broker.delete_exchange(name)
+
+    def op_bind(self, exchange, queue, body):
+        self.broker.bind(exchange, queue)
+
+    def op_unbind(self, exchange, queue, body):
+        self.broker.unbind(exchange, queue)
+
+    def op_send(self, address, ttl, durable, body):
+        message = Message(body, ttl=ttl, durable=durable)
+        self.broker.send(address, message)
+
+    def op_open(self, reader, queue, body):
+        self.op_close(reader, body)
+        queue = self.broker.queue(queue)
+        queue.attach()
+        self.cursors[reader] = Cursor(queue)
+
+    def op_close(self, reader, body):
+        cursor = self.cursors.pop(reader, None)
+        if cursor is not None:
+            cursor.close()
+            self.broker.reap()
+
+    def op_get(self, reader, timeout, body):
+        cursor = self.cursor(reader)
+        fetched = cursor.get(timeout)
+        if fetched is None:
+            return
+        tag, message = fetched
+        return dict(tag=tag, body=message.body)
+
+    def op_ack(self, reader, tags, body):
+        cursor = self.cursor(reader)
+        for tag in tags:
+            cursor.ack(tag)
+
+    def op_reject(self, reader, tag, requeue, body):
+        cursor = self.cursor(reader)
+        cursor.reject(tag, requeue)
+
+    def cursor(self, reader):
+        """
+        Find an open reader.
+        :param reader: The reader ID.
+        :type reader: str
+        :return: The cursor.
+        :rtype: Cursor
+        :raise: NotFound
+        """
+        try:
+            cursor = self.cursors[reader]
+        except KeyError:
+            raise NotFound('reader: %s, not-found' % reader)
+        name = cursor.queue.name
+        if self.broker.queues.get(name) is not cursor.queue:
+            raise NotFound('queue: %s, not-found' % name)
+        return cursor
+
+
+class Server(Thread):
+    """
+    Accepts client connections on a socket.
+    One server per address in the process.
+    :ivar address: The socket address.
+    :type address: wire.Address
+    :ivar sock: The listening socket.
+    :type sock: socket.socket
+    :ivar broker: The in-process broker.
+    :type broker: Broker
+    :cvar servers: Running servers by address.
+    :type servers: dict
+    """
+
+    servers = {}
+    lock = RLock()
+
+    @staticmethod
+    def listen(address):
+        """
+        Listen on the specified address.
+        Has no effect when already listening in this process.
+        :param address: The socket address.
+        :type address: wire.Address
+        :return: The server.
+        :rtype: Server
+        :raise: socket.error when the address cannot be bound.
+        """
+        key = utf8(address)
+        with Server.lock:
+            server = Server.servers.get(key)
+            if server is not None and server.isAlive():
+                return server
+            sock = address.listen()
+            server = Server(address, sock)
+            server.start()
+            Server.servers[key] = server
+            log.info('listening on: %s', key)
+            return server
+
+    def __init__(self, address, sock):
+        """
+        :param address: The socket address.
+        :type address: wire.Address
+        :param sock: The listening socket.
+        :type sock: socket.socket
+        """
+        Thread.__init__(self, name='socket:%s' % address)
+        self.address = address
+        self.sock = sock
+        self.broker = Broker(utf8(address), 0)
+        self.setDaemon(True)
+
+    def run(self):
+        """
+        Accept client connections.
+        """
+        try:
+            while not Thread.aborted():
+                sock, peer = self.sock.accept()
+                handler = Handler(self.broker, sock, peer)
+                handler.start()
+        except socket.error, se:
+            log.error('%s: %s', self.getName(), utf8(se))
+        finally:
+            self.sock.close()
+            self.address.unlock()
@@ -0,0 +1,241 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+The socket wire protocol.
+Each frame is: <header-length><body-length><header><body> where
+the lengths are 32-bit unsigned integers (network byte order), the
+header is a json encoded dictionary and the body is opaque.
+"""
+
+import os
+import socket
+
+from errno import EADDRINUSE, EAGAIN, EACCES
+from fcntl import flock, LOCK_EX, LOCK_NB
+from struct import Struct
+
+from gofer.common import json, utf8
+from gofer.messaging.adapter.url import URL
+
+
+# frame prefix: (header-length, body-length)
+PREFIX = Struct('!II')
+
+# socket listen backlog
+BACKLOG = 64
+
+# maximum frame header and body sizes (bytes).
+MAX_HEADER = 0x10000
+MAX_BODY = 0x4000000
+
+# maximum bytes requested by each socket recv().
+CHUNK = 0x10000
+
+# reply status
+OK = 'ok'
+NOT_FOUND = 'not-found'
+ERROR = 'error'
+
+
+class ConnectionClosed(socket.error):
+    """
+    The peer closed the connection.
+    """
+
+
+class FrameError(socket.error):
+    """
+    The peer sent a frame that is not valid.
+    """
+
+
+def send(sock, header, body=''):
+    """
+    Send a frame.
+    :param sock: A connected socket.
+    :type sock: socket.socket
+    :param header: The frame header.
+    :type header: dict
+    :param body: The (opaque) frame body.
+    :type body: str
+    """
+    header = json.dumps(header)
+    body = body or ''
+    sock.sendall(''.join((PREFIX.pack(len(header), len(body)), header, body)))
+
+
+def recv(sock):
+    """
+    Receive a frame.
+    :param sock: A connected socket.
+    :type sock: socket.socket
+    :return: tuple of: (header, body)
+    :rtype: tuple
+    :raise: ConnectionClosed
+    :raise: FrameError
+    """
+    prefix = read(sock, PREFIX.size)
+    header_length, body_length = PREFIX.unpack(prefix)
+    if header_length > MAX_HEADER or body_length > MAX_BODY:
+        raise FrameError('frame (%d, %d) too large' % (header_length, body_length))
+    header = json.loads(read(sock, header_length))
+    body = read(sock, body_length)
+    return header, body
+
+
+def read(sock, length):
+    """
+    Read exactly the specified number of bytes.
+    :param sock: A connected socket.
+    :type sock: socket.socket
+    :param length: The number of bytes.
+    :type length: int
+    :return: The bytes read.
+    :rtype: str
+    :raise: ConnectionClosed
+    """
+    chunks = []
+    while length > 0:
+        chunk = sock.recv(min(length, CHUNK))
+        if not chunk:
+            raise ConnectionClosed('connection closed by peer')
+        chunks.append(chunk)
+        length -= len(chunk)
+    return ''.join(chunks)
+
+
+class Address(object):
+    """
+    A socket address.
+    :ivar family: The address family (AF_INET|AF_UNIX).
+    :type family: int
+    :ivar address: The socket address.
+    :type address: str|tuple
+    :ivar fp: The (held) lock file while listening on a unix socket.
+    :type fp: file
+    """
+
+    @staticmethod
+    def find(url):
+        """
+        Get the socket address for the specified URL.
+        :param url: The broker url.
+        :type url: str
+        :return: The address.
+        :rtype: Address
+        """
+        url = URL(url)
+        if url.is_unix():
+            return Address(socket.AF_UNIX, '/%s' % url.path)
+        else:
+            return Address(socket.AF_INET, (url.host or 'localhost', url.port))
+
+    def __init__(self, family, address):
+        """
+        :param family: The address family (AF_INET|AF_UNIX).
+        :type family: int
+        :param address: The socket address.
+        :type address: str|tuple
+        """
+        self.family = family
+        self.address = address
+        self.fp = None
+
+    def socket(self):
+        """
+        Create a socket.
+        :return: The (unconnected) socket.
+        :rtype: socket.socket
+        """
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def connect(self):
+        """
+        Connect to the address.
+        :return: The connected socket.
+        :rtype: socket.socket
+        :raise: socket.error
+        """
+        sock = self.socket()
+        try:
+            sock.connect(self.address)
+            return sock
+        except Exception:
+            sock.close()
+            raise
+
+    def listen(self):
+        """
+        Bind and listen on the address.
+        A unix socket file is only removed while holding the
+        exclusive lock so that a live listener is never replaced.
+        :return: The listening socket.
+        :rtype: socket.socket
+        :raise: socket.error (EADDRINUSE) when another process is listening.
+        """
+        sock = self.socket()
+        try:
+            if self.family == socket.AF_UNIX:
+                self.lock()
+                if os.path.exists(self.address):
+                    # stale
+                    os.unlink(self.address)
+            else:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(self.address)
+            sock.listen(BACKLOG)
+            return sock
+        except Exception:
+            sock.close()
+            self.unlock()
+            raise
+
+    def lock(self):
+        """
+        Acquire the exclusive (flock) lock on a unix socket address.
+        The lock is held by the listening process until unlocked
+        and is released by the kernel when the process exits.
+        :raise: socket.error (EADDRINUSE) when held by another process.
+        """
+        if self.fp is not None:
+            return
+        path = '%s.lock' % self.address
+        fp = open(path, 'a')
+        try:
+            flock(fp.fileno(), LOCK_EX | LOCK_NB)
+            self.fp = fp
+        except IOError, e:
+            fp.close()
+            if e.errno in (EAGAIN, EACCES):
+                raise socket.error(EADDRINUSE, 'locked: %s' % path)
+            raise
+
+    def unlock(self):
+        """
+        Release the lock acquired by lock().
+        """
+        fp = self.fp
+        self.fp = None
+        if fp is not None:
+            fp.close()
+
+    def __unicode__(self):
+        if self.family == socket.AF_UNIX:
+            return 'unix:%s' % self.address
+        else:
+            return 'tcp:%s:%d' % self.address
+
+    def __str__(self):
+        return utf8(self)
@@ -30,9 +30,14 @@ AMQPS = {
     'amqps': 5671,
 }
 
+UNIX = {
+    'unix': 0,
+}
+
 PORT = {}
 PORT.update(AMQP)
 PORT.update(AMQPS)
+PORT.update(UNIX)
 
 
 class Part(object):
@@ -59,6 +64,7 @@ class URL(Part):
     """
     Represents a broker URL.
     Format: <adapter>+<scheme>://<user>:<password>@<host>:<port></>.
+    Unix domain socket format: <adapter>+unix:///<path>.
     :ivar adapter: The messaging adapter.
     :type adapter: str
     :ivar scheme: The URL scheme.
@@ -112,14 +118,19 @@ class URL(Part):
         url = '%s://' % self.scheme
         if self.userid:
             url += '%(u)s:%(p)s@' % {'u': self.userid, 'p': self.password}
-        url += self.host
+        url += self.host or ''
         if self.port not in PORT.values():
             url += ':%d' % self.port
+        if self.is_unix():
+            url += '/%s' % self.path
         return url
 
     def is_ssl(self):
         return self.scheme in AMQPS
 
+    def is_unix(self):
+        return self.scheme in UNIX
+
     def __hash__(self):
         return hash(self.canonical)
 
@@ -21,12 +21,28 @@ from logging import getLogger
 from base64 import b64encode, b64decode
 
 from gofer.common import utf8
+from gofer.messaging.codec import MARK
 from gofer.messaging.model import Document, DocumentError
 
 
 log = getLogger(__name__)
 
 
+# signed message tag (envelope version).
+TAG = 'S1'
+
+# supported signed message formats (advertised to peers).
+FORMATS = [TAG]
+
+# supported digest algorithms.
+DIGESTS = {
+    'sha256': sha256,
+}
+
+# digest algorithm used to sign.
+DIGEST = 'sha256'
+
+
 class ValidationFailed(DocumentError):
     """
     Message validation failed.
@@ -53,8 +69,15 @@ class ValidationFailed(DocumentError):
 class Authenticator(object):
     """
     Document the message authenticator API.
+    :cvar addressed: The destination address is passed to sign().
+    :type addressed: bool
+    :cvar formats: Additional signing formats supported (advertised to peers).
+    :type formats: tuple
     """
 
+    addressed = False
+    formats = ()
+
     def sign(self, digest):
         """
         Sign the specified message.
@@ -79,28 +102,59 @@ class Authenticator(object):
         raise NotImplementedError()
 
 
-def sign(authenticator, message):
+def formats(authenticator):
+    """
+    Get the signing formats advertised to peers.
+    Includes the formats supported by the authenticator.
+    :param authenticator: A message authenticator.
+    :type authenticator: Authenticator
+    :return: The list of supported formats.
+    :rtype: list
+    """
+    return FORMATS + list(getattr(authenticator, 'formats', ()))
+
+
+def sign(authenticator, message, address=None, header=False):
     """
     Sign the message using the specified validator.
-    signed document:
+    signed document (legacy):
       {
         message: <message>,
         signature: <signature>
       }
+    signed message (header):
+      <MARK><TAG> <digest> <signature>\n<message>
+    The header format passes the signed bytes along as-is but
+    is only read by peers that advertise support (FORMATS) so the
+    legacy format is the default.  Tagged (binary) messages cannot
+    be nested in a json document and always use the header format.
     :param authenticator: A message authenticator.
     :type authenticator: Authenticator
-    :param message: A (signed) json encoded AMQP message.
+    :param message: An encoded AMQP message.
     :rtype message: str
+    :param address: The (optional) destination AMQP address.
+    :type address: str
+    :param header: Sign using the header format.
+    :type header: bool
     """
     if not authenticator:
         return message
     try:
-        h = sha256()
+        if isinstance(message, unicode):
+            message = message.encode('utf-8')
+        h = DIGESTS[DIGEST]()
         h.update(message)
         digest = h.hexdigest()
-        signature = authenticator.sign(digest)
-        signed = Document(message=message, signature=encode(signature))
-        message = signed.dump()
+        if getattr(authenticator, 'addressed', False):
+            signature = authenticator.sign(digest, address)
+        else:
+            signature = authenticator.sign(digest)
+        if header or message.startswith(MARK):
+            header = ' '.join((MARK + TAG, DIGEST, encode(signature)))
+            message = '\n'.join((header, message))
+        else:
+            signed = Document(message=message, signature=encode(signature))
+            message = signed.dump()
     except Exception, e:
         log.info(utf8(e))
         log.debug(message, exc_info=True)
@@ -110,23 +164,20 @@ def sign(authenticator, message):
 def validate(authenticator, message):
     """
     Validate the document using the specified validator.
-    signed document:
-      {
-        message: <message>,
-        signature: <signature>
-      }
     :param authenticator: A message authenticator.
     :type authenticator: Authenticator
-    :param message: A json encoded AMQP message.
+    :param message: An encoded AMQP message.
     :rtype message: str
     :return: The authenticated document.
     :rtype: Document
     :raises ValidationFailed: when message is not valid.
     """
-    document, original, signature = peal(message)
+    document, original, signature, algorithm = _peal(message)
     try:
         if authenticator:
-            h = sha256()
+            if algorithm not in DIGESTS:
+                raise ValueError('digest: %s, not supported' % algorithm)
+            h = DIGESTS[algorithm]()
             h.update(original)
             digest = h.hexdigest()
             authenticator.validate(document, digest, decode(signature))
@@ -146,7 +197,9 @@ def validate(authenticator, message):
 def peal(message):
     """
     Peal the incoming message. The message one of:
-     - A signed document:
+     - A signed message:
+        <MARK><TAG> <digest> <signature>\n<message>
+     - A (legacy) signed document:
         {
           message: <message>,
           signature: <signature>
@@ -156,11 +209,28 @@ def peal(message):
     - The document to be passed along.
     - The original (signed) AMQP message to be validated.
     - The signature.
-    :param message: A json encoded AMQP message.
+    :param message: An encoded AMQP message.
     :type message: str
     :return: tuple of: (document, original, signature)
     :rtype: tuple
     """
+    return _peal(message)[:3]
+
+
+def _peal(message):
+    """
+    Peal the incoming message.
+    :param message: An encoded AMQP message.
+    :type message: str
+    :return: tuple of: (document, original, signature, digest algorithm)
+    :rtype: tuple
+    :see: peal()
+    """
+    if isinstance(message, basestring) and message.startswith(MARK + TAG):
+        header, _, original = message.partition('\n')
+        part = header.split(' ')
+        if len(part) == 3:
+            return load(original), original, part[2], part[1]
     document = load(message)
     signature = document.signature
     original = document.message
@@ -168,7 +238,7 @@ def peal(message):
         document = load(original)
     else:
         original = message
-    return document, original, signature
+    return document, original, signature, DIGEST
 
 
 def load(json):
@@ -0,0 +1,308 @@
+#
+# Copyright (c) 2011 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+
+"""
+Wire codecs.
+Documents are encoded as json (default) or with an optional
+compact binary encoding.  Encoded documents (other than json)
+are prefixed with a tag that identifies the codec and version:
+  <MARK><tag><payload>
+Untagged messages are json so the default encoding is unchanged.
+"""
+
+from struct import Struct
+from uuid import uuid4
+
+from gofer.common import json, Options
+
+
+# marks a tagged (non-json) message.
+MARK = '\x00'
+
+
+class Codec(object):
+    """
+    Document the wire codec API.
+    :cvar NAME: The codec name.
+    :type NAME: str
+    :cvar TAG: The envelope tag (codec and version).
+    :type TAG: str
+    """
+
+    NAME = None
+    TAG = None
+
+    def encode(self, thing):
+        """
+        Encode the specified object.
+        :param thing: The object to encode.
+        :return: The encoded string.
+        :rtype: str
+        """
+        raise NotImplementedError()
+
+    def decode(self, s):
+        """
+        Decode the specified string.
+        :param s: An encoded string.
+        :type s: str
+        :return: The decoded object.
+        :raises ValueError: when not valid.
+        """
+        raise NotImplementedError()
+
+
+class Encoded(object):
+    """
+    An encoded value.
+    Spliced as-is into documents encoded by the same codec
+    so the value is only encoded once.
+    :ivar codec: The codec used to encode the value.
+    :type codec: Codec
+    :ivar content: The encoded value.
+    :type content: str
+    """
+
+    def __init__(self, codec, content):
+        """
+        :param codec: The codec used to encode the value.
+        :type codec: Codec
+        :param content: The encoded value.
+        :type content: str
+        """
+        self.codec = codec
+        self.content = content
+
+    def decode(self):
+        """
+        Decode the value.
+        Used when spliced by a different codec.
+        :return: The decoded value.
+        """
+        return self.codec.decode(self.content)
+
+
+class Json(Codec):
+    """
+    The (default) json codec.
+    Options are encoded in place (not copied) by the
+    encoder and messages are not tagged.
+    Keys are not sorted (as they were in 2.9 and earlier) so that the C encoder
+    can be used.  The byte layout of an encoded document is therefore not
+    stable and must not be relied upon.  Signatures are computed on the
+    bytes as sent so authentication is not affected.
+    """
+
+    NAME = 'json'
+    TAG = ''
+
+    def encode(self, thing):
+        spliced = {}
+
+        def default(x):
+            if isinstance(x, Options):
+                return x.__dict__
+            if isinstance(x, Encoded):
+                if x.codec.NAME != self.NAME:
+                    return x.decode()
+                placeholder = MARK + uuid4().hex
+                spliced[json.dumps(placeholder)] = x.content
+                return placeholder
+            raise TypeError('%r is not JSON serializable' % x)
+
+        s = json.dumps(thing, default=default)
+        for placeholder, content in spliced.items():
+            s = s.replace(placeholder, content, 1)
+        return s
+
+    def decode(self, s):
+        return json.loads(s)
+
+
+class Binary(Codec):
+    """
+    A compact binary codec.
+    Each value is encoded as a type code followed by the value.  Integers
+    and lengths are (zigzag) varints.  Strings, lists and maps are prefixed
+    by length.  Options are encoded as maps and tuples as lists.  Byte strings
+    are decoded as unicode (like json) when valid utf-8.
+    """
+
+    NAME = 'binary'
+    TAG = 'B1'
+
+    FLOAT = Struct('>d')
+
+    def encode(self, thing):
+        buf = [MARK, self.TAG]
+        self._encode(thing, buf)
+        return ''.join(buf)
+
+    def decode(self, s):
+        if not s.startswith(MARK + self.TAG):
+            raise ValueError('not %s encoded' % self.NAME)
+        try:
+            thing, offset = self._decode(s, len(MARK + self.TAG))
+        except ValueError:
+            raise
+        except Exception, e:
+            raise ValueError('invalid: %s' % e)
+        if offset != len(s):
+            raise ValueError('invalid: trailing data')
+        return thing
+
+    @staticmethod
+    def _varint(n, buf):
+        while n > 0x7f:
+            buf.append(chr(0x80 | (n & 0x7f)))
+            n >>= 7
+        buf.append(chr(n))
+
+    @staticmethod
+    def _unvarint(s, offset):
+        n = 0
+        shift = 0
+        while True:
+            byte = ord(s[offset])
+            offset += 1
+            n |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return n, offset
+            shift += 7
+
+    def _encode(self, thing, buf):
+        if thing is None:
+            buf.append('N')
+        elif thing is True:
+            buf.append('T')
+        elif thing is False:
+            buf.append('F')
+        elif isinstance(thing, (int, long)):
+            buf.append('i')
+            if thing < 0:
+                self._varint((-thing << 1) - 1, buf)
+            else:
+                self._varint(thing << 1, buf)
+        elif isinstance(thing, float):
+            buf.append('d')
+            buf.append(self.FLOAT.pack(thing))
+        elif isinstance(thing, basestring):
+            if isinstance(thing, unicode):
+                thing = thing.encode('utf-8')
+            buf.append('s')
+            self._varint(len(thing), buf)
+            buf.append(thing)
+        elif isinstance(thing, (list, tuple)):
+            buf.append('l')
+            self._varint(len(thing), buf)
+            for x in thing:
+                self._encode(x, buf)
+        elif isinstance(thing, Encoded):
+            if thing.codec.NAME == self.NAME:
+                buf.append(thing.content[len(MARK + self.TAG):])
+            else:
+                self._encode(thing.decode(), buf)
+        elif isinstance(thing, (dict, Options)):
+            if isinstance(thing, Options):
+                thing = thing.__dict__
+            buf.append('m')
+            self._varint(len(thing), buf)
+            for k, v in thing.iteritems():
+                if not isinstance(k, basestring):
+                    k = str(k)
+                self._encode(k, buf)
+                self._encode(v, buf)
+        else:
+            raise TypeError('%r is not %s serializable' % (thing, self.NAME))
+
+    def _decode(self, s, offset):
+        code = s[offset]
+        offset += 1
+        if code == 'N':
+            return None, offset
+        if code == 'T':
+            return True, offset
+        if code == 'F':
+            return False, offset
+        if code == 'd':
+            return self.FLOAT.unpack_from(s, offset)[0], offset + self.FLOAT.size
+        n, offset = self._unvarint(s, offset)
+        if code == 'i':
+            if n & 1:
+                return -((n + 1) >> 1), offset
+            else:
+                return n >> 1, offset
+        if code == 's':
+            end = offset + n
+            if end > len(s):
+                raise ValueError('invalid: truncated')
+            thing = s[offset:end]
+            try:
+                return thing.decode('utf-8'), end
+            except UnicodeDecodeError:
+                return thing, end
+        if code == 'l':
+            thing = []
+            for _ in xrange(n):
+                x, offset = self._decode(s, offset)
+                thing.append(x)
+            return thing, offset
+        if code == 'm':
+            thing = {}
+            for _ in xrange(n):
+                k, offset = self._decode(s, offset)
+                v, offset = self._decode(s, offset)
+                thing[k] = v
+            return thing, offset
+        raise ValueError('invalid: type code %r' % code)
+
+
+# default codec
+JSON = Json()
+
+# supported codecs by name
+CODECS = dict((c.NAME, c) for c in (JSON, Binary()))
+
+
+def find(name):
+    """
+    Find a codec by name.
+    :param name: The codec name (None=default).
+    :type name: str
+    :return: The codec.
+    :rtype: Codec
+    :raises ValueError: when not found.
+    """
+    if not name:
+        return JSON
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError('codec: %s, not supported' % name)
+
+
+def detect(s):
+    """
+    Detect the codec used to encode the specified string.
+    :param s: An encoded string.
+    :type s: str
+    :return: The codec.
+    :rtype: Codec
+    :raises ValueError: when the tag is not supported.
+    """
+    if not isinstance(s, basestring) or not s.startswith(MARK):
+        return JSON
+    for codec in CODECS.itervalues():
+        if codec.TAG and s.startswith(codec.TAG, len(MARK)):
+            return codec
+    raise ValueError('codec: tag %r, not supported' % s[len(MARK):len(MARK) + 2])
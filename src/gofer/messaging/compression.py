@@ -0,0 +1,104 @@
+#
+# Copyright (c) 2011 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+
+"""
+Message compression.
+A compressed message is the (signed) json encoded AMQP message
+compressed and wrapped in an envelope:
+  {
+    compression: <codec>,
+    payload: <base64 encoded compressed message>
+  }
+"""
+
+from zlib import compress as deflate, decompress as inflate
+from base64 import b64encode, b64decode
+from logging import getLogger
+
+from gofer.common import utf8
+from gofer.messaging.model import Document, DocumentError
+
+
+log = getLogger(__name__)
+
+
+# codec
+ZLIB = 'zlib'
+
+# supported codecs (advertised to peers)
+CODECS = [ZLIB]
+
+# envelope
+PREFIX = '{"compression": "%s", "payload": "' % ZLIB
+SUFFIX = '"}'
+
+
+class DecompressionFailed(DocumentError):
+    """
+    Message decompression failed.
+    """
+
+    CODE = 'compression.failed'
+    DESCRIPTION = 'MODEL: message decompression failed'
+
+    def __init__(self, details):
+        """
+        :param details: A detailed description.
+        :type details: str
+        """
+        DocumentError.__init__(
+            self,
+            self.CODE,
+            self.DESCRIPTION,
+            Document(),
+            details)
+
+
+def compress(message, threshold):
+    """
+    Compress the message when larger than the threshold.
+    :param message: A (signed) json encoded AMQP message.
+    :type message: str
+    :param threshold: The size (bytes) above which the
+        message is compressed (0=never).
+    :type threshold: int
+    :return: The original or compressed message.
+    :rtype: str
+    """
+    if not threshold or len(message) <= threshold:
+        return message
+    if isinstance(message, unicode):
+        message = message.encode('utf-8')
+    payload = b64encode(deflate(message))
+    return ''.join((PREFIX, payload, SUFFIX))
+
+
+def decompress(message):
+    """
+    Decompress the message when compressed.
+    The envelope is detected by prefix so uncompressed
+    messages are not decoded.
+    :param message: A json encoded AMQP message.
+    :type message: str
+    :return: The original message.
+    :rtype: str
+    :raises DecompressionFailed: when the payload is not valid.
+    """
+    if not isinstance(message, basestring) or not message.startswith(PREFIX):
+        return message
+    try:
+        payload = message[len(PREFIX):-len(SUFFIX)]
+        return inflate(b64decode(payload))
+    except Exception, e:
+        log.debug(message, exc_info=True)
+        raise DecompressionFailed(utf8(e))
@@ -38,6 +38,7 @@ class ConsumerThread(Thread):
         self.url = url
         self.node = node
         self.wait = wait
+        self.prefetch = 0
         self.authenticator = None
         self.reader = None
         self.setDaemon(True)
@@ -55,6 +56,7 @@ class ConsumerThread(Thread):
         """
         self.reader = Reader(self.node, self.url)
         self.reader.authenticator = self.authenticator
+        self.reader.prefetch = self.prefetch
         self.open()
         try:
             while not Thread.aborted():
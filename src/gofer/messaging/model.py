@@ -11,7 +11,8 @@
 
 from logging import getLogger
 
-from gofer.common import utf8, json, Options
+from gofer.common import utf8, Options
+from gofer.messaging import codec
 
 
 log = getLogger(__name__)
@@ -103,34 +104,21 @@ class Document(Options):
 
     def load(self, s):
         """
-        Load using a json string.
-        :param s: A json encoded string.
+        Load using an encoded string.
+        The codec is detected by envelope tag.
+        :param s: An encoded (json) string.
         :type s: str
         """
-        d = json.loads(s)
+        d = codec.detect(s).decode(s)
         self.__dict__.update(d)
         return self
 
-    def dump(self):
+    def dump(self, name=None):
         """
-        Dump to a json string.
-        :return: A json encoded string.
+        Dump to an encoded string.
+        :param name: The (optional) codec name (default: json).
+        :type name: str
+        :return: An encoded (json) string.
         :rtype: str
         """
-        def fn(thing):
-            if isinstance(thing, Options):
-                thing = dict(thing.__dict__)
-                for k, v in thing.items():
-                    thing[k] = fn(v)
-                return thing
-            if isinstance(thing, dict):
-                thing = dict(thing)
-                for k, v in thing.items():
-                    thing[k] = fn(v)
-                return thing
-            if isinstance(thing, (tuple, list)):
-                thing = [fn(e) for e in thing]
-                return thing
-            return thing
-        d = fn(self)
-        return json.dumps(d, sort_keys=True)
+        return codec.find(name).encode(self)
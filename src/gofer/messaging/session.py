@@ -0,0 +1,615 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+
+"""
+Session key (HMAC-SHA256) message authentication.
+Only imported when configured.
+"""
+
+from os import urandom
+from hmac import HMAC
+from time import time
+from uuid import uuid4
+from hashlib import sha256
+from binascii import hexlify
+from threading import RLock, Lock
+
+from gofer.common import json, synchronized, utf8
+from gofer.messaging.auth import Authenticator, ValidationFailed, encode, decode
+
+try:
+    from hmac import compare_digest
+except ImportError:
+    # python < 2.7.7
+    compare_digest = None
+
+
+# RFC 3526 2048-bit MODP group (14).
+PRIME = long(
+    'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD1'
+    '29024E088A67CC74020BBEA63B139B22514A08798E3404DD'
+    'EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245'
+    'E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED'
+    'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3D'
+    'C2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F'
+    '83655D23DCA3AD961C62F356208552BB9ED529077096966D'
+    '670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B'
+    'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9'
+    'DE2BCBF6955817183995497CEA956AE515D2261898FA0510'
+    '15728E5A8AACAA68FFFFFFFFFFFFFFFF', 16)
+
+# Diffie-Hellman generator.
+GENERATOR = 2
+
+# Diffie-Hellman private exponent size (bytes).
+EXPONENT = 32
+
+# default session key lifetime (seconds).
+LIFETIME = 3600
+
+# allowed clock skew between peers (seconds).
+SKEW = 300
+
+# maximum number of stale key IDs announced.
+STALE = 10
+
+# session token signing format (advertised to peers).
+FORMAT = 'K1'
+
+# session authenticators by (wrapped authenticator ID, lifetime).
+wrapped = {}
+wrapping = Lock()
+
+
+def equal(a, b):
+    """
+    Compare strings in constant time.
+    :param a: A string.
+    :type a: str
+    :param b: A string.
+    :type b: str
+    :return: True if equal.
+    :rtype: bool
+    """
+    if compare_digest is not None:
+        return compare_digest(a, b)
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+class Key(object):
+    """
+    An ephemeral Diffie-Hellman key pair.
+    :ivar id: The key ID.
+    :type id: str
+    :ivar private: The private exponent.
+    :type private: long
+    :ivar public: The public value.
+    :type public: long
+    :ivar expires: When the key expires (seconds since epoch).
+    :type expires: int
+    """
+
+    def __init__(self, lifetime):
+        """
+        :param lifetime: The key lifetime (seconds).
+        :type lifetime: int
+        """
+        self.id = utf8(uuid4())
+        self.private = long(hexlify(urandom(EXPONENT)), 16)
+        self.public = pow(GENERATOR, self.private, PRIME)
+        self.expires = int(time() + lifetime)
+
+    def agree(self, peer):
+        """
+        Agree on the session key shared with a peer.
+        :param peer: The peer key.
+        :type peer: Peer
+        :return: The session key.
+        :rtype: str
+        """
+        shared = pow(peer.public, self.private, PRIME)
+        h = sha256()
+        for key_id in sorted((self.id, peer.id)):
+            h.update(key_id)
+        h.update('%x' % shared)
+        return h.digest()
+
+
+class Peer(object):
+    """
+    The public key of a peer.
+    :ivar id: The key ID.
+    :type id: str
+    :ivar public: The public value.
+    :type public: long
+    :ivar expires: When the key expires (seconds since epoch).
+    :type expires: int
+    """
+
+    def __init__(self, id, public, expires):
+        """
+        :param id: The key ID.
+        :type id: str
+        :param public: The public value.
+        :type public: long
+        :param expires: When the key expires (seconds since epoch).
+        :type expires: int
+        :raise ValueError: when the public value is not valid.
+        """
+        if not 1 < public < PRIME - 1:
+            raise ValueError('key: %s, public value not valid' % id)
+        self.id = utf8(id)
+        self.public = public
+        self.expires = int(expires)
+
+    def expired(self):
+        """
+        Get whether the key has expired.
+        :return: True if expired.
+        :rtype: bool
+        """
+        return self.expires + SKEW <= time()
+
+
+class SessionAuthenticator(Authenticator):
+    """
+    Authenticates messages using HMAC-SHA256 and session keys shared
+    by each pair of peers.  The session keys are agreed using ephemeral
+    Diffie-Hellman keys carried in messages signed by the wrapped
+    authenticator.
+    Session keys are selected by address.  A message is authenticated
+    using the session key shared with the peer known to be reached at
+    the destination address.  Each message announces the addresses at
+    which the sender has been reached and requests route the reply
+    address to the sender.
+    Session tokens are only sent to peers that use them or advertised
+    support (FORMAT) in the request.  Otherwise, messages are signed by
+    the wrapped authenticator only.  Until the peer has proven the
+    session key (by sending a valid HMAC), messages carry the public key
+    and are also signed by the wrapped authenticator.  After that, only
+    the HMAC is sent.  A message keyed to an unknown session key (Eg: the
+    peer has been restarted or another peer reads the same address) fails
+    validation.  The unknown key is announced in the next message sent
+    by the receiver and the session is established again.
+    Keys are rotated every (lifetime / 2) seconds and expire after
+    lifetime seconds.
+    :cvar formats: Signing formats advertised to peers.
+    :type formats: tuple
+    :ivar authenticator: The wrapped (asymmetric) authenticator.
+    :type authenticator: Authenticator
+    :ivar lifetime: The key lifetime (seconds).
+    :type lifetime: int
+    :ivar keys: My keys.  The newest is last.
+    :type keys: list
+    :ivar peers: Peer keys by ID.
+    :type peers: dict
+    :ivar secrets: Session keys by (key ID, peer key ID).
+    :type secrets: dict
+    :ivar proven: Sessions (key ID, peer key ID) known to the peer.
+    :type proven: set
+    :ivar routes: Peer key IDs by address.
+    :type routes: dict
+    :ivar advertised: The expiration of addresses at which
+        peers that advertised support are reached.
+    :type advertised: dict
+    :ivar reached: The expiration of addresses at which we have been reached.
+    :type reached: dict
+    :ivar stale: The expiration of unknown key IDs used by peers.
+    :type stale: dict
+    """
+
+    addressed = True
+    formats = (FORMAT,)
+
+    @staticmethod
+    def wrap(authenticator, lifetime=LIFETIME):
+        """
+        Get the session authenticator wrapping an authenticator.
+        One is created for each wrapped authenticator and lifetime
+        so that sessions are shared by all requests.
+        :param authenticator: The wrapped (asymmetric) authenticator.
+        :type authenticator: Authenticator
+        :param lifetime: The key lifetime (seconds).
+        :type lifetime: int
+        :return: The session authenticator.
+        :rtype: SessionAuthenticator
+        """
+        key = (id(authenticator), lifetime)
+        with wrapping:
+            session = wrapped.get(key)
+            if session is None:
+                session = SessionAuthenticator(authenticator, lifetime)
+                wrapped[key] = session
+            return session
+
+    def __init__(self, authenticator, lifetime=LIFETIME):
+        """
+        :param authenticator: The wrapped (asymmetric) authenticator.
+        :type authenticator: Authenticator
+        :param lifetime: The key lifetime (seconds).
+        :type lifetime: int
+        """
+        self.authenticator = authenticator
+        self.lifetime = lifetime
+        self.keys = []
+        self.peers = {}
+        self.secrets = {}
+        self.proven = set()
+        self.routes = {}
+        self.advertised = {}
+        self.reached = {}
+        self.stale = {}
+        self.__mutex = RLock()
+
+    def sign(self, digest, address=None):
+        """
+        Sign the specified message.
+        :param digest: An AMQP message digest.
+        :type digest: str
+        :param address: The (optional) destination AMQP address.
+        :type address: str
+        :return: The message signature.
+        :rtype: str
+        """
+        token, key, peer = self._token(address)
+        if token is None:
+            return self.authenticator.sign(digest)
+        signature = None
+        if 'pub' in token:
+            signature = self.authenticator.sign(self.digest(token, digest))
+        if peer is not None:
+            token['mac'] = self.mac(key, peer, token, digest)
+        if signature is not None:
+            token['signature'] = encode(signature)
+        return json.dumps(token, separators=(',', ':'))
+
+    def validate(self, document, digest, signature):
+        """
+        Validate the specified message and signature.
+        The HMAC is validated when the session key is known.  The
+        signature is passed along to the wrapped authenticator.
+        :param document: The original signed document.
+        :type document: Document
+        :param digest: An AMQP message digest.
+        :type digest: str
+        :param signature: A message signature.
+        :type signature: str
+        :raises ValidationFailed: when message is not valid.
+        """
+        token = self.load(signature)
+        if token is None:
+            self.authenticator.validate(document, digest, signature)
+            self._update(document, None, {})
+            return
+        mac = token.pop('mac', None)
+        signature = token.pop('signature', None)
+        key = None
+        if mac is not None:
+            key = self._mine(token['to'])
+        peer = self._find(token)
+        if signature is not None:
+            self.authenticator.validate(document, self.digest(token, digest), decode(signature))
+            if 'pub' in token:
+                peer = self._learn(token)
+        elif key is None or peer is None:
+            # replies announce the unknown key.
+            if peer is None:
+                self._forget(token['key'])
+            self._advertise(document, True)
+            raise ValidationFailed('session: %s, not known' % token.get('to'))
+        if key is not None and peer is not None:
+            if not equal(utf8(mac), self.mac(key, peer, token, digest)):
+                raise ValidationFailed('session: %s, not valid' % key.id)
+            self._prove(key, peer)
+        self._update(document, peer, token)
+
+    def mac(self, key, peer, token, digest):
+        """
+        Get the message authentication code.
+        :param key: My key.
+        :type key: Key
+        :param peer: The peer key.
+        :type peer: Peer
+        :param token: The signature token.
+        :type token: dict
+        :param digest: An AMQP message digest.
+        :type digest: str
+        :return: The HMAC-SHA256 hex digest.
+        :rtype: str
+        """
+        secret = self._secret(key, peer)
+        h = HMAC(secret, digestmod=sha256)
+        h.update(self.canonical(token, digest))
+        return h.hexdigest()
+
+    def digest(self, token, digest=''):
+        """
+        Get the digest to be signed by the wrapped authenticator.
+        :param token: The signature token.
+        :type token: dict
+        :param digest: An AMQP message digest.
+        :type digest: str
+        :return: The token digest.
+        :rtype: str
+        """
+        h = sha256()
+        h.update(self.canonical(token, digest))
+        return h.hexdigest()
+
+    @staticmethod
+    def canonical(token, digest):
+        """
+        Get the canonical (signed) form of the token and digest.
+        :param token: The signature token.
+        :type token: dict
+        :param digest: An AMQP message digest.
+        :type digest: str
+        :return: The canonical form.
+        :rtype: str
+        """
+        token = json.dumps(token, sort_keys=True, separators=(',', ':'))
+        return '\n'.join((token, digest))
+
+    @staticmethod
+    def load(signature):
+        """
+        Load the signature token.
+        :param signature: A message signature.
+        :type signature: str
+        :return: The token or None when signed by the wrapped authenticator.
+        :rtype: dict
+        """
+        if not signature.startswith('{'):
+            return
+        try:
+            token = json.loads(signature)
+        except ValueError:
+            return
+        if isinstance(token, dict):
+            return token
+
+    @synchronized
+    def _token(self, address):
+        """
+        Build the signature token for a message sent to an address.
+        :param address: The destination AMQP address.
+        :type address: str
+        :return: tuple of: (token, key, peer).  The token is None when
+            the message is only signed by the wrapped authenticator.
+            The peer is None when the session key is not known.
+        :rtype: tuple
+        """
+        key = self._key()
+        peer = self._route(address)
+        if peer is None and address not in self.advertised:
+            return None, key, None
+        token = dict(key=key.id)
+        if self.reached:
+            token['addresses'] = sorted(self.reached)
+        if self.stale:
+            token['stale'] = sorted(self.stale)
+        if peer is None or (key.id, peer.id) not in self.proven:
+            token['pub'] = '%x' % key.public
+            token['expires'] = key.expires
+        if peer is not None:
+            token['to'] = peer.id
+        return token, key, peer
+
+    def _key(self):
+        """
+        Get my current key.
+        A new key is created when the current key is
+        within (lifetime / 2) seconds of expiring.
+        :return: The current key.
+        :rtype: Key
+        """
+        now = time()
+        if self.keys and self.keys[-1].expires - now > self.lifetime / 2:
+            return self.keys[-1]
+        key = Key(self.lifetime)
+        self.keys.append(key)
+        self._purge(now)
+        return key
+
+    def _route(self, address):
+        """
+        Get the peer known to be reached at an address.
+        :param address: An AMQP address.
+        :type address: str
+        :return: The peer key or None.
+        :rtype: Peer
+        """
+        peer = self.peers.get(self.routes.get(address))
+        if peer is None:
+            return
+        if peer.expires <= time():
+            # the peer stops using the key
+            self.routes.pop(address)
+            return
+        return peer
+
+    @synchronized
+    def _learn(self, token):
+        """
+        Learn the (signed) public key of a peer.
+        :param token: An authenticated signature token.
+        :type token: dict
+        :return: The peer key.
+        :rtype: Peer
+        :raises ValidationFailed: when the key has expired.
+        """
+        peer = Peer(token['key'], long(token['pub'], 16), token['expires'])
+        if peer.expired():
+            raise ValidationFailed('session: %s, expired' % peer.id)
+        known = self.peers.get(peer.id)
+        if known is not None and known.public == peer.public:
+            return known
+        self.peers[peer.id] = peer
+        self.stale.pop(peer.id, None)
+        return peer
+
+    def _find(self, token):
+        """
+        Find the public key of the peer that sent a message.
+        :param token: A signature token.
+        :type token: dict
+        :return: The peer key or None when not known.
+        :rtype: Peer
+        :raises ValidationFailed: when expired.
+        """
+        peer = self.peers.get(token['key'])
+        if peer is None:
+            return
+        if peer.expired():
+            raise ValidationFailed('session: %s, expired' % peer.id)
+        return peer
+
+    @synchronized
+    def _mine(self, key_id):
+        """
+        Find one of my keys by ID.
+        Unknown key IDs are recorded as stale and announced to peers.
+        :param key_id: A key ID.
+        :type key_id: str
+        :return: The key or None when not found or expired.
+        :rtype: Key
+        """
+        now = time()
+        for key in self.keys:
+            if key.id == key_id and key.expires + SKEW > now:
+                return key
+        self._forget(key_id)
+
+    @synchronized
+    def _forget(self, key_id):
+        """
+        Record an unknown key ID as stale.
+        Stale key IDs are announced to peers.
+        :param key_id: A key ID.
+        :type key_id: str
+        """
+        self.stale[key_id] = time() + self.lifetime
+        if len(self.stale) > STALE:
+            oldest = min(self.stale, key=self.stale.get)
+            self.stale.pop(oldest)
+
+    @synchronized
+    def _secret(self, key, peer):
+        """
+        Get the session key shared with a peer.
+        :param key: My key.
+        :type key: Key
+        :param peer: The peer key.
+        :type peer: Peer
+        :return: The session key.
+        :rtype: str
+        """
+        session = (key.id, peer.id)
+        secret = self.secrets.get(session)
+        if secret is None:
+            secret = key.agree(peer)
+            self.secrets[session] = secret
+        return secret
+
+    @synchronized
+    def _prove(self, key, peer):
+        """
+        Record that a peer knows my key.
+        The public key and signature are no longer sent to the peer.
+        :param key: My key.
+        :type key: Key
+        :param peer: The peer key.
+        :type peer: Peer
+        """
+        self.proven.add((key.id, peer.id))
+
+    @synchronized
+    def _update(self, document, peer, token):
+        """
+        Update sessions using an authenticated message.
+        - Record the address at which we have been reached.
+        - Route the addresses at which the peer has been reached.
+        - Route the reply address to the peer.  The route is removed
+          when the peer did not use a session.
+        - Record the reply address when the peer advertised support.
+        - Remove routes to keys the peer reported as unknown.
+        - Forget sessions proven using my keys the peer reported as unknown.
+        :param document: The authenticated document.
+        :type document: Document
+        :param peer: The peer key (or None when not known).
+        :type peer: Peer
+        :param token: The authenticated signature token.
+        :type token: dict
+        """
+        routing = document.routing
+        if routing and routing[-1]:
+            self.reached[routing[-1]] = time() + self.lifetime
+        if peer is not None:
+            for address in token.get('addresses', []):
+                self.routes[address] = peer.id
+        replyto = document.replyto
+        if replyto:
+            if peer is not None:
+                self.routes[replyto] = peer.id
+            else:
+                self.routes.pop(replyto, None)
+        self._advertise(document, bool(token))
+        stale = set(token.get('stale', []))
+        if not stale:
+            return
+        for address, key_id in self.routes.items():
+            if key_id in stale:
+                self.routes.pop(address)
+        self.proven = set(s for s in self.proven if s[0] not in stale)
+
+    @synchronized
+    def _advertise(self, document, used=False):
+        """
+        Record the reply address of a peer that advertised
+        support for (or used) session tokens.
+        :param document: A received document.
+        :type document: Document
+        :param used: The peer used a session token.
+        :type used: bool
+        """
+        replyto = document.replyto
+        if not replyto:
+            return
+        if used or FORMAT in (document.signing or ()):
+            self.advertised[replyto] = time() + self.lifetime
+
+    def _purge(self, now):
+        """
+        Purge expired keys, sessions, routes and addresses.
+        :param now: The current time (seconds since epoch).
+        :type now: float
+        """
+        self.keys = [k for k in self.keys if k.expires + SKEW > now]
+        for peer in self.peers.values():
+            if peer.expired():
+                self.peers.pop(peer.id)
+        mine = set(k.id for k in self.keys)
+        for session in self.secrets.keys():
+            if session[0] not in mine or session[1] not in self.peers:
+                self.secrets.pop(session)
+        self.proven = set(s for s in self.proven if s in self.secrets)
+        for address, key_id in self.routes.items():
+            if key_id not in self.peers:
+                self.routes.pop(address)
+        for collection in (self.reached, self.advertised, self.stale):
+            for item, expires in collection.items():
+                if expires <= now:
+                    collection.pop(item)
@@ -90,6 +90,10 @@ class ReplyConsumer(Consumer):
                 reply = Progress(document)
                 reply.notify(self.listener)
                 return
+            if reply.partial():
+                reply = Partial(document)
+                reply.notify(self.listener)
+                return
             if reply.succeeded():
                 self.blacklist.add(document.sn)
                 reply = Succeeded(document)
@@ -360,6 +364,44 @@ class Progress(AsyncReply):
         return utf8(self)
 
 
+class Partial(AsyncReply):
+    """
+    A partial (streamed) result of an asynchronous operation.
+    The final (Succeeded) reply is the number of partial results.
+    :ivar seq: The sequence number of the partial result.
+    :type seq: int
+    :ivar retval: The returned (partial) value.
+    :type retval: object
+    """
+
+    def __init__(self, document):
+        """
+        :param document: The received document.
+        :type document: Document
+        """
+        AsyncReply.__init__(self, document)
+        reply = Return(document.result)
+        self.seq = document.seq
+        self.retval = reply.retval
+
+    def notify(self, listener):
+        if callable(listener):
+            listener(self)
+        else:
+            listener.partial(self)
+
+    def __unicode__(self):
+        s = list()
+        s.append(AsyncReply.__unicode__(self))
+        s.append('  seq: %s' % self.seq)
+        s.append('  retval:')
+        s.append(unicode(self.retval))
+        return '\n'.join(s)
+
+    def __str__(self):
+        return utf8(self)
+
+
 class Listener:
     """
     An asynchronous operation callback listener.
@@ -412,3 +454,11 @@ class Listener:
         :type reply: Progress.
         """
         pass
+
+    def partial(self, reply):
+        """
+        Async partial (streamed) result.
+        :param reply: The partial result.
+        :type reply: Partial.
+        """
+        pass
@@ -13,19 +13,165 @@
 # Jeff Ortel <jortel@redhat.com>
 #
 
+from Queue import Queue
+from time import sleep
 from logging import getLogger
+from threading import RLock, Event
 
+from gofer.common import Thread, Singleton, synchronized, released
 from gofer.messaging import Consumer, Producer, Document
 from gofer.metrics import timestamp
 
 log = getLogger(__name__)
 
 
+# adaptive prefetch
+AUTO = 'auto'
+
+# seconds to pause reading when the plugin is saturated.
+PAUSE = 1
+
+# seconds to wait for queued status documents to be sent.
+DRAIN = 10
+
+
+class StatusSender(object):
+    """
+    Publishes request status documents asynchronously.
+    One sender (and one open producer) per broker URL.
+    The sending thread is started on first use and is replaced
+    when it has stopped.  Workers wait() for a queued status to be
+    sent before sending their own status for the same request.
+    :ivar url: The broker URL.
+    :type url: str
+    :ivar queue: The outbound queue of: (authenticator, address, body).
+    :type queue: Queue
+    :ivar thread: The sending thread.
+    :type thread: Thread
+    :ivar pending: Set when sent, by request serial number.
+    :type pending: dict
+    """
+
+    __metaclass__ = Singleton
+
+    def __init__(self, url):
+        """
+        :param url: The broker URL.
+        :type url: str
+        """
+        self.url = url
+        self.queue = Queue()
+        self.thread = None
+        self.pending = {}
+        self.__mutex = RLock()
+
+    @synchronized
+    def put(self, authenticator, address, **body):
+        """
+        Queue a status document to be sent.
+        :param authenticator: A message authenticator.
+        :type authenticator: gofer.messaging.auth.Authenticator
+        :param address: An AMQP address.
+        :type address: str
+        :keyword body: document body.
+        """
+        if self.thread is None or not self.thread.isAlive():
+            self.thread = Thread(
+                target=self.run,
+                name='status:%s' % self.url,
+                args=(self.queue,))
+            self.thread.setDaemon(True)
+            self.thread.start()
+        sn = body.get('sn')
+        if sn is not None:
+            self.pending[sn] = Event()
+        self.queue.put((authenticator, address, body))
+
+    def wait(self, sn, timeout=DRAIN):
+        """
+        Wait for the queued status for a request to be sent.
+        Returns immediately when nothing is queued for the request.
+        :param sn: The request serial number.
+        :type sn: str
+        :param timeout: The time (seconds) to wait.
+        :type timeout: float
+        """
+        with self.__mutex:
+            event = self.pending.get(sn)
+        if event is not None:
+            event.wait(timeout)
+
+    @synchronized
+    def sent(self, sn):
+        """
+        The status for a request has been sent (or has failed).
+        Notify waiting workers.
+        :param sn: The request serial number.
+        :type sn: str
+        """
+        event = self.pending.pop(sn, None)
+        if event is not None:
+            event.set()
+
+    def shutdown(self, timeout=DRAIN):
+        """
+        Send the queued status documents and stop the sending thread.
+        :param timeout: The time (seconds) to wait for the queue to be drained.
+        :type timeout: float
+        """
+        with self.__mutex:
+            thread = self.thread
+            queue = self.queue
+            self.thread = None
+            self.queue = Queue()
+        if thread is None:
+            return
+        queue.put(None)
+        thread.join(timeout)
+
+    @released
+    def run(self, queue):
+        """
+        Read the outbound queue and send status documents.
+        :param queue: The outbound queue.
+        :type queue: Queue
+        """
+        producer = Producer(self.url)
+        while True:
+            queued = queue.get()
+            if queued is None:
+                # shutdown
+                break
+            authenticator, address, body = queued
+            try:
+                producer.authenticator = authenticator
+                if not producer.is_open():
+                    producer.open()
+                producer.send(address, **body)
+            except Exception:
+                log.exception('send (%s), failed', body.get('status'))
+                try:
+                    producer.close()
+                except Exception:
+                    pass
+            self.sent(body.get('sn'))
+        producer.close()
+
+
 class RequestConsumer(Consumer):
     """
     Request consumer.
-    Reads messages from AMQP, sends the accepted status then writes
-    to local pending queue to be consumed by the scheduler.
+    Reads messages from AMQP, queues the accepted status to be sent
+    then writes to local pending queue to be consumed by the scheduler.
+    The worker that dispatches the request waits for the accepted
+    status to be sent before sending the started status.
+    :ivar status: Used to send status updates.
+    :type status: StatusSender
+    :ivar plugin: A plugin.
+    :type plugin: gofer.agent.plugin.Plugin
+    :ivar adaptive: The prefetch window is sized using the
+        plugin thread pool capacity and backlog.
+    :type adaptive: bool
     """
 
     def __init__(self, node, plugin):
@@ -36,7 +182,54 @@ class RequestConsumer(Consumer):
         :type plugin: gofer.agent.plugin.Plugin
         """
         super(RequestConsumer, self).__init__(node, plugin.url)
+        self.plugin = plugin
         self.scheduler = plugin.scheduler
+        self.status = StatusSender(plugin.url)
+        self.adaptive = plugin.prefetch == AUTO
+        if self.adaptive:
+            self.prefetch = max(self.window(), 1)
+        else:
+            self.prefetch = int(plugin.prefetch or 0)
+
+    def window(self):
+        """
+        Get the adaptive prefetch window.
+        The plugin thread pool capacity less the backlog of
+        requests pending dispatch or being dispatched.
+        :return: The window.
+        :rtype: int
+        """
+        capacity = self.plugin.pool.capacity
+        backlog = len(self.scheduler.pending.journal)
+        return capacity - backlog
+
+    def read(self):
+        """
+        Read and process incoming documents.
+        In adaptive mode, the prefetch window is adjusted before
+        reading and reading is paused while the plugin is saturated.
+        """
+        if self.adaptive:
+            window = self.window()
+            if window < 1:
+                sleep(PAUSE)
+                return
+            if window != self.reader.prefetch:
+                try:
+                    self.reader.flow(window)
+                except Exception:
+                    log.exception(self.getName())
+        super(RequestConsumer, self).read()
+
+    def run(self):
+        """
+        Main consumer loop.
+        Queued status documents are sent before returning.
+        """
+        try:
+            super(RequestConsumer, self).run()
+        finally:
+            self.status.shutdown()
 
     def rejected(self, code, description, document, details):
         """
@@ -60,6 +253,7 @@ class RequestConsumer(Consumer):
     def send(self, request, status, **details):
         """
         Send a status update.
+        The status is queued and sent asynchronously.
         :param request: The received (json) request.
         :type request: Document
         :param status: The status to send ('accepted'|'rejected')
@@ -68,22 +262,14 @@ class RequestConsumer(Consumer):
         address = request.replyto
         if not address:
             return
-        try:
-            producer = Producer(self.url)
-            producer.authenticator = self.authenticator
-            producer.open()
-            try:
-                producer.send(
-                    address,
-                    sn=request.sn,
-                    data=request.data,
-                    status=status,
-                    timestamp=timestamp(),
-                    **details)
-            finally:
-                producer.close()
-        except Exception:
-            log.exception('send (%s), failed', status)
+        self.status.put(
+            self.authenticator,
+            address,
+            sn=request.sn,
+            data=request.data,
+            status=status,
+            timestamp=timestamp(),
+            **details)
 
     def dispatch(self, request):
         """
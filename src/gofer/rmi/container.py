@@ -36,6 +36,9 @@ class Container(object):
           (int) Seconds to wait for a synchronous reply (default:90).
       - authenticator
           (Authenticator) A message authenticator.
+      - session
+          (int) The session key lifetime (seconds).  When specified,
+          the authenticator is used to establish session keys.
       - progress
           (callable) A progress callback.
       - secret
@@ -49,10 +52,18 @@ class Container(object):
       - reply
           (str) An AMQP reply address.
       - trigger
-          (int) The trigger type (0=auto|1=manual).
+          (int) The trigger type (0=auto|1=manual|2=future).
       - data
           (object) User defined data that is round tripped.
           Used for asynchronous reply correlation and cancel criteria.
+      - compression
+          (int) Requests larger than this size (bytes) are compressed.
+      - header
+          (bool) Sign requests using the header format.
+          Only enable when the agent is known to support it.
+      - streaming
+          (bool) Asynchronous replies may be streamed as partial results.
+          Only enable when the reply listener handles partial results.
 
     :ivar __id: The peer ID.
     :type __id: str
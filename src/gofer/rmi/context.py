@@ -12,9 +12,13 @@
 #
 # Jeff Ortel <jortel@redhat.com>
 #
+from heapq import heappush, heappop
+from itertools import count
+from time import time
 from logging import getLogger
+from threading import RLock, Condition
 
-from gofer.common import Local
+from gofer.common import Thread, Local, synchronized
 from gofer.rmi.tracker import Tracker
 from gofer.messaging import Producer
 
@@ -22,6 +26,10 @@ from gofer.messaging import Producer
 log = getLogger(__name__)
 
 
+# seconds the flusher waits when nothing is scheduled.
+IDLE = 10
+
+
 class Context(object):
     """
     Remote method invocation context.
@@ -71,52 +79,265 @@ class Context(object):
         self.cancelled = cancelled
 
 
-class Progress(object):
+class Flusher(object):
     """
-    Provides support for progress reporting.
-    :ivar request: The current request.
-    :type request: gofer.messaging.Document
-    :ivar producer: An open AMQP producer.
-    :type producer: gofer.messaging.Producer
+    Flushes pending (coalesced) progress reports when due.
+    A single thread is shared by all reporters.  It is started
+    on first use and is replaced when it has stopped.
+    :ivar scheduled: A heap of scheduled flushes: (due, key, reporter).
+    :type scheduled: list
+    :ivar keys: Used to order reporters scheduled for the same time.
+    :type keys: itertools.count
+    :ivar thread: The flushing thread.
+    :type thread: Thread
+    """
+
+    def __init__(self):
+        self.scheduled = []
+        self.keys = count()
+        self.thread = None
+        self.__condition = Condition()
+
+    def add(self, reporter, due):
+        """
+        Schedule the reporter to be flushed.
+        :param reporter: A reporter.
+        :type reporter: Reporter
+        :param due: When the report is due (epoch seconds).
+        :type due: float
+        """
+        with self.__condition:
+            if self.thread is None or not self.thread.isAlive():
+                self.thread = Thread(target=self.run, name='progress-flusher')
+                self.thread.setDaemon(True)
+                self.thread.start()
+            heappush(self.scheduled, (due, next(self.keys), reporter))
+            self.__condition.notify()
+
+    def next(self):
+        """
+        Wait for the next scheduled flush to be due.
+        :return: The due flush: (due, reporter) or None.
+        :rtype: tuple
+        """
+        with self.__condition:
+            if not self.scheduled:
+                self.__condition.wait(IDLE)
+                return None
+            due, key, reporter = self.scheduled[0]
+            delay = due - time()
+            if delay > 0:
+                self.__condition.wait(delay)
+                return None
+            heappop(self.scheduled)
+            return due, reporter
+
+    def run(self):
+        """
+        Flush reporters as they are due.
+        """
+        while not Thread.aborted():
+            scheduled = self.next()
+            if scheduled is None:
+                continue
+            due, reporter = scheduled
+            try:
+                reporter.flush(due)
+            except Exception:
+                log.exception('flush: %s', reporter)
+
+
+class Reporter(object):
+    """
+    Provides (rate limited) progress reporting.
+    Reports are coalesced and sent at most *rate* times per second.
+    The latest (coalesced) state is sent by flush() which is called
+    by the flusher when the interval has elapsed so that reports are
+    not withheld while the method works without reporting.
+    :cvar flusher: Flushes pending reports when due.
+    :type flusher: Flusher
     :ivar total: The total work units.
     :type total: int
     :ivar completed: The completed work units.
     :type completed: int
     :ivar details: The reported details.
     :type details: object
+    :ivar rate: The maximum number of reports (per second) sent (0=unlimited).
+    :type rate: float
+    :ivar aggregate: Reported (text) details should be aggregated
+        rather than replaced between reports.
+    :type aggregate: bool
+    :ivar sent: When the last report was sent.
+    :type sent: float
+    :ivar pending: A report has been coalesced and not sent.
+    :type pending: bool
+    :ivar due: When the pending report is scheduled to be flushed.
+    :type due: float
+    """
+
+    flusher = Flusher()
+
+    def __init__(self, rate=0):
+        """
+        :param rate: The maximum number of reports (per second) sent (0=unlimited).
+        :type rate: float
+        """
+        self.total = 0
+        self.completed = 0
+        self.details = {}
+        self.rate = rate
+        self.aggregate = False
+        self.sent = 0
+        self.pending = False
+        self.due = None
+        self.__mutex = RLock()
+
+    def configure(self, options):
+        """
+        Configure the reporter.
+        :param options: Progress reporting options.
+            - rate: The maximum number of reports (per second) sent.
+            - aggregate: Reported (text) details should be aggregated.
+        :type options: gofer.Options
+        """
+        if options.rate is not None:
+            self.rate = options.rate
+        if options.aggregate is not None:
+            self.aggregate = options.aggregate
+
+    @synchronized
+    def report(self):
+        """
+        Report progress.
+        The report is coalesced when the rate is exceeded and
+        scheduled to be flushed when the interval has elapsed.
+        :return: True if sent.
+        :rtype: bool
+        """
+        now = time()
+        interval = self.rate and 1.0 / self.rate
+        if now - self.sent < interval:
+            self.pending = True
+            self.schedule(self.sent + interval - now)
+            return False
+        self.cancel()
+        self.sent = now
+        self.pending = False
+        self.send()
+        return True
+
+    @synchronized
+    def flush(self, due=None):
+        """
+        Send the latest (coalesced) report.
+        :param due: The scheduled flush being run by the flusher.
+            Ignored unless it is still scheduled.
+        :type due: float
+        """
+        if due is not None and due != self.due:
+            # cancelled
+            return
+        self.cancel()
+        if not self.pending:
+            return
+        self.sent = time()
+        self.pending = False
+        self.send()
+
+    @synchronized
+    def drain(self):
+        """
+        Take the latest (coalesced) report.
+        Used when the caller sends the report along with other documents.
+        :return: True if a report was pending.
+        :rtype: bool
+        """
+        self.cancel()
+        if not self.pending:
+            return False
+        self.sent = time()
+        self.pending = False
+        return True
+
+    @synchronized
+    def schedule(self, delay):
+        """
+        Schedule (when not scheduled) the pending report to be flushed.
+        :param delay: The delay in seconds.
+        :type delay: float
+        """
+        if self.due is not None:
+            return
+        self.due = time() + delay
+        self.flusher.add(self, self.due)
+
+    @synchronized
+    def cancel(self):
+        """
+        Cancel the scheduled flush.
+        """
+        self.due = None
+
+    def send(self):
+        """
+        Send the progress report.
+        """
+        raise NotImplementedError()
+
+
+class Progress(Reporter):
+    """
+    Provides support for progress reporting.
+    :ivar request: The current request.
+    :type request: gofer.messaging.Document
+    :ivar producer: An open AMQP producer.
+    :type producer: gofer.messaging.Producer
+    :ivar lock: Held while using the producer.  Shared with the
+        worker so that flushed reports and the worker's own
+        documents are not sent concurrently.
+    :type lock: RLock
     """
 
-    def __init__(self, request, producer):
+    def __init__(self, request, producer, rate=0, lock=None):
         """
         :param request: The current request.
         :type request: gofer.messaging.Document
         :param producer: An open AMQP producer.
         :type producer: gofer.messaging.Producer
+        :param rate: The maximum number of reports (per second) sent (0=unlimited).
+        :type rate: float
+        :param lock: Held while using the producer.
+        :type lock: RLock
         """
+        Reporter.__init__(self, rate)
         self.request = request
         self.producer = producer
-        self.total = 0
-        self.completed = 0
-        self.details = {}
+        self.lock = lock or RLock()
 
-    def report(self):
+    def document(self):
+        """
+        Build the progress report document body.
+        :return: The document body.
+        :rtype: dict
+        """
+        return dict(
+            sn=self.request.sn,
+            data=self.request.data,
+            status='progress',
+            total=self.total,
+            completed=self.completed,
+            details=self.details)
+
+    def send(self):
         """
         Send the progress report.
         """
-        sn = self.request.sn
-        data = self.request.data
         address = self.request.replyto
         if not address:
             return
         try:
-            self.producer.send(
-                address,
-                sn=sn,
-                data=data,
-                status='progress',
-                total=self.total,
-                completed=self.completed,
-                details=self.details)
+            with self.lock:
+                self.producer.send(address, **self.document())
         except Exception:
             log.exception('Send: progress, failed')
 
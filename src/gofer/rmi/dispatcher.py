@@ -24,7 +24,9 @@ import traceback as tb
 from gofer import NAME
 from gofer.common import Options, utf8, new
 from gofer.messaging import Document
+from gofer.messaging.codec import Encoded, JSON
 from gofer.pam import authenticate as pam_authenticate
+from gofer.rmi.context import Context
 from gofer.rmi.model import ALL
 
 from logging import getLogger
@@ -235,24 +237,38 @@ class Reply(Document):
         :rtype: bool
         """
         return self.status == 'progress'
+
+    def partial(self):
+        """
+        Test whether the reply indicates status (partial).
+        :return: True when indicates a partial (streamed) result.
+        :rtype: bool
+        """
+        return self.status == 'partial'
     
 
 class Return(Document):
     """
     Return document.
+    :ivar encoded: The (validated) encoding cached so the
+        return is only encoded once.
+    :type encoded: gofer.messaging.codec.Encoded
     """
 
+    __slots__ = ('encoded',)
+
     @classmethod
-    def succeed(cls, x):
+    def succeed(cls, x, **details):
         """
         Return successful
         :param x: The returned value.
         :type x: any
+        :keyword details: Additional (optional) return details.
         :return: A return document.
         :rtype: Return
         """
-        inst = Return(retval=x)
-        inst.dump()  # validate
+        inst = Return(retval=x, **details)
+        inst.encoded = Encoded(JSON, inst.dump())  # validate
         return inst
 
     @classmethod
@@ -307,10 +323,59 @@ class Return(Document):
                       xclass=xclass.__name__,
                       xstate=state,
                       xargs=args)
-        inst.dump()  # validate
+        inst.encoded = Encoded(JSON, inst.dump())  # validate
         return inst
 
 
+class Stream(object):
+    """
+    A streamed return.
+    Iterating the stream yields a (validated) Return for each
+    chunk produced by the (generator) method.  Once exhausted, the
+    (final) result is the number of chunks (partials) or the
+    raised exception.
+    :ivar iterable: The returned iterable.
+    :type iterable: iterable
+    :ivar count: The number of chunks.
+    :type count: int
+    :ivar result: The final result.
+    :type result: Return
+    """
+
+    def __init__(self, iterable):
+        """
+        :param iterable: The returned iterable.
+        :type iterable: iterable
+        """
+        self.iterable = iterable
+        self.count = 0
+        self.result = None
+
+    def __iter__(self):
+        try:
+            for chunk in self.iterable:
+                partial = Return.succeed(chunk)
+                self.count += 1
+                yield partial
+            self.result = Return.succeed(self.count, partials=self.count)
+        except Exception:
+            log.exception('stream failed after: %d', self.count)
+            self.result = Return.exception()
+
+    def collect(self):
+        """
+        Collect all of the chunks into a single (list) result.
+        Used when the caller does not support streaming.
+        :return: The list of chunks or the raised exception.
+        :rtype: Return
+        """
+        try:
+            return Return.succeed(list(self.iterable))
+        except Exception:
+            log.exception('stream failed')
+            return Return.exception()
+
+
 class Request(Document):
     """
     An RMI request document.
@@ -446,8 +511,13 @@ class RMI(object):
         try:
             self.permitted()
             fninfo = RMI.fninfo(self.method)
+            context = Context.current()
+            if context and fninfo.progress:
+                context.progress.configure(fninfo.progress)
             model = ALL[fninfo.call.model](self.method, *self.args, **self.kwargs)
             retval = model()
+            if fninfo.call.stream:
+                return Stream(retval)
             return Return.succeed(retval)
         except Exception:
             log.exception(utf8(self.method))
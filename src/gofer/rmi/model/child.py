@@ -16,7 +16,7 @@
 from logging import getLogger
 
 from gofer import utf8
-from gofer.rmi.context import Context
+from gofer.rmi.context import Context, Reporter
 from gofer.rmi.model import protocol
 
 
@@ -33,7 +33,9 @@ class Call(protocol.Call):
         Perform RMI on the child-side of the forked call
         as follows:
           - Reset the RMI context.
+            The progress reporter inherits the (parent) reporting options.
           - Invoke the method
+          - Flush (coalesced) progress.
           - Send result: retval, progress, raised exception.
         All output is sent to the parent using the inter-process pipe.
         :param pipe: A message pipe.
@@ -42,8 +44,13 @@ class Call(protocol.Call):
         try:
             context = Context.current()
             context.cancelled = lambda: False
-            context.progress = Progress(pipe)
-            result = self.method(*self.args, **self.kwargs)
+            progress = Progress(pipe, context.progress.rate)
+            progress.aggregate = context.progress.aggregate
+            context.progress = progress
+            try:
+                result = self.method(*self.args, **self.kwargs)
+            finally:
+                progress.flush()
             reply = protocol.Result(result)
             reply.send(pipe)
         except Exception, e:
@@ -52,30 +59,24 @@ class Call(protocol.Call):
             reply.send(pipe)
 
 
-class Progress(object):
+class Progress(Reporter):
     """
     Provides progress reporting to the parent through the pipe.
     :ivar pipe: A message pipe.
     :type pipe: gofer.mp.Writer
-    :ivar total: The total work units.
-    :type total: int
-    :ivar completed: The completed work units.
-    :type completed: int
-    :ivar details: The reported details.
-    :type details: object
     """
 
-    def __init__(self, pipe):
+    def __init__(self, pipe, rate=0):
         """
         :param pipe: A message pipe.
         :type  pipe: gofer.mp.Writer
+        :param rate: The maximum number of reports (per second) sent (0=unlimited).
+        :type rate: float
         """
+        Reporter.__init__(self, rate)
         self.pipe = pipe
-        self.total = 0
-        self.completed = 0
-        self.details = {}
 
-    def report(self):
+    def send(self):
         """
         Report progress.
         """
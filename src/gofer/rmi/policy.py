@@ -18,18 +18,28 @@ Contains request delivery policies.
 """
 
 from logging import getLogger
+from threading import Event, RLock
+from Queue import Queue, Empty, Full
+from time import time
 from uuid import uuid4
 
-from gofer.common import Thread, Options, nvl, utf8, released
+from gofer.common import Options, nvl, utf8, released, synchronized
+from gofer.messaging import auth
 from gofer.messaging import Document, DocumentError
-from gofer.messaging import Producer, Reader, Queue, Exchange
+from gofer.messaging import Producer
+from gofer.messaging.model import validate
+from gofer.messaging.compression import CODECS
 from gofer.rmi.dispatcher import Return, RemoteException
-from gofer.metrics import Timer
+from gofer.rmi.router import RequestSender, ReplyRouter
 
 
 log = getLogger(__name__)
 
 
+# the number of partial (streamed) results queued by a future.
+PARTIALS = 100
+
+
 class Timeout:
     """
     Policy timeout.
@@ -155,7 +165,12 @@ class Policy(object):
 
     @property
     def authenticator(self):
-        return self.options.authenticator
+        authenticator = self.options.authenticator
+        lifetime = int(self.options.session or 0)
+        if authenticator and lifetime:
+            from gofer.messaging.session import SessionAuthenticator
+            authenticator = SessionAuthenticator.wrap(authenticator, lifetime)
+        return authenticator
 
     @property
     def reply(self):
@@ -184,52 +199,18 @@ class Policy(object):
     def exchange(self):
         return self.options.exchange
 
-    def get_reply(self, sn, reader):
-        """
-        Get the reply matched by serial number.
-        :param sn: The request serial number.
-        :type sn: str
-        :param reader: A reader.
-        :type reader: gofer.messaging.consumer.Reader
-        :return: The matched reply document.
-        :rtype: Document
-        """
-        timer = Timer()
-        timeout = float(self.wait)
-
-        while not Thread.aborted():
-            timer.start()
-            document = reader.search(sn, int(timeout))
-            timer.stop()
-            elapsed = timer.duration()
-            if elapsed > timeout:
-                raise RequestTimeout(sn, self.wait)
-            else:
-                timeout -= elapsed
-
-            if not document:
-                raise RequestTimeout(sn, self.wait)
-
-            # rejected
-            if document.status == 'rejected':
-                raise DocumentError(
-                    document.code,
-                    document.description,
-                    document.document,
-                    document.details)
+    @property
+    def compression(self):
+        return int(self.options.compression or 0)
 
-            # accepted | started
-            if document.status in ('accepted', 'started'):
-                continue
+    @property
+    def header(self):
+        return bool(self.options.header)
 
-            # progress reported
-            if document.status == 'progress':
-                self.on_progress(document)
-                continue
+    @property
+    def streaming(self):
+        return bool(self.options.streaming)
 
-            # reply
-            return self.on_reply(document)
-        
     def on_reply(self, document):
         """
         Handle the reply.
@@ -275,8 +256,9 @@ class Policy(object):
         trigger = Trigger(self, request)
         if self.trigger == Trigger.MANUAL:
             return trigger
-        else:
-            return trigger()
+        if self.trigger == Trigger.FUTURE:
+            return trigger.submit()
+        return trigger()
 
 
 class Trigger:
@@ -293,6 +275,7 @@ class Trigger:
     """
 
     MANUAL = 1  # trigger
+    FUTURE = 2  # trigger
     NOWAIT = 0  # wait (seconds)
 
     def __init__(self, policy, request):
@@ -311,17 +294,19 @@ class Trigger:
     def sn(self):
         return self._sn
 
-    def _send(self, reply=None, queue=None):
+    def _send(self, reply=None):
         """
         Send the request using the specified policy
         object and generated serial number.
         :param reply: The AMQP reply address.
         :type reply: str
-        :param queue: The reply queue for synchronous calls.
-        :type queue: Queue
+        :return: The request serial number.
+        :rtype: str
         """
         producer = Producer(self._policy.url)
         producer.authenticator = self._policy.authenticator
+        producer.compression = self._policy.compression
+        producer.header = self._policy.header
         producer.open()
 
         try:
@@ -334,60 +319,457 @@ class Trigger:
                 request=self._request,
                 secret=self._policy.secret,
                 pam=self._policy.pam,
-                data=self._policy.data)
+                data=self._policy.data,
+                compression=CODECS,
+                signing=auth.formats(self._policy.authenticator),
+                streaming=self._policy.streaming)
         finally:
             producer.close()
 
         log.debug('sent (%s): %s', self._policy.address, self._request)
+        return self._sn
 
-        if queue is None:
-            # no reply expected
-            return self._sn
-
-        reader = Reader(queue, self._policy.url)
-        reader.authenticator = self._policy.authenticator
-        reader.open()
-
-        try:
-            policy = self._policy
-            return policy.get_reply(self.sn, reader)
-        finally:
-            reader.close()
-
-    def __call__(self):
+    def submit(self):
         """
         Trigger pulled.
-        Execute the request.
+        Send the request without waiting for the reply.
+        Synchronous requests are queued to be sent by the RequestSender
+        and the replies are routed to the future by the ReplyRouter.
+        For asynchronous requests, the returned future is
+        already done and the result is the serial number.
+        :return: The future result.
+        :rtype: Future
         """
         if not self._pending:
             raise Exception('trigger already executed')
         self._pending = False
 
+        future = Future(self._policy, self.sn)
+
         # asynchronous
         if self._policy.reply:
-            return self._send(reply=self._policy.reply)
+            future.set_result(self._send(reply=self._policy.reply))
+            return future
         if self._policy.wait == Trigger.NOWAIT:
-            return self._send()
+            future.set_result(self._send())
+            return future
 
         # synchronous
-        queue = Queue()
-        queue.durable = False
-        queue.declare(self._policy.url)
-        reply = queue.name
+        policy = self._policy
+        router = ReplyRouter(policy.url, policy.exchange)
+        router.start()
+        router.register(future)
+        future.add_callback(router.unregister)
+        sender = RequestSender(policy.url)
+        sender.put(
+            future,
+            policy,
+            # body
+            sn=self.sn,
+            replyto=router.address,
+            request=self._request,
+            secret=policy.secret,
+            pam=policy.pam,
+            data=policy.data,
+            compression=CODECS,
+            signing=auth.formats(policy.authenticator),
+            streaming=True)
+        return future
+
+    def __call__(self):
+        """
+        Trigger pulled.
+        Execute the request and wait for the reply.
+        An iterator of partial results is returned when the
+        result is streamed.
+        """
+        future = self.submit()
+        wait = self._policy.wait
+        if not future.ready(wait):
+            e = RequestTimeout(self.sn, wait)
+            future.set_exception(e)
+            raise e
+        if future.streaming():
+            return future.stream(wait)
+        return future.result()
+
+    def __unicode__(self):
+        return self._sn
+
+    def __str__(self):
+        return utf8(self)
+
 
-        if self._policy.exchange:
-            exchange = Exchange(self._policy.exchange)
-            exchange.bind(queue, self._policy.url)
-            reply = '/'.join((self._policy.exchange, queue.name))
+class Future(object):
+    """
+    The future result of a request.
+    Replies are processed as they are routed (by serial number)
+    to the future.  Callbacks are called with the future once
+    the final reply has been received.  Partial (streamed) results
+    are queued and read using stream().  The queue is bounded and
+    the future fails when it overflows rather than blocking routing.
+    :ivar sn: The request serial number.
+    :type sn: str
+    :ivar _policy: The policy object.
+    :type _policy: Policy
+    :ivar _event: Set when done.
+    :type _event: Event
+    :ivar _ready: Set when done or the first partial result is received.
+    :type _ready: Event
+    :ivar _streaming: Partial (streamed) results are being received.
+    :type _streaming: bool
+    :ivar _partials: Queue of partial results: (seq, retval).
+        Terminated by: (None, None) when done and not full.
+    :type _partials: Queue
+    :ivar _retval: The returned value.
+    :type _retval: object
+    :ivar _exval: The raised exception.
+    :type _exval: Exception
+    :ivar _callbacks: Called when done.
+    :type _callbacks: list
+    :ivar _touched: When the future was created or last received a reply.
+    :type _touched: float
+    """
 
+    def __init__(self, policy, sn):
+        """
+        :param policy: The policy object.
+        :type policy: Policy
+        :param sn: The request serial number.
+        :type sn: str
+        """
+        self.sn = sn
+        self._policy = policy
+        self._event = Event()
+        self._ready = Event()
+        self._streaming = False
+        self._partials = Queue(PARTIALS)
+        self._retval = None
+        self._exval = None
+        self._callbacks = []
+        self._touched = time()
+        self.__mutex = RLock()
+
+    def put(self, message):
+        """
+        Process a received reply.
+        Status updates are handled and the final
+        reply (or error) completes the future.
+        :param message: A json encoded (signed) reply.
+        :type message: str
+        """
+        policy = self._policy
+        self._touched = time()
         try:
-            return self._send(reply=reply, queue=queue)
-        finally:
-            queue.purge(self._policy.url)
-            queue.delete(self._policy.url)
+            document = auth.validate(policy.authenticator, message)
+            validate(document)
+
+            # rejected
+            if document.status == 'rejected':
+                raise DocumentError(
+                    document.code,
+                    document.description,
+                    document.document,
+                    document.details)
+
+            # accepted | started
+            if document.status in ('accepted', 'started'):
+                return
+
+            # progress reported
+            if document.status == 'progress':
+                policy.on_progress(document)
+                return
+
+            # partial (streamed) result
+            if document.status == 'partial':
+                if self.done():
+                    return
+                try:
+                    self._partials.put((document.seq, policy.on_reply(document)), block=False)
+                except Full:
+                    # the router is shared; never block it on a slow stream
+                    raise RequestTimeout(self.sn, policy.wait)
+                self._streaming = True
+                self._ready.set()
+                return
+
+            # reply
+            if document.result and 'partials' in document.result:
+                self._streaming = True
+            self.set_result(policy.on_reply(document))
+        except Exception, e:
+            self.set_exception(e)
+
+    def set_result(self, retval):
+        """
+        Complete the future with the returned value.
+        :param retval: The returned value.
+        :type retval: object
+        """
+        self._done(retval, None)
+
+    def set_exception(self, exval):
+        """
+        Complete the future with the raised exception.
+        :param exval: The raised exception.
+        :type exval: Exception
+        """
+        self._done(None, exval)
+
+    def done(self):
+        """
+        Get whether the final reply has been received.
+        :return: True if done.
+        :rtype: bool
+        """
+        return self._event.isSet()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the future to be done.
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :return: True if done.
+        :rtype: bool
+        """
+        self._event.wait(timeout)
+        return self._event.isSet()
+
+    def ready(self, timeout=None):
+        """
+        Wait for the future to be done or streaming.
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :return: True if done or streaming.
+        :rtype: bool
+        """
+        self._ready.wait(timeout)
+        return self._ready.isSet()
+
+    def streaming(self):
+        """
+        Get whether partial (streamed) results have been received.
+        :return: True if streaming.
+        :rtype: bool
+        """
+        return self._streaming
+
+    def stream(self, timeout=None):
+        """
+        Iterate the partial (streamed) results in sequence.
+        The iterator ends when the future is done and the (final)
+        result is the number of partial results.
+        :param timeout: The timeout (seconds) to wait for each result.
+        :type timeout: float
+        :return: A generator of returned values.
+        :rtype: generator
+        :raise RequestTimeout: when the next result is not received within the timeout.
+        :raise Exception: returned by the peer.
+        """
+        received = {}
+        seq = 0
+        while True:
+            if seq in received:
+                yield received.pop(seq)
+                seq += 1
+                continue
+            try:
+                if self.done():
+                    n, retval = self._partials.get(block=False)
+                else:
+                    n, retval = self._partials.get(timeout=timeout)
+            except Empty:
+                if self.done():
+                    break
+                e = RequestTimeout(self.sn, timeout)
+                self.set_exception(e)
+                raise e
+            if n is None:
+                break
+            received[n] = retval
+        for n in sorted(received):
+            yield received[n]
+        if self._exval is not None:
+            raise self._exval
+
+    def result(self, timeout=None):
+        """
+        Get the result.
+        The future is completed with RequestTimeout when not
+        done within the timeout.
+        :param timeout: The timeout in seconds.
+        :type timeout: float
+        :return: The returned value.
+        :rtype: object
+        :raise RequestTimeout: when not done within the timeout.
+        :raise Exception: returned by the peer.
+        """
+        if not self.wait(timeout):
+            self.set_exception(RequestTimeout(self.sn, timeout))
+        if self._exval is not None:
+            raise self._exval
+        return self._retval
+
+    def expired(self, now):
+        """
+        Get whether a reply has not been received within the policy wait.
+        :param now: The current time.
+        :type now: float
+        :return: True if expired.
+        :rtype: bool
+        """
+        if self.done():
+            return False
+        return now - self._touched > self._policy.wait
+
+    def expire(self):
+        """
+        Complete the future with RequestTimeout.
+        """
+        self.set_exception(RequestTimeout(self.sn, self._policy.wait))
+
+    def add_callback(self, fn):
+        """
+        Add a callback to be called (with this future) when done.
+        The callback is called immediately when already done.
+        :param fn: A callback.
+        :type fn: callable
+        """
+        if not self._add(fn):
+            self._notify(fn)
+
+    @synchronized
+    def remove_callback(self, fn):
+        """
+        Remove a callback.
+        :param fn: A callback.
+        :type fn: callable
+        """
+        try:
+            self._callbacks.remove(fn)
+        except ValueError:
+            pass
+
+    @synchronized
+    def _add(self, fn):
+        """
+        Add a callback.
+        :param fn: A callback.
+        :type fn: callable
+        :return: True if added (not done).
+        :rtype: bool
+        """
+        if self.done():
+            return False
+        self._callbacks.append(fn)
+        return True
+
+    def _done(self, retval, exval):
+        """
+        Complete the future and notify callbacks.
+        Only the first completion is kept.
+        :param retval: The returned value.
+        :type retval: object
+        :param exval: The raised exception.
+        :type exval: Exception
+        """
+        callbacks = self._complete(retval, exval)
+        for fn in callbacks:
+            self._notify(fn)
+
+    @synchronized
+    def _complete(self, retval, exval):
+        """
+        Store the result and set the event.
+        :return: The callbacks to be notified.
+        :rtype: list
+        """
+        if self.done():
+            return []
+        self._retval = retval
+        self._exval = exval
+        self._event.set()
+        try:
+            self._partials.put((None, None), block=False)
+        except Full:
+            # stream() stops once drained
+            pass
+        self._ready.set()
+        callbacks = self._callbacks
+        self._callbacks = []
+        return callbacks
+
+    def _notify(self, fn):
+        """
+        Call the callback.
+        :param fn: A callback.
+        :type fn: callable
+        """
+        try:
+            fn(self)
+        except Exception:
+            log.exception('future callback failed: %s', self.sn)
 
     def __unicode__(self):
-        return self._sn
+        return self.sn
 
     def __str__(self):
         return utf8(self)
+
+
+def wait_any(futures, timeout=None):
+    """
+    Wait for any of the futures to be done.
+    :param futures: A list of futures.
+    :type futures: list
+    :param timeout: The timeout in seconds.
+    :type timeout: float
+    :return: tuple of: (done, pending) futures.
+    :rtype: tuple
+    """
+    event = Event()
+    notify = lambda f: event.set()
+    for future in futures:
+        future.add_callback(notify)
+    try:
+        event.wait(timeout)
+    finally:
+        for future in futures:
+            future.remove_callback(notify)
+    return _split(futures)
+
+
+def wait_all(futures, timeout=None):
+    """
+    Wait for all of the futures to be done.
+    :param futures: A list of futures.
+    :type futures: list
+    :param timeout: The timeout in seconds.
+    :type timeout: float
+    :return: tuple of: (done, pending) futures.
+    :rtype: tuple
+    """
+    if timeout is not None:
+        deadline = time() + timeout
+    for future in futures:
+        if timeout is None:
+            future.wait()
+            continue
+        remaining = deadline - time()
+        if remaining <= 0 or not future.wait(remaining):
+            break
+    return _split(futures)
+
+
+def _split(futures):
+    """
+    Split the futures by state.
+    :param futures: A list of futures.
+    :type futures: list
+    :return: tuple of: (done, pending) futures.
+    :rtype: tuple
+    """
+    done = [f for f in futures if f.done()]
+    pending = [f for f in futures if not f.done()]
+    return done, pending
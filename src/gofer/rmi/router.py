@@ -0,0 +1,334 @@
+#
+# Copyright (c) 2011 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU Lesser General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (LGPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of LGPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/lgpl-2.0.txt.
+#
+
+"""
+Sends requests and routes replies for synchronous requests.
+"""
+
+from Queue import Empty
+from Queue import Queue as Outbox
+from time import sleep, time
+from logging import getLogger
+from threading import RLock
+
+from gofer.common import Thread, Singleton, synchronized, released
+from gofer.messaging import auth
+from gofer.messaging import Queue, Exchange, Producer
+from gofer.messaging.compression import decompress
+from gofer.messaging.consumer import ConsumerThread
+
+
+log = getLogger(__name__)
+
+
+# seconds an unused reply queue is kept by the broker.
+EXPIRATION = 600
+
+# seconds to pause after a failed read.
+DELAY = 10
+
+# max number of queued requests sent as a batch.
+BATCH = 100
+
+# seconds between checks for expired futures.
+EXPIRE = 1
+
+
+class RequestSender(Thread):
+    """
+    Sends requests asynchronously.
+    One sender (and one open producer) per broker URL so callers
+    never block on the broker.  A failed send completes the future
+    with the raised exception.
+    :ivar url: The broker URL.
+    :type url: str
+    :ivar outbox: The queue of: (future, policy, body).
+    :type outbox: Outbox
+    """
+
+    __metaclass__ = Singleton
+
+    def __init__(self, url):
+        """
+        :param url: The broker URL.
+        :type url: str
+        """
+        Thread.__init__(self, name='requests:%s' % url)
+        self.url = url
+        self.outbox = Outbox()
+        self.__mutex = RLock()
+        self.setDaemon(True)
+
+    @synchronized
+    def put(self, future, policy, **body):
+        """
+        Queue a request to be sent.
+        The thread is started on first use.
+        :param future: The future result of the request.
+        :type future: gofer.rmi.policy.Future
+        :param policy: The policy used to send the request.
+        :type policy: gofer.rmi.policy.Policy
+        :keyword body: document body.
+        """
+        if not self.isAlive():
+            self.start()
+        self.outbox.put((future, policy, body))
+
+    def get(self):
+        """
+        Get the next batch of queued requests.
+        Blocks until a request has been queued then takes (up to BATCH)
+        the requests already queued.
+        :return: A list of: (future, policy, body).
+        :rtype: list
+        """
+        batch = [self.outbox.get()]
+        while len(batch) < BATCH:
+            try:
+                batch.append(self.outbox.get(block=False))
+            except Empty:
+                break
+        return batch
+
+    @staticmethod
+    def split(batch):
+        """
+        Split a batch of requests into groups of consecutive
+        requests that may be sent together.  Requests are grouped by
+        address, ttl, authenticator, compression and signing format.
+        :param batch: A list of: (future, policy, body).
+        :type batch: list
+        :return: A list of groups.
+        :rtype: list
+        """
+        groups = []
+        last = None
+        for request in batch:
+            policy = request[1]
+            key = (
+                policy.address,
+                policy.ttl,
+                policy.authenticator,
+                policy.compression,
+                policy.header)
+            if key != last:
+                groups.append([])
+                last = key
+            groups[-1].append(request)
+        return groups
+
+    @released
+    def run(self):
+        """
+        Read the outbound queue and send requests.
+        Requests queued together (fan-out) are sent as a batch.
+        """
+        producer = Producer(self.url)
+        while not Thread.aborted():
+            for group in self.split(self.get()):
+                self.send(producer, group)
+
+    @staticmethod
+    def send(producer, group):
+        """
+        Send a group of requests.
+        :param producer: A producer.
+        :type producer: Producer
+        :param group: A list of: (future, policy, body).
+        :type group: list
+        """
+        policy = group[0][1]
+        try:
+            producer.authenticator = policy.authenticator
+            producer.compression = policy.compression
+            producer.header = policy.header
+            if not producer.is_open():
+                producer.open()
+            producer.send_many(policy.address, [r[2] for r in group], policy.ttl)
+            log.debug('sent (%s): %d request(s)', policy.address, len(group))
+        except Exception, e:
+            for future, policy, body in group:
+                log.exception('send (%s), failed', future.sn)
+                future.set_exception(e)
+            try:
+                producer.close()
+            except Exception:
+                pass
+
+
+class ReplyRouter(ConsumerThread):
+    """
+    A shared reply queue.
+    One long-lived queue per broker URL (and exchange) is read by a
+    background thread and each reply is routed by serial number to the
+    pending future.  Replies are validated by the future so each call
+    may use its own authenticator.
+    :ivar exchange: The (optional) exchange bound to the queue.
+    :type exchange: str
+    :ivar pending: Pending futures keyed by serial number.
+    :type pending: dict
+    :ivar checked: When pending futures were last checked for expiration.
+    :type checked: float
+    """
+
+    __metaclass__ = Singleton
+
+    def __init__(self, url, exchange=None):
+        """
+        :param url: The broker URL.
+        :type url: str
+        :param exchange: The (optional) exchange bound to the queue.
+        :type exchange: str
+        """
+        queue = Queue()
+        queue.durable = False
+        queue.auto_delete = True
+        queue.expiration = EXPIRATION
+        ConsumerThread.__init__(self, queue, url)
+        self.setName('replies:%s' % url)
+        self.exchange = exchange
+        self.pending = {}
+        self.checked = 0
+        self.__mutex = RLock()
+
+    @property
+    def address(self):
+        """
+        The reply address.
+        :rtype: str
+        """
+        if self.exchange:
+            return '/'.join((self.exchange, self.node.name))
+        else:
+            return self.node.name
+
+    @synchronized
+    def start(self):
+        """
+        Declare (and bind) the reply queue and start the reader.
+        The thread is started on first use.
+        """
+        if self.isAlive():
+            return
+        self.declare()
+        ConsumerThread.start(self)
+
+    def declare(self):
+        """
+        Declare (and bind) the reply queue.
+        """
+        self.node.declare(self.url)
+        if self.exchange:
+            exchange = Exchange(self.exchange)
+            exchange.bind(self.node, self.url)
+
+    def open(self):
+        """
+        Declare (and bind) the reply queue and open the reader.
+        The queue is declared each time the reader is (re)opened because
+        the auto-deleted queue expires (or is deleted) while the reader
+        is disconnected from the broker.
+        """
+        while not Thread.aborted():
+            try:
+                self.declare()
+                self.reader.open()
+                break
+            except Exception:
+                log.exception(self.getName())
+                sleep(DELAY)
+
+    @synchronized
+    def register(self, future):
+        """
+        Register a pending future.
+        Must be called before the request is sent.
+        :param future: The future result of a request.
+        :type future: gofer.rmi.policy.Future
+        """
+        self.pending[future.sn] = future
+
+    @synchronized
+    def unregister(self, future):
+        """
+        Unregister a pending future.
+        Replies received afterwards are discarded.
+        :param future: The future result of a request.
+        :type future: gofer.rmi.policy.Future
+        """
+        self.pending.pop(future.sn, None)
+
+    @synchronized
+    def find(self, sn):
+        """
+        Find a pending future by serial number.
+        :param sn: The request serial number.
+        :type sn: str
+        :return: The pending future or (None).
+        :rtype: gofer.rmi.policy.Future
+        """
+        return self.pending.get(sn)
+
+    def expire(self):
+        """
+        Complete pending futures that have not received a reply
+        within the policy wait.  This enforces the wait for futures
+        that nobody is waiting on.  Checked every EXPIRE seconds.
+        """
+        now = time()
+        if now - self.checked < EXPIRE:
+            return
+        self.checked = now
+        with self.__mutex:
+            expired = [f for f in self.pending.values() if f.expired(now)]
+        for future in expired:
+            log.debug('reply: %s, expired', future.sn)
+            future.expire()
+
+    def read(self):
+        """
+        Read and route the next reply.
+        The reader is reopened (and the queue declared) when the read
+        fails.  Replies that cannot be routed are discarded.
+        """
+        self.expire()
+        try:
+            message = self.reader.get(self.wait)
+            if message is None:
+                # wait expired
+                return
+            message.ack()
+        except Exception:
+            log.exception(self.getName())
+            sleep(DELAY)
+            self.close()
+            self.open()
+            return
+        try:
+            self.route(message.body)
+        except Exception:
+            log.exception('reply: discarded')
+
+    def route(self, message):
+        """
+        Route the reply to the pending future.
+        :param message: A json encoded (signed) reply.
+        :type message: str
+        """
+        message = decompress(message)
+        document, original, signature = auth.peal(message)
+        future = self.find(document.sn)
+        if future:
+            future.put(message)
+        else:
+            log.debug('reply: %s, not pending (discarded)', document.sn)
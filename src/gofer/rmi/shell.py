@@ -38,17 +38,21 @@ class Shell(object):
         Report progress.
         :param details: The details to report.
         :type details: dict
+        :return: True if sent.  False when not enabled or coalesced.
+        :rtype: bool
         """
         if not self.progress_reported:
             # not enabled
-            return
+            return False
         context = Context.current()
         context.progress.details = details
-        context.progress.report()
+        return context.progress.report()
 
     def run(self, *command):
         """
         Run the specified command.
+        Output is reported (as progress) by line.  When progress is
+        aggregated, the lines read since the last (sent) report are reported.
         :param command: A command and parameters.
         :type command: tuple
         :return: (status, {stdout:<str>, stderr:<str>})
@@ -63,6 +67,7 @@ class Shell(object):
             STDERR: '',
         }
         context = Context.current()
+        aggregate = context.progress.aggregate
         p = Popen(command, stdout=PIPE, stderr=PIPE)
         try:
             while True:
@@ -74,9 +79,16 @@ class Shell(object):
                     line = fp.readline()
                     if line:
                         n_read += len(line)
-                        details[key] = line
+                        if aggregate:
+                            details[key] += line
+                        else:
+                            details[key] = line
                         result[key] += line
-                        self.report(details)
+                        if self.report(details) and aggregate:
+                            details = {
+                                STDOUT: '',
+                                STDERR: '',
+                            }
                 if not n_read:
                     #  EOF
                     break
@@ -20,9 +20,8 @@ classes on which we invoke methods.
 """
 
 from new import classobj
-from threading import RLock
 
-from gofer.common import Options, synchronized
+from gofer.common import Options
 from gofer.rmi.policy import Policy
 from gofer.rmi.dispatcher import Request
 
@@ -99,8 +98,6 @@ class Stub:
     :type __url: str
     :ivar __address: The AMQP address
     :type __address: str
-    :ivar __mutex: The mutex prevents concurrent calls.
-    :type __mutex: RLock
     :ivar __policy: The invocation policy.
     :type __policy: Policy
     :ivar __cntr: The constructor arguments.
@@ -118,14 +115,13 @@ class Stub:
         """
         self.__url = url
         self.__address = address
-        self.__mutex = RLock()
         self.__policy = Policy(url, address, options)
         self.__cntr = None
 
-    @synchronized
     def __send(self, request):
         """
         Send the request using the configured request method.
+        Requests are not serialized; many may be in flight.
         :param request: An RMI request.
         :type request: str
         """
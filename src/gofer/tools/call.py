@@ -19,9 +19,9 @@ from optparse import OptionParser
 from logging import basicConfig, CRITICAL
 
 from gofer import utf8
+from gofer.common import json
 from gofer.messaging import Connection
 from gofer.messaging.adapter.model import DEFAULT_URL
-from gofer.messaging.model import json
 from gofer.proxy import Agent
 
 
@@ -155,11 +155,13 @@ class TestPlugin(TestCase):
                 enabled='1',
                 threads=4,
                 latency=0.5,
+                progress=5,
                 forward='a, b, c',
                 accept='d, e, f'),
             messaging=Mock(
                 uuid='x99',
-                url='amqp://localhost')
+                url='amqp://localhost',
+                confirms='10')
         )
         plugin = Plugin(descriptor, '')
         plugin.scheduler = Mock()
@@ -171,8 +173,12 @@ class TestPlugin(TestCase):
         self.assertEqual(plugin.uuid, descriptor.messaging.uuid)
         # latency
         self.assertEqual(plugin.latency, descriptor.main.latency)
+        # progress
+        self.assertEqual(plugin.progress, 5.0)
         # url
         self.assertEqual(plugin.url, descriptor.messaging.url)
+        # confirms
+        self.assertEqual(plugin.confirms, 10)
         # enabled
         self.assertTrue(plugin.enabled)
         # connector
@@ -293,6 +299,7 @@ class TestPlugin(TestCase):
         self.assertEqual(connector.ssl.client_key, descriptor.messaging.clientkey)
         self.assertEqual(connector.ssl.client_certificate, descriptor.messaging.clientcert)
         self.assertEqual(connector.ssl.host_validation, descriptor.messaging.host_validation)
+        self.assertTrue(connector.listen)
 
     @patch('gofer.agent.plugin.Node')
     @patch('gofer.agent.plugin.RequestConsumer')
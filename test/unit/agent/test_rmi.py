@@ -9,12 +9,441 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from threading import current_thread
 from unittest import TestCase
 
 from mock import patch, Mock
 
 from gofer.agent.rmi import Scheduler, Transaction, Context
+from gofer.agent.rmi import Pooled, ProducerPool, Reaper, Task
 from gofer.messaging import Document
+from gofer.rmi.dispatcher import Return, Stream
+
+
+class TestPooled(TestCase):
+
+    @patch('gofer.agent.rmi.Connection')
+    @patch('gofer.agent.rmi.Producer')
+    def test_init(self, producer, connection):
+        url = 'amqp://host'
+        pooled = Pooled(url)
+        producer.assert_called_once_with(url)
+        connection.assert_called_once_with(url)
+        self.assertEqual(pooled.producer, producer.return_value)
+        self.assertEqual(pooled.connection, connection.return_value)
+        self.assertFalse(pooled.busy)
+
+    @patch('gofer.agent.rmi.Connection')
+    @patch('gofer.agent.rmi.Producer')
+    def test_close(self, producer, connection):
+        pooled = Pooled('amqp://host')
+        producer.return_value.close.side_effect = ValueError
+        pooled.close()
+        producer.return_value.close.assert_called_once_with()
+        connection.return_value.close.assert_called_once_with()
+
+
+class TestProducerPool(TestCase):
+
+    def test_init(self):
+        pool = ProducerPool(10)
+        self.assertEqual(pool.idle, 10)
+        self.assertEqual(pool.pool, {})
+        self.assertEqual(pool.reaper, None)
+
+    @patch('gofer.agent.rmi.Reaper')
+    def test_start(self, reaper):
+        pool = ProducerPool()
+        reaper.return_value.isAlive.return_value = True
+        pool.start()
+        pool.start()
+        reaper.assert_called_once_with(pool)
+        reaper.return_value.start.assert_called_once_with()
+
+    @patch('gofer.agent.rmi.ProducerPool.start', Mock())
+    @patch('gofer.agent.rmi.Pooled')
+    def test_get(self, pooled):
+        plugin = Mock(url='amqp://host')
+        producer = pooled.return_value.producer
+        producer.is_open.return_value = False
+        pool = ProducerPool()
+
+        # test
+        p = pool.get(plugin)
+
+        # validation
+        pooled.assert_called_once_with(plugin.url)
+        p.open.assert_called_once_with()
+        self.assertEqual(p, producer)
+        self.assertEqual(p.authenticator, plugin.authenticator)
+        self.assertEqual(p.window, plugin.confirms)
+        self.assertEqual(pool.pool[(current_thread(), plugin.url)], pooled.return_value)
+        self.assertTrue(pooled.return_value.busy)
+
+    @patch('gofer.agent.rmi.ProducerPool.start', Mock())
+    @patch('gofer.agent.rmi.Pooled')
+    def test_get_reused(self, pooled):
+        plugin = Mock(url='amqp://host')
+        producer = pooled.return_value.producer
+        producer.is_open.side_effect = [False, True]
+        pool = ProducerPool()
+
+        # test
+        p1 = pool.get(plugin)
+        p2 = pool.get(plugin)
+
+        # validation
+        pooled.assert_called_once_with(plugin.url)
+        p1.open.assert_called_once_with()
+        self.assertEqual(p1, p2)
+
+    @patch('gofer.agent.rmi.ProducerPool.start', Mock())
+    @patch('gofer.agent.rmi.Pooled')
+    def test_get_open_failed(self, pooled):
+        plugin = Mock(url='amqp://host')
+        producer = pooled.return_value.producer
+        producer.is_open.return_value = False
+        producer.open.side_effect = ValueError
+        pool = ProducerPool()
+
+        # test
+        self.assertRaises(ValueError, pool.get, plugin)
+
+        # validation
+        pooled.return_value.close.assert_called_once_with()
+        self.assertEqual(pool.pool, {})
+
+    @patch('gofer.agent.rmi.time')
+    def test_release(self, time):
+        time.return_value = 100
+        url = 'amqp://host'
+        pooled = Mock(busy=True, used=0)
+        pool = ProducerPool()
+        pool.pool[(current_thread(), url)] = pooled
+
+        # test
+        pool.release(url)
+        pool.release('other')
+
+        # validation
+        self.assertFalse(pooled.busy)
+        self.assertEqual(pooled.used, 100)
+
+    def test_discard(self):
+        url = 'amqp://host'
+        pooled = Mock()
+        other = Mock()
+        pool = ProducerPool()
+        pool.pool[(current_thread(), url)] = pooled
+        pool.pool[(current_thread(), 'other')] = other
+
+        # test
+        pool.discard(url)
+        pool.discard(url)
+
+        # validation
+        pooled.close.assert_called_once_with()
+        self.assertFalse(other.close.called)
+        self.assertEqual(pool.pool.keys(), [(current_thread(), 'other')])
+
+    @patch('gofer.agent.rmi.time')
+    def test_reap(self, time):
+        time.return_value = 100
+        idle = Mock(busy=False, used=80)
+        recent = Mock(busy=False, used=95)
+        busy = Mock(busy=True, used=0)
+        pool = ProducerPool(10)
+        pool.pool['A'] = idle
+        pool.pool['B'] = recent
+        pool.pool['C'] = busy
+
+        # test
+        pool.reap()
+
+        # validation
+        idle.close.assert_called_once_with()
+        self.assertFalse(recent.close.called)
+        self.assertFalse(busy.close.called)
+        self.assertEqual(sorted(pool.pool.keys()), ['B', 'C'])
+
+    def test_clear(self):
+        pooled = Mock()
+        pool = ProducerPool()
+        pool.pool['A'] = pooled
+
+        # test
+        pool.clear()
+
+        # validation
+        pooled.close.assert_called_once_with()
+        self.assertEqual(pool.pool, {})
+
+
+class TestReaper(TestCase):
+
+    def test_init(self):
+        pool = Mock()
+        reaper = Reaper(pool)
+        self.assertEqual(reaper.pool, pool)
+        self.assertTrue(reaper.isDaemon())
+
+    @patch('gofer.agent.rmi.sleep')
+    @patch('gofer.agent.rmi.Thread.aborted')
+    def test_run(self, aborted, sleep):
+        aborted.side_effect = [False, False, True]
+        pool = Mock(idle=10)
+        pool.reap.side_effect = [ValueError, None]
+        reaper = Reaper(pool)
+
+        # test
+        reaper.run()
+
+        # validation
+        sleep.assert_called_with(5)
+        self.assertEqual(pool.reap.call_count, 2)
+
+
+class TestTask(TestCase):
+
+    @patch('gofer.agent.rmi.Context')
+    @patch('gofer.agent.rmi.Progress')
+    @patch('gofer.agent.rmi.Cancelled')
+    def test_call(self, cancelled, progress, context):
+        cancelled.return_value.return_value = False
+        request = Document(sn=1, data=2, replyto='q', ts=0, signing=['S1'])
+        plugin = Mock(url='amqp://host', latency=0)
+        transaction = Mock(plugin=plugin, request=request)
+        pool = Mock()
+        task = Task(transaction)
+        task.producers = pool
+        header = []
+        plugin.dispatch.side_effect = lambda r: header.append(pool.get.return_value.header)
+
+        # test
+        task()
+
+        # validation
+        producer = pool.get.return_value
+        self.assertEqual(header, [True])
+        self.assertEqual(producer.header, False)
+        pool.get.assert_called_once_with(plugin)
+        progress.assert_called_once_with(request, producer, plugin.progress, task.lock)
+        progress.return_value.cancel.assert_called_once_with()
+        progress.return_value.drain.assert_called_once_with()
+        plugin.dispatch.assert_called_once_with(request)
+        transaction.commit.assert_called_once_with()
+        self.assertEqual(producer.send.call_count, 1)
+        documents = producer.send_many.call_args[0][1]
+        self.assertEqual(documents[0], progress.return_value.document.return_value)
+        self.assertEqual(documents[1]['sn'], request.sn)
+        self.assertFalse(producer.close.called)
+        self.assertFalse(pool.discard.called)
+        pool.release.assert_called_once_with(plugin.url)
+        self.assertEqual(task.producer, None)
+
+    @patch('gofer.agent.rmi.StatusSender')
+    @patch('gofer.agent.rmi.Context', Mock())
+    @patch('gofer.agent.rmi.Progress', Mock())
+    @patch('gofer.agent.rmi.Cancelled')
+    def test_call_wait_accepted(self, cancelled, sender):
+        cancelled.return_value.return_value = False
+        request = Document(sn=1, data=2, replyto='q', ts=0)
+        plugin = Mock(url='amqp://host', latency=0)
+        transaction = Mock(plugin=plugin, request=request)
+        pool = Mock()
+        pool.get.return_value.send.side_effect = \
+            lambda *a, **k: sender.return_value.wait.assert_called_once_with(request.sn)
+        task = Task(transaction)
+        task.producers = pool
+
+        # test
+        task()
+
+        # validation
+        sender.assert_called_once_with(plugin.url)
+        self.assertEqual(pool.get.return_value.send.call_count, 1)
+        self.assertFalse(pool.discard.called)
+
+    @patch('gofer.agent.rmi.Context', Mock())
+    @patch('gofer.agent.rmi.Progress', Mock())
+    @patch('gofer.agent.rmi.Cancelled')
+    def test_call_send_failed(self, cancelled):
+        cancelled.return_value.return_value = False
+        request = Document(sn=1, data=2, replyto='q', ts=0)
+        plugin = Mock(url='amqp://host', latency=0)
+        transaction = Mock(plugin=plugin, request=request)
+        pool = Mock()
+        pool.get.return_value.send.side_effect = ValueError
+        task = Task(transaction)
+        task.producers = pool
+
+        # test
+        task()
+
+        # validation
+        pool.discard.assert_called_once_with(plugin.url)
+
+    @patch('gofer.agent.rmi.Cancelled')
+    def test_call_cancelled(self, cancelled):
+        cancelled.return_value.return_value = True
+        plugin = Mock(url='amqp://host', latency=0)
+        transaction = Mock(plugin=plugin, request=Document(sn=1))
+        pool = Mock()
+        task = Task(transaction)
+        task.producers = pool
+
+        # test
+        task()
+
+        # validation
+        transaction.discard.assert_called_once_with()
+        self.assertFalse(pool.get.called)
+
+    @patch('gofer.agent.rmi.Context', Mock())
+    @patch('gofer.agent.rmi.Progress', Mock())
+    @patch('gofer.agent.rmi.Cancelled')
+    def test_call_stream(self, cancelled):
+        cancelled.return_value.return_value = False
+        request = Document(sn=1, data=2, replyto='q', ts=0, streaming=True)
+        plugin = Mock(url='amqp://host', latency=0)
+        plugin.dispatch.return_value = Stream(['a', 'b'])
+        transaction = Mock(plugin=plugin, request=request)
+        pool = Mock()
+        task = Task(transaction)
+        task.producers = pool
+
+        # test
+        task()
+
+        # validation
+        producer = pool.get.return_value
+        calls = producer.send.call_args_list
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(calls[0][1]['status'], 'started')
+        self.assertEqual([c[1]['status'] for c in calls[1:3]], ['partial', 'partial'])
+        self.assertEqual([c[1]['seq'] for c in calls[1:3]], [0, 1])
+        reply = producer.send_many.call_args[0][1][-1]
+        self.assertEqual(reply['result'].decode(), {'retval': 2, 'partials': 2})
+        self.assertFalse(pool.discard.called)
+
+    @patch('gofer.agent.rmi.Context', Mock())
+    @patch('gofer.agent.rmi.Progress', Mock())
+    @patch('gofer.agent.rmi.Cancelled')
+    def test_call_stream_failed(self, cancelled):
+        cancelled.return_value.return_value = False
+        request = Document(sn=1, data=2, replyto='q', ts=0, streaming=True)
+        plugin = Mock(url='amqp://host', latency=0)
+        plugin.dispatch.return_value = Stream(['a', 'b'])
+        transaction = Mock(plugin=plugin, request=request)
+        pool = Mock()
+        pool.get.return_value.send.side_effect = [None, ValueError]
+        task = Task(transaction)
+        task.producers = pool
+
+        # test
+        task()
+
+        # validation
+        self.assertEqual(pool.get.return_value.send.call_count, 2)
+        pool.discard.assert_called_once_with(plugin.url)
+
+    @patch('gofer.agent.rmi.Context', Mock())
+    @patch('gofer.agent.rmi.Progress', Mock())
+    @patch('gofer.agent.rmi.Cancelled')
+    def test_call_stream_not_supported(self, cancelled):
+        cancelled.return_value.return_value = False
+        request = Document(sn=1, data=2, replyto='q', ts=0)
+        plugin = Mock(url='amqp://host', latency=0)
+        plugin.dispatch.return_value = Stream(['a', 'b'])
+        transaction = Mock(plugin=plugin, request=request)
+        pool = Mock()
+        task = Task(transaction)
+        task.producers = pool
+
+        # test
+        task()
+
+        # validation
+        producer = pool.get.return_value
+        calls = producer.send.call_args_list
+        self.assertEqual([c[1]['status'] for c in calls], ['started'])
+        reply = producer.send_many.call_args[0][1][-1]
+        self.assertEqual(reply['result'].decode(), {'retval': ['a', 'b']})
+
+    def test_send_partial_no_reply(self):
+        request = Document(sn=1, data=2, ts=0)
+        task = Task(Mock(request=request))
+        task.producer = Mock()
+        stream = Stream(['a', 'b'])
+
+        # test
+        result = task.send_partial(request, stream)
+
+        # validation
+        self.assertFalse(task.producer.send.called)
+        self.assertEqual(stream.count, 2)
+        self.assertEqual(result, stream.result)
+
+    def test_send_reply_compressed(self):
+        request = Document(sn=1, data=2, replyto='q', ts=0, compression=['zlib'])
+        plugin = Mock(compression=1024)
+        task = Task(Mock(plugin=plugin, request=request))
+        producer = Mock(compression=0)
+        compression = []
+        producer.send_many.side_effect = lambda *a, **k: compression.append(producer.compression)
+        task.producer = producer
+
+        # test
+        task.send_reply(request, 'done')
+
+        # validation
+        self.assertEqual(compression, [1024])
+        self.assertEqual(producer.compression, 0)
+
+    def test_send_reply_encoded(self):
+        request = Document(sn=1, data=2, replyto='q', ts=0)
+        task = Task(Mock(request=request))
+        task.producer = Mock()
+        result = Return.succeed(18)
+
+        # test
+        task.send_reply(request, result)
+
+        # validation
+        documents = task.producer.send_many.call_args[0][1]
+        self.assertEqual(documents, [
+            dict(sn=1, data=2, result=result.encoded, timestamp=documents[0]['timestamp'])
+        ])
+
+    def test_send_reply_progress(self):
+        request = Document(sn=1, data=2, replyto='q', ts=0)
+        task = Task(Mock(request=request))
+        task.producer = Mock()
+        progress = Mock()
+        progress.drain.return_value = True
+        progress.document.return_value = {'status': 'progress'}
+
+        # test
+        task.send_reply(request, 'done', progress)
+
+        # validation
+        address, documents = task.producer.send_many.call_args[0]
+        self.assertEqual(address, request.replyto)
+        self.assertEqual(documents[0], progress.document.return_value)
+        self.assertEqual(documents[1]['result'], 'done')
+
+    def test_compression(self):
+        plugin = Mock(compression=1024)
+        task = Task(Mock(plugin=plugin))
+        self.assertEqual(task.compression(Document(compression=['zlib'])), 1024)
+        self.assertEqual(task.compression(Document(compression=['lz4'])), 0)
+        self.assertEqual(task.compression(Document()), 0)
+
+    def test_header(self):
+        task = Task(Mock())
+        self.assertTrue(task.header(Document(signing=['S1'])))
+        self.assertFalse(task.header(Document(signing=['S2'])))
+        self.assertFalse(task.header(Document()))
 
 
 class TestScheduler(TestCase):
@@ -22,7 +22,7 @@ from gofer.messaging.adapter.model import Message
 with ipatch('amqp'):
     from gofer.messaging.adapter.amqp.consumer import Receiver, Inbox, Empty
     from gofer.messaging.adapter.amqp.consumer import Reader, BaseReader
-    from gofer.messaging.adapter.amqp.consumer import DELIVERY_TAG
+    from gofer.messaging.adapter.amqp.consumer import DELIVERY_TAG, NO_DELAY, DRAIN
 
 
 class Queue(object):
@@ -99,8 +99,7 @@ class TestReader(TestCase):
 
         # validation
         reader.close.assert_called_once_with()
-        reader.connection.close.assert_called_once_with()
-        connection.return_value.open.assert_called_once_with()
+        reader.connection.repair.assert_called_once_with()
         connection.return_value.channel.assert_called_once_with()
         receiver.assert_called_once_with(reader)
         self.assertEqual(reader.channel, connection.return_value.channel.return_value)
@@ -160,6 +159,12 @@ class TestReader(TestCase):
         self.assertEqual(message._impl, received)
         self.assertEqual(message._body, received.body)
 
+    def test_flow(self):
+        reader = Reader(None, '')
+        reader.channel = Mock()
+        reader.flow(10)
+        reader.channel.basic_qos.assert_called_once_with(0, 10, False)
+
     def test_ack(self):
         url = 'test-url'
         tag = '1234'
@@ -231,9 +236,11 @@ class TestReader(TestCase):
         reader.channel.basic_reject.assert_called_once_with(tag, False)
 
     @patch('gofer.messaging.adapter.amqp.consumer.Empty', Empty)
-    def test_get_empty(self):
+    @patch('gofer.messaging.adapter.reliability.time')
+    def test_get_empty(self, time):
         queue = Mock(name='test-queue')
         url = 'test-url'
+        time.side_effect = [0, 10]
 
         # test
         reader = Reader(queue, url=url)
@@ -245,57 +252,69 @@ class TestReader(TestCase):
         reader.receiver.fetch.assert_called_once_with(10)
         self.assertEqual(message, None)
 
+    @patch('gofer.messaging.adapter.reliability.time')
+    def test_get_woken(self, time):
+        queue = Mock(name='test-queue')
+        received = Mock(content='<body/>')
+        url = 'test-url'
+        time.side_effect = [0, 4]
 
-class TestReceiver(TestCase):
+        # test
+        reader = Reader(queue, url=url)
+        reader.receiver = Mock()
+        reader.receiver.fetch.side_effect = [Empty, received]
+        message = reader.get(10)
 
-    @patch('select.epoll')
-    def test_wait(self, epoll):
-        fd = 0
-        channel = Mock(method_queue=[])
-        timeout = 10
+        # validation
+        self.assertEqual(
+            reader.receiver.fetch.call_args_list,
+            [
+                ((10,), {}),
+                ((6,), {}),
+            ])
+        self.assertEqual(message._impl, received)
 
-        epoll.return_value.poll.return_value = [fd]
+
+class TestReceiver(TestCase):
+
+    @patch('gofer.messaging.adapter.amqp.consumer.wait')
+    def test_wait(self, wait):
+        channel = Mock()
+        wait.side_effect = [True, True, True, False]
 
         # test
-        Receiver._wait(fd, channel, timeout)
+        Receiver._wait(channel, 10)
 
         # validation
-        epoll.assert_called_once_with()
-        epoll.return_value.register.assert_called_with(fd, select.EPOLLIN)
-        epoll.return_value.poll.assert_called_with(timeout)
-        channel.wait.assert_called_once_with()
-
-    @patch('select.epoll')
-    def test_wait_with_queued(self, epoll):
-        fd = 0
-        channel = Mock(method_queue=[Mock()])
-        timeout = 10
-
-        epoll.return_value.poll.return_value = [fd]
+        self.assertEqual(
+            wait.call_args_list,
+            [
+                ((channel, 10), {}),
+                ((channel, NO_DELAY), {}),
+                ((channel, NO_DELAY), {}),
+                ((channel, NO_DELAY), {}),
+            ])
+
+    @patch('gofer.messaging.adapter.amqp.consumer.wait')
+    def test_wait_nothing(self, wait):
+        channel = Mock()
+        wait.return_value = False
 
         # test
-        Receiver._wait(fd, channel, timeout)
+        Receiver._wait(channel, 10)
 
         # validation
-        self.assertFalse(epoll.called)
-        channel.wait.assert_called_once_with()
-
-    @patch('select.epoll')
-    def test_wait_nothing(self, epoll):
-        fd = 0
-        channel = Mock(method_queue=[])
-        timeout = 10
+        wait.assert_called_once_with(channel, 10)
 
-        epoll.return_value.poll.return_value = []
+    @patch('gofer.messaging.adapter.amqp.consumer.wait')
+    def test_wait_drain_limit(self, wait):
+        wait.return_value = True
 
         # test
-        Receiver._wait(fd, channel, timeout)
+        Receiver._wait(Mock(), 10)
 
         # validation
-        epoll.assert_called_once_with()
-        epoll.return_value.register.assert_called_with(fd, select.EPOLLIN)
-        epoll.return_value.poll.assert_called_with(timeout)
-        self.assertFalse(channel.wait.called)
+        self.assertEqual(wait.call_count, DRAIN + 1)
 
     def test_init(self):
         reader = Mock()
@@ -312,16 +331,29 @@ class TestReceiver(TestCase):
 
     def test_open(self):
         node = Mock(address='test')
-        reader = Mock(node=node, channel=Mock())
+        reader = Mock(node=node, channel=Mock(), prefetch=0)
 
         # test
         r = Receiver(reader)
         r = r.open()
 
         # validation
+        self.assertFalse(reader.channel.basic_qos.called)
         reader.channel.basic_consume.assert_called_once_with(node.address, callback=r.inbox.put)
         self.assertEqual(r.tag, reader.channel.basic_consume.return_value)
 
+    def test_open_prefetch(self):
+        node = Mock(address='test')
+        reader = Mock(node=node, channel=Mock(), prefetch=10)
+
+        # test
+        r = Receiver(reader)
+        r = r.open()
+
+        # validation
+        reader.channel.basic_qos.assert_called_once_with(0, reader.prefetch, False)
+        reader.channel.basic_consume.assert_called_once_with(node.address, callback=r.inbox.put)
+
     def test_close(self):
         reader = Mock(channel=Mock())
         tag = 1234
@@ -362,8 +394,7 @@ class TestReceiver(TestCase):
         message = r.fetch(timeout)
 
         # validation
-        fd = channel.connection.sock.fileno.return_value
-        r._wait.assert_called_once_with(fd, channel, timeout)
+        r._wait.assert_called_once_with(channel, timeout)
         self.assertEqual(message, received)
 
     def test_fetch_empty(self):
@@ -22,6 +22,13 @@ with ipatch('amqp'):
 
 class TestExchange(TestCase):
 
+    def setUp(self):
+        self.connection = patch('gofer.messaging.adapter.amqp.connection.RealConnection')
+        self.connection.start()
+
+    def tearDown(self):
+        self.connection.stop()
+
     def test_init(self):
         name = 'test-exchange'
         policy = 'direct'
@@ -94,6 +101,13 @@ class TestExchange(TestCase):
 
 class TestQueue(TestCase):
 
+    def setUp(self):
+        self.connection = patch('gofer.messaging.adapter.amqp.connection.RealConnection')
+        self.connection.start()
+
+    def tearDown(self):
+        self.connection.stop()
+
     def test_init(self):
         name = 'test-queue'
         queue = Queue(name)
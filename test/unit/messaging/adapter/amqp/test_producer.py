@@ -19,6 +19,215 @@ from gofer.devel import ipatch
 with ipatch('amqp'):
     from gofer.messaging.adapter.amqp.producer import build_message
     from gofer.messaging.adapter.amqp.producer import Sender, BaseSender
+    from gofer.messaging.adapter.amqp.producer import Confirms, NotConfirmed
+    from gofer.messaging.adapter.amqp.producer import split, CONFIRMS, RETRIES, LINGER
+
+
+class Channel(object):
+
+    def __init__(self):
+        self.events = {'basic_ack': set(), 'basic_nack': set()}
+        self.confirm_select = Mock()
+        self.basic_publish = Mock()
+        self.wait = Mock()
+        self.method_queue = []
+        self.connection = Mock()
+
+
+class TestSplit(TestCase):
+
+    def test_queue(self):
+        self.assertEqual(split('jeff'), ('', 'jeff'))
+
+    def test_exchange(self):
+        self.assertEqual(split('amq.direct/bar'), ('amq.direct', 'bar'))
+
+
+class TestNotConfirmed(TestCase):
+
+    def test_init(self):
+        addresses = ['q2', 'amq.direct/q1', 'q2']
+        exception = NotConfirmed(addresses)
+        self.assertEqual(exception.addresses, addresses)
+        self.assertEqual(
+            str(exception),
+            NotConfirmed.DESCRIPTION % (3, 'amq.direct/q1, q2'))
+
+
+class TestConfirms(TestCase):
+
+    def test_init(self):
+        channel = Channel()
+        confirms = Confirms(channel)
+        channel.confirm_select.assert_called_once_with()
+        self.assertEqual(channel.events['basic_ack'], set([confirms.ack]))
+        self.assertEqual(channel.events['basic_nack'], set([confirms.nack]))
+        self.assertEqual(confirms.channel, channel)
+        self.assertEqual(confirms.published, 0)
+        self.assertEqual(confirms.outstanding, 0)
+        self.assertEqual(confirms.backlog, [])
+        self.assertEqual(confirms.nacked, [])
+        self.assertEqual(confirms.failed, [])
+
+    def test_publish(self):
+        message = Mock()
+        channel = Channel()
+        confirms = Confirms(channel)
+        confirms.publish(message, 'amq.direct', 'bar')
+        confirms.publish(message, 'amq.direct', 'bar')
+        channel.basic_publish.assert_called_with(
+            message, mandatory=True, exchange='amq.direct', routing_key='bar')
+        self.assertEqual(confirms.published, 2)
+        self.assertEqual(
+            confirms.unconfirmed,
+            {
+                1: (message, 'amq.direct', 'bar', 0),
+                2: (message, 'amq.direct', 'bar', 0),
+            })
+
+    def test_publish_backlog(self):
+        messages = [Mock(), Mock()]
+        channel = Channel()
+        confirms = Confirms(channel)
+        confirms.backlog = [(messages[0], '', 'q1', 0)]
+        confirms.publish(messages[1], '', 'q2')
+        self.assertEqual(
+            [c[0][0] for c in channel.basic_publish.call_args_list],
+            messages)
+        self.assertEqual(confirms.backlog, [])
+        self.assertEqual(confirms.outstanding, 2)
+
+    def test_resend(self):
+        messages = [Mock(), Mock(), Mock()]
+        channel = Channel()
+        confirms = Confirms(channel)
+        confirms.backlog = [(messages[0], '', 'q1', 1)]
+        confirms.nacked = [(messages[1], '', 'q2', 0), (messages[2], 'amq.direct', 'q3', RETRIES)]
+        confirms.resend()
+        self.assertEqual(
+            confirms.unconfirmed,
+            {
+                1: (messages[0], '', 'q1', 1),
+                2: (messages[1], '', 'q2', 1),
+            })
+        self.assertEqual(confirms.backlog, [])
+        self.assertEqual(confirms.nacked, [])
+        self.assertEqual(confirms.failed, [(messages[2], 'amq.direct', 'q3', RETRIES)])
+
+    def test_resend_failed(self):
+        message = Mock()
+        channel = Channel()
+        channel.basic_publish.side_effect = [None, IOError]
+        confirms = Confirms(channel)
+        confirms.backlog = [(message, '', 'q1', 0), (message, '', 'q2', 0)]
+        self.assertRaises(IOError, confirms.resend)
+        self.assertEqual(confirms.backlog, [(message, '', 'q2', 0)])
+        self.assertEqual(confirms.pending(), [(message, '', 'q2', 0), (message, '', 'q1', 0)])
+
+    def test_pending(self):
+        confirms = Confirms(Channel())
+        confirms.backlog = [1]
+        confirms.unconfirmed = {10: 3, 2: 2}
+        confirms.nacked = [4]
+        self.assertEqual(confirms.pending(), [1, 2, 3, 4])
+        self.assertEqual(confirms.outstanding, 4)
+
+    def test_ack(self):
+        confirms = Confirms(Channel())
+        confirms.unconfirmed = {1: 1, 2: 2, 3: 3, 4: 4}
+        confirms.ack(2, False)
+        self.assertEqual(confirms.unconfirmed, {1: 1, 3: 3, 4: 4})
+        confirms.ack(3, True)
+        self.assertEqual(confirms.unconfirmed, {4: 4})
+
+    def test_nack(self):
+        confirms = Confirms(Channel())
+        confirms.unconfirmed = {1: 1, 2: 2, 3: 3}
+        confirms.nack(2, True)
+        self.assertEqual(confirms.unconfirmed, {3: 3})
+        self.assertEqual(confirms.nacked, [1, 2])
+
+    def test_wait(self):
+        channel = Channel()
+        confirms = Confirms(channel)
+        confirms.unconfirmed = {1: 1, 2: 2, 3: 3}
+        channel.wait.side_effect = lambda *unused: confirms.ack(confirms.published, True)
+        confirms.published = 3
+        self.assertTrue(confirms.wait())
+        channel.wait.assert_called_once_with(CONFIRMS)
+        self.assertEqual(confirms.outstanding, 0)
+
+    def test_wait_window(self):
+        channel = Channel()
+        confirms = Confirms(channel)
+        confirms.unconfirmed = {1: 1, 2: 2}
+        confirms.wait(2)
+        self.assertFalse(channel.wait.called)
+
+    def test_wait_nacked(self):
+        message = Mock()
+        channel = Channel()
+        confirms = Confirms(channel)
+        confirms.unconfirmed = {1: (message, '', 'q1', 0)}
+        confirms.published = 1
+
+        def wait(*unused):
+            confirms.nack(confirms.published, False)
+
+        channel.wait.side_effect = wait
+
+        # test
+        try:
+            confirms.wait()
+            self.fail()
+        except NotConfirmed, e:
+            self.assertEqual(e.addresses, ['q1'])
+
+        # validation
+        self.assertEqual(channel.basic_publish.call_count, RETRIES)
+        self.assertEqual(confirms.outstanding, 0)
+        self.assertEqual(confirms.failed, [])
+
+    def test_wait_nacked_then_acked(self):
+        message = Mock()
+        channel = Channel()
+        confirms = Confirms(channel)
+        confirms.unconfirmed = {1: (message, '', 'q1', 0)}
+        confirms.published = 1
+
+        def wait(*unused):
+            if channel.wait.call_count == 1:
+                confirms.nack(1, False)
+            else:
+                confirms.ack(2, False)
+
+        channel.wait.side_effect = wait
+
+        # test
+        self.assertTrue(confirms.wait())
+
+        # validation
+        channel.basic_publish.assert_called_once_with(
+            message, mandatory=True, exchange='', routing_key='q1')
+        self.assertEqual(confirms.outstanding, 0)
+
+    @patch('gofer.messaging.adapter.amqp.producer.time')
+    def test_wait_timeout(self, _time):
+        _time.side_effect = [0, 0.5, 2]
+        channel = Channel()
+        confirms = Confirms(channel)
+        confirms.unconfirmed = {1: 1}
+        confirms._read = Mock()
+        self.assertFalse(confirms.wait(timeout=1))
+        confirms._read.assert_called_once_with(0.5)
+        self.assertFalse(channel.wait.called)
+
+    @patch('gofer.messaging.adapter.amqp.producer.wait')
+    def test_read(self, wait):
+        channel = Channel()
+        confirms = Confirms(channel)
+        confirms._read(10)
+        wait.assert_called_once_with(channel, 10)
 
 
 class TestBuildMessage(TestCase):
@@ -78,6 +287,8 @@ class TestSender(TestCase):
         self.assertEqual(sender.url, url)
         self.assertEqual(sender.connection, connection.return_value)
         self.assertEqual(sender.channel, None)
+        self.assertEqual(sender.confirms, None)
+        self.assertEqual(sender.window, 1)
 
     @patch('gofer.messaging.adapter.amqp.producer.Connection', Mock())
     def test_is_open(self):
@@ -89,8 +300,9 @@ class TestSender(TestCase):
         sender.channel = Mock()
         self.assertTrue(sender.is_open())
 
+    @patch('gofer.messaging.adapter.amqp.producer.Confirms')
     @patch('gofer.messaging.adapter.amqp.producer.Connection')
-    def test_open(self, connection):
+    def test_open(self, connection, confirms):
         url = 'test-url'
 
         # test
@@ -101,23 +313,32 @@ class TestSender(TestCase):
         # validation
         connection.return_value.open.assert_called_once_with()
         connection.return_value.channel.assert_called_once_with()
+        confirms.assert_called_once_with(sender.channel)
         self.assertEqual(sender.channel, connection.return_value.channel.return_value)
+        self.assertEqual(sender.confirms, confirms.return_value)
 
+    @patch('gofer.messaging.adapter.amqp.producer.Confirms')
     @patch('gofer.messaging.adapter.amqp.producer.Connection')
-    def test_repair(self, connection):
+    def test_repair(self, connection, confirms):
         url = 'test-url'
+        broken = Mock()
+        closed = []
 
         # test
         sender = Sender(url)
-        sender.close = Mock()
+        sender.confirms = broken
+        sender.close = Mock(side_effect=lambda: closed.append(sender.confirms))
         sender.repair()
 
         # validation
-        sender.close.assert_called_once_with()
-        sender.connection.close.assert_called_once_with()
-        connection.return_value.open.assert_called_once_with()
+        self.assertEqual(closed, [None])
+        self.assertFalse(broken.wait.called)
+        sender.connection.repair.assert_called_once_with()
         connection.return_value.channel.assert_called_once_with()
+        confirms.assert_called_once_with(sender.channel)
         self.assertEqual(sender.channel, connection.return_value.channel.return_value)
+        self.assertEqual(sender.confirms, confirms.return_value)
+        self.assertEqual(sender.confirms.backlog, broken.pending.return_value)
 
     @patch('gofer.messaging.adapter.amqp.producer.Connection', Mock())
     def test_open_already(self):
@@ -134,19 +355,25 @@ class TestSender(TestCase):
     def test_close(self):
         connection = Mock()
         channel = Mock()
+        confirms = Mock()
 
         channel.close.side_effect = ValueError
+        confirms.wait.side_effect = ValueError
 
         # test
         sender = Sender(None)
         sender.connection = connection
         sender.channel = channel
+        sender.confirms = confirms
         sender.is_open = Mock(return_value=True)
         sender.close()
 
         # validation
+        confirms.wait.assert_called_once_with(timeout=LINGER)
         channel.close.assert_called_once_with()
         self.assertFalse(connection.close.called)
+        self.assertEqual(sender.channel, None)
+        self.assertEqual(sender.confirms, None)
 
     @patch('gofer.messaging.adapter.amqp.producer.build_message')
     @patch('gofer.messaging.adapter.amqp.producer.Connection', Mock())
@@ -158,17 +385,52 @@ class TestSender(TestCase):
         # test
         sender = Sender('')
         sender.durable = 18
-        sender.channel = Mock()
+        sender.confirms = Mock()
         sender.send(address, content, ttl=ttl)
 
         # validation
         build.assert_called_once_with(content, ttl, sender.durable)
-        sender.channel.basic_publish.assert_called_once_with(
-            build.return_value,
-            mandatory=True,
-            exchange='',
-            routing_key='jeff')
+        sender.confirms.publish.assert_called_once_with(build.return_value, '', 'jeff')
+        sender.confirms.wait.assert_called_once_with(0)
 
+    @patch('gofer.messaging.adapter.amqp.producer.build_message')
+    @patch('gofer.messaging.adapter.amqp.producer.Connection', Mock())
+    def test_send_window(self, build):
+        sender = Sender('')
+        sender.window = 10
+        sender.confirms = Mock()
+        sender.send('jeff', 'hello')
+        sender.confirms.wait.assert_called_once_with(9)
+
+    @patch('gofer.messaging.adapter.amqp.producer.build_message')
+    @patch('gofer.messaging.adapter.amqp.producer.Connection', Mock())
+    def test_send_batch(self, build):
+        ttl = 10
+        address = 'amq.direct/bar'
+        contents = ['A', 'B']
+        messages = [Mock(), Mock()]
+        build.side_effect = messages
+
+        # test
+        sender = Sender('')
+        sender.durable = 18
+        sender.confirms = Mock()
+        sender.send_batch(address, contents, ttl=ttl)
+
+        # validation
+        self.assertEqual(
+            build.call_args_list,
+            [
+                (('A', ttl, sender.durable), {}),
+                (('B', ttl, sender.durable), {}),
+            ])
+        self.assertEqual(
+            sender.confirms.publish.call_args_list,
+            [
+                ((messages[0], 'amq.direct', 'bar'), {}),
+                ((messages[1], 'amq.direct', 'bar'), {}),
+            ])
+        sender.confirms.wait.assert_called_once_with(0)
 
     @patch('gofer.messaging.adapter.amqp.producer.build_message')
     @patch('gofer.messaging.adapter.amqp.producer.Connection', Mock())
@@ -182,13 +444,9 @@ class TestSender(TestCase):
         # test
         sender = Sender('')
         sender.durable = False
-        sender.channel = Mock()
+        sender.confirms = Mock()
         sender.send(address, content, ttl=ttl)
 
         # validation
         build.assert_called_once_with(content, ttl, sender.durable)
-        sender.channel.basic_publish.assert_called_once_with(
-            build.return_value,
-            mandatory=True,
-            exchange=exchange,
-            routing_key=key)
+        sender.confirms.publish.assert_called_once_with(build.return_value, exchange, key)
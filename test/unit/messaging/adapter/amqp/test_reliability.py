@@ -158,8 +158,7 @@ class TestEndpoint(TestCase):
         url = Mock()
         messenger = Endpoint(url)
         messenger.repair()
-        messenger.connection.close.assert_called_once_with()
-        messenger.connection.open.assert_called_once_with()
+        messenger.connection.repair.assert_called_once_with()
         self.assertEqual(messenger.channel, messenger.connection.channel.return_value)
 
     @patch('gofer.messaging.adapter.amqp.reliability.Connection', Mock())
@@ -0,0 +1,243 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch
+
+from gofer.messaging.adapter.model import NotFound, DIRECT, TOPIC
+from gofer.messaging.adapter.memory.broker import split, match
+from gofer.messaging.adapter.memory.broker import Message, Queue, Exchange, Broker
+from gofer.messaging.adapter.memory.broker import LOCALHOST
+
+
+class TestFunctions(TestCase):
+
+    def test_split(self):
+        self.assertEqual(split('q1'), ('', 'q1'))
+        self.assertEqual(split('amq.direct/q1'), ('amq.direct', 'q1'))
+
+    def test_match(self):
+        self.assertTrue(match('a.b', 'a.b'))
+        self.assertFalse(match('a.b', 'a.bc'))
+        self.assertTrue(match('a.*', 'a.b'))
+        self.assertFalse(match('a.*', 'a.b.c'))
+        self.assertTrue(match('a.#', 'a.b.c'))
+        self.assertTrue(match('#', 'a.b'))
+        self.assertTrue(match('a.#.c', 'a.c'))
+        self.assertFalse(match('a.*', 'b.c'))
+
+
+class TestMessage(TestCase):
+
+    @patch('gofer.messaging.adapter.memory.broker.time')
+    def test_init(self, _time):
+        _time.return_value = 10
+        message = Message('hello', ttl=5, durable=False)
+        self.assertEqual(message.body, 'hello')
+        self.assertFalse(message.durable)
+        self.assertEqual(message.expiration, 15)
+
+    def test_init_no_ttl(self):
+        message = Message('hello')
+        self.assertTrue(message.durable)
+        self.assertEqual(message.expiration, 0)
+        self.assertFalse(message.expired())
+
+    @patch('gofer.messaging.adapter.memory.broker.time')
+    def test_expired(self, _time):
+        _time.return_value = 10
+        message = Message('hello', ttl=5)
+        _time.return_value = 16
+        self.assertTrue(message.expired())
+
+
+class TestQueue(TestCase):
+
+    def test_init(self):
+        queue = Queue('q1', durable=False, auto_delete=True, expiration=10, exclusive=True)
+        self.assertEqual(queue.name, 'q1')
+        self.assertFalse(queue.durable)
+        self.assertTrue(queue.auto_delete)
+        self.assertEqual(queue.expiration, 10)
+        self.assertTrue(queue.exclusive)
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.readers, 0)
+
+    def test_put_get(self):
+        queue = Queue('q1')
+        m1 = Message('1')
+        m2 = Message('2')
+        queue.put(m1)
+        queue.put(m2)
+        self.assertEqual(queue.get(), m1)
+        self.assertEqual(queue.get(), m2)
+        self.assertEqual(queue.get(), None)
+
+    def test_requeue(self):
+        queue = Queue('q1')
+        m1 = Message('1')
+        m2 = Message('2')
+        queue.put(m2)
+        queue.requeue(m1)
+        self.assertEqual(queue.get(), m1)
+
+    def test_get_expired(self):
+        queue = Queue('q1')
+        m1 = Message('1', ttl=1)
+        m1.expiration = 1
+        m2 = Message('2')
+        queue.put(m1)
+        queue.put(m2)
+        self.assertEqual(queue.get(), m2)
+        self.assertEqual(len(queue), 0)
+
+    def test_get_timeout(self):
+        queue = Queue('q1')
+        self.assertEqual(queue.get(0.01), None)
+
+    def test_attach_detach(self):
+        queue = Queue('q1')
+        queue.attach()
+        queue.attach()
+        self.assertFalse(queue.detach())
+        self.assertTrue(queue.detach())
+        self.assertTrue(queue.detach())
+        self.assertEqual(queue.readers, 0)
+
+    def test_expired(self):
+        queue = Queue('q1')
+        self.assertFalse(queue.expired())
+        queue = Queue('q1', auto_delete=True, expiration=10)
+        self.assertFalse(queue.expired())
+        queue.unused -= 20
+        self.assertTrue(queue.expired())
+        queue.attach()
+        self.assertFalse(queue.expired())
+
+    def test_expired_when_unused(self):
+        queue = Queue('q1', auto_delete=True)
+        self.assertFalse(queue.expired())
+        queue.attach()
+        self.assertFalse(queue.expired())
+        queue.detach()
+        self.assertTrue(queue.expired())
+
+
+class TestExchange(TestCase):
+
+    def test_direct(self):
+        exchange = Exchange('ex')
+        self.assertEqual(exchange.policy, DIRECT)
+        exchange.bindings.add('q1')
+        self.assertEqual(exchange.route('q1'), ['q1'])
+        self.assertEqual(exchange.route('q2'), [])
+
+    def test_topic(self):
+        exchange = Exchange('ex', TOPIC)
+        exchange.bindings.update(['a.*', 'a.b', 'c'])
+        self.assertEqual(sorted(exchange.route('a.b')), ['a.*', 'a.b'])
+        self.assertEqual(exchange.route('c'), ['c'])
+        self.assertEqual(exchange.route('d'), [])
+
+
+class TestBroker(TestCase):
+
+    def test_find(self):
+        broker = Broker.find('memory+amqp://h1:1234')
+        self.assertEqual(broker.host, 'h1')
+        self.assertEqual(broker.port, 1234)
+        self.assertTrue(broker is Broker.find('memory+amqp://h1:1234'))
+        self.assertFalse(broker is Broker.find('memory+amqp://h2:1234'))
+
+    def test_find_no_host(self):
+        broker = Broker.find('memory+amqp://')
+        self.assertEqual(broker.host, LOCALHOST)
+
+    def test_init(self):
+        broker = Broker('test-init', 0)
+        self.assertEqual(broker.queues, {})
+        self.assertEqual(sorted(broker.exchanges), ['amq.direct', 'amq.topic'])
+        self.assertEqual(broker.exchanges['amq.topic'].policy, TOPIC)
+
+    def test_queue(self):
+        broker = Broker('test-queue', 0)
+        broker.declare_queue('q1', durable=False)
+        queue = broker.queue('q1')
+        self.assertEqual(queue.name, 'q1')
+        self.assertFalse(queue.durable)
+        broker.declare_queue('q1')
+        self.assertTrue(broker.queue('q1') is queue)
+        broker.delete_queue('q1')
+        self.assertRaises(NotFound, broker.queue, 'q1')
+
+    def test_exchange(self):
+        broker = Broker('test-exchange', 0)
+        broker.declare_exchange('ex', TOPIC)
+        exchange = broker.exchange('ex')
+        self.assertEqual(exchange.policy, TOPIC)
+        broker.declare_exchange('ex')
+        self.assertTrue(broker.exchange('ex') is exchange)
+        broker.delete_exchange('ex')
+        self.assertRaises(NotFound, broker.exchange, 'ex')
+
+    def test_bind(self):
+        broker = Broker('test-bind', 0)
+        broker.declare_queue('q1')
+        broker.bind('amq.direct', 'q1')
+        self.assertEqual(broker.exchanges['amq.direct'].bindings, set(['q1']))
+        self.assertRaises(NotFound, broker.bind, 'amq.direct', 'q2')
+        self.assertRaises(NotFound, broker.bind, 'ex', 'q1')
+        broker.unbind('amq.direct', 'q1')
+        self.assertEqual(broker.exchanges['amq.direct'].bindings, set())
+
+    def test_delete_queue_unbinds(self):
+        broker = Broker('test-delete-unbinds', 0)
+        broker.declare_queue('q1')
+        broker.bind('amq.direct', 'q1')
+        broker.delete_queue('q1')
+        self.assertEqual(broker.exchanges['amq.direct'].bindings, set())
+
+    def test_reap(self):
+        broker = Broker('test-reap', 0)
+        broker.declare_queue('q1', auto_delete=True)
+        broker.declare_queue('q2', auto_delete=True, expiration=10)
+        broker.declare_queue('q3')
+        broker.queues['q1'].used = True
+        broker.reap()
+        self.assertEqual(sorted(broker.queues), ['q2', 'q3'])
+
+    def test_send(self):
+        broker = Broker('test-send', 0)
+        broker.declare_queue('q1')
+        broker.declare_queue('q2')
+        broker.bind('amq.direct', 'q2')
+        m1 = Message('1')
+        m2 = Message('2')
+        broker.send('q1', m1)
+        broker.send('amq.direct/q2', m2)
+        broker.send('q3', Message('3'))
+        broker.send('amq.direct/q1', Message('4'))
+        self.assertEqual(broker.queues['q1'].get(), m1)
+        self.assertEqual(broker.queues['q2'].get(), m2)
+        self.assertEqual(len(broker.queues['q1']), 0)
+
+    def test_send_topic(self):
+        broker = Broker('test-send-topic', 0)
+        broker.declare_queue('a.*')
+        broker.bind('amq.topic', 'a.*')
+        message = Message('1')
+        broker.send('amq.topic/a.b', message)
+        self.assertEqual(broker.queues['a.*'].get(), message)
+
+    def test_send_not_found(self):
+        broker = Broker('test-send-not-found', 0)
+        self.assertRaises(NotFound, broker.send, 'ex/q1', Message('1'))
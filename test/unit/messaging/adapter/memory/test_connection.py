@@ -0,0 +1,60 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch
+
+from gofer.messaging.adapter.model import BaseConnection
+from gofer.messaging.adapter.memory.connection import Connection
+
+
+class TestConnection(TestCase):
+
+    def test_init(self):
+        url = 'memory+amqp://test-init'
+        c = Connection(url)
+        self.assertTrue(isinstance(c, BaseConnection))
+        self.assertEqual(c.url, url)
+        self.assertEqual(c.broker, None)
+
+    @patch('gofer.messaging.adapter.memory.connection.Broker')
+    def test_open(self, broker):
+        url = 'memory+amqp://test-open'
+
+        # test
+        c = Connection(url)
+        c.open()
+        c.open()
+
+        # validation
+        broker.find.assert_called_once_with(url)
+        self.assertEqual(c.broker, broker.find.return_value)
+        self.assertTrue(c.is_open())
+
+    @patch('gofer.messaging.adapter.memory.connection.Broker')
+    def test_repair(self, broker):
+        url = 'memory+amqp://test-repair'
+
+        # test
+        c = Connection(url)
+        c.open()
+        c.repair()
+
+        # validation
+        self.assertEqual(broker.find.call_count, 2)
+        self.assertTrue(c.is_open())
+
+    def test_close(self):
+        c = Connection('memory+amqp://test-close')
+        c.open()
+        c.close()
+        self.assertFalse(c.is_open())
@@ -0,0 +1,131 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+from uuid import uuid4
+
+from gofer.messaging.adapter.model import BaseReader, Message, NotFound
+from gofer.messaging.adapter.memory.consumer import Reader
+from gofer.messaging.adapter.memory.model import Queue
+from gofer.messaging.adapter.memory.broker import Broker
+from gofer.messaging.adapter.memory import broker
+
+
+class TestReader(TestCase):
+
+    def setUp(self):
+        self.url = 'memory+amqp://%s' % uuid4().hex
+        self.queue = Queue('q1')
+        self.queue.declare(self.url)
+        self.broker = Broker.find(self.url)
+
+    def tearDown(self):
+        self.broker.delete_queue('q1')
+
+    def test_init(self):
+        reader = Reader(self.queue, self.url)
+        self.assertTrue(isinstance(reader, BaseReader))
+        self.assertEqual(reader.queue, None)
+        self.assertEqual(reader.unacked, [])
+
+    def test_open(self):
+        reader = Reader(self.queue, self.url)
+        reader.open()
+        reader.open()
+        self.assertTrue(reader.is_open())
+        self.assertTrue(reader.queue is self.broker.queue('q1'))
+        self.assertEqual(reader.queue.readers, 1)
+        reader.close()
+
+    def test_open_not_found(self):
+        reader = Reader(Queue('q2'), self.url)
+        self.assertRaises(NotFound, reader.open)
+
+    def test_repair(self):
+        reader = Reader(self.queue, self.url)
+        reader.open()
+        reader.repair()
+        self.assertTrue(reader.is_open())
+        self.assertEqual(reader.queue.readers, 1)
+        reader.close()
+
+    def test_close(self):
+        reader = Reader(self.queue, self.url)
+        reader.close()
+        reader.open()
+        queue = reader.queue
+        self.broker.send('q1', broker.Message('1'))
+        self.broker.send('q1', broker.Message('2'))
+        reader.get()
+        reader.get()
+        reader.close()
+        self.assertFalse(reader.is_open())
+        self.assertEqual(reader.unacked, [])
+        self.assertEqual(queue.readers, 0)
+        self.assertEqual([m.body for m in queue.messages], ['1', '2'])
+
+    def test_close_auto_delete(self):
+        queue = Queue('q2')
+        queue.auto_delete = True
+        queue.declare(self.url)
+        reader = Reader(queue, self.url)
+        reader.open()
+        reader.close()
+        self.assertRaises(NotFound, self.broker.queue, 'q2')
+
+    def test_get(self):
+        impl = broker.Message('hello')
+        self.broker.send('q1', impl)
+        reader = Reader(self.queue, self.url)
+        reader.open()
+        message = reader.get()
+        self.assertTrue(isinstance(message, Message))
+        self.assertEqual(message.body, 'hello')
+        self.assertEqual(reader.unacked, [impl])
+        self.assertEqual(reader.get(), None)
+        reader.close()
+
+    def test_get_deleted(self):
+        reader = Reader(self.queue, self.url)
+        reader.open()
+        self.broker.delete_queue('q1')
+        self.assertRaises(NotFound, reader.get)
+
+    def test_ack(self):
+        self.broker.send('q1', broker.Message('hello'))
+        reader = Reader(self.queue, self.url)
+        reader.open()
+        message = reader.get()
+        message.ack()
+        message.ack()
+        self.assertEqual(reader.unacked, [])
+        reader.close()
+        self.assertEqual(len(self.broker.queue('q1')), 0)
+
+    def test_reject(self):
+        self.broker.send('q1', broker.Message('hello'))
+        reader = Reader(self.queue, self.url)
+        reader.open()
+        message = reader.get()
+        message.reject(True)
+        self.assertEqual(reader.unacked, [])
+        self.assertEqual(reader.get().body, 'hello')
+        reader.close()
+
+    def test_reject_discarded(self):
+        self.broker.send('q1', broker.Message('hello'))
+        reader = Reader(self.queue, self.url)
+        reader.open()
+        message = reader.get()
+        message.reject(False)
+        self.assertEqual(reader.get(), None)
+        reader.close()
+        self.assertEqual(len(self.broker.queue('q1')), 0)
@@ -0,0 +1,66 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from gofer.messaging.adapter.model import BaseExchange, BaseQueue, NotFound, TOPIC
+from gofer.messaging.adapter.memory.model import Exchange, Queue
+from gofer.messaging.adapter.memory.broker import Broker
+
+
+class TestExchange(TestCase):
+
+    def test_init(self):
+        self.assertTrue(isinstance(Exchange('ex'), BaseExchange))
+
+    def test_declare(self):
+        url = 'memory+amqp://test-exchange-declare'
+        exchange = Exchange('ex', TOPIC)
+        exchange.declare(url)
+        broker = Broker.find(url)
+        self.assertEqual(broker.exchange('ex').policy, TOPIC)
+        exchange.delete(url)
+        self.assertRaises(NotFound, broker.exchange, 'ex')
+
+    def test_bind(self):
+        url = 'memory+amqp://test-exchange-bind'
+        exchange = Exchange('ex')
+        queue = Queue('q1')
+        exchange.declare(url)
+        queue.declare(url)
+        exchange.bind(queue, url)
+        broker = Broker.find(url)
+        self.assertEqual(broker.exchange('ex').bindings, set(['q1']))
+        exchange.unbind(queue, url)
+        self.assertEqual(broker.exchange('ex').bindings, set())
+
+
+class TestQueue(TestCase):
+
+    def test_init(self):
+        self.assertTrue(isinstance(Queue('q1'), BaseQueue))
+
+    def test_declare(self):
+        url = 'memory+amqp://test-queue-declare'
+        queue = Queue('q1')
+        queue.durable = False
+        queue.auto_delete = True
+        queue.expiration = 10
+        queue.exclusive = True
+        queue.declare(url)
+        broker = Broker.find(url)
+        impl = broker.queue('q1')
+        self.assertFalse(impl.durable)
+        self.assertTrue(impl.auto_delete)
+        self.assertEqual(impl.expiration, 10)
+        self.assertTrue(impl.exclusive)
+        queue.delete(url)
+        self.assertRaises(NotFound, broker.queue, 'q1')
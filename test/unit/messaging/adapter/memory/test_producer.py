@@ -0,0 +1,55 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+from uuid import uuid4
+
+from mock import patch
+
+from gofer.messaging.adapter.model import BaseSender, NotFound
+from gofer.messaging.adapter.memory.producer import Sender
+from gofer.messaging.adapter.memory.broker import Broker
+
+
+class TestSender(TestCase):
+
+    def setUp(self):
+        self.url = 'memory+amqp://%s' % uuid4().hex
+        self.broker = Broker.find(self.url)
+        self.broker.declare_queue('q1')
+
+    def test_init(self):
+        sender = Sender(self.url)
+        self.assertTrue(isinstance(sender, BaseSender))
+        self.assertEqual(sender.url, self.url)
+
+    def test_open(self):
+        sender = Sender(self.url)
+        sender.open()
+        self.assertTrue(sender.is_open())
+        sender.repair()
+        self.assertTrue(sender.is_open())
+        sender.close()
+
+    @patch('gofer.messaging.adapter.memory.broker.time')
+    def test_send(self, _time):
+        _time.return_value = 10
+        sender = Sender(self.url)
+        sender.durable = False
+        sender.send('q1', 'hello', ttl=5)
+        message = self.broker.queue('q1').get()
+        self.assertEqual(message.body, 'hello')
+        self.assertFalse(message.durable)
+        self.assertEqual(message.expiration, 15)
+
+    def test_send_not_found(self):
+        sender = Sender(self.url)
+        self.assertRaises(NotFound, sender.send, 'ex/q1', 'hello')
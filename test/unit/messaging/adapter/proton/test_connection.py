@@ -10,15 +10,28 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 from unittest import TestCase
+from threading import Thread
 
-from mock import patch, Mock
+from mock import patch, Mock, MagicMock
 
 from gofer.devel import ipatch
 from gofer import ThreadSingleton
 from gofer.messaging.adapter.model import URL, Connector
 
 with ipatch('proton'):
-    from gofer.messaging.adapter.proton.connection import Connection
+    from gofer.messaging.adapter.proton.connection import Connection, Shared
+    from gofer.messaging.adapter.proton.connection import ConnectionLock, Processor
+
+
+MODULE = 'gofer.messaging.adapter.proton.connection'
+
+
+class Timeout(Exception):
+    pass
+
+
+class SendException(Exception):
+    pass
 
 
 class TestConnection(TestCase):
@@ -80,6 +93,8 @@ class TestConnection(TestCase):
         url = 'test-url'
         connection = Connection(url)
         self.assertEqual(connection.url, url)
+        self.assertEqual(connection._shared, Shared(url))
+        self.assertEqual(connection.lock, connection._shared.lock)
         self.assertEqual(connection._impl, None)
 
     def test_is_open(self):
@@ -88,24 +103,17 @@ class TestConnection(TestCase):
         connection._impl = Mock()
         self.assertTrue(connection.is_open())
 
-    @patch('gofer.messaging.adapter.proton.connection.Connector.find')
-    @patch('gofer.messaging.adapter.proton.connection.BlockingConnection')
-    @patch('gofer.messaging.adapter.proton.connection.Connection.ssl_domain')
-    def test_open(self, ssl_domain, blocking, find):
-        url = 'proton+amqps://localhost'
-        find.return_value = Mock(url=URL(url), heartbeat=12)
+    def test_open(self):
+        url = 'test-url'
+        connection = Connection(url)
+        connection._shared = MagicMock()
 
         # test
-        connection = Connection(url)
         connection.open()
 
         # validation
-        canonical = URL(url).canonical
-        find.assert_called_once_with(url)
-        blocking.assert_called_once_with(
-            canonical,
-            heartbeat=find.return_value.heartbeat,
-            ssl_domain=ssl_domain.return_value)
+        connection._shared.acquire.assert_called_once_with()
+        self.assertEqual(connection._impl, connection._shared.acquire.return_value)
 
     @patch('gofer.messaging.adapter.proton.connection.BlockingConnection')
     def test_open_already(self, blocking):
@@ -148,7 +156,12 @@ class TestConnection(TestCase):
 
         # validation
         connection._impl.create_receiver.assert_called_once_with(
-            address, dynamic=False, name=uuid.return_value, options=None)
+            address,
+            credit=None,
+            dynamic=False,
+            name=uuid.return_value,
+            handler=None,
+            options=None)
         self.assertEqual(receiver, connection._impl.create_receiver.return_value)
         self.assertFalse(properties.called)
 
@@ -167,22 +180,379 @@ class TestConnection(TestCase):
         # validation
         properties.assert_called_once_with({'x-opt-qd.address': address})
         connection._impl.create_receiver.assert_called_once_with(
-            None, dynamic=True, name=uuid.return_value, options=properties.return_value)
+            None,
+            credit=None,
+            dynamic=True,
+            name=uuid.return_value,
+            handler=None,
+            options=properties.return_value)
         self.assertEqual(receiver, connection._impl.create_receiver.return_value)
 
-    def test_close(self):
+    def test_wait(self):
+        condition = Mock()
+        connection = Connection('test-url')
+        connection._impl = Mock()
+
+        # test
+        connection.wait(condition, 10)
+
+        # validation
+        connection._impl.processor.wait.assert_called_once_with(condition, 10)
+
+    @patch(MODULE + '.Link')
+    @patch(MODULE + '.Delivery')
+    def test_send(self, delivery, link):
+        sender = Mock()
+        message = Mock()
+        connection = Connection('test-url')
+        connection.wait = Mock()
+        connection._shared = MagicMock()
+        _delivery = sender.link.send.return_value
+
+        # test
+        sent = connection.send(sender, message, 10)
+
+        # validation
+        sender.link.send.assert_called_once_with(message)
+        self.assertEqual(connection.wait.call_args[0][1], 10)
+        _delivery.settled = False
+        self.assertFalse(connection.wait.call_args[0][0]())
+        _delivery.settled = True
+        self.assertTrue(connection.wait.call_args[0][0]())
+        _delivery.settle.assert_called_once_with()
+        self.assertEqual(sent, _delivery)
+        self.assertEqual(connection._shared.lock.__enter__.call_count, 2)
+
+    @patch(MODULE + '.SendException', SendException)
+    @patch(MODULE + '.Link')
+    @patch(MODULE + '.Delivery')
+    def test_send_rejected(self, delivery, link):
+        sender = Mock()
+        sender.link.send.return_value.remote_state = delivery.REJECTED
+        connection = Connection('test-url')
+        connection.wait = Mock()
+
+        # test
+        self.assertRaises(SendException, connection.send, sender, Mock())
+
+    @patch(MODULE + '.Link')
+    @patch(MODULE + '.Delivery')
+    def test_send_pre_settled(self, delivery, link):
+        sender = Mock()
+        _delivery = sender.link.send.return_value
+        _delivery.link.snd_settle_mode = link.SND_SETTLED
+        connection = Connection('test-url')
+        connection.wait = Mock()
+
+        # test
+        connection.send(sender, Mock())
+
+        # validation
+        self.assertFalse(_delivery.settle.called)
+
+    def test_receive(self):
+        receiver = Mock()
+        receiver.link.credit = 0
+        connection = Connection('test-url')
+        connection.wait = Mock()
+        connection._shared = MagicMock()
+
+        # test
+        received = connection.receive(receiver, 10)
+
+        # validation
+        receiver.link.flow.assert_called_once_with(1)
+        self.assertEqual(connection.wait.call_args[0][1], 10)
+        receiver.fetcher.has_message = False
+        self.assertFalse(connection.wait.call_args[0][0]())
+        receiver.fetcher.has_message = True
+        self.assertTrue(connection.wait.call_args[0][0]())
+        receiver.fetcher.pop.assert_called_once_with()
+        self.assertEqual(received, receiver.fetcher.pop.return_value)
+        self.assertEqual(connection._shared.lock.__enter__.call_count, 2)
+
+    @patch(MODULE + '.Timeout', Timeout)
+    def test_receive_timeout(self):
+        receiver = Mock()
+        receiver.link.credit = 1
+        connection = Connection('test-url')
+        connection.wait = Mock(side_effect=Timeout)
+
+        # test
+        self.assertRaises(Timeout, connection.receive, receiver, 10)
+
+        # validation
+        self.assertFalse(receiver.link.flow.called)
+        self.assertFalse(receiver.fetcher.pop.called)
+
+    def test_repair(self):
         url = 'test-url'
         c = Connection(url)
+        c._shared = Mock()
         impl = Mock()
         c._impl = impl
-        c.close()
-        impl.close.assert_called_once_with()
-        self.assertEqual(c._impl, None)
 
-    def test_close_failed(self):
+        # test
+        c.repair()
+
+        # validation
+        c._shared.discard.assert_called_once_with(impl)
+        c._shared.acquire.assert_called_once_with()
+        self.assertEqual(c._impl, c._shared.acquire.return_value)
+
+    def test_close(self):
         url = 'test-url'
         c = Connection(url)
+        c._shared = Mock()
         impl = Mock()
-        impl.close.side_effect = ValueError
         c._impl = impl
+
+        # test
         c.close()
+
+        # validation
+        c._shared.release.assert_called_once_with(impl)
+        self.assertEqual(c._impl, None)
+
+
+class TestConnectionLock(TestCase):
+
+    def test_init(self):
+        lock = ConnectionLock()
+        self.assertEqual(lock.waiting, 0)
+        self.assertEqual(lock.interrupt, None)
+
+    def test_acquire(self):
+        lock = ConnectionLock()
+        lock.interrupt = Mock()
+
+        # test
+        with lock:
+            with lock:
+                pass
+
+        # validation
+        self.assertEqual(lock.waiting, 0)
+        self.assertFalse(lock.interrupt.called)
+
+    def test_contended(self):
+        lock = ConnectionLock()
+        lock.interrupt = Mock()
+        acquired = []
+
+        def acquire():
+            with lock:
+                acquired.append(thread)
+
+        # test
+        lock.acquire()
+        thread = Thread(target=acquire)
+        thread.start()
+        while not lock.waiting:
+            pass
+        lock.release()
+        lock.defer()
+        thread.join()
+
+        # validation
+        lock.interrupt.assert_called_once_with()
+        self.assertEqual(acquired, [thread])
+        self.assertEqual(lock.waiting, 0)
+
+    def test_defer(self):
+        lock = ConnectionLock()
+        lock.defer()
+
+
+class TestProcessor(TestCase):
+
+    def test_init(self):
+        impl = Mock()
+        lock = Mock()
+        processor = Processor(impl, lock)
+        self.assertEqual(processor.impl, impl)
+        self.assertEqual(processor.lock, lock)
+        self.assertFalse(processor.processing)
+        self.assertEqual(processor.waiting, {})
+
+    def test_wait_satisfied(self):
+        condition = Mock(return_value=True)
+        processor = Processor(Mock(), ConnectionLock())
+
+        # test
+        processor.wait(condition, 10)
+
+        # validation
+        self.assertFalse(processor.impl.wait.called)
+        self.assertFalse(processor.processing)
+
+    @patch(MODULE + '.time', Mock(return_value=0))
+    def test_wait(self):
+        condition = Mock(side_effect=[False, True])
+        processor = Processor(Mock(), ConnectionLock())
+
+        # test
+        processor.wait(condition, 10)
+
+        # validation
+        calls = processor.impl.wait.call_args_list
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][1], dict(timeout=10))
+        self.assertFalse(processor.processing)
+        self.assertEqual(processor.waiting, {})
+
+    def test_wait_no_timeout(self):
+        condition = Mock(side_effect=[False, True])
+        processor = Processor(Mock(), ConnectionLock())
+
+        # test
+        processor.wait(condition)
+
+        # validation
+        self.assertEqual(processor.impl.wait.call_args[1], dict(timeout=None))
+
+    def test_wait_deferred(self):
+        condition = Mock(side_effect=[False, False, True])
+        processor = Processor(Mock(), ConnectionLock())
+        processor.lock.defer = Mock()
+
+        # test
+        processor.wait(condition)
+
+        # validation
+        self.assertEqual(processor.impl.wait.call_count, 2)
+        processor.lock.defer.assert_called_once_with()
+
+    @patch(MODULE + '.Timeout', Timeout)
+    def test_wait_timeout(self):
+        condition = Mock(return_value=False)
+        processor = Processor(Mock(), ConnectionLock())
+        processor.impl.wait.side_effect = Timeout
+
+        # test
+        self.assertRaises(Timeout, processor.wait, condition, 10)
+
+        # validation
+        self.assertFalse(processor.processing)
+
+    @patch(MODULE + '.Timeout', Timeout)
+    def test_wait_expired(self):
+        condition = Mock(return_value=False)
+        processor = Processor(Mock(), ConnectionLock())
+
+        # test
+        self.assertRaises(Timeout, processor.wait, condition, 0)
+
+        # validation
+        self.assertFalse(processor.impl.wait.called)
+
+    def test_done(self):
+        condition = Mock(return_value=False)
+        processor = Processor(Mock(), ConnectionLock())
+        processor.impl.wait.side_effect = [None, ValueError]
+
+        # test
+        self.assertRaises(ValueError, processor.wait, condition)
+
+        # validation
+        done = processor.impl.wait.call_args[0][0]
+        self.assertFalse(done())
+        processor.lock.waiting = 1
+        self.assertTrue(done())
+        processor.lock.waiting = 0
+        processor.waiting[Mock()] = Mock(return_value=True)
+        self.assertTrue(done())
+
+    def test_notify(self):
+        event = Mock()
+        pending = Mock()
+        processor = Processor(Mock(), ConnectionLock())
+        processor.waiting[event] = Mock(return_value=True)
+        processor.waiting[pending] = Mock(return_value=False)
+
+        # test
+        processor._notify()
+
+        # validation
+        event.notify.assert_called_once_with()
+        self.assertFalse(pending.notify.called)
+        self.assertEqual(processor.waiting.keys(), [pending])
+
+    def test_notified(self):
+        calls = []
+        messages = []
+        processor = Processor(Mock(), ConnectionLock())
+
+        def process(done, timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                # until the second thread wants the lock.
+                while not done():
+                    pass
+            else:
+                messages.append(len(calls))
+
+        def wait(n):
+            processor.wait(lambda: n in messages)
+
+        processor.impl.wait.side_effect = process
+
+        # test
+        first = Thread(target=wait, args=(3,))
+        second = Thread(target=wait, args=(2,))
+        first.start()
+        while not calls:
+            pass
+        second.start()
+        first.join(10)
+        second.join(10)
+
+        # validation
+        self.assertFalse(first.isAlive())
+        self.assertFalse(second.isAlive())
+        self.assertEqual(messages, [2, 3])
+        self.assertFalse(processor.processing)
+        self.assertEqual(processor.waiting, {})
+
+
+class TestShared(TestCase):
+
+    def test_init(self):
+        shared = Shared('test-init')
+        self.assertTrue(isinstance(shared.lock, ConnectionLock))
+
+    @patch('gofer.messaging.adapter.proton.connection.Connector.find')
+    @patch('gofer.messaging.adapter.proton.connection.BlockingConnection')
+    @patch('gofer.messaging.adapter.proton.connection.Connection.ssl_domain')
+    def test_connect(self, ssl_domain, blocking, find):
+        url = 'proton+amqps://localhost'
+        find.return_value = Mock(url=URL(url), heartbeat=12)
+
+        # test
+        shared = Shared(url)
+        impl = shared.connect()
+
+        # validation
+        canonical = URL(url).canonical
+        find.assert_called_once_with(url)
+        blocking.assert_called_once_with(
+            canonical,
+            heartbeat=find.return_value.heartbeat,
+            ssl_domain=ssl_domain.return_value)
+        self.assertEqual(impl, blocking.return_value)
+        self.assertTrue(isinstance(impl.processor, Processor))
+        self.assertEqual(impl.processor.impl, impl)
+        self.assertEqual(impl.processor.lock, shared.lock)
+        self.assertEqual(shared.lock.interrupt, impl.container.wakeup)
+
+    def test_disconnect(self):
+        impl = Mock()
+        shared = Shared('test-url')
+        shared.disconnect(impl)
+        impl.close.assert_called_once_with()
+
+    def test_disconnect_failed(self):
+        impl = Mock()
+        impl.close.side_effect = ValueError
+        shared = Shared('test-url')
+        shared.disconnect(impl)
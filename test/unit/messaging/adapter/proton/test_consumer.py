@@ -9,16 +9,19 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from collections import deque
+from itertools import count
 from unittest import TestCase
 
-from mock import Mock, patch
+from mock import Mock, MagicMock, patch
 
 from gofer.devel import ipatch
 
 from gofer.messaging.adapter.model import Message
 
 with ipatch('proton'):
-    from gofer.messaging.adapter.proton.consumer import Reader, BaseReader
+    from gofer.messaging.adapter.proton.consumer import Reader, BaseReader, Inbox
+    from gofer.messaging.adapter.proton.consumer import NO_DELAY
 
 
 class Timeout(Exception):
@@ -35,6 +38,36 @@ class LinkException(Exception):
     pass
 
 
+class TestInbox(TestCase):
+
+    def test_init(self):
+        keys = Mock()
+        inbox = Inbox(keys)
+        self.assertEqual(inbox.keys, keys)
+        self.assertEqual(inbox.messages, deque())
+        self.assertEqual(inbox.deliveries, {})
+
+    def test_message(self):
+        events = [
+            Mock(delivery=Mock(settled=False)),
+            Mock(delivery=Mock(settled=True)),
+        ]
+
+        # test
+        inbox = Inbox(count(1))
+        for event in events:
+            inbox.on_message(event)
+
+        # validation
+        self.assertEqual(
+            list(inbox.messages),
+            [
+                (events[0].message, 1),
+                (events[1].message, 2),
+            ])
+        self.assertEqual(inbox.deliveries, {1: events[0].delivery})
+
+
 class TestReader(TestCase):
 
     @patch('gofer.messaging.adapter.proton.consumer.Connection')
@@ -52,8 +85,10 @@ class TestReader(TestCase):
         self.assertEqual(reader.connection, connection.return_value)
         self.assertEqual(reader.node, node)
         self.assertEqual(reader.receiver, None)
+        self.assertEqual(reader.inbox, None)
+        self.assertEqual(next(reader.keys), 1)
 
-    @patch('gofer.messaging.adapter.proton.consumer.Connection', Mock())
+    @patch('gofer.messaging.adapter.proton.consumer.Connection', MagicMock())
     def test_is_open(self):
         url = 'test-url'
         node = Mock(address='test')
@@ -64,40 +99,104 @@ class TestReader(TestCase):
         reader.receiver = Mock()
         self.assertTrue(reader.is_open())
 
+    @patch('gofer.messaging.adapter.proton.consumer.Inbox')
     @patch('gofer.messaging.adapter.proton.consumer.Connection')
-    def test_open(self, connection):
+    def test_open(self, connection, inbox):
         url = 'test-url'
         node = Mock(address='test')
 
         # test
         reader = Reader(node, url)
         reader.is_open = Mock(return_value=False)
+        reader.replenish = Mock()
         reader.open()
 
         # validation
         connection.return_value.open.assert_called_once_with()
-        connection.return_value.receiver.assert_called_once_with(node.address)
+        connection.return_value.receiver.assert_called_once_with(
+            node.address, handler=inbox.return_value)
+        inbox.assert_called_once_with(reader.keys)
         self.assertEqual(reader.receiver, reader.connection.receiver.return_value)
+        self.assertEqual(reader.inbox, inbox.return_value)
+        reader.replenish.assert_called_once_with()
 
+    @patch('gofer.messaging.adapter.proton.consumer.Inbox')
     @patch('gofer.messaging.adapter.proton.consumer.Connection')
-    def test_repair(self, connection):
+    def test_repair(self, connection, inbox):
         url = 'test-url'
         node = Mock(address='test')
 
         # test
         reader = Reader(node, url)
         reader.close = Mock()
+        reader.replenish = Mock()
 
         reader.repair()
 
         # validation
         reader.close.assert_called_once_with()
-        reader.connection.close.assert_called_once_with()
-        connection.return_value.open.assert_called_once_with()
-        connection.return_value.receiver.assert_called_once_with(node.address)
+        reader.connection.repair.assert_called_once_with()
+        connection.return_value.receiver.assert_called_once_with(
+            node.address, handler=inbox.return_value)
+        inbox.assert_called_once_with(reader.keys)
         self.assertEqual(reader.receiver, reader.connection.receiver.return_value)
+        self.assertEqual(reader.inbox, inbox.return_value)
+        reader.replenish.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.proton.consumer.Connection')
+    def test_open_prefetch(self, connection):
+        node = Mock(address='test')
+        receiver = connection.return_value.receiver.return_value
+        receiver.link.credit = 1
+
+        # test
+        reader = Reader(node, 'test-url')
+        reader.prefetch = 10
+        reader.open()
+
+        # validation
+        receiver.link.flow.assert_called_once_with(9)
+
+    def test_flow(self):
+        reader = Reader(Mock(), '')
+        reader.replenish = Mock()
+        reader.flow(10)
+        self.assertEqual(reader.prefetch, 10)
+        reader.replenish.assert_called_once_with()
+
+    def test_replenish(self):
+        receiver = Mock()
+        receiver.link.credit = 4
+
+        # test
+        reader = Reader(Mock(), '')
+        reader.receiver = receiver
+        reader.inbox = Inbox(count(1))
+        reader.inbox.messages.extend([1, 2])
+        reader.prefetch = 10
+        reader.replenish()
+        reader.prefetch = 2
+        reader.replenish()
+
+        # validation
+        receiver.link.flow.assert_called_once_with(4)
+
+    def test_replenish_no_prefetch(self):
+        receiver = Mock()
+        receiver.link.credit = 0
+
+        # test
+        reader = Reader(Mock(), '')
+        reader.receiver = receiver
+        reader.inbox = Inbox(count(1))
+        reader.replenish()
+        receiver.link.credit = 1
+        reader.replenish()
+
+        # validation
+        receiver.link.flow.assert_called_once_with(1)
 
-    @patch('gofer.messaging.adapter.proton.consumer.Connection', Mock())
+    @patch('gofer.messaging.adapter.proton.consumer.Connection', MagicMock())
     def test_open_already(self):
         url = 'test-url'
         node = Mock(address='test')
@@ -111,7 +210,7 @@ class TestReader(TestCase):
         self.assertFalse(reader.connection.open.called)
 
     def test_close(self):
-        connection = Mock()
+        connection = MagicMock()
         receiver = Mock()
         receiver.close.side_effect = KeyError
         node = Mock(address='test')
@@ -120,78 +219,159 @@ class TestReader(TestCase):
         reader = Reader(node, '')
         reader.connection = connection
         reader.receiver = receiver
+        reader.inbox = Inbox(count(1))
         reader.is_open = Mock(return_value=True)
         reader.close()
 
         # validation
         receiver.close.assert_called_once_with()
         self.assertFalse(connection.close.called)
+        self.assertEqual(reader.inbox, None)
+
+    def reader(self):
+        reader = Reader(Mock(address='test'), url='')
+        reader.connection = MagicMock()
+        reader.receiver = Mock()
+        reader.receiver.link.credit = 1
+        reader.inbox = Inbox(count(1))
+        return reader
 
     def test_get(self):
-        node = Mock(address='test')
         received = Mock(body='<body/>')
-        url = 'test-url'
 
         # test
-        reader = Reader(node, url=url)
-        reader.receiver = Mock()
-        reader.receiver.receive.return_value = received
+        reader = self.reader()
+        reader.connection.wait.side_effect = \
+            lambda *unused: reader.inbox.messages.append((received, 18))
         message = reader.get(10)
 
         # validation
-        reader.receiver.receive.assert_called_once_with(10)
+        self.assertEqual(reader.connection.wait.call_args[0][1], 10)
         self.assertTrue(isinstance(message, Message))
         self.assertEqual(message._reader, reader)
-        self.assertEqual(message._impl, received)
+        self.assertEqual(message._impl, 18)
         self.assertEqual(message._body, received.body)
+        self.assertEqual(len(reader.inbox.messages), 0)
+
+    def test_get_queued(self):
+        received = Mock(body='<body/>')
+
+        # test
+        reader = self.reader()
+        reader.inbox.messages.append((received, 18))
+        message = reader.get(10)
+
+        # validation
+        self.assertFalse(reader.connection.wait.called)
+        self.assertEqual(message._impl, 18)
 
     @patch('gofer.messaging.adapter.proton.consumer.Timeout', Timeout)
-    def test_get_empty(self):
-        node = Mock(address='test')
-        url = 'test-url'
+    @patch('gofer.messaging.adapter.reliability.time')
+    def test_get_empty(self, time):
+        time.side_effect = [0, 10]
 
         # test
-        reader = Reader(node, url=url)
-        reader.receiver = Mock()
-        reader.receiver.receive.side_effect = Timeout
+        reader = self.reader()
+        reader.connection.wait.side_effect = Timeout
         message = reader.get(10)
 
         # validation
-        reader.receiver.receive.assert_called_once_with(10)
+        self.assertEqual(reader.connection.wait.call_count, 1)
         self.assertEqual(message, None)
 
-    def test_ack(self):
-        node = Mock(address='test')
-        url = 'test-url'
+    @patch('gofer.messaging.adapter.proton.consumer.Timeout', Timeout)
+    @patch('gofer.messaging.adapter.reliability.time')
+    def test_get_retried(self, time):
+        received = Mock(body='<body/>')
+        time.side_effect = [0, 1, 2]
 
         # test
-        reader = Reader(node, url=url)
-        reader.receiver = Mock()
-        reader.ack(None)
+        reader = self.reader()
+
+        def wait(condition, timeout):
+            if reader.connection.wait.call_count < 3:
+                raise Timeout()
+            reader.inbox.messages.append((received, 18))
+
+        reader.connection.wait.side_effect = wait
+        message = reader.get(10)
 
         # validation
-        reader.receiver.accept.assert_called_once_with()
+        self.assertEqual([c[0][1] for c in reader.connection.wait.call_args_list], [10, 9, 8])
+        self.assertEqual(message._impl, 18)
 
-    def test_reject(self):
-        node = Mock(address='test')
-        url = 'test-url'
+    def test_get_no_delay(self):
+        received = Mock(body='<body/>')
 
         # test
-        reader = Reader(node, url=url)
-        reader.receiver = Mock()
-        reader.reject(None, requeue=False)
+        reader = self.reader()
+        reader.connection.wait.side_effect = \
+            lambda *unused: reader.inbox.messages.append((received, 18))
+        reader.get()
 
         # validation
-        reader.receiver.reject.assert_called_once_with()
+        self.assertEqual(reader.connection.wait.call_args[0][1], NO_DELAY)
 
-    def test_reject_queued(self):
-        node = Mock(address='test')
-        url = 'test-url'
+    def test_settle(self):
+        delivery = Mock()
+        state = Mock()
 
         # test
-        reader = Reader(node, url=url)
-        reader.receiver = Mock()
-        reader.reject(None, requeue=True)
+        reader = Reader(Mock(), url='')
+        reader.inbox = Inbox(count(1))
+        reader.inbox.deliveries[18] = delivery
+        reader.settle(18, state)
+        reader.settle(18, state)
+
+        # validation
+        delivery.update.assert_called_once_with(state)
+        delivery.settle.assert_called_once_with()
+        self.assertEqual(reader.inbox.deliveries, {})
+
+    @patch('gofer.messaging.adapter.proton.consumer.Delivery')
+    def test_ack(self, delivery):
+        # test
+        reader = Reader(Mock(), url='')
+        reader.settle = Mock()
+        reader.ack(18)
+
+        # validation
+        reader.settle.assert_called_once_with(18, delivery.ACCEPTED)
+
+    @patch('gofer.messaging.adapter.proton.consumer.Delivery')
+    def test_ack_batch(self, delivery):
+        deliveries = [Mock(), Mock(), Mock()]
+
+        # test
+        reader = Reader(Mock(), url='')
+        reader.inbox = Inbox(count(1))
+        for key, d in enumerate(deliveries):
+            reader.inbox.deliveries[key] = d
+        reader.ack_batch([0, 1])
+
+        # validation
+        for d in deliveries[:2]:
+            d.update.assert_called_once_with(delivery.ACCEPTED)
+            d.settle.assert_called_once_with()
+        self.assertFalse(deliveries[2].settle.called)
+        self.assertEqual(reader.inbox.deliveries, {2: deliveries[2]})
+
+    @patch('gofer.messaging.adapter.proton.consumer.Delivery')
+    def test_reject(self, delivery):
+        # test
+        reader = Reader(Mock(), url='')
+        reader.settle = Mock()
+        reader.reject(18, requeue=False)
+
+        # validation
+        reader.settle.assert_called_once_with(18, delivery.REJECTED)
+
+    @patch('gofer.messaging.adapter.proton.consumer.Delivery')
+    def test_reject_queued(self, delivery):
+        # test
+        reader = Reader(Mock(), url='')
+        reader.settle = Mock()
+        reader.reject(18, requeue=True)
 
         # validation
-        reader.receiver.release.assert_called_once_with()
+        reader.settle.assert_called_once_with(18, delivery.RELEASED)
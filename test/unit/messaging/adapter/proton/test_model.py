@@ -11,17 +11,23 @@
 
 from unittest import TestCase
 
-from mock import patch, Mock
+from mock import patch, Mock, MagicMock
 
 from gofer.devel import ipatch
+from gofer.messaging.adapter.model import Aborted
 
 with ipatch('proton'):
     from gofer.messaging.adapter.proton import model
-    from gofer.messaging.adapter.proton.model import Error, Method
+    from gofer.messaging.adapter.proton.model import Error, Method, Session
+    from gofer.messaging.adapter.proton.model import ManagementSession
     from gofer.messaging.adapter.proton.model import Exchange, BaseExchange
     from gofer.messaging.adapter.proton.model import Queue, BaseQueue
 
 
+class Timeout(Exception):
+    pass
+
+
 class TestError(TestCase):
 
     def test_init(self):
@@ -32,22 +38,136 @@ class TestError(TestCase):
         self.assertEqual(error.args[0], description)
 
 
-class TestMethod(TestCase):
+class TestSession(TestCase):
 
     @patch('gofer.messaging.adapter.proton.model.Connection')
     def test_init(self, _connection):
+        url = 'proton-session-init'
+        session = Session(url)
+        _connection.assert_called_once_with(url)
+        self.assertTrue(isinstance(session, ManagementSession))
+        self.assertEqual(session.url, url)
+        self.assertEqual(session.connection, _connection.return_value)
+        self.assertEqual(session.sender, None)
+        self.assertEqual(session.receiver, None)
+        self.assertTrue(Session(url) is session)
+
+    @patch('gofer.messaging.adapter.proton.model.Connection')
+    def test_open(self, _connection):
+        url = 'proton-session-open'
+        connection = MagicMock()
+        _connection.return_value = connection
+        sender = Mock()
+        receiver = Mock()
+        connection.receiver.return_value = receiver
+        connection.sender.return_value = sender
+
+        # test
+        session = Session(url)
+        session.open()
+        session.open()
+
+        # validation
+        connection.open.assert_called_once_with()
+        connection.sender.assert_called_once_with(model.ADDRESS)
+        connection.receiver.assert_called_once_with(
+            model.ADDRESS, dynamic=True, credit=model.CREDIT)
+        self.assertEqual(session.sender, sender)
+        self.assertEqual(session.receiver, receiver)
+
+    @patch('gofer.messaging.adapter.proton.model.Connection')
+    def test_repair(self, _connection):
+        url = 'proton-session-repair'
+        connection = MagicMock()
+        _connection.return_value = connection
+        sender = Mock()
+        receiver = Mock()
+        connection.receiver.return_value = receiver
+        connection.sender.return_value = sender
+
+        # test
+        session = Session(url)
+        session.close = Mock()
+        session.repair()
+
+        # validation
+        session.close.assert_called_once_with()
+        connection.repair.assert_called_once_with()
+        connection.sender.assert_called_once_with(model.ADDRESS)
+        connection.receiver.assert_called_once_with(
+            model.ADDRESS, dynamic=True, credit=model.CREDIT)
+        self.assertEqual(session.sender, sender)
+        self.assertEqual(session.receiver, receiver)
+        self.assertEqual(session.generation, 1)
+
+    @patch('gofer.messaging.adapter.proton.model.Connection', MagicMock())
+    def test_close(self):
+        sender = Mock()
+        receiver = Mock()
+        session = Session('proton-session-close')
+        session.sender = sender
+        session.receiver = receiver
+
+        sender.close.side_effect = ValueError
+        receiver.close.side_effect = ValueError
+
+        # test
+        session.close()
+
+        # validation
+        receiver.close.assert_called_once_with()
+        sender.close.assert_called_once_with()
+        self.assertFalse(session.is_open())
+
+    @patch('gofer.messaging.adapter.proton.model.Connection', MagicMock())
+    def test_send(self):
+        request = Mock()
+        session = Session('proton-session-send')
+        session.connection = MagicMock()
+        session.sender = Mock()
+        session.receiver = Mock()
+        session.send(request)
+        self.assertEqual(request.reply_to, session.receiver.remote_source.address)
+        session.connection.send.assert_called_once_with(session.sender, request)
+        self.assertFalse(session.sender.send.called)
+
+    @patch('gofer.messaging.adapter.proton.model.Connection', MagicMock())
+    def test_fetch(self):
+        session = Session('proton-session-fetch')
+        session.connection = MagicMock()
+        session.receiver = Mock()
+        reply = session.fetch(10)
+        session.connection.receive.assert_called_once_with(session.receiver, 10)
+        session.receiver.accept.assert_called_once_with()
+        self.assertEqual(reply, session.connection.receive.return_value)
+
+    @patch('gofer.messaging.adapter.proton.model.Timeout', Timeout)
+    @patch('gofer.messaging.adapter.proton.model.Connection', MagicMock())
+    def test_fetch_timeout(self):
+        session = Session('proton-session-fetch-timeout')
+        session.connection = MagicMock()
+        session.receiver = Mock()
+        session.connection.receive.side_effect = Timeout
+        reply = session.fetch(10)
+        self.assertEqual(reply, None)
+        self.assertFalse(session.receiver.accept.called)
+
+
+class TestMethod(TestCase):
+
+    @patch('gofer.messaging.adapter.proton.model.Session')
+    def test_init(self, _session):
         url = 'test-url'
         name = model.CREATE
         arguments = {'a': 1}
         method = Method(url, name, arguments)
-        _connection.assert_called_once_with(url)
+        _session.assert_called_once_with(url)
         self.assertEqual(method.url, url)
         self.assertEqual(method.name, name)
         self.assertEqual(method.arguments, arguments)
-        self.assertEqual(method.connection, _connection.return_value)
-        self.assertEqual(method.sender, None)
-        self.assertEqual(method.receiver, None)
+        self.assertEqual(method.session, _session.return_value)
 
+    @patch('gofer.messaging.adapter.proton.model.Session', Mock())
     def test_body(self):
         name = model.CREATE
         arguments = {'a': 1}
@@ -60,6 +180,7 @@ class TestMethod(TestCase):
                 '_arguments': arguments
             })
 
+    @patch('gofer.messaging.adapter.proton.model.Session', Mock())
     def test_properties(self):
         method = Method('', model.CREATE, {})
         self.assertEqual(
@@ -70,13 +191,7 @@ class TestMethod(TestCase):
                 'method': 'request'
             })
 
-    def test_send(self):
-        request = Mock()
-        method = Method('', '', {})
-        method.sender = Mock()
-        method.send(request)
-        method.sender.send.assert_called_with(request)
-
+    @patch('gofer.messaging.adapter.proton.model.Session', Mock())
     def test_reply_succeeded(self):
         body = ''
         properties = {
@@ -86,6 +201,7 @@ class TestMethod(TestCase):
         method = Method('', '', {})
         method.on_reply(reply)
 
+    @patch('gofer.messaging.adapter.proton.model.Session', Mock())
     def test_reply_failed(self):
         values = {
             'error_code': 18,
@@ -99,6 +215,7 @@ class TestMethod(TestCase):
         method = Method('', '', {})
         self.assertRaises(Error, method.on_reply, reply)
 
+    @patch('gofer.messaging.adapter.proton.model.Session', Mock())
     def test_reply_already_exists(self):
         values = {
             'error_code': model.EEXIST,
@@ -112,130 +229,65 @@ class TestMethod(TestCase):
         method = Method('', '', {})
         method.on_reply(reply)
 
-    @patch('gofer.messaging.adapter.proton.model.uuid4')
-    @patch('gofer.messaging.adapter.proton.model.Connection')
-    def test_open(self, _connection, uuid):
-        url = 'url-test'
-        uuid.return_value = '5138'
-        connection = Mock()
-        _connection.return_value = connection
-        sender = Mock()
-        sender.close.side_effect = ValueError
-        receiver = Mock()
-        receiver.close.side_effect = ValueError
-        connection.receiver.return_value = receiver
-        connection.sender.return_value = sender
-
-        # test
-        method = Method(url, '', {})
-        method.open()
-
-        # validation
-        _connection.assert_called_once_with(url)
-        connection.open.assert_called_once_with()
-        connection.sender.assert_called_once_with(model.ADDRESS)
-        connection.receiver.assert_called_once_with(model.ADDRESS, dynamic=True)
-        self.assertEqual(method.connection, connection)
-        self.assertEqual(method.sender, sender)
-        self.assertEqual(method.receiver, receiver)
-
-    @patch('gofer.messaging.adapter.proton.model.Connection', Mock())
-    def test_open_already(self):
-        method = Method('', '', {})
-        method.is_open = Mock(return_value=True)
-        method.open()
-        self.assertFalse(method.connection.open.called)
-
-    @patch('gofer.messaging.adapter.proton.model.uuid4')
-    @patch('gofer.messaging.adapter.proton.model.Connection')
-    def test_repair(self, _connection, uuid):
-        url = 'url-test'
-        uuid.return_value = '5138'
-        connection = Mock()
-        _connection.return_value = connection
-        sender = Mock()
-        sender.close.side_effect = ValueError
-        receiver = Mock()
-        receiver.close.side_effect = ValueError
-        connection.receiver.return_value = receiver
-        connection.sender.return_value = sender
-
-        # test
-        method = Method(url, '', {})
-        method.close = Mock()
-        method.repair()
-
-        # validation
-        method.close.assert_called_once_with()
-        connection.close.assert_called_once_with()
-        connection.open.assert_called_once_with()
-        connection.sender.assert_called_once_with(model.ADDRESS)
-        connection.receiver.assert_called_once_with(model.ADDRESS, dynamic=True)
-        self.assertEqual(method.connection, connection)
-        self.assertEqual(method.sender, sender)
-        self.assertEqual(method.receiver, receiver)
-
-    def test_close(self):
-        connection = Mock()
-        sender = Mock()
-        receiver = Mock()
-        method = Method('', '', {})
-        method.connection = connection
-        method.sender = sender
-        method.receiver = receiver
-
-        sender.close.side_effect = ValueError
-        receiver.close.side_effect = ValueError
-
-        # test
-        method.close()
-
-        # validation
-        receiver.close.assert_called_once_with()
-        sender.close.assert_called_once_with()
+    @patch('gofer.messaging.adapter.proton.model.Session', Mock())
+    def test_reply_resent_delete_not_found(self):
+        values = {
+            'error_code': 18,
+            'error_text': 'not-found: Delete failed. No such queue: q1'
+        }
+        body = {'_values': values}
+        properties = {
+            'qmf.opcode': '_exception'
+        }
+        reply = Mock(body=body, properties=properties)
+        # resent
+        method = Method('', model.DELETE, {})
+        method.on_reply(reply, True)
+        # not resent
+        self.assertRaises(Error, method.on_reply, reply)
+        # not delete
+        method = Method('', model.CREATE, {})
+        self.assertRaises(Error, method.on_reply, reply, True)
 
     @patch('gofer.messaging.adapter.proton.model.uuid4')
     @patch('gofer.messaging.adapter.proton.model.Message')
-    @patch('gofer.messaging.adapter.proton.model.Connection')
-    def test_call(self, _connection, message, uuid):
+    @patch('gofer.messaging.adapter.proton.model.Session')
+    def test_call(self, _session, message, uuid):
         url = 'url-test'
         name = model.CREATE
         arguments = {'a': 1}
         uuid.return_value = '5138'
-        connection = Mock()
-        _connection.return_value = connection
-        sender = Mock()
-        sender.close.side_effect = ValueError
-        receiver = Mock()
-        receiver.close.side_effect = ValueError
-        connection.receiver.return_value = receiver
-        connection.sender.return_value = sender
+        session = _session.return_value
+        session.request.return_value = (Mock(), False)
 
         # test
         method = Method(url, name, arguments)
-        method.send = Mock()
         method.on_reply = Mock()
         method()
 
         # validation
-        _connection.assert_called_once_with(url)
-        connection.open.assert_called_once_with()
-
-        connection.sender.assert_called_once_with(model.ADDRESS)
-        connection.receiver.assert_called_once_with(model.ADDRESS, dynamic=True)
-
         message.assert_called_once_with(
             body=method.body,
-            reply_to=receiver.remote_source.address,
             properties=method.properties,
             correlation_id=str(uuid.return_value),
             subject=model.SUBJECT
         )
+        session.request.assert_called_once_with(
+            message.return_value, str(uuid.return_value))
+        method.on_reply.assert_called_once_with(session.request.return_value[0], False)
 
-        method.send.assert_called_once_with(message.return_value)
-        method.on_reply.assert_called_once_with(receiver.receive.return_value)
-        sender.close.assert_called_once_with()
-        receiver.close.assert_called_once_with()
+    @patch('gofer.messaging.adapter.proton.model.Session')
+    def test_call_aborted(self, _session):
+        session = _session.return_value
+        session.request.side_effect = Aborted
+
+        # test
+        method = Method('url-test', model.CREATE, {})
+        method.on_reply = Mock()
+        self.assertRaises(Aborted, method)
+
+        # validation
+        self.assertFalse(method.on_reply.called)
 
 
 class TestExchange(TestCase):
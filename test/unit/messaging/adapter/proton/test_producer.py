@@ -12,12 +12,13 @@
 from unittest import TestCase
 
 
-from mock import Mock, patch
+from mock import Mock, MagicMock, patch
 
 from gofer.devel import ipatch
 
 with ipatch('proton'):
     from gofer.messaging.adapter.proton.producer import BaseSender, Sender, build_message
+    from gofer.messaging.adapter.proton.producer import Links, LINKS, IDLE
 
 
 class TestBuilder(TestCase):
@@ -41,6 +42,76 @@ class TestBuilder(TestCase):
         self.assertEqual(m, message.return_value)
 
 
+class TestLinks(TestCase):
+
+    def test_init(self):
+        links = Links()
+        self.assertEqual(links.size, LINKS)
+        self.assertEqual(links.idle, IDLE)
+        self.assertEqual(len(links), 0)
+
+    def test_find(self):
+        link = Mock()
+        links = Links()
+        links.add('q1', link)
+        self.assertEqual(links.find('q1'), link)
+        self.assertEqual(links.find('q2'), None)
+        self.assertFalse(link.close.called)
+
+    def test_add_replaced(self):
+        link = Mock()
+        links = Links()
+        links.add('q1', link)
+        links.add('q1', Mock())
+        link.close.assert_called_once_with()
+        self.assertEqual(len(links), 1)
+
+    def test_evict(self):
+        cached = [Mock(), Mock(), Mock()]
+        links = Links(size=2)
+        links.add('q0', cached[0])
+        links.add('q1', cached[1])
+        links.find('q0')
+        links.add('q2', cached[2])
+        self.assertEqual(len(links), 2)
+        cached[1].close.assert_called_once_with()
+        self.assertFalse(cached[0].close.called)
+        self.assertEqual(list(links.order), ['q0', 'q2'])
+        self.assertEqual(links.find('q1'), None)
+
+    @patch('gofer.messaging.adapter.proton.producer.time')
+    def test_reap(self, time):
+        cached = [Mock(), Mock()]
+        time.side_effect = [0, 50, 100]
+        links = Links(idle=60)
+        links.add('q0', cached[0])
+        links.add('q1', cached[1])
+        links.reap()
+        cached[0].close.assert_called_once_with()
+        self.assertFalse(cached[1].close.called)
+        self.assertEqual(list(links.links.keys()), ['q1'])
+
+    def test_discard(self):
+        link = Mock()
+        link.close.side_effect = ValueError
+        links = Links()
+        links.add('q1', link)
+        links.discard('q1')
+        links.discard('q1')
+        link.close.assert_called_once_with()
+        self.assertEqual(len(links), 0)
+
+    def test_clear(self):
+        cached = [Mock(), Mock()]
+        links = Links()
+        links.add('q0', cached[0])
+        links.add('q1', cached[1])
+        links.clear()
+        self.assertEqual(len(links), 0)
+        for link in cached:
+            link.close.assert_called_once_with()
+
+
 class TestSender(TestCase):
 
     @patch('gofer.messaging.adapter.proton.producer.Connection')
@@ -55,17 +126,18 @@ class TestSender(TestCase):
         self.assertTrue(isinstance(sender, BaseSender))
         self.assertEqual(sender.url, url)
         self.assertEqual(sender.connection, connection.return_value)
+        self.assertTrue(isinstance(sender.links, Links))
 
-    @patch('gofer.messaging.adapter.proton.producer.Connection', Mock())
+    @patch('gofer.messaging.adapter.proton.producer.Connection', MagicMock())
     def test_is_open(self):
         url = 'test-url'
         sender = Sender(url)
-        sender.connection = Mock()
+        sender.connection = MagicMock()
         sender.connection.is_open.return_value = False
         # closed
         self.assertFalse(sender.is_open())
         # open
-        sender.connection = Mock()
+        sender.connection = MagicMock()
         sender.connection.is_open.return_value = True
         self.assertTrue(sender.is_open())
 
@@ -91,11 +163,10 @@ class TestSender(TestCase):
         sender.repair()
 
         # validation
-        sender.connection.close.assert_called_once_with()
         sender.close.assert_called_once_with()
-        connection.return_value.open.assert_called_once_with()
+        sender.connection.repair.assert_called_once_with()
 
-    @patch('gofer.messaging.adapter.proton.producer.Connection', Mock())
+    @patch('gofer.messaging.adapter.proton.producer.Connection', MagicMock())
     def test_open_already(self):
         url = 'test-url'
 
@@ -108,20 +179,22 @@ class TestSender(TestCase):
         self.assertFalse(sender.connection.open.called)
 
     def test_close(self):
-        connection = Mock()
+        connection = MagicMock()
         connection.close.side_effect = ValueError
 
         # test
         sender = Sender(None)
         sender.connection = connection
+        sender.links = Mock()
         sender.is_open = Mock(return_value=True)
         sender.close()
 
         # validation
+        sender.links.clear.assert_called_once_with()
         self.assertFalse(connection.close.called)
 
     @patch('gofer.messaging.adapter.proton.producer.build_message')
-    @patch('gofer.messaging.adapter.proton.producer.Connection', Mock())
+    @patch('gofer.messaging.adapter.proton.producer.Connection', MagicMock())
     def test_send(self, builder):
         ttl = 10
         address = 'q1'
@@ -130,12 +203,34 @@ class TestSender(TestCase):
         # test
         sender = Sender('')
         sender.durable = 18
-        sender.connection = Mock()
+        sender.connection = MagicMock()
+        sender.send(address, content, ttl=ttl)
         sender.send(address, content, ttl=ttl)
 
         # validation
-        builder.assert_called_once_with(content, ttl, sender.durable)
+        builder.assert_called_with(content, ttl, sender.durable)
         sender.connection.sender.assert_called_once_with(address)
         _sender = sender.connection.sender.return_value
-        _sender.send.assert_called_once_with(builder.return_value)
+        self.assertEqual(
+            sender.connection.send.call_args_list,
+            [
+                ((_sender, builder.return_value), {}),
+                ((_sender, builder.return_value), {}),
+            ])
+        self.assertFalse(_sender.close.called)
+        self.assertEqual(sender.links.find(address), _sender)
+
+    @patch('gofer.messaging.adapter.proton.producer.Connection', MagicMock())
+    def test_send_failed(self):
+        address = 'q1'
+
+        # test
+        sender = Sender('')
+        sender.connection = MagicMock()
+        _sender = sender.connection.sender.return_value
+        sender.connection.send.side_effect = ValueError
+        self.assertRaises(ValueError, sender.send, address, 'hello')
+
+        # validation
         _sender.close.assert_called_once_with()
+        self.assertEqual(len(sender.links), 0)
@@ -14,7 +14,7 @@
 
 from unittest import TestCase
 
-from mock import Mock, patch
+from mock import Mock, MagicMock, patch
 
 from gofer.devel import ipatch
 
@@ -45,7 +45,7 @@ class TestReliable(TestCase):
 
     def test_reliable(self):
         fn = Mock()
-        messenger = Mock()
+        messenger = MagicMock()
         args = (messenger, 2, 3)
         kwargs = {'A': 1}
 
@@ -56,12 +56,25 @@ class TestReliable(TestCase):
         # validation
         fn.assert_called_once_with(*args, **kwargs)
 
+    def test_reliable_not_locked(self):
+        messenger = MagicMock()
+
+        def fn(*unused):
+            self.assertFalse(messenger.connection.lock.__enter__.called)
+
+        # test
+        wrapped = reliable(fn)
+        wrapped(messenger)
+
+        # validation
+        self.assertFalse(messenger.connection.lock.__enter__.called)
+
     @patch('gofer.messaging.adapter.proton.reliability.ConnectionException', ConnectionException)
     @patch('gofer.messaging.adapter.proton.reliability.sleep')
     def test_reliable_connection_exception(self, sleep):
         url = 'test-url'
         fn = Mock(side_effect=[ConnectionException, None])
-        messenger = Mock(url=url, connection=Mock())
+        messenger = Mock(url=url, connection=MagicMock())
         args = (messenger, 2, 3)
         kwargs = {'A': 1}
 
@@ -84,7 +97,7 @@ class TestReliable(TestCase):
     def test_reliable_link_detached(self, sleep):
         url = 'test-url'
         fn = Mock(side_effect=[LinkDetached, None])
-        messenger = Mock(url=url, connection=Mock())
+        messenger = Mock(url=url, connection=MagicMock())
         args = (messenger, 2, 3)
         kwargs = {'A': 1}
 
@@ -111,5 +124,5 @@ class TestReliable(TestCase):
 
         # test
         wrapped = reliable(fn)
-        self.assertRaises(NotFound, wrapped, None)
+        self.assertRaises(NotFound, wrapped, MagicMock())
         self.assertFalse(sleep.called)
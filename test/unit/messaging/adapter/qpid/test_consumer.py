@@ -90,13 +90,31 @@ class TestReader(TestCase):
 
         # validation
         close.assert_called_once_with()
-        connection.return_value.close.assert_called_once_with()
-        connection.return_value.open.assert_called_once_with()
+        connection.return_value.repair.assert_called_once_with()
         connection.return_value.session.assert_called_once_with()
         connection.return_value.session.return_value.receiver.assert_called_once_with(node.address)
         self.assertEqual(reader.session, connection.return_value.session.return_value)
         self.assertEqual(reader.receiver, reader.session.receiver.return_value)
 
+    @patch('gofer.messaging.adapter.qpid.consumer.Connection')
+    def test_open_prefetch(self, connection):
+        node = Mock(address='test')
+
+        # test
+        reader = Reader(node, 'test-url')
+        reader.prefetch = 10
+        reader.open()
+
+        # validation
+        session = connection.return_value.session.return_value
+        session.receiver.assert_called_once_with(node.address, capacity=10)
+
+    def test_flow(self):
+        reader = Reader(Mock(), '')
+        reader.receiver = Mock()
+        reader.flow(10)
+        self.assertEqual(reader.receiver.capacity, 10)
+
     @patch('gofer.messaging.adapter.qpid.consumer.Connection', Mock())
     def test_open_already(self):
         url = 'test-url'
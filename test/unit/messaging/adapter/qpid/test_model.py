@@ -14,14 +14,20 @@ from unittest import TestCase
 from mock import patch, Mock
 
 from gofer.devel import ipatch
+from gofer.messaging.adapter.model import Aborted
 
 with ipatch('qpid'):
     from gofer.messaging.adapter.qpid import model
-    from gofer.messaging.adapter.qpid.model import Error, Method
+    from gofer.messaging.adapter.qpid.model import Error, Method, Session
+    from gofer.messaging.adapter.qpid.model import ManagementSession
     from gofer.messaging.adapter.qpid.model import Exchange, BaseExchange
     from gofer.messaging.adapter.qpid.model import Queue, BaseQueue
 
 
+class Empty(Exception):
+    pass
+
+
 class TestError(TestCase):
 
     def test_init(self):
@@ -32,23 +38,147 @@ class TestError(TestCase):
         self.assertEqual(error.args[0], description)
 
 
-class TestMethod(TestCase):
+class TestSession(TestCase):
+
+    @patch('gofer.messaging.adapter.qpid.model.uuid4')
+    @patch('gofer.messaging.adapter.qpid.model.Connection')
+    def test_init(self, _connection, uuid):
+        url = 'qpid-session-init'
+        uuid.return_value = '5138'
+        session = Session(url)
+        _connection.assert_called_once_with(url)
+        self.assertTrue(isinstance(session, ManagementSession))
+        self.assertEqual(session.url, url)
+        self.assertEqual(session.connection, _connection.return_value)
+        self.assertEqual(session.session, None)
+        self.assertEqual(session.sender, None)
+        self.assertEqual(session.receiver, None)
+        self.assertEqual(session.reply_to, model.REPLY_TO % uuid.return_value)
+        self.assertTrue(Session(url) is session)
 
     @patch('gofer.messaging.adapter.qpid.model.Connection')
-    def test_init(self, _connection):
+    def test_open(self, _connection):
+        url = 'qpid-session-open'
+        connection = Mock()
+        _connection.return_value = connection
+        ssn = Mock()
+        sender = Mock()
+        receiver = Mock()
+        connection.session.return_value = ssn
+        ssn.receiver.return_value = receiver
+        ssn.sender.return_value = sender
+
+        # test
+        session = Session(url)
+        session.open()
+        session.open()
+
+        # validation
+        connection.open.assert_called_once_with()
+        ssn.sender.assert_called_once_with(model.ADDRESS)
+        ssn.receiver.assert_called_once_with(session.reply_to, capacity=model.CAPACITY)
+        self.assertEqual(session.session, ssn)
+        self.assertEqual(session.sender, sender)
+        self.assertEqual(session.receiver, receiver)
+
+    @patch('gofer.messaging.adapter.qpid.model.Connection')
+    def test_repair(self, _connection):
+        url = 'qpid-session-repair'
+        connection = Mock()
+        _connection.return_value = connection
+        ssn = Mock()
+        sender = Mock()
+        receiver = Mock()
+        connection.session.return_value = ssn
+        ssn.receiver.return_value = receiver
+        ssn.sender.return_value = sender
+
+        # test
+        session = Session(url)
+        session.close = Mock()
+        session.repair()
+
+        # validation
+        session.close.assert_called_once_with()
+        connection.repair.assert_called_once_with()
+        ssn.sender.assert_called_once_with(model.ADDRESS)
+        ssn.receiver.assert_called_once_with(session.reply_to, capacity=model.CAPACITY)
+        self.assertEqual(session.sender, sender)
+        self.assertEqual(session.receiver, receiver)
+        self.assertEqual(session.generation, 1)
+
+    @patch('gofer.messaging.adapter.qpid.model.Connection')
+    def test_close(self, _connection):
+        connection = Mock()
+        _connection.return_value = connection
+        ssn = Mock()
+        sender = Mock()
+        receiver = Mock()
+        session = Session('qpid-session-close')
+        session.session = ssn
+        session.sender = sender
+        session.receiver = receiver
+
+        ssn.close.side_effect = ValueError
+        sender.close.side_effect = ValueError
+        receiver.close.side_effect = ValueError
+
+        # test
+        session.close()
+
+        # validation
+        receiver.close.assert_called_once_with()
+        sender.close.assert_called_once_with()
+        ssn.close.assert_called_once_with()
+        self.assertFalse(connection.close.called)
+        self.assertFalse(session.is_open())
+
+    @patch('gofer.messaging.adapter.qpid.model.Connection', Mock())
+    def test_send(self):
+        request = Mock()
+        session = Session('qpid-session-send')
+        session.sender = Mock()
+        session.send(request)
+        self.assertEqual(request.reply_to, session.reply_to)
+        session.sender.send.assert_called_once_with(request)
+
+    @patch('gofer.messaging.adapter.qpid.model.Connection', Mock())
+    def test_fetch(self):
+        session = Session('qpid-session-fetch')
+        session.session = Mock()
+        session.receiver = Mock()
+        reply = session.fetch(10)
+        session.receiver.fetch.assert_called_once_with(10)
+        session.session.acknowledge.assert_called_once_with(reply)
+        self.assertEqual(reply, session.receiver.fetch.return_value)
+
+    @patch('gofer.messaging.adapter.qpid.model.Empty', Empty)
+    @patch('gofer.messaging.adapter.qpid.model.Connection', Mock())
+    def test_fetch_empty(self):
+        session = Session('qpid-session-fetch-empty')
+        session.session = Mock()
+        session.receiver = Mock()
+        session.receiver.fetch.side_effect = Empty
+        reply = session.fetch(10)
+        self.assertEqual(reply, None)
+        self.assertFalse(session.session.acknowledge.called)
+
+
+class TestMethod(TestCase):
+
+    @patch('gofer.messaging.adapter.qpid.model.Session')
+    def test_init(self, _session):
         url = 'test-url'
         name = model.CREATE
         arguments = {'a': 1}
         method = Method(url, name, arguments)
-        _connection.assert_called_once_with(url)
+        _session.assert_called_once_with(url)
         self.assertEqual(method.url, url)
         self.assertEqual(method.name, name)
         self.assertEqual(method.arguments, arguments)
-        self.assertEqual(method.connection, _connection.return_value)
-        self.assertEqual(method.session, None)
-        self.assertEqual(method.sender, None)
-        self.assertEqual(method.receiver, None)
+        self.assertEqual(method.session, _session.return_value)
 
+    @patch('gofer.messaging.adapter.qpid.model.Session', Mock())
     def test_content(self):
         url = 'test-url'
         name = model.CREATE
@@ -62,6 +192,7 @@ class TestMethod(TestCase):
                 '_arguments': arguments
             })
 
+    @patch('gofer.messaging.adapter.qpid.model.Session', Mock())
     def test_properties(self):
         url = 'test-url'
         method = Method(url, model.CREATE, {})
@@ -73,6 +204,7 @@ class TestMethod(TestCase):
                 'method': 'request'
             })
 
+    @patch('gofer.messaging.adapter.qpid.model.Session', Mock())
     def test_reply_succeeded(self):
         url = 'test-url'
         content = ''
@@ -83,6 +215,7 @@ class TestMethod(TestCase):
         method = Method(url, '', {})
         method.on_reply(reply)
 
+    @patch('gofer.messaging.adapter.qpid.model.Session', Mock())
     def test_reply_failed(self):
         url = 'test-url'
         values = {
@@ -97,6 +230,7 @@ class TestMethod(TestCase):
         method = Method(url, '', {})
         self.assertRaises(Error, method.on_reply, reply)
 
+    @patch('gofer.messaging.adapter.qpid.model.Session', Mock())
     def test_reply_already_exists(self):
         url = 'test-url'
         values = {
@@ -111,135 +245,64 @@ class TestMethod(TestCase):
         method = Method(url, '', {})
         method.on_reply(reply)
 
-    @patch('gofer.messaging.adapter.qpid.model.uuid4')
-    @patch('gofer.messaging.adapter.qpid.model.Connection')
-    def test_open(self, _connection, uuid):
-        url = 'url-test'
-        uuid.return_value = '5138'
-        connection = Mock()
-        _connection.return_value = connection
-        session = Mock()
-        session.close.side_effect = ValueError
-        sender = Mock()
-        sender.close.side_effect = ValueError
-        receiver = Mock()
-        receiver.close.side_effect = ValueError
-        connection.session.return_value = session
-        session.receiver.return_value = receiver
-        session.sender.return_value = sender
-        reply_to = model.REPLY_TO % uuid.return_value
-
-        # test
-        method = Method(url, '', {})
-        method.open()
-
-        # validation
-        connection.open.assert_called_once_with()
-        session.sender.assert_called_once_with(model.ADDRESS)
-        session.receiver.assert_called_once_with(reply_to)
-        self.assertEqual(method.connection, connection)
-        self.assertEqual(method.sender, sender)
-        self.assertEqual(method.receiver, receiver)
-
-    @patch('gofer.messaging.adapter.qpid.model.Connection', Mock())
-    def test_open_already(self):
-        # test
-        method = Method('', '', {})
-        method.is_open = Mock(return_value=True)
-        method.open()
-
-        # validation
-        self.assertFalse(method.connection.open.called)
-
-    @patch('gofer.messaging.adapter.qpid.model.uuid4')
-    @patch('gofer.messaging.adapter.qpid.model.Method.close')
-    @patch('gofer.messaging.adapter.qpid.model.Connection')
-    def test_repair(self, _connection, close, uuid):
-        url = 'url-test'
-        uuid.return_value = '5138'
-        connection = Mock()
-        _connection.return_value = connection
-        session = Mock()
-        session.close.side_effect = ValueError
-        sender = Mock()
-        sender.close.side_effect = ValueError
-        receiver = Mock()
-        receiver.close.side_effect = ValueError
-        connection.session.return_value = session
-        session.receiver.return_value = receiver
-        session.sender.return_value = sender
-        reply_to = model.REPLY_TO % uuid.return_value
-
-        # test
-        method = Method(url, '', {})
-        method.repair()
-
-        # validation
-        close.assert_called_once_with()
-        connection.close.assert_called_once_with()
-        connection.open.assert_called_once_with()
-        session.sender.assert_called_once_with(model.ADDRESS)
-        session.receiver.assert_called_once_with(reply_to)
-        self.assertEqual(method.connection, connection)
-        self.assertEqual(method.sender, sender)
-        self.assertEqual(method.receiver, receiver)
-
-    def test_close(self):
-        connection = Mock()
-        session = Mock(connection=connection)
-        sender = Mock()
-        receiver = Mock()
-        method = Method('', '', {})
-        method.connection = connection
-        method.session = session
-        method.sender = sender
-        method.receiver = receiver
-
-        session.close.side_effect = ValueError
-        sender.close.side_effect = ValueError
-        receiver.close.side_effect = ValueError
-
-        # test
-        method.close()
-
-        # validation
-        receiver.close.assert_called_once_with()
-        sender.close.assert_called_once_with()
-        session.close.assert_called_once_with()
-        self.assertFalse(connection.close.called)
+    @patch('gofer.messaging.adapter.qpid.model.Session', Mock())
+    def test_reply_resent_delete_not_found(self):
+        values = {
+            'error_code': 18,
+            'error_text': 'not-found: Delete failed. No such queue: q1'
+        }
+        content = {'_values': values}
+        properties = {
+            'qmf.opcode': '_exception'
+        }
+        reply = Mock(content=content, properties=properties)
+        # resent
+        method = Method('', model.DELETE, {})
+        method.on_reply(reply, True)
+        # not resent
+        self.assertRaises(Error, method.on_reply, reply)
+        # not delete
+        method = Method('', model.CREATE, {})
+        self.assertRaises(Error, method.on_reply, reply, True)
 
     @patch('gofer.messaging.adapter.qpid.model.uuid4')
     @patch('gofer.messaging.adapter.qpid.model.Message')
-    def test_call(self, message, uuid):
+    @patch('gofer.messaging.adapter.qpid.model.Session')
+    def test_call(self, _session, message, uuid):
         url = 'url-test'
         name = model.CREATE
         arguments = {'a': 1}
+        session = _session.return_value
+        session.request.return_value = (Mock(), False)
 
         # test
         method = Method(url, name, arguments)
-        method.reply_to = '234'
-        method.open = Mock()
-        method.close = Mock()
-        method.session = Mock()
-        method.sender = Mock()
-        method.receiver = Mock()
         method.on_reply = Mock()
         method()
 
         # validation
-        method.open.assert_called_once_with()
         message.assert_called_once_with(
             content=method.content,
-            reply_to=method.reply_to,
             properties=method.properties,
             correlation_id=str(uuid.return_value),
             subject=model.SUBJECT
         )
+        session.request.assert_called_once_with(
+            message.return_value, str(uuid.return_value))
+        method.on_reply.assert_called_once_with(session.request.return_value[0], False)
 
-        method.session.acknowledge.assert_called_once_with()
-        method.sender.send.assert_called_once_with(message.return_value)
-        method.on_reply.assert_called_once_with(method.receiver.fetch.return_value)
-        method.close.assert_called_once_with()
+    @patch('gofer.messaging.adapter.qpid.model.Session')
+    def test_call_aborted(self, _session):
+        session = _session.return_value
+        session.request.side_effect = Aborted
+
+        # test
+        method = Method('url-test', model.CREATE, {})
+        method.on_reply = Mock()
+        self.assertRaises(Aborted, method)
+
+        # validation
+        self.assertFalse(method.on_reply.called)
 
 
 class TestExchange(TestCase):
@@ -71,8 +71,7 @@ class TestSender(TestCase):
 
         # validation
         close.assert_called_once_with()
-        connection.return_value.close.assert_called_once_with()
-        connection.return_value.open.assert_called_once_with()
+        connection.return_value.repair.assert_called_once_with()
         connection.return_value.session.assert_called_once_with()
         self.assertEqual(sender.session, connection.return_value.session.return_value)
 
@@ -0,0 +1,124 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from gofer.devel import ipatch
+from gofer import ThreadSingleton
+
+with ipatch('proton'):
+    from gofer.messaging.adapter.reactor.connection import Connection, Shared, CREDIT
+
+
+class TestConnection(TestCase):
+
+    def setUp(self):
+        ThreadSingleton.all().clear()
+
+    def tearDown(self):
+        ThreadSingleton.all().clear()
+
+    def test_init(self):
+        url = 'test-url'
+        connection = Connection(url)
+        self.assertEqual(connection.url, url)
+        self.assertEqual(connection._shared, Shared(url))
+        self.assertEqual(connection._impl, None)
+
+    def test_is_open(self):
+        connection = Connection('')
+        self.assertFalse(connection.is_open())
+        connection._impl = Mock()
+        self.assertTrue(connection.is_open())
+
+    def test_open(self):
+        connection = Connection('test-url')
+        connection._shared = Mock()
+
+        # test
+        connection.open()
+        connection.open()
+
+        # validation
+        connection._shared.acquire.assert_called_once_with()
+        self.assertEqual(connection._impl, connection._shared.acquire.return_value)
+
+    def test_sender(self):
+        connection = Connection('test-url')
+        connection._impl = Mock()
+        sender = connection.sender('test')
+        connection._impl.sender.assert_called_once_with('test')
+        self.assertEqual(sender, connection._impl.sender.return_value)
+
+    def test_receiver(self):
+        connection = Connection('test-url')
+        connection._impl = Mock()
+
+        # test
+        receiver = connection.receiver('test')
+        connection.receiver('test', dynamic=True, credit=5)
+
+        # validation
+        self.assertEqual(
+            connection._impl.receiver.call_args_list,
+            [
+                (('test', CREDIT), dict(dynamic=False)),
+                (('test', 5), dict(dynamic=True)),
+            ])
+        self.assertEqual(receiver, connection._impl.receiver.return_value)
+
+    def test_repair(self):
+        c = Connection('test-url')
+        c._shared = Mock()
+        impl = Mock()
+        c._impl = impl
+
+        # test
+        c.repair()
+
+        # validation
+        c._shared.discard.assert_called_once_with(impl)
+        c._shared.acquire.assert_called_once_with()
+        self.assertEqual(c._impl, c._shared.acquire.return_value)
+
+    def test_close(self):
+        c = Connection('test-url')
+        c._shared = Mock()
+        impl = Mock()
+        c._impl = impl
+
+        # test
+        c.close()
+
+        # validation
+        c._shared.release.assert_called_once_with(impl)
+        self.assertEqual(c._impl, None)
+
+
+class TestShared(TestCase):
+
+    @patch('gofer.messaging.adapter.reactor.connection.Loop')
+    def test_connect(self, loop):
+        url = 'reactor-shared-connect'
+        shared = Shared(url)
+        impl = shared.connect()
+        loop.assert_called_once_with(url)
+        loop.return_value.open.assert_called_once_with()
+        self.assertEqual(impl, loop.return_value)
+
+    def test_disconnect(self):
+        impl = Mock()
+        impl.close.side_effect = ValueError
+        shared = Shared('reactor-shared-disconnect')
+        shared.disconnect(impl)
+        impl.close.assert_called_once_with()
@@ -0,0 +1,161 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.devel import ipatch
+
+from gofer.messaging.adapter.model import Message
+
+with ipatch('proton'):
+    from gofer.messaging.adapter.reactor.consumer import Reader, BaseReader
+
+
+class Delivery(object):
+    ACCEPTED = 1
+    REJECTED = 2
+    RELEASED = 3
+
+
+class TestReader(TestCase):
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection')
+    def test_init(self, connection):
+        node = Mock(address='test')
+        url = 'test-url'
+
+        # test
+        reader = Reader(node, url=url)
+
+        # validation
+        connection.assert_called_once_with(url)
+        self.assertTrue(isinstance(reader, BaseReader))
+        self.assertEqual(reader.url, url)
+        self.assertEqual(reader.node, node)
+        self.assertEqual(reader.connection, connection.return_value)
+        self.assertEqual(reader.receiver, None)
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection', Mock())
+    def test_credit(self):
+        reader = Reader(Mock(), '')
+        self.assertEqual(reader.credit, None)
+        reader.prefetch = 5
+        self.assertEqual(reader.credit, 5)
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection')
+    def test_open(self, connection):
+        node = Mock(address='test')
+        reader = Reader(node, '')
+
+        # test
+        reader.open()
+        reader.open()
+
+        # validation
+        connection.return_value.open.assert_called_once_with()
+        connection.return_value.receiver.assert_called_once_with(node.address, credit=None)
+        self.assertEqual(reader.receiver, connection.return_value.receiver.return_value)
+        self.assertTrue(reader.is_open())
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection')
+    def test_repair(self, connection):
+        node = Mock(address='test')
+        receiver = Mock()
+        reader = Reader(node, '')
+        reader.receiver = receiver
+
+        # test
+        reader.repair()
+
+        # validation
+        receiver.close.assert_called_once_with()
+        connection.return_value.repair.assert_called_once_with()
+        connection.return_value.receiver.assert_called_once_with(node.address, credit=None)
+        self.assertEqual(reader.receiver, connection.return_value.receiver.return_value)
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection', Mock())
+    def test_close(self):
+        receiver = Mock()
+        reader = Reader(Mock(), '')
+        reader.receiver = receiver
+
+        # test
+        reader.close()
+        reader.close()
+
+        # validation
+        receiver.close.assert_called_once_with()
+        self.assertFalse(reader.is_open())
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection', Mock())
+    def test_flow(self):
+        reader = Reader(Mock(), '')
+        reader.receiver = Mock()
+        reader.flow(10)
+        reader.receiver.flow.assert_called_once_with(10)
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection', Mock())
+    def test_get(self):
+        impl = Mock()
+        reader = Reader(Mock(), '')
+        reader.receiver = Mock()
+        reader.receiver.get.return_value = (impl, 1)
+
+        # test
+        message = reader.get(10)
+
+        # validation
+        reader.receiver.get.assert_called_once_with(10.0)
+        self.assertTrue(isinstance(message, Message))
+        self.assertEqual(message._reader, reader)
+        self.assertEqual(message._impl, (reader.receiver, 1))
+        self.assertEqual(message._body, impl.body)
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection', Mock())
+    def test_get_empty(self):
+        reader = Reader(Mock(), '')
+        reader.receiver = Mock()
+        reader.receiver.get.return_value = None
+        self.assertEqual(reader.get(), None)
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Delivery', Delivery)
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection', Mock())
+    def test_ack(self):
+        receiver = Mock()
+        reader = Reader(Mock(), '')
+        reader.ack((receiver, 1))
+        receiver.settle.assert_called_once_with([1], Delivery.ACCEPTED)
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Delivery', Delivery)
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection', Mock())
+    def test_ack_batch(self):
+        r1 = Mock()
+        r2 = Mock()
+        reader = Reader(Mock(), '')
+        reader.ack_batch([(r1, 1), (r2, 2), (r1, 3)])
+        r1.settle.assert_called_once_with([1, 3], Delivery.ACCEPTED)
+        r2.settle.assert_called_once_with([2], Delivery.ACCEPTED)
+
+    @patch('gofer.messaging.adapter.reactor.consumer.Delivery', Delivery)
+    @patch('gofer.messaging.adapter.reactor.consumer.Connection', Mock())
+    def test_reject(self):
+        receiver = Mock()
+        reader = Reader(Mock(), '')
+        reader.reject((receiver, 1))
+        reader.reject((receiver, 2), False)
+        self.assertEqual(
+            receiver.settle.call_args_list,
+            [
+                (([1], Delivery.RELEASED), {}),
+                (([2], Delivery.REJECTED), {}),
+            ])
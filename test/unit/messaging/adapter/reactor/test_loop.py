@@ -0,0 +1,525 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from Queue import Queue
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.devel import ipatch
+
+with ipatch('proton'):
+    from gofer.messaging.adapter.reactor import loop
+    from gofer.messaging.adapter.reactor.loop import Pending, Link, Receiver, Sender
+    from gofer.messaging.adapter.reactor.loop import Handler, Loop, TASK
+
+
+class ConnectionException(Exception):
+    pass
+
+
+class LinkDetached(Exception):
+
+    def __init__(self, link):
+        self.link = link
+
+
+class ConnectionClosed(Exception):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+class SendException(Exception):
+    pass
+
+
+class TestErrors(TestCase):
+
+    @patch('gofer.messaging.adapter.reactor.loop.LinkDetached', LinkDetached)
+    def test_detached(self):
+        error = loop.detached(Mock())
+        self.assertTrue(isinstance(error, LinkDetached))
+        self.assertEqual(error.link, None)
+
+    @patch('gofer.messaging.adapter.reactor.loop.ConnectionClosed', ConnectionClosed)
+    def test_closed(self):
+        error = loop.closed(Mock())
+        self.assertTrue(isinstance(error, ConnectionClosed))
+        self.assertEqual(error.connection, None)
+
+
+class TestPending(TestCase):
+
+    def test_succeeded(self):
+        pending = Pending()
+        pending.succeeded(18)
+        self.assertEqual(pending.wait(), 18)
+
+    def test_failed(self):
+        pending = Pending()
+        pending.failed(ValueError())
+        self.assertRaises(ValueError, pending.wait)
+
+    @patch('gofer.messaging.adapter.reactor.loop.ConnectionException', ConnectionException)
+    def test_timeout(self):
+        pending = Pending()
+        pending.event = Mock()
+        pending.event.isSet.return_value = False
+        self.assertRaises(ConnectionException, pending.wait, 10)
+        pending.event.wait.assert_called_once_with(10)
+        self.assertRaises(ConnectionException, pending.wait)
+        pending.event.wait.assert_called_with(loop.TIMEOUT)
+
+
+class TestLink(TestCase):
+
+    def test_init(self):
+        _loop = Mock()
+        link = Link(_loop)
+        self.assertEqual(link.loop, _loop)
+        self.assertEqual(len(link.name), 36)
+        self.assertEqual(link.impl, None)
+        self.assertTrue(isinstance(link.attaching, Pending))
+
+    def test_attached(self):
+        link = Link(Mock())
+        link.attached()
+        self.assertEqual(link.attaching.wait(), link)
+
+    def test_detached(self):
+        link = Link(Mock())
+        link.detached(ValueError())
+        self.assertRaises(ValueError, link.attaching.wait)
+
+    @patch('gofer.messaging.adapter.reactor.loop.ConnectionException', ConnectionException)
+    def test_close(self):
+        link = Link(Mock())
+        link.loop.post.side_effect = ConnectionException
+        link.close()
+        link.loop.post.assert_called_once_with(link._close)
+
+    def test__close(self):
+        link = Link(Mock(links={}))
+        link.impl = Mock()
+        link.loop.links[link.name] = link
+        link._close()
+        link.impl.close.assert_called_once_with()
+        self.assertEqual(link.loop.links, {})
+
+
+class TestReceiver(TestCase):
+
+    def setUp(self):
+        self.loop = Mock(links={})
+        self.receiver = Receiver(self.loop, 10)
+
+    def test_init(self):
+        self.assertEqual(self.receiver.credit, 10)
+        self.assertTrue(isinstance(self.receiver.inbox, Queue))
+        self.assertEqual(self.receiver.deliveries, {})
+        self.assertEqual(self.receiver.address, None)
+
+    def test_attach(self):
+        pending = self.receiver.attach('q1', False)
+        create = self.loop.container.create_receiver
+        create.assert_called_once_with(
+            self.loop.connection,
+            'q1',
+            name=self.receiver.name,
+            dynamic=False,
+            options=None)
+        create.return_value.flow.assert_called_once_with(10)
+        self.assertEqual(self.loop.links, {self.receiver.name: self.receiver})
+        self.assertEqual(pending, self.receiver.attaching)
+
+    @patch('gofer.messaging.adapter.reactor.loop.DynamicNodeProperties')
+    def test_attach_dynamic(self, properties):
+        self.receiver.attach('q1', True)
+        properties.assert_called_once_with({'x-opt-qd.address': u'q1'})
+        self.loop.container.create_receiver.assert_called_once_with(
+            self.loop.connection,
+            None,
+            name=self.receiver.name,
+            dynamic=True,
+            options=properties.return_value)
+
+    def test_attached(self):
+        self.receiver.impl = Mock()
+        self.receiver.attached()
+        self.assertEqual(self.receiver.address, self.receiver.impl.remote_source.address)
+        self.assertEqual(self.receiver.attaching.wait(), self.receiver)
+
+    def test_received(self):
+        message = Mock()
+        self.receiver.received(message, 'd1')
+        self.receiver.received(message, 'd2')
+        self.assertEqual(self.receiver.deliveries, {1: 'd1', 2: 'd2'})
+        self.assertEqual(self.receiver.get(), (message, 1))
+
+    def test_get(self):
+        self.receiver.credit = 4
+        for n in range(3):
+            self.receiver.inbox.put((Mock(), n))
+        self.receiver.get()
+        self.assertFalse(self.loop.post.called)
+        self.receiver.get()
+        self.loop.post.assert_called_once_with(self.receiver.replenish)
+        self.assertEqual(self.receiver.taken, 0)
+        self.receiver.get()
+        self.assertEqual(self.receiver.taken, 1)
+
+    def test_get_empty(self):
+        self.assertEqual(self.receiver.get(0), None)
+
+    def test_detached(self):
+        self.receiver.deliveries[1] = Mock()
+        self.receiver.detached(ValueError())
+        self.assertEqual(self.receiver.deliveries, {})
+        self.assertRaises(ValueError, self.receiver.get)
+        self.assertRaises(ValueError, self.receiver.get)
+
+    def test_flow(self):
+        self.receiver.flow(20)
+        self.assertEqual(self.receiver.credit, 20)
+        self.loop.post.assert_called_once_with(self.receiver.replenish)
+
+    def test_replenish(self):
+        self.receiver.impl = Mock(credit=4)
+        self.receiver.inbox.put(1)
+        self.receiver.replenish()
+        self.receiver.impl.flow.assert_called_once_with(5)
+        self.receiver.impl.credit = 9
+        self.receiver.replenish()
+        self.assertEqual(self.receiver.impl.flow.call_count, 1)
+
+    def test_settle(self):
+        self.receiver.settle([1, 2], 'state')
+        self.loop.post.assert_called_once_with(self.receiver._settle, [1, 2], 'state')
+
+    @patch('gofer.messaging.adapter.reactor.loop.ConnectionException', ConnectionException)
+    def test_settle_closed(self):
+        self.loop.post.side_effect = ConnectionException
+        self.receiver.settle([1, 2], 'state')
+
+    def test__settle(self):
+        delivery = Mock()
+        self.receiver.deliveries[1] = delivery
+        self.receiver._settle([1, 2], 'state')
+        delivery.update.assert_called_once_with('state')
+        delivery.settle.assert_called_once_with()
+        self.assertEqual(self.receiver.deliveries, {})
+
+    def test__close(self):
+        self.receiver.impl = Mock()
+        self.receiver.deliveries[1] = Mock()
+        self.receiver._close()
+        self.receiver.impl.close.assert_called_once_with()
+        self.assertEqual(self.receiver.deliveries, {})
+
+
+class TestSender(TestCase):
+
+    def setUp(self):
+        self.loop = Mock(links={})
+        self.sender = Sender(self.loop)
+
+    def test_attach(self):
+        pending = self.sender.attach('q1')
+        self.loop.container.create_sender.assert_called_once_with(
+            self.loop.connection, 'q1', name=self.sender.name)
+        self.assertEqual(self.loop.links, {self.sender.name: self.sender})
+        self.assertEqual(pending, self.sender.attaching)
+
+    def test_send(self):
+        message = Mock()
+        self.sender.send(message)
+        self.loop.call.assert_called_once_with(self.sender._send, message)
+
+    def test__send(self):
+        message = Mock()
+        self.sender.impl = Mock()
+        pending = self.sender._send(message)
+        self.sender.impl.send.assert_called_once_with(message)
+        tag = self.sender.impl.send.return_value.tag
+        self.assertEqual(self.sender.unsettled, {tag: pending})
+
+    def test__send_detached(self):
+        self.sender.error = ValueError()
+        self.assertRaises(ValueError, self.sender._send, Mock())
+
+    def test_settled(self):
+        accepted = Mock(tag=1)
+        rejected = Mock(tag=2)
+        self.sender.unsettled = {1: Pending(), 2: Pending()}
+        pending = dict(self.sender.unsettled)
+        self.sender.settled(accepted, None)
+        self.sender.settled(rejected, ValueError())
+        self.sender.settled(Mock(tag=3), None)
+        self.assertEqual(pending[1].wait(), None)
+        self.assertRaises(ValueError, pending[2].wait)
+        self.assertEqual(self.sender.unsettled, {})
+
+    def test_detached(self):
+        error = ValueError()
+        self.sender.unsettled = {1: Pending()}
+        pending = self.sender.unsettled[1]
+        self.sender.detached(error)
+        self.assertEqual(self.sender.error, error)
+        self.assertEqual(self.sender.unsettled, {})
+        self.assertRaises(ValueError, pending.wait)
+
+
+class TestHandler(TestCase):
+
+    def setUp(self):
+        self.link = Mock()
+        self.loop = Mock(url='test-url', links={'l1': self.link})
+        self.handler = Handler(self.loop)
+
+    def event(self):
+        event = Mock()
+        event.link.name = 'l1'
+        event.receiver.name = 'l1'
+        return event
+
+    def test_start(self):
+        event = self.event()
+        self.handler.on_start(event)
+        event.container.selectable.assert_called_once_with(self.loop.injector)
+
+    def test_task(self):
+        self.handler.on_task(self.event())
+        self.loop.run_tasks.assert_called_once_with()
+
+    def test_connection_opened(self):
+        self.handler.on_connection_opened(self.event())
+        self.loop.opened.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.loop.closed')
+    def test_connection_error(self, closed):
+        event = self.event()
+        self.handler.on_connection_error(event)
+        closed.assert_called_once_with(event.connection)
+        self.loop.lost.assert_called_once_with(closed.return_value)
+
+    @patch('gofer.messaging.adapter.reactor.loop.ConnectionException', ConnectionException)
+    def test_transport_error(self):
+        self.handler.on_transport_error(self.event())
+        self.handler.on_disconnected(self.event())
+        self.assertEqual(self.loop.lost.call_count, 2)
+        for call in self.loop.lost.call_args_list:
+            self.assertTrue(isinstance(call[0][0], ConnectionException))
+
+    def test_link_opened(self):
+        self.handler.on_link_opened(self.event())
+        self.link.attached.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.loop.detached')
+    def test_link_error(self, detached):
+        event = self.event()
+        self.handler.on_link_error(event)
+        self.handler.on_link_closing(event)
+        detached.assert_called_once_with(event.link)
+        self.link.detached.assert_called_once_with(detached.return_value)
+        self.assertEqual(self.loop.links, {})
+
+    def test_message(self):
+        event = self.event()
+        self.handler.on_message(event)
+        self.link.received.assert_called_once_with(event.message, event.delivery)
+
+    @patch('gofer.messaging.adapter.reactor.loop.SendException', SendException)
+    def test_settled(self):
+        event = self.event()
+        self.handler.on_accepted(event)
+        self.handler.on_rejected(event)
+        self.handler.on_released(event)
+        calls = self.link.settled.call_args_list
+        self.assertEqual(calls[0][0], (event.delivery, None))
+        self.assertTrue(isinstance(calls[1][0][1], SendException))
+        self.assertTrue(isinstance(calls[2][0][1], SendException))
+
+
+class TestLoop(TestCase):
+
+    def setUp(self):
+        self.loop = Loop('test-url')
+        self.loop.container = Mock()
+        self.loop.injector = Mock()
+
+    def test_init(self):
+        _loop = Loop('test-url')
+        self.assertEqual(_loop.url, 'test-url')
+        self.assertEqual(_loop.getName(), 'reactor:test-url')
+        self.assertTrue(_loop.isDaemon())
+        self.assertEqual(_loop.links, {})
+        self.assertEqual(_loop.error, None)
+
+    @patch('gofer.messaging.adapter.reactor.loop.ConnectionException', ConnectionException)
+    def test_run(self):
+        pending = self.loop.post(Mock())
+        self.loop.run()
+        self.loop.container.run.assert_called_once_with()
+        self.assertTrue(isinstance(self.loop.error, ConnectionException))
+        self.assertRaises(ConnectionException, pending.wait)
+        self.loop.injector.close.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.loop.ConnectionException', ConnectionException)
+    def test_run_failed(self):
+        link = Mock()
+        opening = Pending()
+        connection = Mock()
+        self.loop.links = {'l1': link}
+        self.loop.opening = opening
+        self.loop.connection = connection
+        self.loop.container.run.side_effect = ValueError
+        pending = self.loop.post(Mock())
+
+        # test
+        self.loop.run()
+
+        # validation
+        error = self.loop.error
+        self.assertTrue(isinstance(error, ConnectionException))
+        link.detached.assert_called_once_with(error)
+        self.assertRaises(ConnectionException, opening.wait)
+        self.assertRaises(ConnectionException, pending.wait)
+        connection.close.assert_called_once_with()
+        self.assertEqual(self.loop.links, {})
+
+    def test_run_shutdown(self):
+        error = ValueError()
+        self.loop.error = error
+        self.loop.run()
+        self.assertEqual(self.loop.error, error)
+        self.assertFalse(self.loop.injector.close.called)
+
+    @patch('gofer.messaging.adapter.reactor.loop.Loop.shutdown')
+    def test_stopped(self, shutdown):
+        shutdown.side_effect = ValueError
+        error = KeyError()
+        self.loop.stopped(error)
+        shutdown.assert_called_once_with(error)
+
+    @patch('gofer.messaging.adapter.reactor.loop.ApplicationEvent')
+    def test_post(self, event):
+        fn = Mock()
+        pending = self.loop.post(fn, 1, 2)
+        event.assert_called_once_with(TASK)
+        self.loop.injector.trigger.assert_called_once_with(event.return_value)
+        self.loop.run_tasks()
+        fn.assert_called_once_with(1, 2)
+        self.assertEqual(pending.wait(), fn.return_value)
+
+    def test_post_closed(self):
+        self.loop.error = ValueError()
+        self.assertRaises(ValueError, self.loop.post, Mock())
+
+    def test_call(self):
+        remote = Pending()
+        remote.succeeded(18)
+        fn = Mock(return_value=remote)
+        self.loop.injector.trigger.side_effect = lambda e: self.loop.run_tasks()
+        self.assertEqual(self.loop.call(fn), 18)
+
+    def test_run_tasks(self):
+        fn = Mock(side_effect=ValueError)
+        pending = self.loop.post(fn)
+        self.loop.run_tasks()
+        self.assertRaises(ValueError, pending.wait)
+        self.loop.error = KeyError()
+        fn = Mock()
+        pending = Pending()
+        self.loop.tasks.append((fn, (), pending))
+        self.loop.run_tasks()
+        self.assertFalse(fn.called)
+        self.assertRaises(KeyError, pending.wait)
+
+    @patch('gofer.messaging.adapter.reactor.loop.Loop.call')
+    @patch('gofer.messaging.adapter.reactor.loop.Loop.start')
+    def test_open(self, start, call):
+        self.loop.open()
+        start.assert_called_once_with()
+        call.assert_called_once_with(self.loop._open)
+
+    @patch('gofer.messaging.adapter.reactor.loop.Loop.close')
+    @patch('gofer.messaging.adapter.reactor.loop.Loop.call')
+    @patch('gofer.messaging.adapter.reactor.loop.Loop.start')
+    def test_open_failed(self, start, call, close):
+        call.side_effect = ValueError
+        self.assertRaises(ValueError, self.loop.open)
+        close.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.loop.BlockingConnection')
+    @patch('gofer.messaging.adapter.reactor.loop.Connector')
+    def test__open(self, connector, connection):
+        pending = self.loop._open()
+        connector.find.assert_called_once_with('test-url')
+        _connector = connector.find.return_value
+        connection.ssl_domain.assert_called_once_with(_connector)
+        self.loop.container.connect.assert_called_once_with(
+            url=_connector.url.canonical,
+            heartbeat=_connector.heartbeat,
+            ssl_domain=connection.ssl_domain.return_value,
+            reconnect=False)
+        self.assertEqual(self.loop.connection, self.loop.container.connect.return_value)
+        self.assertEqual(self.loop.opening, pending)
+
+    def test_opened(self):
+        pending = Pending()
+        self.loop.opening = pending
+        self.loop.opened()
+        self.assertEqual(self.loop.opening, None)
+        self.assertEqual(pending.wait(), None)
+
+    def test_lost(self):
+        link = Mock()
+        opening = Pending()
+        connection = Mock()
+        self.loop.links = {'l1': link}
+        self.loop.opening = opening
+        self.loop.connection = connection
+        error = ValueError()
+
+        # test
+        self.loop.lost(error)
+        self.loop.lost(KeyError())
+
+        # validation
+        self.assertEqual(self.loop.error, error)
+        link.detached.assert_called_once_with(error)
+        self.assertRaises(ValueError, opening.wait)
+        connection.close.assert_called_once_with()
+        self.loop.injector.close.assert_called_once_with()
+        self.assertEqual(self.loop.links, {})
+        self.assertEqual(self.loop.connection, None)
+
+    @patch('gofer.messaging.adapter.reactor.loop.ConnectionException', ConnectionException)
+    @patch('gofer.messaging.adapter.reactor.loop.Loop.post')
+    def test_close(self, post):
+        self.loop.close()
+        post.side_effect = ConnectionException
+        self.loop.close()
+        self.assertEqual(post.call_args[0][0], self.loop.shutdown)
+
+    @patch('gofer.messaging.adapter.reactor.loop.Loop.call')
+    def test_sender(self, call):
+        sender = self.loop.sender('q1')
+        self.assertEqual(sender, call.return_value)
+        self.assertEqual(call.call_args[0][1:], ('q1',))
+
+    @patch('gofer.messaging.adapter.reactor.loop.Loop.call')
+    def test_receiver(self, call):
+        receiver = self.loop.receiver('q1', 10, dynamic=True)
+        self.assertEqual(receiver, call.return_value)
+        self.assertEqual(call.call_args[0][1:], ('q1', True))
+        self.assertEqual(call.call_args[0][0].im_self.credit, 10)
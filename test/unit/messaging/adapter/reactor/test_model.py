@@ -0,0 +1,424 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch, Mock, MagicMock
+
+from gofer.devel import ipatch
+from gofer.messaging.adapter.model import Aborted
+
+with ipatch('proton'):
+    from gofer.messaging.adapter.reactor import model
+    from gofer.messaging.adapter.reactor.model import Error, Method, Session
+    from gofer.messaging.adapter.reactor.model import ManagementSession
+    from gofer.messaging.adapter.reactor.model import Exchange, BaseExchange
+    from gofer.messaging.adapter.reactor.model import Queue, BaseQueue
+
+
+class TestSession(TestCase):
+
+    @patch('gofer.messaging.adapter.reactor.model.Connection')
+    def test_init(self, _connection):
+        url = 'reactor-session-init'
+        session = Session(url)
+        _connection.assert_called_once_with(url)
+        self.assertTrue(isinstance(session, ManagementSession))
+        self.assertEqual(session.url, url)
+        self.assertEqual(session.connection, _connection.return_value)
+        self.assertEqual(session.sender, None)
+        self.assertEqual(session.receiver, None)
+        self.assertTrue(Session(url) is session)
+
+    @patch('gofer.messaging.adapter.reactor.model.Connection')
+    def test_open(self, _connection):
+        url = 'reactor-session-open'
+        connection = MagicMock()
+        _connection.return_value = connection
+        sender = Mock()
+        receiver = Mock()
+        connection.receiver.return_value = receiver
+        connection.sender.return_value = sender
+
+        # test
+        session = Session(url)
+        session.open()
+        session.open()
+
+        # validation
+        connection.open.assert_called_once_with()
+        connection.sender.assert_called_once_with(model.ADDRESS)
+        connection.receiver.assert_called_once_with(
+            model.ADDRESS, dynamic=True, credit=model.CREDIT)
+        self.assertEqual(session.sender, sender)
+        self.assertEqual(session.receiver, receiver)
+
+    @patch('gofer.messaging.adapter.reactor.model.Connection')
+    def test_repair(self, _connection):
+        url = 'reactor-session-repair'
+        connection = MagicMock()
+        _connection.return_value = connection
+        sender = Mock()
+        receiver = Mock()
+        connection.receiver.return_value = receiver
+        connection.sender.return_value = sender
+
+        # test
+        session = Session(url)
+        session.close = Mock()
+        session.repair()
+
+        # validation
+        session.close.assert_called_once_with()
+        connection.repair.assert_called_once_with()
+        connection.sender.assert_called_once_with(model.ADDRESS)
+        connection.receiver.assert_called_once_with(
+            model.ADDRESS, dynamic=True, credit=model.CREDIT)
+        self.assertEqual(session.sender, sender)
+        self.assertEqual(session.receiver, receiver)
+        self.assertEqual(session.generation, 1)
+
+    @patch('gofer.messaging.adapter.reactor.model.Connection', MagicMock())
+    def test_close(self):
+        sender = Mock()
+        receiver = Mock()
+        session = Session('reactor-session-close')
+        session.sender = sender
+        session.receiver = receiver
+
+        # test
+        session.close()
+        session.close()
+
+        # validation
+        receiver.close.assert_called_once_with()
+        sender.close.assert_called_once_with()
+        self.assertFalse(session.is_open())
+
+    @patch('gofer.messaging.adapter.reactor.model.Connection', MagicMock())
+    def test_send(self):
+        request = Mock()
+        session = Session('reactor-session-send')
+        session.sender = Mock()
+        session.receiver = Mock()
+        session.send(request)
+        self.assertEqual(request.reply_to, session.receiver.address)
+        session.sender.send.assert_called_once_with(request)
+
+    @patch('gofer.messaging.adapter.reactor.model.Delivery')
+    @patch('gofer.messaging.adapter.reactor.model.Connection', MagicMock())
+    def test_fetch(self, delivery):
+        reply = Mock()
+        session = Session('reactor-session-fetch')
+        session.receiver = Mock()
+        session.receiver.get.return_value = (reply, 1)
+        fetched = session.fetch(10)
+        session.receiver.get.assert_called_once_with(10)
+        session.receiver.settle.assert_called_once_with([1], delivery.ACCEPTED)
+        self.assertEqual(fetched, reply)
+
+    @patch('gofer.messaging.adapter.reactor.model.Connection', MagicMock())
+    def test_fetch_timeout(self):
+        session = Session('reactor-session-fetch-timeout')
+        session.receiver = Mock()
+        session.receiver.get.return_value = None
+        reply = session.fetch(10)
+        self.assertEqual(reply, None)
+        self.assertFalse(session.receiver.settle.called)
+
+
+class TestMethod(TestCase):
+
+    @patch('gofer.messaging.adapter.reactor.model.Session')
+    def test_init(self, _session):
+        url = 'test-url'
+        name = model.CREATE
+        arguments = {'a': 1}
+        method = Method(url, name, arguments)
+        _session.assert_called_once_with(url)
+        self.assertEqual(method.url, url)
+        self.assertEqual(method.name, name)
+        self.assertEqual(method.arguments, arguments)
+        self.assertEqual(method.session, _session.return_value)
+
+    @patch('gofer.messaging.adapter.reactor.model.Session', Mock())
+    def test_body(self):
+        name = model.CREATE
+        arguments = {'a': 1}
+        method = Method('', name, arguments)
+        self.assertEqual(
+            method.body,
+            {
+                '_object_id': model.OBJECT_ID,
+                '_method_name': name,
+                '_arguments': arguments
+            })
+
+    @patch('gofer.messaging.adapter.reactor.model.Session', Mock())
+    def test_properties(self):
+        method = Method('', model.CREATE, {})
+        self.assertEqual(
+            method.properties,
+            {
+                'qmf.opcode': '_method_request',
+                'x-amqp-0-10.app-id': 'qmf2',
+                'method': 'request'
+            })
+
+    @patch('gofer.messaging.adapter.reactor.model.Session', Mock())
+    def test_reply_succeeded(self):
+        body = ''
+        properties = {
+            'qmf.opcode': ''
+        }
+        reply = Mock(body=body, properties=properties)
+        method = Method('', '', {})
+        method.on_reply(reply)
+
+    @patch('gofer.messaging.adapter.reactor.model.Session', Mock())
+    def test_reply_failed(self):
+        values = {
+            'error_code': 18,
+            'error_text': 'just failed'
+        }
+        body = {'_values': values}
+        properties = {
+            'qmf.opcode': '_exception'
+        }
+        reply = Mock(body=body, properties=properties)
+        method = Method('', '', {})
+        self.assertRaises(Error, method.on_reply, reply)
+
+    @patch('gofer.messaging.adapter.reactor.model.Session', Mock())
+    def test_reply_already_exists(self):
+        values = {
+            'error_code': model.EEXIST,
+            'error_text': 'just failed'
+        }
+        body = {'_values': values}
+        properties = {
+            'qmf.opcode': '_exception'
+        }
+        reply = Mock(body=body, properties=properties)
+        method = Method('', '', {})
+        method.on_reply(reply)
+
+    @patch('gofer.messaging.adapter.reactor.model.Session', Mock())
+    def test_reply_resent_delete_not_found(self):
+        values = {
+            'error_code': 18,
+            'error_text': 'not-found: Delete failed. No such queue: q1'
+        }
+        body = {'_values': values}
+        properties = {
+            'qmf.opcode': '_exception'
+        }
+        reply = Mock(body=body, properties=properties)
+        # resent
+        method = Method('', model.DELETE, {})
+        method.on_reply(reply, True)
+        # not resent
+        self.assertRaises(Error, method.on_reply, reply)
+        # not delete
+        method = Method('', model.CREATE, {})
+        self.assertRaises(Error, method.on_reply, reply, True)
+
+    @patch('gofer.messaging.adapter.reactor.model.uuid4')
+    @patch('gofer.messaging.adapter.reactor.model.Message')
+    @patch('gofer.messaging.adapter.reactor.model.Session')
+    def test_call(self, _session, message, uuid):
+        url = 'url-test'
+        name = model.CREATE
+        arguments = {'a': 1}
+        uuid.return_value = '5138'
+        session = _session.return_value
+        session.request.return_value = (Mock(), False)
+
+        # test
+        method = Method(url, name, arguments)
+        method.on_reply = Mock()
+        method()
+
+        # validation
+        message.assert_called_once_with(
+            body=method.body,
+            properties=method.properties,
+            correlation_id=str(uuid.return_value),
+            subject=model.SUBJECT
+        )
+        session.request.assert_called_once_with(
+            message.return_value, str(uuid.return_value))
+        method.on_reply.assert_called_once_with(session.request.return_value[0], False)
+
+    @patch('gofer.messaging.adapter.reactor.model.Session')
+    def test_call_aborted(self, _session):
+        session = _session.return_value
+        session.request.side_effect = Aborted
+
+        # test
+        method = Method('url-test', model.CREATE, {})
+        method.on_reply = Mock()
+        self.assertRaises(Aborted, method)
+
+        # validation
+        self.assertFalse(method.on_reply.called)
+
+
+class TestExchange(TestCase):
+
+    def test_init(self):
+        name = 'test-exchange'
+        policy = 'direct'
+
+        # test
+        exchange = Exchange(name, policy=policy)
+
+        # validation
+        self.assertTrue(isinstance(exchange, BaseExchange))
+        self.assertEqual(exchange.name, name)
+        self.assertEqual(exchange.policy, policy)
+
+    @patch('gofer.messaging.adapter.reactor.model.Method')
+    def test_declare(self, method):
+        url = 'test-url'
+
+        # test
+        exchange = Exchange('test', policy='direct')
+        exchange.durable = 0
+        exchange.auto_delete = 1
+        exchange.declare(url)
+
+        # validation
+        arguments = {
+            'strict': True,
+            'name': exchange.name,
+            'type': 'exchange',
+            'exchange-type': exchange.policy,
+            'properties': {
+                'auto-delete': exchange.auto_delete,
+                'durable': exchange.durable
+            }
+        }
+        method.assert_called_once_with(url, model.CREATE, arguments)
+        method.return_value.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.model.Method')
+    def test_delete(self, method):
+        url = 'test-url'
+
+        # test
+        exchange = Exchange('test')
+        exchange.delete(url)
+
+        # validation
+        arguments = {
+            'strict': True,
+            'name': exchange.name,
+            'type': 'exchange',
+            'properties': {}
+        }
+        method.assert_called_once_with(url, model.DELETE, arguments)
+        method.return_value.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.model.Method')
+    def test_bind(self, method):
+        url = 'test-url'
+        queue = Queue('test-queue')
+
+        # test
+        exchange = Exchange('test')
+        exchange.bind(queue, url)
+
+        # validation
+        arguments = {
+            'strict': True,
+            'name': '/'.join((exchange.name, queue.name, queue.name)),
+            'type': 'binding',
+            'properties': {}
+        }
+        method.assert_called_once_with(url, model.CREATE, arguments)
+        method.return_value.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.model.Method')
+    def test_unbind(self, method):
+        url = 'test-url'
+        queue = Queue('test-queue')
+
+        # test
+        exchange = Exchange('test')
+        exchange.unbind(queue, url)
+
+        # validation
+        arguments = {
+            'strict': True,
+            'name': '/'.join((exchange.name, queue.name, queue.name)),
+            'type': 'binding',
+            'properties': {}
+        }
+        method.assert_called_once_with(url, model.DELETE, arguments)
+        method.return_value.assert_called_once_with()
+
+
+class TestQueue(TestCase):
+
+    def test_init(self):
+        name = 'test-queue'
+
+        # test
+        queue = Queue(name)
+
+        # validation
+        self.assertTrue(isinstance(queue, BaseQueue))
+        self.assertEqual(queue.name, name)
+
+    @patch('gofer.messaging.adapter.reactor.model.Method')
+    def test_declare(self, method):
+        url = 'test-url'
+
+        # test
+        queue = Queue('test-queue')
+        queue.durable = 0
+        queue.auto_delete = True
+        queue.expiration = 10
+        queue.exclusive = 3
+        queue.declare(url)
+
+        # validation
+        arguments = {
+            'strict': True,
+            'name': queue.name,
+            'type': 'queue',
+            'properties': {
+                'exclusive': queue.exclusive,
+                'auto-delete': queue.auto_delete,
+                'durable': queue.durable
+            }
+        }
+        method.assert_called_once_with(url, model.CREATE, arguments)
+        method.return_value.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.model.Method')
+    def test_delete(self, method):
+        url = 'test-url'
+
+        # test
+        queue = Queue('test-queue')
+        queue.delete(url)
+
+        # validation
+        arguments = {
+            'strict': True,
+            'name': queue.name,
+            'type': 'queue',
+            'properties': {}
+        }
+        method.assert_called_once_with(url, model.DELETE, arguments)
+        method.return_value.assert_called_once_with()
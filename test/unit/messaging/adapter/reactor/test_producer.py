@@ -0,0 +1,78 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.devel import ipatch
+
+with ipatch('proton'):
+    from gofer.messaging.adapter.reactor.producer import Sender, BaseSender, Links
+
+
+class TestSender(TestCase):
+
+    @patch('gofer.messaging.adapter.reactor.producer.Connection')
+    def test_init(self, connection):
+        url = 'test-url'
+        sender = Sender(url)
+        connection.assert_called_once_with(url)
+        self.assertTrue(isinstance(sender, BaseSender))
+        self.assertEqual(sender.connection, connection.return_value)
+        self.assertTrue(isinstance(sender.links, Links))
+
+    @patch('gofer.messaging.adapter.reactor.producer.Connection')
+    def test_open(self, connection):
+        connection.return_value.is_open.return_value = False
+        sender = Sender('')
+        sender.open()
+        connection.return_value.open.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.producer.Connection')
+    def test_repair(self, connection):
+        sender = Sender('')
+        sender.links = Mock()
+        sender.repair()
+        sender.links.clear.assert_called_once_with()
+        connection.return_value.repair.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.reactor.producer.build_message')
+    @patch('gofer.messaging.adapter.reactor.producer.Connection')
+    def test_send(self, connection, build):
+        link = Mock()
+        connection.return_value.sender.return_value = link
+        sender = Sender('')
+
+        # test
+        sender.send('q1', 'hello', ttl=10)
+        sender.send('q1', 'hello')
+
+        # validation
+        connection.return_value.sender.assert_called_once_with('q1')
+        build.assert_any_call('hello', 10, sender.durable)
+        self.assertEqual(link.send.call_count, 2)
+        self.assertEqual(sender.links.find('q1'), link)
+
+    @patch('gofer.messaging.adapter.reactor.producer.build_message', Mock())
+    @patch('gofer.messaging.adapter.reactor.producer.Connection')
+    def test_send_failed(self, connection):
+        link = Mock()
+        link.send.side_effect = ValueError
+        connection.return_value.sender.return_value = link
+        sender = Sender('')
+
+        # test
+        self.assertRaises(ValueError, sender.send, 'q1', 'hello')
+
+        # validation
+        link.close.assert_called_once_with()
+        self.assertEqual(len(sender.links), 0)
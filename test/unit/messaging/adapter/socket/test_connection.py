@@ -0,0 +1,138 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import socket
+
+from errno import ECONNREFUSED
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.messaging.adapter.model import BaseConnection, NotFound
+from gofer.messaging.adapter.socket import wire
+from gofer.messaging.adapter.socket.connection import Connection, Error
+
+
+class TestConnection(TestCase):
+
+    def test_init(self):
+        url = 'socket+tcp://test-init:1'
+        c = Connection(url)
+        self.assertTrue(isinstance(c, BaseConnection))
+        self.assertEqual(c.url, url)
+        self.assertEqual(c._impl, None)
+        self.assertEqual(c.generation, 0)
+
+    @patch('gofer.messaging.adapter.socket.connection.Server')
+    @patch('gofer.messaging.adapter.socket.connection.wire.Address')
+    def test_open(self, address, server):
+        url = 'socket+tcp://test-open:1'
+
+        # test
+        c = Connection(url)
+        c.open()
+        c.open()
+
+        # validation
+        address.find.assert_called_once_with(url)
+        address.find.return_value.connect.assert_called_once_with()
+        self.assertFalse(server.listen.called)
+        self.assertEqual(c._impl, address.find.return_value.connect.return_value)
+        self.assertEqual(c.generation, 1)
+
+    @patch('gofer.messaging.adapter.socket.connection.Connector')
+    @patch('gofer.messaging.adapter.socket.connection.Server')
+    @patch('gofer.messaging.adapter.socket.connection.wire.Address')
+    def test_open_listen(self, address, server, connector):
+        url = 'socket+tcp://test-open-listen:1'
+        sock = Mock()
+        _address = address.find.return_value
+        _address.connect.side_effect = [socket.error(ECONNREFUSED, 'refused'), sock]
+
+        # test
+        connector.find.return_value.listen = True
+        c = Connection(url)
+        c.open()
+
+        # validation
+        connector.find.assert_called_once_with(url)
+        server.listen.assert_called_once_with(_address)
+        self.assertEqual(c._impl, sock)
+
+    @patch('gofer.messaging.adapter.socket.connection.Connector')
+    @patch('gofer.messaging.adapter.socket.connection.Server')
+    @patch('gofer.messaging.adapter.socket.connection.wire.Address')
+    def test_open_not_listener(self, address, server, connector):
+        url = 'socket+tcp://test-open-not-listener:1'
+        _address = address.find.return_value
+        _address.connect.side_effect = socket.error(ECONNREFUSED, 'refused')
+
+        # test
+        connector.find.return_value.listen = False
+        c = Connection(url)
+        c.retry = False
+        self.assertRaises(socket.error, c.open)
+
+        # validation
+        self.assertFalse(server.listen.called)
+        self.assertEqual(c._impl, None)
+
+    @patch('gofer.messaging.adapter.socket.connection.wire.Address')
+    def test_repair(self, address):
+        url = 'socket+tcp://test-repair:1'
+        sock = address.find.return_value.connect.return_value
+
+        # test
+        c = Connection(url)
+        c.open()
+        c.repair()
+
+        # validation
+        sock.close.assert_called_once_with()
+        self.assertTrue(c.is_open())
+        self.assertEqual(c.generation, 2)
+
+    def test_close(self):
+        c = Connection('socket+tcp://test-close:1')
+        sock = Mock()
+        sock.close.side_effect = socket.error
+        c._impl = sock
+        c.close()
+        c.close()
+        sock.close.assert_called_once_with()
+        self.assertFalse(c.is_open())
+
+    @patch('gofer.messaging.adapter.socket.connection.wire.recv')
+    @patch('gofer.messaging.adapter.socket.connection.wire.send')
+    def test_call(self, send, recv):
+        c = Connection('socket+tcp://test-call:1')
+        c._impl = Mock()
+        recv.return_value = (dict(status=wire.OK, tag=1), 'hello')
+
+        # test
+        reply = c.call('get', reader='r1', timeout=10)
+
+        # validation
+        send.assert_called_once_with(c._impl, dict(op='get', reader='r1', timeout=10), '')
+        recv.assert_called_once_with(c._impl)
+        self.assertEqual(reply, (dict(tag=1), 'hello'))
+
+    @patch('gofer.messaging.adapter.socket.connection.wire.recv')
+    @patch('gofer.messaging.adapter.socket.connection.wire.send')
+    def test_call_failed(self, send, recv):
+        c = Connection('socket+tcp://test-call-failed:1')
+        c._impl = Mock()
+        recv.side_effect = [
+            (dict(status=wire.NOT_FOUND, description=''), ''),
+            (dict(status=wire.ERROR, description=''), ''),
+        ]
+        self.assertRaises(NotFound, c.call, 'get')
+        self.assertRaises(Error, c.call, 'get')
@@ -0,0 +1,123 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.messaging.adapter.model import BaseReader, Message
+from gofer.messaging.adapter.socket.consumer import Reader
+
+
+class TestReader(TestCase):
+
+    def setUp(self):
+        self.node = Mock()
+        self.node.name = 'q1'
+        self.connection = Mock(generation=1)
+        self.patcher = patch('gofer.messaging.adapter.socket.consumer.Connection')
+        connection = self.patcher.start()
+        connection.return_value = self.connection
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_init(self):
+        url = 'socket+tcp://test-init:1'
+        reader = Reader(self.node, url)
+        self.assertTrue(isinstance(reader, BaseReader))
+        self.assertEqual(reader.connection, self.connection)
+        self.assertEqual(reader.cursor, None)
+        self.assertEqual(reader.generation, 0)
+
+    def test_open(self):
+        reader = Reader(self.node, '')
+        reader.open()
+        reader.open()
+        self.connection.open.assert_called_once_with()
+        self.connection.call.assert_called_once_with('open', reader=reader.cursor, queue='q1')
+        self.assertTrue(reader.is_open())
+        self.assertEqual(reader.generation, 1)
+
+    def test_repair(self):
+        reader = Reader(self.node, '')
+        reader.cursor = 'r0'
+        reader.repair()
+        self.connection.repair.assert_called_once_with()
+        self.assertNotEqual(reader.cursor, 'r0')
+        self.assertTrue(reader.is_open())
+
+    def test_close(self):
+        reader = Reader(self.node, '')
+        reader.cursor = 'r1'
+        self.connection.call.side_effect = ValueError
+        reader.close()
+        reader.close()
+        self.connection.call.assert_called_once_with('close', reader='r1')
+        self.assertFalse(reader.is_open())
+
+    def test_get(self):
+        reader = Reader(self.node, '')
+        reader.cursor = 'r1'
+        reader.generation = 1
+        self.connection.call.return_value = (dict(tag=3), 'hello')
+
+        # test
+        message = reader.get(10)
+
+        # validation
+        self.connection.call.assert_called_once_with('get', reader='r1', timeout=10)
+        self.assertTrue(isinstance(message, Message))
+        self.assertEqual(message._reader, reader)
+        self.assertEqual(message._impl, ('r1', 3))
+        self.assertEqual(message.body, 'hello')
+
+    def test_get_empty(self):
+        reader = Reader(self.node, '')
+        reader.cursor = 'r1'
+        reader.generation = 1
+        self.connection.call.return_value = ({}, '')
+        self.assertEqual(reader.get(10), None)
+
+    def test_get_reopened(self):
+        reader = Reader(self.node, '')
+        reader.cursor = 'r1'
+        self.connection.call.return_value = ({}, '')
+
+        # test
+        reader.get(10)
+
+        # validation
+        self.assertNotEqual(reader.cursor, 'r1')
+        self.assertEqual(reader.generation, 1)
+        self.connection.call.assert_called_with('get', reader=reader.cursor, timeout=10)
+
+    def test_ack(self):
+        reader = Reader(self.node, '')
+        reader.cursor = 'r1'
+        reader.ack(('r1', 1))
+        reader.ack(('r0', 2))
+        self.connection.call.assert_called_once_with('ack', reader='r1', tags=[1])
+
+    def test_ack_batch(self):
+        reader = Reader(self.node, '')
+        reader.cursor = 'r1'
+        reader.ack_batch([('r1', 1), ('r0', 2), ('r1', 3)])
+        reader.ack_batch([('r0', 4)])
+        self.connection.call.assert_called_once_with('ack', reader='r1', tags=[1, 3])
+
+    def test_reject(self):
+        reader = Reader(self.node, '')
+        reader.cursor = 'r1'
+        reader.reject(('r1', 1), False)
+        reader.reject(('r0', 2))
+        self.connection.call.assert_called_once_with(
+            'reject', reader='r1', tag=1, requeue=False)
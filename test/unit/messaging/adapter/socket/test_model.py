@@ -0,0 +1,78 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch
+
+from gofer.messaging.adapter.model import BaseExchange, BaseQueue
+from gofer.messaging.adapter.socket.model import Exchange, Queue
+
+
+class TestExchange(TestCase):
+
+    def test_init(self):
+        exchange = Exchange('e1', policy='fanout')
+        self.assertTrue(isinstance(exchange, BaseExchange))
+        self.assertEqual(exchange.policy, 'fanout')
+
+    @patch('gofer.messaging.adapter.socket.reliability.Connection')
+    def test_declare(self, connection):
+        exchange = Exchange('e1', policy='fanout')
+        exchange.declare('')
+        connection.return_value.call.assert_called_once_with(
+            'declare_exchange', name='e1', policy='fanout')
+
+    @patch('gofer.messaging.adapter.socket.reliability.Connection')
+    def test_delete(self, connection):
+        exchange = Exchange('e1')
+        exchange.delete('')
+        connection.return_value.call.assert_called_once_with('delete_exchange', name='e1')
+
+    @patch('gofer.messaging.adapter.socket.reliability.Connection')
+    def test_bind(self, connection):
+        exchange = Exchange('e1')
+        exchange.bind(Queue('q1'), '')
+        exchange.unbind(Queue('q1'), '')
+        self.assertEqual(
+            connection.return_value.call.call_args_list,
+            [
+                (('bind',), dict(exchange='e1', queue='q1')),
+                (('unbind',), dict(exchange='e1', queue='q1')),
+            ])
+
+
+class TestQueue(TestCase):
+
+    def test_init(self):
+        queue = Queue('q1')
+        self.assertTrue(isinstance(queue, BaseQueue))
+
+    @patch('gofer.messaging.adapter.socket.reliability.Connection')
+    def test_declare(self, connection):
+        queue = Queue('q1')
+        queue.durable = False
+        queue.auto_delete = True
+        queue.expiration = 10
+        queue.declare('')
+        connection.return_value.call.assert_called_once_with(
+            'declare_queue',
+            name='q1',
+            durable=False,
+            auto_delete=True,
+            expiration=10,
+            exclusive=False)
+
+    @patch('gofer.messaging.adapter.socket.reliability.Connection')
+    def test_delete(self, connection):
+        queue = Queue('q1')
+        queue.delete('')
+        connection.return_value.call.assert_called_once_with('delete_queue', name='q1')
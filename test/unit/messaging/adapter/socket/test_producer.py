@@ -0,0 +1,55 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.messaging.adapter.model import BaseSender
+from gofer.messaging.adapter.socket.producer import Sender
+
+
+class TestSender(TestCase):
+
+    @patch('gofer.messaging.adapter.socket.producer.Connection')
+    def test_init(self, connection):
+        url = 'socket+tcp://test-init:1'
+        sender = Sender(url)
+        connection.assert_called_once_with(url)
+        self.assertTrue(isinstance(sender, BaseSender))
+        self.assertEqual(sender.connection, connection.return_value)
+
+    @patch('gofer.messaging.adapter.socket.producer.Connection')
+    def test_open(self, connection):
+        sender = Sender('')
+        sender.open()
+        connection.return_value.open.assert_called_once_with()
+        self.assertEqual(sender.is_open(), connection.return_value.is_open.return_value)
+
+    @patch('gofer.messaging.adapter.socket.producer.Connection')
+    def test_repair(self, connection):
+        sender = Sender('')
+        sender.repair()
+        connection.return_value.repair.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.socket.producer.Connection')
+    def test_close(self, connection):
+        sender = Sender('')
+        sender.close()
+        self.assertFalse(connection.return_value.close.called)
+
+    @patch('gofer.messaging.adapter.socket.producer.Connection')
+    def test_send(self, connection):
+        sender = Sender('')
+        sender.durable = False
+        sender.send('q1', 'hello', 10)
+        connection.return_value.call.assert_called_once_with(
+            'send', body='hello', address='q1', ttl=10, durable=False)
@@ -0,0 +1,71 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import socket
+
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.messaging.adapter.socket.reliability import reliable, DELAY
+from gofer.messaging.adapter.socket.reliability import Endpoint, endpoint
+
+
+class TestReliable(TestCase):
+
+    def test_reliable(self):
+        fn = Mock()
+        messenger = Mock()
+        wrapped = reliable(fn)
+        wrapped(messenger, 2, A=1)
+        fn.assert_called_once_with(messenger, 2, A=1)
+
+    @patch('gofer.messaging.adapter.socket.reliability.sleep')
+    def test_reliable_socket_error(self, sleep):
+        fn = Mock(side_effect=[socket.error, None])
+        messenger = Mock()
+
+        # test
+        wrapped = reliable(fn)
+        wrapped(messenger, 2)
+
+        # validation
+        sleep.assert_called_once_with(DELAY)
+        messenger.repair.assert_called_once_with()
+        self.assertEqual(fn.call_count, 2)
+
+    def test_reliable_other(self):
+        fn = Mock(side_effect=ValueError)
+        wrapped = reliable(fn)
+        self.assertRaises(ValueError, wrapped, Mock())
+
+
+class TestEndpoint(TestCase):
+
+    @patch('gofer.messaging.adapter.socket.reliability.Endpoint')
+    def test_endpoint(self, _endpoint):
+        fn = Mock()
+        wrapped = endpoint(fn)
+        wrapped('url')
+        _endpoint.assert_called_once_with('url')
+        _endpoint.return_value.open.assert_called_once_with()
+        fn.assert_called_once_with(_endpoint.return_value)
+
+    @patch('gofer.messaging.adapter.socket.reliability.Connection')
+    def test_messenger(self, connection):
+        ep = Endpoint('url')
+        ep.open()
+        ep.repair()
+        ep.close()
+        self.assertEqual(ep.is_open(), connection.return_value.is_open.return_value)
+        connection.return_value.open.assert_called_once_with()
+        connection.return_value.repair.assert_called_once_with()
+        self.assertFalse(connection.return_value.close.called)
@@ -0,0 +1,157 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import socket
+
+from unittest import TestCase
+from uuid import uuid4
+
+from mock import Mock, patch
+
+from gofer.messaging.adapter.socket import wire
+from gofer.messaging.adapter.socket.server import Cursor, Handler, Server
+from gofer.messaging.adapter.memory.broker import Broker
+
+
+class TestCursor(TestCase):
+
+    def test_get(self):
+        queue = Mock()
+        cursor = Cursor(queue)
+        message = cursor.get(10)
+        queue.get.assert_called_once_with(10)
+        self.assertEqual(message, (1, queue.get.return_value))
+        self.assertEqual(cursor.unacked, {1: queue.get.return_value})
+
+    def test_get_empty(self):
+        queue = Mock()
+        queue.get.return_value = None
+        cursor = Cursor(queue)
+        self.assertEqual(cursor.get(10), None)
+        self.assertEqual(cursor.tag, 0)
+
+    def test_ack(self):
+        cursor = Cursor(Mock())
+        cursor.unacked = {1: Mock()}
+        cursor.ack(1)
+        cursor.ack(2)
+        self.assertEqual(cursor.unacked, {})
+
+    def test_reject(self):
+        queue = Mock()
+        message = Mock()
+        cursor = Cursor(queue)
+        cursor.unacked = {1: message, 2: Mock()}
+        cursor.reject(1, True)
+        cursor.reject(2, False)
+        queue.requeue.assert_called_once_with(message)
+        self.assertEqual(cursor.unacked, {})
+
+    def test_close(self):
+        queue = Mock()
+        cursor = Cursor(queue)
+        cursor.unacked = {1: 'm1', 2: 'm2'}
+        cursor.close()
+        self.assertEqual(queue.requeue.call_args_list, [(('m2',), {}), (('m1',), {})])
+        queue.detach.assert_called_once_with()
+        self.assertEqual(cursor.unacked, {})
+
+
+class TestHandler(TestCase):
+
+    def setUp(self):
+        self.broker = Broker(uuid4().hex, 0)
+        self.handler = Handler(self.broker, Mock(), ('h1', 1234))
+
+    def call(self, op, body='', **header):
+        header['op'] = op
+        return self.handler.dispatch(header, body)
+
+    def test_send_and_get(self):
+        self.call('declare_queue', name='q1', durable=True)
+        self.call('open', reader='r1', queue='q1')
+        self.call('send', 'hello', address='q1', ttl=None, durable=True)
+        reply, body = self.call('get', reader='r1', timeout=0)
+        self.assertEqual(reply, dict(tag=1, status=wire.OK))
+        self.assertEqual(body, 'hello')
+        reply, body = self.call('get', reader='r1', timeout=0)
+        self.assertEqual(reply, dict(status=wire.OK))
+        self.call('ack', reader='r1', tags=[1])
+        self.assertEqual(self.handler.cursors['r1'].unacked, {})
+
+    def test_reject(self):
+        self.call('declare_queue', name='q1')
+        self.call('open', reader='r1', queue='q1')
+        self.call('send', 'hello', address='q1', ttl=None, durable=True)
+        self.call('get', reader='r1', timeout=0)
+        self.call('reject', reader='r1', tag=1, requeue=True)
+        reply, body = self.call('get', reader='r1', timeout=0)
+        self.assertEqual(reply['tag'], 2)
+        self.assertEqual(body, 'hello')
+
+    def test_close(self):
+        self.call('declare_queue', name='q1')
+        self.call('open', reader='r1', queue='q1')
+        self.call('send', 'hello', address='q1', ttl=None, durable=True)
+        self.call('get', reader='r1', timeout=0)
+        self.handler.close()
+        self.assertEqual(self.handler.cursors, {})
+        self.assertEqual(len(self.broker.queue('q1').messages), 1)
+        self.handler.sock.close.assert_called_once_with()
+
+    def test_not_found(self):
+        reply, body = self.call('get', reader='r1', timeout=0)
+        self.assertEqual(reply['status'], wire.NOT_FOUND)
+        self.call('declare_queue', name='q1')
+        self.call('open', reader='r1', queue='q1')
+        self.call('delete_queue', name='q1')
+        reply, body = self.call('get', reader='r1', timeout=0)
+        self.assertEqual(reply['status'], wire.NOT_FOUND)
+
+    def test_error(self):
+        reply, body = self.call('bind', exchange='e1')
+        self.assertEqual(reply['status'], wire.ERROR)
+
+    @patch('gofer.messaging.adapter.socket.server.wire')
+    def test_run(self, _wire):
+        _wire.recv.side_effect = [({'op': 'delete_queue', 'name': 'q1'}, ''), socket.error]
+        self.handler.run()
+        _wire.send.assert_called_once_with(
+            self.handler.sock, {'status': _wire.OK}, '')
+        self.handler.sock.close.assert_called_once_with()
+
+
+class TestServer(TestCase):
+
+    @patch('gofer.messaging.adapter.socket.server.Server.start')
+    def test_listen(self, start):
+        address = Mock()
+        address.__unicode__ = Mock(return_value='tcp:test-listen:1')
+        server = Server.listen(address)
+        address.listen.assert_called_once_with()
+        start.assert_called_once_with()
+        self.assertEqual(server.sock, address.listen.return_value)
+        self.assertEqual(server.broker.host, 'tcp:test-listen:1')
+        self.assertEqual(Server.servers['tcp:test-listen:1'], server)
+        Server.servers.clear()
+
+    @patch('gofer.messaging.adapter.socket.server.Handler')
+    def test_run(self, handler):
+        sock = Mock()
+        client = Mock()
+        sock.accept.side_effect = [(client, 'peer'), socket.error]
+        address = Mock()
+        server = Server(address, sock)
+        server.run()
+        handler.assert_called_once_with(server.broker, client, 'peer')
+        handler.return_value.start.assert_called_once_with()
+        sock.close.assert_called_once_with()
+        address.unlock.assert_called_once_with()
@@ -0,0 +1,166 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import socket
+
+from errno import EADDRINUSE, ENOSPC
+from tempfile import mkdtemp
+from shutil import rmtree
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from gofer.messaging.adapter.socket import wire
+from gofer.messaging.adapter.socket.wire import Address, ConnectionClosed, FrameError
+
+
+class TestFrames(TestCase):
+
+    def test_send(self):
+        sock = Mock()
+        wire.send(sock, {'op': 'get'}, 'hello')
+        frame = sock.sendall.call_args[0][0]
+        self.assertEqual(frame[:wire.PREFIX.size], wire.PREFIX.pack(13, 5))
+        self.assertEqual(frame[wire.PREFIX.size:], '{"op": "get"}hello')
+
+    def test_recv(self):
+        sock = Mock()
+        sent = Mock()
+        wire.send(sent, {'op': 'get'}, 'hello')
+        frame = sent.sendall.call_args[0][0]
+        stream = [frame]
+
+        def recv(n):
+            chunk = stream[0][:min(n, 3)]
+            stream[0] = stream[0][len(chunk):]
+            return chunk
+
+        sock.recv.side_effect = recv
+        header, body = wire.recv(sock)
+        self.assertEqual(header, {'op': 'get'})
+        self.assertEqual(body, 'hello')
+
+    def test_recv_too_large(self):
+        sock = Mock()
+        sock.recv.return_value = wire.PREFIX.pack(10, wire.MAX_BODY + 1)
+        self.assertRaises(FrameError, wire.recv, sock)
+        sock.recv.return_value = wire.PREFIX.pack(wire.MAX_HEADER + 1, 0)
+        self.assertRaises(FrameError, wire.recv, sock)
+        self.assertTrue(issubclass(FrameError, socket.error))
+
+    def test_read_chunked(self):
+        sock = Mock()
+        sock.recv.side_effect = lambda n: 'x' * n
+        self.assertEqual(len(wire.read(sock, wire.CHUNK * 2)), wire.CHUNK * 2)
+        sock.recv.assert_called_with(wire.CHUNK)
+
+    def test_read_closed(self):
+        sock = Mock()
+        sock.recv.return_value = ''
+        self.assertRaises(ConnectionClosed, wire.read, sock, 10)
+        self.assertTrue(issubclass(ConnectionClosed, socket.error))
+
+
+class TestAddress(TestCase):
+
+    def test_find_tcp(self):
+        address = Address.find('socket+tcp://h1:1234')
+        self.assertEqual(address.family, socket.AF_INET)
+        self.assertEqual(address.address, ('h1', 1234))
+        self.assertEqual(str(address), 'tcp:h1:1234')
+
+    def test_find_unix(self):
+        address = Address.find('socket+unix:///var/run/gofer.sock')
+        self.assertEqual(address.family, socket.AF_UNIX)
+        self.assertEqual(address.address, '/var/run/gofer.sock')
+        self.assertEqual(str(address), 'unix:/var/run/gofer.sock')
+
+    @patch('socket.socket')
+    def test_connect(self, _socket):
+        sock = _socket.return_value
+        address = Address(socket.AF_INET, ('h1', 1234))
+        self.assertEqual(address.connect(), sock)
+        _socket.assert_called_once_with(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt.assert_called_once_with(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.connect.assert_called_once_with(('h1', 1234))
+
+    @patch('socket.socket')
+    def test_connect_failed(self, _socket):
+        sock = _socket.return_value
+        sock.connect.side_effect = socket.error
+        address = Address(socket.AF_UNIX, '/tmp/s')
+        self.assertRaises(socket.error, address.connect)
+        sock.close.assert_called_once_with()
+
+    @patch('gofer.messaging.adapter.socket.wire.os')
+    @patch('socket.socket')
+    def test_listen_unix(self, _socket, os):
+        sock = _socket.return_value
+        os.path.exists.return_value = True
+        address = Address(socket.AF_UNIX, '/tmp/s')
+        address.lock = Mock()
+        self.assertEqual(address.listen(), sock)
+        address.lock.assert_called_once_with()
+        os.unlink.assert_called_once_with('/tmp/s')
+        sock.bind.assert_called_once_with('/tmp/s')
+        sock.listen.assert_called_once_with(wire.BACKLOG)
+
+    @patch('gofer.messaging.adapter.socket.wire.os')
+    @patch('socket.socket')
+    def test_listen_unix_locked(self, _socket, os):
+        sock = _socket.return_value
+        address = Address(socket.AF_UNIX, '/tmp/s')
+        address.lock = Mock(side_effect=socket.error(EADDRINUSE, 'locked'))
+        self.assertRaises(socket.error, address.listen)
+        self.assertFalse(os.unlink.called)
+        self.assertFalse(sock.bind.called)
+        sock.close.assert_called_once_with()
+
+    @patch('socket.socket')
+    def test_listen_tcp(self, _socket):
+        sock = _socket.return_value
+        sock.bind.side_effect = socket.error
+        address = Address(socket.AF_INET, ('h1', 1234))
+        self.assertRaises(socket.error, address.listen)
+        sock.setsockopt.assert_any_call(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.close.assert_called_once_with()
+
+    def test_lock(self):
+        tmp = mkdtemp()
+        try:
+            path = os.path.join(tmp, 'gofer.sock')
+            owner = Address(socket.AF_UNIX, path)
+            other = Address(socket.AF_UNIX, path)
+            owner.lock()
+            owner.lock()
+            self.assertTrue(os.path.exists(path + '.lock'))
+            try:
+                other.lock()
+                self.fail('expected: socket.error')
+            except socket.error, se:
+                self.assertEqual(se.errno, EADDRINUSE)
+            self.assertEqual(other.fp, None)
+            owner.unlock()
+            self.assertEqual(owner.fp, None)
+            other.lock()
+            other.unlock()
+        finally:
+            rmtree(tmp)
+
+    @patch('gofer.messaging.adapter.socket.wire.open', create=True)
+    @patch('gofer.messaging.adapter.socket.wire.flock')
+    def test_lock_failed(self, flock, _open):
+        flock.side_effect = IOError(ENOSPC, 'no space')
+        address = Address(socket.AF_UNIX, '/tmp/s')
+        self.assertRaises(IOError, address.lock)
+        _open.return_value.close.assert_called_once_with()
+        self.assertEqual(address.fp, None)
@@ -10,16 +10,21 @@
 # amqp://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import os
+import sys
 
 from unittest import TestCase
 
 from mock import patch, Mock
 
-from gofer.messaging.adapter.factory import Loader, PACKAGE
+from gofer.messaging.adapter.factory import Manifest, Loader, PACKAGE, MANIFEST, REQUIRED
 from gofer.messaging.adapter.factory import Adapter
 from gofer.messaging.adapter.factory import AdapterError, AdapterNotFound, NoAdaptersLoaded
 from gofer.messaging.adapter.url import URL
 from gofer.messaging.model import ModelError
+from gofer.messaging.adapter import factory
+
+
+PACKAGE_PATH = factory.__file__
 
 
 class TestExceptions(TestCase):
@@ -39,56 +44,128 @@ class TestExceptions(TestCase):
         self.assertEqual(exception.message, AdapterNotFound.DESCRIPTION % name)
 
 
-class TestLoader(TestCase):
+class TestManifest(TestCase):
+
+    def test_init(self):
+        manifest = Manifest('p1', 'pkg.p1', ['A'])
+        self.assertEqual(manifest.name, 'p1')
+        self.assertEqual(manifest.package, 'pkg.p1')
+        self.assertEqual(manifest.provides, ['A'])
+        self.assertTrue(manifest.default)
+        self.assertEqual(manifest.adapter, None)
+        self.assertEqual(manifest.error, None)
+
+    def test_read(self):
+        path = os.path.join(os.path.dirname(PACKAGE_PATH), 'amqp')
+        manifest = Manifest.read(path)
+        self.assertEqual(manifest.name, 'amqp')
+        self.assertEqual(manifest.package, '.'.join((PACKAGE, 'amqp')))
+        self.assertTrue('amqp-0-9-1' in manifest.provides)
+        self.assertTrue(manifest.default)
+        self.assertEqual(manifest.adapter, None)
+
+    def test_read_not_default(self):
+        path = os.path.join(os.path.dirname(PACKAGE_PATH), 'memory')
+        manifest = Manifest.read(path)
+        self.assertEqual(manifest.name, 'memory')
+        self.assertFalse(manifest.default)
+
+    @patch('os.path.isfile')
+    def test_read_no_manifest(self, isfile):
+        isfile.return_value = False
+        self.assertEqual(Manifest.read('/tmp/p1'), None)
+        isfile.assert_called_once_with(os.path.join('/tmp/p1', MANIFEST))
+
+    @patch('__builtin__.__import__')
+    def test_load(self, _import):
+        pkg = Mock(PROVIDES=['A', 'B'])
+        _import.return_value = pkg
+        manifest = Manifest('p1', 'pkg.p1', ['A'])
+
+        # test
+        adapter = manifest.load()
+        manifest.load()
+
+        # validation
+        _import.assert_called_once_with('pkg.p1', {}, {}, REQUIRED)
+        self.assertEqual(adapter, pkg)
+        self.assertEqual(manifest.adapter, pkg)
+        self.assertEqual(manifest.provides, pkg.PROVIDES)
 
-    PACKAGE = 'gofer.testing'
-    FILE = 'test-factory.py'
+    @patch('__builtin__.__import__')
+    def test_load_failed(self, _import):
+        _import.side_effect = ImportError('no module')
+        manifest = Manifest('p1', 'pkg.p1', ['A'])
+
+        # test
+        adapter = manifest.load()
+        manifest.load()
+
+        # validation
+        _import.assert_called_once_with('pkg.p1', {}, {}, REQUIRED)
+        self.assertEqual(adapter, None)
+        self.assertEqual(manifest.error, 'no module')
+
+
+class TestLoader(TestCase):
 
     def test_construction(self):
         ldr = Loader()
         self.assertEqual(ldr.list, [])
         self.assertEqual(ldr.catalog, {})
 
-    @patch('__builtin__.__import__')
+    @patch('gofer.messaging.adapter.factory.Manifest.load')
+    @patch('gofer.messaging.adapter.factory.Manifest.read')
     @patch('os.path.isdir')
     @patch('os.listdir')
-    def test__load(self, _listdir, _isdir, _import):
-        listing = [
-            ['p1', Mock(__name__='p1', PROVIDES=['A', 'B'])],
-            ['p2', Mock(__name__='p2', PROVIDES=['C', 'D'])],
-            ['p3', Mock(__name__='p3', PROVIDES=['E', 'F'])],
-            ['p4', Mock(__name__='p4', PROVIDES=['G', 'H'])],
-            ['p5', AttributeError],
-            ['p6', ImportError],
-            ['f1', None],
-        ]
-
-        loaded = self._loaded(listing)
+    def test__load(self, _listdir, _isdir, read, load):
+        manifests = {
+            'p1': Manifest('p1', 'pkg.p1', ['A', 'B']),
+            'p2': Manifest('p2', 'pkg.p2', ['B', 'p3']),
+            'p3': Manifest('p3', 'pkg.p3', ['C']),
+        }
 
         def isdir(p):
             return os.path.basename(p).startswith('p')
 
-        _listdir.return_value = [p[0] for p in listing]
+        def _read(p):
+            return manifests.get(os.path.basename(p))
+
+        _listdir.return_value = ['p3', 'p1', 'p2', 'p4', 'p5', 'f1']
         _isdir.side_effect = isdir
-        _import.side_effect = [p[1] for p in listing]
+        read.side_effect = _read
+        load.side_effect = [Mock(), None]
+
+        # test
         _list, catalog = Loader._load()
-        self.assertEqual(_list, loaded[0])
-        self.assertEqual(catalog, loaded[1])
-
-    def _loaded(self, listing):
-        _list = []
-        catalog = {}
-        for name, pkg in listing:
-            if not name.startswith('p'):
-                continue
-            if not isinstance(pkg, Mock):
+
+        # validation
+        p1 = manifests['p1']
+        p2 = manifests['p2']
+        p3 = manifests['p3']
+        p4 = _list[3]
+        self.assertEqual(_list[:3], [p1, p2, p3])
+        self.assertEqual(len(_list), 4)
+        self.assertEqual(p4.name, 'p4')
+        self.assertEqual(p4.package, '.'.join((PACKAGE, 'p4')))
+        self.assertEqual(load.call_count, 2)
+        self.assertEqual(catalog['A'], [p1])
+        self.assertEqual(catalog['B'], [p2, p1])
+        self.assertEqual(catalog['p3'], [p3, p2])
+        self.assertEqual(catalog['pkg.p1'], [p1])
+        self.assertEqual(catalog['p4'], [p4])
+        self.assertFalse('p5' in catalog)
+
+    def test__load_not_imported(self):
+        _list, catalog = Loader._load()
+        self.assertEqual([m.name for m in _list], ['amqp', 'memory', 'proton', 'qpid', 'reactor', 'socket'])
+        self.assertEqual([m.name for m in catalog['qpid']], ['qpid', 'proton'])
+        for manifest in _list:
+            self.assertEqual(manifest.adapter, None)
+            if manifest.name in ('memory', 'socket'):
+                # imported by the memory and socket adapter tests
                 continue
-            _list.append(pkg)
-            catalog[name] = pkg
-            catalog['.'.join((PACKAGE, name))] = pkg
-            for c in pkg.PROVIDES:
-                catalog[c] = pkg
-        return _list, catalog
+            self.assertFalse(manifest.package in sys.modules)
 
     @patch('gofer.messaging.adapter.factory.Loader._load')
     def test_load(self, _load):
@@ -112,25 +189,40 @@ class TestLoader(TestCase):
         self.assertEqual(catalog, ldr.catalog)
 
 
+def manifest(adapter=None, default=True):
+    manifest = Mock()
+    manifest.default = default
+    manifest.load.return_value = adapter
+    return manifest
+
+
 class AdapterTest(TestCase):
 
+    def test_select(self):
+        adapter = Mock()
+        manifests = [manifest(), manifest(adapter), manifest(Mock())]
+        self.assertEqual(Adapter.select(manifests), adapter)
+        self.assertFalse(manifests[2].load.called)
+        self.assertEqual(Adapter.select([manifest()]), None)
+
     @patch('gofer.messaging.adapter.factory.Adapter.bindings', {})
     @patch('gofer.messaging.adapter.factory.Loader.load')
     def test_bind(self, _load):
         name = 'qpid'
-        adapter = Mock()
+        manifests = [manifest(Mock())]
         url = URL('redhat.com')
-        _load.return_value = [adapter], {name: adapter}
+        _load.return_value = manifests, {name: manifests}
 
         Adapter.bind(str(url), name)
 
         _load.assert_called_with()
-        self.assertEqual(Adapter.bindings, {url.canonical: adapter})
+        self.assertEqual(Adapter.bindings, {url.canonical: manifests})
+        self.assertFalse(manifests[0].load.called)
 
     @patch('gofer.messaging.adapter.factory.Adapter.bindings', {})
     @patch('gofer.messaging.adapter.factory.Loader.load')
     def test_bind_not_found(self, _load):
-        _load.return_value = [Mock()], {'A': Mock()}
+        _load.return_value = [manifest()], {'A': [manifest()]}
         self.assertRaises(AdapterNotFound, Adapter.bind, '', '')
 
     @patch('gofer.messaging.adapter.factory.Loader.load')
@@ -144,20 +236,44 @@ class AdapterTest(TestCase):
         name = 'A'
         url = '%s+amqp://redhat.com' % name
         adapter = Mock()
-        _load.return_value = [adapter], {name: adapter}
+        manifests = [manifest(adapter)]
+        _load.return_value = manifests, {name: manifests}
 
         p = Adapter.find(url)
 
         _load.assert_called_with()
         self.assertEqual(p, adapter)
 
+    @patch('gofer.messaging.adapter.factory.Adapter.bindings', {})
+    @patch('gofer.messaging.adapter.factory.Loader.load')
+    def test_find_fallback(self, _load):
+        name = 'A'
+        url = '%s+amqp://redhat.com' % name
+        adapter = Mock()
+        manifests = [manifest(), manifest(adapter)]
+        _load.return_value = manifests, {name: manifests}
+
+        p = Adapter.find(url)
+
+        self.assertEqual(p, adapter)
+
+    @patch('gofer.messaging.adapter.factory.Adapter.bindings', {})
+    @patch('gofer.messaging.adapter.factory.Loader.load')
+    def test_find_not_imported(self, _load):
+        name = 'A'
+        url = '%s+amqp://redhat.com' % name
+        manifests = [manifest()]
+        _load.return_value = manifests, {name: manifests}
+        self.assertRaises(AdapterNotFound, Adapter.find, url)
+
     @patch('gofer.messaging.adapter.factory.Adapter.bindings', {})
     @patch('gofer.messaging.adapter.factory.Loader.load')
     def test_find_with_binding(self, _load):
         name = 'A'
         url = 'amqp://redhat.com'
         adapter = Mock()
-        _load.return_value = [adapter], {name: adapter}
+        manifests = [manifest(adapter)]
+        _load.return_value = manifests, {name: manifests}
 
         Adapter.bind(url, name)
         p = Adapter.find(url)
@@ -169,11 +285,11 @@ class AdapterTest(TestCase):
     @patch('gofer.messaging.adapter.factory.Loader.load')
     def test_find_not_matched(self, _load):
         url = 'amqp://redhat.com'
-        _list = [1, 2, 3]
+        _list = [manifest(1), manifest(2), manifest(3)]
         catalog = {
-            'C': _list[0],
-            'B': _list[1],
-            'A': _list[2]
+            'C': [_list[0]],
+            'B': [_list[1]],
+            'A': [_list[2]]
         }
         _load.return_value = _list, catalog
         self.assertRaises(AdapterNotFound, Adapter.find, url)
@@ -181,18 +297,35 @@ class AdapterTest(TestCase):
     @patch('gofer.messaging.adapter.factory.Adapter.bindings', {})
     @patch('gofer.messaging.adapter.factory.Loader.load')
     def test_find_without_url(self, _load):
-        _list = [1, 2, 3]
+        _list = [manifest(), manifest(2), manifest(3)]
         catalog = {
-            'C': _list[0],
-            'B': _list[1],
-            'A': _list[2]
+            'C': [_list[0]],
+            'B': [_list[1]],
+            'A': [_list[2]]
         }
         _load.return_value = _list, catalog
         p = Adapter.find('')
-        self.assertEqual(p, _list[0])
+        self.assertEqual(p, 2)
+        self.assertFalse(_list[2].load.called)
+
+    @patch('gofer.messaging.adapter.factory.Adapter.bindings', {})
+    @patch('gofer.messaging.adapter.factory.Loader.load')
+    def test_find_without_url_not_default(self, _load):
+        _list = [manifest(1, default=False), manifest(2)]
+        _load.return_value = _list, {}
+        p = Adapter.find('')
+        self.assertEqual(p, 2)
+        self.assertFalse(_list[0].load.called)
+
+    @patch('gofer.messaging.adapter.factory.Adapter.bindings', {})
+    @patch('gofer.messaging.adapter.factory.Loader.load')
+    def test_find_without_url_not_imported(self, _load):
+        _load.return_value = [manifest()], {}
+        self.assertRaises(NoAdaptersLoaded, Adapter.find, '')
 
     @patch('gofer.messaging.adapter.factory.Adapter.bindings', {})
     @patch('gofer.messaging.adapter.factory.Loader.load')
     def test_find_nothing_loaded(self, _load):
         _load.return_value = [], {}
         self.assertRaises(NoAdaptersLoaded, Adapter.find, '')
+        self.assertRaises(NoAdaptersLoaded, Adapter.find, 'amqp://redhat.com')
@@ -17,7 +17,7 @@ from unittest import TestCase
 
 from mock import patch, Mock
 
-from gofer.messaging.adapter.reliability import blocking, DELAY, DELAY_MULTIPLIER
+from gofer.messaging.adapter.reliability import blocking
 from gofer.messaging.adapter.reliability import MINUTE, DAY, MONTH, WEEK, YEAR
 
 
@@ -42,8 +42,9 @@ class TestBlocking(TestCase):
         fn.assert_called_once_with(reader, timeout)
         self.assertEqual(message, fn.return_value)
 
-    @patch('gofer.messaging.adapter.reliability.sleep')
-    def test_delay(self, sleep):
+    @patch('gofer.messaging.adapter.reliability.time')
+    def test_remaining(self, time):
+        time.side_effect = [100, 102.5, 107]
         received = [
             None,
             None,
@@ -56,28 +57,41 @@ class TestBlocking(TestCase):
         self.assertEqual(
             fn.call_args_list,
             [
-                ((reader, float(timeout)), {}),
-                ((reader, float(timeout - DELAY)), {}),
-                ((reader, float(timeout - (DELAY + (DELAY * DELAY_MULTIPLIER)))), {})
-            ])
-        self.assertEqual(
-            sleep.call_args_list,
-            [
-                ((DELAY,), {}),
-                ((DELAY * DELAY_MULTIPLIER,), {})
+                ((reader, 10.0), {}),
+                ((reader, 7.5), {}),
+                ((reader, 3.0), {})
             ])
         self.assertEqual(message, received[-1])
 
-    @patch('gofer.messaging.adapter.reliability.sleep')
-    def test_call_blocking(self, sleep):
+    @patch('gofer.messaging.adapter.reliability.time')
+    def test_timeout(self, time):
+        time.side_effect = [100, 106, 110.5]
         fn = Mock(return_value=None)
         _fn = blocking(fn)
         reader = Mock()
         timeout = 10
         message = _fn(reader, timeout)
         self.assertEqual(message, None)
-        total = 0.0
-        for call in sleep.call_args_list:
-            total += call[0][0]
-        self.assertEqual(int(total), timeout)
-        self.assertEqual(fn.call_count, 43)
+        self.assertEqual(
+            fn.call_args_list,
+            [
+                ((reader, 10.0), {}),
+                ((reader, 4.0), {})
+            ])
+
+    def test_no_timeout(self):
+        fn = Mock(return_value=None)
+        _fn = blocking(fn)
+        reader = Mock()
+        message = _fn(reader)
+        self.assertEqual(message, None)
+        fn.assert_called_once_with(reader, 0.0)
+
+    @patch('gofer.messaging.adapter.reliability.Thread.aborted')
+    def test_aborted(self, aborted):
+        aborted.return_value = True
+        fn = Mock()
+        _fn = blocking(fn)
+        message = _fn(Mock(), 10)
+        self.assertEqual(message, None)
+        self.assertFalse(fn.called)
@@ -90,6 +90,11 @@ TESTS = [
     Test('',
          scheme='amqp',
          port=5672),
+    Test('socket+unix:///var/run/gofer.sock',
+         adapter='socket',
+         scheme='unix',
+         port=0,
+         path='var/run/gofer.sock'),
 ]
 
 
@@ -118,6 +123,18 @@ class TestURL(TestCase):
         url = URL('amqps://localhost')
         self.assertTrue(url.is_ssl())
 
+    def test_canonical_unix(self):
+        url = URL('socket+unix:///var/run/gofer.sock')
+        self.assertEqual(url.canonical, 'unix:///var/run/gofer.sock')
+
+    def test_is_unix(self):
+        # false
+        url = URL('amqp://localhost')
+        self.assertFalse(url.is_unix())
+        # true
+        url = URL('socket+unix:///var/run/gofer.sock')
+        self.assertTrue(url.is_unix())
+
     def test_hash(self):
         url = URL('test')
         self.assertEqual(hash(url), hash(url.canonical))
@@ -16,7 +16,7 @@ from mock import patch, Mock
 
 from gofer.messaging import Document
 from gofer.messaging.auth import ValidationFailed, Authenticator
-from gofer.messaging.auth import sign, validate
+from gofer.messaging.auth import sign, validate, formats, FORMATS
 from gofer.messaging.auth import peal, load, encode, decode
 
 
@@ -49,6 +49,13 @@ class TestAuthenticator(TestCase):
         self.assertRaises(NotImplementedError, auth.sign, digest)
         self.assertRaises(NotImplementedError, auth.validate, document, digest, signature)
 
+    def test_formats(self):
+        authenticator = Authenticator()
+        authenticator.formats = ('X1',)
+        self.assertEqual(formats(None), FORMATS)
+        self.assertEqual(formats(Authenticator()), FORMATS)
+        self.assertEqual(formats(authenticator), FORMATS + ['X1'])
+
 
 class TestSign(TestCase):
 
@@ -56,7 +63,7 @@ class TestSign(TestCase):
     def test_sign(self, encode):
         message = '{"A":1}'
         signature = 'KLAJDF988R'
-        authenticator = Mock()
+        authenticator = Mock(addressed=False)
         authenticator.sign.return_value = signature
 
         # functional test
@@ -69,15 +76,64 @@ class TestSign(TestCase):
         encode.assert_called_once_with(signature)
         self.assertEqual(signed, '{"message": "{\\"A\\":1}", "signature": "S0xBSkRGOTg4Ug=="}')
 
+    def test_sign_header(self):
+        message = '{"A":1}'
+        authenticator = Mock()
+        authenticator.sign.return_value = 'KLAJDF988R'
+
+        # functional test
+        signed = sign(authenticator, message, header=True)
+
+        # validation
+        self.assertEqual(signed, '\x00S1 sha256 S0xBSkRGOTg4Ug==\n{"A":1}')
+
+    def test_sign_unicode(self):
+        message = u'{"A":"\u00e9"}'
+        authenticator = Mock()
+        authenticator.sign.return_value = 'KLAJDF988R'
+
+        # functional test
+        signed = sign(authenticator, message, header=True)
+
+        # validation
+        self.assertEqual(signed, '\x00S1 sha256 S0xBSkRGOTg4Ug==\n' + message.encode('utf-8'))
+
+    def test_sign_binary(self):
+        message = Document(A=1).dump('binary')
+        authenticator = Mock()
+        authenticator.sign.return_value = 'KLAJDF988R'
+
+        # functional test
+        signed = sign(authenticator, message)
+
+        # validation
+        document, original, signature = peal(signed)
+        self.assertEqual(document.A, 1)
+        self.assertEqual(original, message)
+        self.assertEqual(signature, encode('KLAJDF988R'))
+
     def test_no_authenticator(self):
         message = 'howdy partner'
         signed = sign(None, message)
         self.assertEqual(signed, message)
 
-    @patch('gofer.messaging.auth.sha256')
-    def test_signing_exception(self, sha):
+    def test_sign_session(self):
+        message = '{"A":1}'
+        address = 'q1'
+        authenticator = Mock(addressed=True)
+        authenticator.sign.return_value = 'KLAJDF988R'
+
+        # functional test
+        sign(authenticator, message, address)
+
+        # validation
+        h = sha256()
+        h.update(message)
+        authenticator.sign.assert_called_once_with(h.hexdigest(), address)
+
+    @patch('gofer.messaging.auth.DIGESTS', {'sha256': Mock(side_effect=ImportError)})
+    def test_signing_exception(self):
         message = 'howdy partner'
-        sha.side_effect = ImportError
         signed = sign(Authenticator(), message)
         self.assertEqual(signed, message)
 
@@ -97,6 +153,31 @@ class TestValidation(TestCase):
         decode.assert_called_once_with(signature)
         self.assertEqual(1, validated['A'])
 
+    def test_validate_signed(self):
+        message = '{"A":1}'
+        authenticator = Mock()
+        authenticator.sign.return_value = 'KLAJDF988R'
+        signed = sign(authenticator, message)
+
+        # functional test
+        validated = validate(authenticator, signed)
+
+        # validation
+        h = sha256()
+        h.update(message)
+        authenticator.validate.assert_called_once_with(validated, h.hexdigest(), 'KLAJDF988R')
+        self.assertEqual(1, validated['A'])
+
+    def test_validate_digest_not_supported(self):
+        message = '\x00S1 md5 S0xBSkRGOTg4Ug==\n{"A":1}'
+        authenticator = Mock()
+
+        # functional test
+        self.assertRaises(ValidationFailed, validate, authenticator, message)
+
+        # validation
+        self.assertFalse(authenticator.validate.called)
+
     @patch('gofer.messaging.auth.Document')
     def test_validate_failed(self, _document):
         _document.return_value = Document()
@@ -140,6 +221,13 @@ class TestPeal(TestCase):
         self.assertEqual(original, '{"A":1}')
         self.assertEqual(signature, 'test-signature')
 
+    def test_signed_envelope(self):
+        message = '\x00S1 sha256 test-signature\n{"A":1}'
+        document, original, signature = peal(message)
+        self.assertEqual(document['A'], 1)
+        self.assertEqual(original, '{"A":1}')
+        self.assertEqual(signature, 'test-signature')
+
     def test_unsigned(self):
         message = '{"A":1}'
         document, original, signature = peal(message)
@@ -0,0 +1,139 @@
+# Copyright (c) 2014 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from gofer.common import Options
+from gofer.messaging.codec import Codec, Json, Binary, Encoded
+from gofer.messaging.codec import MARK, JSON, CODECS
+from gofer.messaging.codec import find, detect
+
+
+class Thing(object):
+    pass
+
+
+class TestCodec(TestCase):
+
+    def test_api(self):
+        codec = Codec()
+        self.assertRaises(NotImplementedError, codec.encode, 1)
+        self.assertRaises(NotImplementedError, codec.decode, '')
+
+
+class TestJson(TestCase):
+
+    def test_encode(self):
+        thing = Options(A=1, B=Options(b=[1, Options(c=2)]), C={'x': (1, 2)})
+        s = Json().encode(thing)
+        self.assertEqual(
+            Json().decode(s),
+            {'A': 1, 'B': {'b': [1, {'c': 2}]}, 'C': {'x': [1, 2]}})
+
+    def test_not_serializable(self):
+        self.assertRaises(TypeError, Json().encode, Thing())
+
+    def test_encoded(self):
+        codec = Json()
+        encoded = Encoded(codec, codec.encode(Options(a=[1, 2])))
+        s = codec.encode(Options(A=encoded, B=[encoded]))
+        self.assertEqual(s.count(encoded.content), 2)
+        self.assertEqual(codec.decode(s), {'A': {'a': [1, 2]}, 'B': [{'a': [1, 2]}]})
+
+    def test_encoded_binary(self):
+        encoded = Encoded(Binary(), Binary().encode({'a': 1}))
+        s = Json().encode({'A': encoded})
+        self.assertEqual(Json().decode(s), {'A': {'a': 1}})
+
+
+class TestBinary(TestCase):
+
+    def test_round_trip(self):
+        thing = Options(
+            none=None,
+            true=True,
+            false=False,
+            int=-10,
+            zero=0,
+            long=-2**70,
+            float=1.5,
+            str='hello',
+            unicode=u'\u00e9t\u00e9',
+            bytes='\xff\x00',
+            list=[1, (2, 3)],
+            map={1: 'a'},
+            options=Options(a=Options(b=1)))
+        codec = Binary()
+        s = codec.encode(thing)
+        self.assertTrue(s.startswith(MARK + Binary.TAG))
+        self.assertEqual(
+            codec.decode(s),
+            {
+                'none': None,
+                'true': True,
+                'false': False,
+                'int': -10,
+                'zero': 0,
+                'long': -2**70,
+                'float': 1.5,
+                'str': 'hello',
+                'unicode': u'\u00e9t\u00e9',
+                'bytes': '\xff\x00',
+                'list': [1, [2, 3]],
+                'map': {'1': 'a'},
+                'options': {'a': {'b': 1}},
+            })
+
+    def test_compact(self):
+        thing = Options(sn='123', data=[True, None, 'x' * 10])
+        self.assertTrue(len(Binary().encode(thing)) < len(Json().encode(thing)))
+
+    def test_not_serializable(self):
+        self.assertRaises(TypeError, Binary().encode, Thing())
+
+    def test_encoded(self):
+        codec = Binary()
+        encoded = Encoded(codec, codec.encode({'a': 1}))
+        self.assertEqual(codec.decode(codec.encode([encoded, 2])), [{'a': 1}, 2])
+
+    def test_encoded_json(self):
+        encoded = Encoded(Json(), Json().encode({'a': 1}))
+        codec = Binary()
+        self.assertEqual(codec.decode(codec.encode([encoded])), [{'a': 1}])
+
+    def test_decode_not_tagged(self):
+        self.assertRaises(ValueError, Binary().decode, '{}')
+
+    def test_decode_invalid(self):
+        codec = Binary()
+        s = codec.encode(['hello', 1])
+        self.assertRaises(ValueError, codec.decode, s[:-3])
+        self.assertRaises(ValueError, codec.decode, s[:-9])
+        self.assertRaises(ValueError, codec.decode, s + 'N')
+        self.assertRaises(ValueError, codec.decode, MARK + Binary.TAG + 'X')
+
+
+class TestFunctions(TestCase):
+
+    def test_codecs(self):
+        self.assertEqual(sorted(CODECS), ['binary', 'json'])
+
+    def test_find(self):
+        self.assertEqual(find(None), JSON)
+        self.assertEqual(find('json'), JSON)
+        self.assertTrue(isinstance(find('binary'), Binary))
+        self.assertRaises(ValueError, find, 'xml')
+
+    def test_detect(self):
+        self.assertEqual(detect('{}'), JSON)
+        self.assertEqual(detect(None), JSON)
+        self.assertTrue(isinstance(detect(Binary().encode(1)), Binary))
+        self.assertRaises(ValueError, detect, MARK + 'Z9')
@@ -0,0 +1,64 @@
+# Copyright (c) 2014 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from gofer.messaging import Document, DocumentError
+from gofer.messaging.compression import DecompressionFailed
+from gofer.messaging.compression import compress, decompress
+from gofer.messaging.compression import PREFIX, ZLIB, CODECS
+
+
+class Test(TestCase):
+
+    def test_codecs(self):
+        self.assertEqual(CODECS, [ZLIB])
+
+    def test_decompression_failed(self):
+        details = 'just failed'
+        f = DecompressionFailed(details)
+        self.assertTrue(isinstance(f, DocumentError))
+        self.assertEqual(f.code, DecompressionFailed.CODE)
+        self.assertEqual(f.description, DecompressionFailed.DESCRIPTION)
+        self.assertEqual(f.details, details)
+        self.assertTrue(isinstance(f.document, Document))
+
+    def test_compress(self):
+        message = Document(sn='123', result='x' * 1000).dump()
+        compressed = compress(message, 100)
+        self.assertTrue(compressed.startswith(PREFIX))
+        self.assertTrue(len(compressed) < len(message))
+        document = Document()
+        document.load(compressed)
+        self.assertEqual(document.compression, ZLIB)
+        self.assertEqual(decompress(compressed), message)
+
+    def test_compress_unicode(self):
+        message = Document(sn='123', result=u'\u00e9' * 1000).dump()
+        compressed = compress(unicode(message), 100)
+        self.assertEqual(decompress(compressed), message)
+
+    def test_compress_small(self):
+        message = Document(sn='123').dump()
+        self.assertEqual(compress(message, 1024), message)
+
+    def test_compress_disabled(self):
+        message = Document(sn='123', result='x' * 1000).dump()
+        self.assertEqual(compress(message, 0), message)
+
+    def test_decompress_not_compressed(self):
+        message = Document(sn='123').dump()
+        self.assertEqual(decompress(message), message)
+        self.assertEqual(decompress(None), None)
+
+    def test_decompress_invalid(self):
+        message = PREFIX + '@@@"}'
+        self.assertRaises(DecompressionFailed, decompress, message)
@@ -45,6 +45,7 @@ class TestConsumerThread(TestCase):
         url = 'test-url'
         node = Node('test-queue')
         consumer = ConsumerThread(node, url)
+        consumer.prefetch = 10
         consumer.open = Mock()
         consumer.close = Mock()
         consumer.read = Mock(side_effect=StopIteration)
@@ -57,6 +58,7 @@ class TestConsumerThread(TestCase):
 
         # validation
         reader.assert_called_once_with(node, url)
+        self.assertEqual(reader.return_value.prefetch, consumer.prefetch)
         consumer.open.assert_called_once_with()
         consumer.read.assert_called_once_with()
         consumer.close.assert_called_once_with()
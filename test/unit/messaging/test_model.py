@@ -11,6 +11,8 @@
 
 from unittest import TestCase
 
+from gofer.common import json
+from gofer.messaging.codec import MARK, Binary
 from gofer.messaging.model import VERSION, Document, validate
 from gofer.messaging.model import ModelError, DocumentError, VersionError
 
@@ -87,6 +89,22 @@ class TestDocument(TestCase):
         )
         s = document.dump()
         self.assertEqual(
-            s,
-            '{"A": 1, "B": 2, "C": {"a": 1, "b": 2}, "D": {"x": 10, "y": 20}, '
-            '"E": [1, {}, {}], "F": 10, "G": "howdy", "H": true}')
+            json.loads(s),
+            json.loads(
+                '{"A": 1, "B": 2, "C": {"a": 1, "b": 2}, "D": {"x": 10, "y": 20}, '
+                '"E": [1, {}, {}], "F": 10, "G": "howdy", "H": true}'))
+
+    def test_dump_binary(self):
+        document = Document(
+            A=1,
+            C=Document(a=1, b=2),
+            E=[1, Document(), dict()],
+            G='howdy',
+        )
+        s = document.dump('binary')
+        self.assertTrue(s.startswith(MARK + Binary.TAG))
+        loaded = Document()
+        loaded.load(s)
+        self.assertEqual(
+            loaded.__dict__,
+            {'A': 1, 'C': {'a': 1, 'b': 2}, 'E': [1, {}, {}], 'G': 'howdy'})
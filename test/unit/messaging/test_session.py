@@ -0,0 +1,339 @@
+# Copyright (c) 2015 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch
+
+from gofer.common import json
+from gofer.messaging import Document
+from gofer.messaging.auth import ValidationFailed, Authenticator
+from gofer.messaging.auth import sign, validate, peal, decode, formats
+from gofer.messaging.session import SessionAuthenticator, Key, Peer, PRIME, SKEW
+from gofer.messaging.session import equal, FORMAT
+
+
+class TestEqual(TestCase):
+
+    def test_equal(self):
+        self.assertTrue(equal('abc', 'abc'))
+        self.assertFalse(equal('abc', 'abd'))
+        self.assertFalse(equal('abc', 'ab'))
+
+    @patch('gofer.messaging.session.compare_digest', None)
+    def test_equal_fallback(self):
+        self.assertTrue(equal('abc', 'abc'))
+        self.assertTrue(equal('', ''))
+        self.assertFalse(equal('abc', 'abd'))
+        self.assertFalse(equal('abc', 'ab'))
+
+
+class Signer(Authenticator):
+
+    def __init__(self):
+        self.signed = 0
+        self.validated = 0
+
+    def sign(self, digest):
+        self.signed += 1
+        return 'signed:' + digest
+
+    def validate(self, document, digest, signature):
+        self.validated += 1
+        if signature != 'signed:' + digest:
+            raise ValidationFailed('bad signature', document)
+
+
+class TestKey(TestCase):
+
+    def test_init(self):
+        key = Key(100)
+        self.assertTrue(key.id)
+        self.assertEqual(key.public, pow(2, key.private, PRIME))
+
+    def test_agree(self):
+        key = Key(100)
+        key2 = Key(100)
+        peer = Peer(key.id, key.public, key.expires)
+        peer2 = Peer(key2.id, key2.public, key2.expires)
+        self.assertEqual(key.agree(peer2), key2.agree(peer))
+        self.assertNotEqual(key.agree(peer2), key.agree(peer))
+
+
+class TestPeer(TestCase):
+
+    def test_init(self):
+        peer = Peer(u'p1', 1234, 10.5)
+        self.assertEqual(peer.id, 'p1')
+        self.assertEqual(peer.public, 1234)
+        self.assertEqual(peer.expires, 10)
+
+    def test_public_not_valid(self):
+        self.assertRaises(ValueError, Peer, 'p1', 1, 10)
+        self.assertRaises(ValueError, Peer, 'p1', PRIME - 1, 10)
+
+    @patch('gofer.messaging.session.time')
+    def test_expired(self, _time):
+        _time.return_value = 1000
+        self.assertFalse(Peer('p1', 2, 1000).expired())
+        self.assertTrue(Peer('p1', 2, 600).expired())
+
+
+class TestSessionAuthenticator(TestCase):
+
+    def setUp(self):
+        self.controller = SessionAuthenticator(Signer())
+        self.agent = SessionAuthenticator(Signer())
+
+    def send(self, sender, receiver, address, **body):
+        document = Document(sn=1, routing=(None, address))
+        document += body
+        signed = sign(sender, document.dump(), address)
+        return validate(receiver, signed)
+
+    def request(self, receiver=None, **body):
+        return self.send(
+            self.controller,
+            receiver or self.agent,
+            'agent',
+            replyto='reply',
+            signing=formats(self.controller),
+            **body)
+
+    def reply(self, sender=None):
+        return self.send(sender or self.agent, self.controller, 'reply')
+
+    def handshake(self, agent=None):
+        for n in range(2):
+            self.request(agent)
+            self.reply(agent)
+
+    def token(self, sender, address):
+        signed = sign(sender, Document(routing=(None, address)).dump(), address)
+        return SessionAuthenticator.load(decode(peal(signed)[2]))
+
+    def test_init(self):
+        inner = Signer()
+        authenticator = SessionAuthenticator(inner, 60)
+        self.assertEqual(authenticator.authenticator, inner)
+        self.assertEqual(authenticator.lifetime, 60)
+        self.assertEqual(authenticator.keys, [])
+        self.assertEqual(authenticator.peers, {})
+        self.assertEqual(authenticator.routes, {})
+        self.assertEqual(authenticator.advertised, {})
+
+    def test_wrap(self):
+        inner = Signer()
+        authenticator = SessionAuthenticator.wrap(inner, 60)
+        self.assertEqual(authenticator.authenticator, inner)
+        self.assertEqual(authenticator.lifetime, 60)
+        self.assertEqual(SessionAuthenticator.wrap(inner, 60), authenticator)
+        self.assertNotEqual(SessionAuthenticator.wrap(inner, 30), authenticator)
+        self.assertNotEqual(SessionAuthenticator.wrap(Signer(), 60), authenticator)
+
+    def test_formats(self):
+        self.assertTrue(FORMAT in formats(self.controller))
+        self.assertFalse(FORMAT in formats(Signer()))
+
+    def test_handshake(self):
+        controller = self.controller
+        agent = self.agent
+
+        # request to an unknown peer signed by the wrapped authenticator.
+        self.assertEqual(self.token(controller, 'agent'), None)
+        document = self.request(A=1)
+        self.assertEqual(document.A, 1)
+        self.assertEqual(agent.reached.keys(), ['agent'])
+        self.assertEqual(agent.advertised.keys(), ['reply'])
+
+        # reply signed; carries the public key and announces the agent address.
+        token = self.token(agent, 'reply')
+        self.assertTrue('pub' in token)
+        self.assertTrue('signature' in token)
+        self.assertFalse('mac' in token)
+        self.reply()
+        self.assertEqual(controller.routes, {'agent': agent.keys[-1].id})
+
+        # request authenticated using the session key (with public key).
+        token = self.token(controller, 'agent')
+        self.assertTrue('mac' in token)
+        self.assertTrue('signature' in token)
+        self.assertTrue('pub' in token)
+        self.request(A=2)
+        self.assertEqual(agent.routes, {'reply': controller.keys[-1].id})
+
+        # session proven; reply authenticated using the session key only.
+        token = self.token(agent, 'reply')
+        self.assertTrue('mac' in token)
+        self.assertFalse('pub' in token)
+        self.assertFalse('signature' in token)
+        self.reply()
+
+        # session proven; request authenticated using the session key only.
+        token = self.token(controller, 'agent')
+        self.assertTrue('mac' in token)
+        self.assertFalse('pub' in token)
+        self.assertFalse('signature' in token)
+
+        # asymmetric crypto limited to the handshake.
+        counted = (
+            controller.authenticator.signed,
+            controller.authenticator.validated,
+            agent.authenticator.signed,
+            agent.authenticator.validated)
+        for n in range(10):
+            self.assertEqual(self.request(A=n).A, n)
+            self.reply()
+        self.assertEqual(
+            (controller.authenticator.signed,
+             controller.authenticator.validated,
+             agent.authenticator.signed,
+             agent.authenticator.validated),
+            counted)
+
+    def test_not_advertised(self):
+        requester = Signer()
+
+        # request and reply signed by the wrapped authenticator only.
+        document = Document(sn=1, routing=(None, 'agent'), replyto='reply', signing=formats(requester))
+        validate(self.agent, sign(requester, document.dump(), 'agent'))
+        self.assertEqual(self.agent.advertised, {})
+        self.assertEqual(self.token(self.agent, 'reply'), None)
+        signed = sign(self.agent, Document(sn=1).dump(), 'reply')
+        validate(requester, signed)
+
+    def test_mac_not_valid(self):
+        self.handshake()
+        document = Document(sn=1, routing=(None, 'agent'))
+        signed = sign(self.controller, document.dump(), 'agent', True)
+        signed = signed.replace('"sn": 1', '"sn": 2')
+        self.assertRaises(ValidationFailed, validate, self.agent, signed)
+
+    def test_signature_not_valid(self):
+        self.request()
+        self.reply()
+        document = Document(sn=1, routing=(None, 'agent'))
+        signed = sign(self.controller, document.dump(), 'agent', True)
+        signed = signed.replace('"sn": 1', '"sn": 2')
+        self.assertRaises(ValidationFailed, validate, self.agent, signed)
+
+    def test_no_signature(self):
+        self.request()
+        self.reply()
+        token, key, peer = self.controller._token('agent')
+        token['to'] = 'k0'
+        token['mac'] = self.controller.mac(key, peer, token, '')
+        signature = json.dumps(token)
+        self.assertRaises(ValidationFailed, self.agent.validate, Document(), '', signature)
+
+    def test_peer_not_known(self):
+        self.handshake()
+        agent = SessionAuthenticator(Signer())
+        agent.keys = self.agent.keys
+
+        # session key only; rejected and the peer key is announced.
+        self.assertRaises(ValidationFailed, self.request, agent)
+        self.assertEqual(agent.stale.keys(), [self.controller.keys[-1].id])
+        self.assertEqual(agent.advertised.keys(), ['reply'])
+
+        # the session is proven again.
+        self.reply(agent)
+        self.assertTrue('pub' in self.token(self.controller, 'agent'))
+        self.request(agent)
+        self.assertEqual(agent.stale, {})
+        self.reply(agent)
+        validated = agent.authenticator.validated
+        self.assertEqual(self.request(agent, A=1).A, 1)
+        self.assertEqual(agent.authenticator.validated, validated)
+
+    def test_restarted(self):
+        self.handshake()
+        stale = self.agent.keys[-1].id
+
+        # agent restarted; key not known so the request is rejected.
+        agent = SessionAuthenticator(Signer())
+        self.assertRaises(ValidationFailed, self.request, agent)
+        self.assertTrue(stale in agent.stale)
+
+        # stale key announced; handshake repeated.
+        self.reply(agent)
+        self.assertEqual(self.controller.routes, {})
+        self.assertEqual(self.request(agent, A=1).A, 1)
+        self.reply(agent)
+        self.assertEqual(self.controller.routes, {'agent': agent.keys[-1].id})
+        self.request(agent)
+        self.reply(agent)
+        validated = agent.authenticator.validated
+        self.request(agent)
+        self.assertEqual(agent.authenticator.validated, validated)
+
+    def test_requester_restarted(self):
+        self.handshake()
+        self.controller = SessionAuthenticator(Signer())
+
+        # the reply address is no longer routed to the old session.
+        self.request()
+        self.assertEqual(self.agent.routes, {})
+        token = self.token(self.agent, 'reply')
+        self.assertTrue('pub' in token)
+        self.assertFalse('mac' in token)
+        self.reply()
+
+    def test_shared_address(self):
+        agent2 = SessionAuthenticator(Signer())
+        self.handshake()
+
+        # rejected by another agent reading the address.
+        self.assertRaises(ValidationFailed, self.request, agent2)
+        self.reply(agent2)
+        self.assertEqual(self.controller.routes, {})
+
+        # signed by the wrapped authenticator; validated by both.
+        self.assertEqual(self.request(self.agent, A=1).A, 1)
+        self.assertEqual(self.request(agent2, A=2).A, 2)
+
+    @patch('gofer.messaging.session.STALE', 2)
+    def test_stale_limited(self):
+        for n in range(3):
+            self.assertEqual(self.agent._mine('k%d' % n), None)
+        self.assertEqual(len(self.agent.stale), 2)
+
+    def test_expired(self):
+        self.request()
+        self.reply()
+        self.controller.lifetime = -1000
+        self.controller.keys = []
+        self.assertRaises(ValidationFailed, self.request)
+
+    @patch('gofer.messaging.session.time')
+    def test_rotation(self, _time):
+        _time.return_value = 1000
+        key = self.controller._key()
+        self.assertEqual(self.controller._key(), key)
+        _time.return_value = 1000 + self.controller.lifetime / 2
+        key2 = self.controller._key()
+        self.assertNotEqual(key2, key)
+        self.assertEqual(self.controller.keys, [key, key2])
+        _time.return_value = key.expires + SKEW
+        self.controller._key()
+        self.assertFalse(key in self.controller.keys)
+
+    def test_not_session(self):
+        message = '{"A":1}'
+        signed = sign(Signer(), message)
+        document = validate(self.agent, signed)
+        self.assertEqual(document.A, 1)
+
+    def test_load(self):
+        self.assertEqual(SessionAuthenticator.load('{"key":"k1"}'), {'key': 'k1'})
+        self.assertEqual(SessionAuthenticator.load('{['), None)
+        self.assertEqual(SessionAuthenticator.load('[]'), None)
+        self.assertEqual(SessionAuthenticator.load('KLAJDF988R'), None)
@@ -56,11 +56,32 @@ class TestProgress(TestCase):
         self.assertEqual(reply.payload.completed, p.completed)
         self.assertEqual(reply.payload.details, p.details)
 
+    @patch('gofer.rmi.context.time')
+    def test_report_coalesced(self, _time):
+        _time.side_effect = [100, 100.1, 100.1, 100.2]
+        pipe = Pipe()
+        p = Progress(pipe, 2)
+        p.flusher = Mock()
+
+        # test
+        p.completed = 1
+        self.assertTrue(p.report())
+        p.completed = 2
+        self.assertFalse(p.report())
+        p.flush()
+
+        # validation
+        self.assertEqual(len(pipe.pipe), 2)
+        reply = protocol.Reply.read(pipe)
+        self.assertEqual(reply.payload.completed, 2)
+
 
 class TestCall(TestCase):
 
     @patch(MODULE + '.Context.current')
     def test_call(self, context):
+        context.return_value.progress.rate = 10
+        context.return_value.progress.aggregate = True
         method = Mock(return_value=18)
         pipe = Pipe()
         call = Call(method, 1, 2, a=1, b=2)
@@ -70,7 +91,10 @@ class TestCall(TestCase):
 
         # validation
         reply = protocol.Reply.read(pipe)
-        self.assertTrue(isinstance(context.return_value.progress, Progress))
+        progress = context.return_value.progress
+        self.assertTrue(isinstance(progress, Progress))
+        self.assertEqual(progress.rate, 10)
+        self.assertTrue(progress.aggregate)
         self.assertEqual(reply.code, protocol.Result.CODE)
         self.assertEqual(reply.payload, method.return_value)
 
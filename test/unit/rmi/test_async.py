@@ -11,6 +11,54 @@
 
 from unittest import TestCase
 
+from mock import patch, Mock, NonCallableMock
+
+from gofer.messaging import Document
+from gofer.rmi.async import ReplyConsumer, Partial, Listener
+
 
 class Test(TestCase):
-    pass
\ No newline at end of file
+    pass
+
+
+class TestReplyConsumer(TestCase):
+
+    @patch('gofer.rmi.async.Partial')
+    def test_dispatch_partial(self, partial):
+        document = Document(sn='1', status='partial', seq=0, result=dict(retval='a'))
+        consumer = ReplyConsumer(Mock(), 'amqp://localhost')
+        consumer.listener = Mock()
+
+        # test
+        consumer.dispatch(document)
+
+        # validation
+        partial.assert_called_once_with(document)
+        partial.return_value.notify.assert_called_once_with(consumer.listener)
+        self.assertFalse('1' in consumer.blacklist)
+
+
+class TestPartial(TestCase):
+
+    def test_init(self):
+        document = Document(
+            sn='1', routing=('a', 'b'), timestamp='ts', data=2,
+            status='partial', seq=3, result=dict(retval='a'))
+        partial = Partial(document)
+        self.assertEqual(partial.sn, '1')
+        self.assertEqual(partial.origin, 'a')
+        self.assertEqual(partial.seq, 3)
+        self.assertEqual(partial.retval, 'a')
+        self.assertTrue('seq: 3' in str(partial))
+
+    def test_notify(self):
+        document = Document(sn='1', routing=('a', 'b'), seq=0, result=dict(retval='a'))
+        partial = Partial(document)
+        # callable
+        listener = Mock()
+        partial.notify(listener)
+        listener.assert_called_once_with(partial)
+        # listener
+        listener = NonCallableMock(spec=Listener)
+        partial.notify(listener)
+        listener.partial.assert_called_once_with(partial)
\ No newline at end of file
@@ -9,8 +9,259 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from Queue import Queue
 from unittest import TestCase
 
+from mock import patch, Mock
 
-class Test(TestCase):
-    pass
\ No newline at end of file
+from gofer.messaging import Document
+from gofer.rmi.consumer import StatusSender, RequestConsumer, AUTO, PAUSE
+
+
+class TestStatusSender(TestCase):
+
+    def test_init(self):
+        url = 'amqp://test-init'
+        sender = StatusSender(url)
+        self.assertEqual(sender.url, url)
+        self.assertEqual(sender.thread, None)
+        self.assertEqual(sender.queue.qsize(), 0)
+
+    def test_singleton(self):
+        url = 'amqp://test-singleton'
+        self.assertTrue(StatusSender(url) is StatusSender(url))
+        self.assertFalse(StatusSender(url) is StatusSender(url + '2'))
+
+    @patch('gofer.rmi.consumer.Thread')
+    def test_put(self, thread):
+        url = 'amqp://test-put'
+        thread.return_value.isAlive.return_value = True
+        authenticator = Mock()
+        sender = StatusSender(url)
+        sender.thread = None
+        sender.put(authenticator, 'q', sn=1)
+        sender.put(authenticator, 'q', sn=2)
+        thread.assert_called_once_with(
+            target=sender.run, name='status:%s' % url, args=(sender.queue,))
+        thread.return_value.setDaemon.assert_called_once_with(True)
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual(sender.queue.get(), (authenticator, 'q', {'sn': 1}))
+        self.assertEqual(sender.queue.get(), (authenticator, 'q', {'sn': 2}))
+        self.assertEqual(sorted(sender.pending), [1, 2])
+
+    @patch('gofer.rmi.consumer.Thread')
+    def test_put_stopped(self, thread):
+        stopped = Mock()
+        stopped.isAlive.return_value = False
+        sender = StatusSender('amqp://test-put-stopped')
+        sender.thread = stopped
+        sender.put(None, 'q', sn=1)
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual(sender.thread, thread.return_value)
+
+    def test_wait(self):
+        sender = StatusSender('amqp://test-wait')
+        event = Mock()
+        sender.pending[1] = event
+        sender.wait(1, 3)
+        sender.wait(2)
+        event.wait.assert_called_once_with(3)
+
+    def test_sent(self):
+        sender = StatusSender('amqp://test-sent')
+        event = Mock()
+        sender.pending[1] = event
+        sender.sent(1)
+        sender.sent(2)
+        event.set.assert_called_once_with()
+        self.assertEqual(sender.pending, {})
+
+    def test_shutdown(self):
+        thread = Mock()
+        sender = StatusSender('amqp://test-shutdown')
+        queue = sender.queue
+        sender.thread = thread
+        sender.shutdown(3)
+        self.assertEqual(queue.get(), None)
+        thread.join.assert_called_once_with(3)
+        self.assertEqual(sender.thread, None)
+        self.assertFalse(sender.queue is queue)
+
+    def test_shutdown_not_started(self):
+        sender = StatusSender('amqp://test-shutdown-not-started')
+        sender.thread = None
+        sender.shutdown()
+        self.assertEqual(sender.queue.qsize(), 0)
+
+    @patch('gofer.rmi.consumer.Producer')
+    def test_run(self, producer):
+        url = 'amqp://test-run'
+        authenticator = Mock()
+        producer.return_value.is_open.side_effect = [False, True]
+        sender = StatusSender(url)
+        sender.sent = Mock()
+        queue = Queue()
+        queue.put((authenticator, 'q1', {'sn': 1}))
+        queue.put((authenticator, 'q2', {'sn': 2}))
+        queue.put(None)
+
+        # test
+        sender.run(queue)
+
+        # validation
+        self.assertEqual(sender.sent.call_args_list, [((1,), {}), ((2,), {})])
+        producer.assert_called_once_with(url)
+        producer.return_value.open.assert_called_once_with()
+        self.assertEqual(producer.return_value.authenticator, authenticator)
+        self.assertEqual(
+            producer.return_value.send.call_args_list,
+            [
+                (('q1',), {'sn': 1}),
+                (('q2',), {'sn': 2}),
+            ])
+        producer.return_value.close.assert_called_once_with()
+
+    @patch('gofer.rmi.consumer.Producer')
+    def test_run_failed(self, producer):
+        producer.return_value.send.side_effect = ValueError
+        sender = StatusSender('amqp://test-run-failed')
+        sender.sent = Mock()
+        queue = Queue()
+        queue.put((None, 'q', {'sn': 1, 'status': 'rejected'}))
+        queue.put(None)
+
+        # test
+        sender.run(queue)
+
+        # validation
+        sender.sent.assert_called_once_with(1)
+        self.assertEqual(producer.return_value.close.call_count, 2)
+
+
+class TestRequestConsumer(TestCase):
+
+    @patch('gofer.rmi.consumer.StatusSender')
+    def test_init(self, sender):
+        node = Mock()
+        plugin = Mock(url='amqp://host', prefetch='10')
+        consumer = RequestConsumer(node, plugin)
+        sender.assert_called_once_with(plugin.url)
+        self.assertEqual(consumer.status, sender.return_value)
+        self.assertEqual(consumer.plugin, plugin)
+        self.assertEqual(consumer.scheduler, plugin.scheduler)
+        self.assertFalse(consumer.adaptive)
+        self.assertEqual(consumer.prefetch, 10)
+
+    @patch('gofer.rmi.consumer.StatusSender', Mock())
+    def test_init_not_specified(self):
+        plugin = Mock(prefetch=None)
+        consumer = RequestConsumer(Mock(), plugin)
+        self.assertFalse(consumer.adaptive)
+        self.assertEqual(consumer.prefetch, 0)
+
+    @patch('gofer.rmi.consumer.StatusSender', Mock())
+    def test_init_adaptive(self):
+        plugin = Mock(prefetch=AUTO)
+        plugin.pool.capacity = 4
+        plugin.scheduler.pending.journal = {}
+        consumer = RequestConsumer(Mock(), plugin)
+        self.assertTrue(consumer.adaptive)
+        self.assertEqual(consumer.prefetch, 4)
+
+    @patch('gofer.rmi.consumer.StatusSender', Mock())
+    def test_init_adaptive_saturated(self):
+        plugin = Mock(prefetch=AUTO)
+        plugin.pool.capacity = 1
+        plugin.scheduler.pending.journal = {1: 1, 2: 2}
+        consumer = RequestConsumer(Mock(), plugin)
+        self.assertEqual(consumer.prefetch, 1)
+
+    @patch('gofer.rmi.consumer.StatusSender', Mock())
+    def test_window(self):
+        plugin = Mock(prefetch='0')
+        plugin.pool.capacity = 4
+        plugin.scheduler.pending.journal = {1: 1}
+        consumer = RequestConsumer(Mock(), plugin)
+        self.assertEqual(consumer.window(), 3)
+
+    @patch('gofer.messaging.consumer.ConsumerThread.read')
+    @patch('gofer.rmi.consumer.StatusSender', Mock())
+    def test_read(self, read):
+        plugin = Mock(prefetch='10')
+        consumer = RequestConsumer(Mock(), plugin)
+        consumer.reader = Mock()
+        consumer.read()
+        read.assert_called_once_with()
+        self.assertFalse(consumer.reader.flow.called)
+
+    @patch('gofer.messaging.consumer.ConsumerThread.read')
+    @patch('gofer.rmi.consumer.StatusSender', Mock())
+    def test_read_adaptive(self, read):
+        plugin = Mock(prefetch=AUTO)
+        plugin.pool.capacity = 4
+        plugin.scheduler.pending.journal = {}
+        consumer = RequestConsumer(Mock(), plugin)
+        consumer.reader = Mock(prefetch=4)
+        # unchanged
+        consumer.read()
+        self.assertFalse(consumer.reader.flow.called)
+        # changed
+        plugin.scheduler.pending.journal = {1: 1}
+        consumer.read()
+        consumer.reader.flow.assert_called_once_with(3)
+        self.assertEqual(read.call_count, 2)
+
+    @patch('gofer.rmi.consumer.sleep')
+    @patch('gofer.messaging.consumer.ConsumerThread.read')
+    @patch('gofer.rmi.consumer.StatusSender', Mock())
+    def test_read_adaptive_saturated(self, read, sleep):
+        plugin = Mock(prefetch=AUTO)
+        plugin.pool.capacity = 1
+        plugin.scheduler.pending.journal = {1: 1}
+        consumer = RequestConsumer(Mock(), plugin)
+        consumer.reader = Mock()
+        consumer.read()
+        sleep.assert_called_once_with(PAUSE)
+        self.assertFalse(consumer.reader.flow.called)
+        self.assertFalse(read.called)
+
+    @patch('gofer.rmi.consumer.timestamp')
+    @patch('gofer.rmi.consumer.StatusSender')
+    def test_send(self, sender, timestamp):
+        request = Document(sn=1, data=2, replyto='q')
+        consumer = RequestConsumer(Mock(), Mock(prefetch=None))
+        consumer.authenticator = Mock()
+        consumer.send(request, 'rejected', code=3)
+        sender.return_value.put.assert_called_once_with(
+            consumer.authenticator,
+            request.replyto,
+            sn=request.sn,
+            data=request.data,
+            status='rejected',
+            timestamp=timestamp.return_value,
+            code=3)
+
+    @patch('gofer.rmi.consumer.StatusSender')
+    def test_send_no_replyto(self, sender):
+        request = Document(sn=1)
+        consumer = RequestConsumer(Mock(), Mock(prefetch=None))
+        consumer.send(request, 'rejected')
+        self.assertFalse(sender.return_value.put.called)
+
+    @patch('gofer.rmi.consumer.StatusSender', Mock())
+    def test_dispatch(self):
+        request = Document(sn=1)
+        plugin = Mock(prefetch=None)
+        consumer = RequestConsumer(Mock(), plugin)
+        consumer.send = Mock(side_effect=lambda *a: self.assertFalse(plugin.scheduler.add.called))
+        consumer.dispatch(request)
+        consumer.send.assert_called_once_with(request, 'accepted')
+        plugin.scheduler.add.assert_called_once_with(request)
+
+    @patch('gofer.messaging.consumer.ConsumerThread.run')
+    @patch('gofer.rmi.consumer.StatusSender')
+    def test_run(self, sender, run):
+        run.side_effect = ValueError
+        consumer = RequestConsumer(Mock(), Mock(prefetch=None))
+        self.assertRaises(ValueError, consumer.run)
+        sender.return_value.shutdown.assert_called_once_with()
\ No newline at end of file
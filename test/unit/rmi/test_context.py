@@ -1,8 +1,9 @@
 from unittest import TestCase
 
-from mock import Mock, patch
+from mock import Mock, MagicMock, patch
 
-from gofer.rmi.context import Context, Progress, Cancelled
+from gofer.common import Options
+from gofer.rmi.context import Context, Flusher, Reporter, Progress, Cancelled
 
 
 MODULE = 'gofer.rmi.context'
@@ -35,6 +36,179 @@ class TestContext(TestCase):
         self.assertEqual(Context._current.inst, None)
 
 
+class TestReporter(TestCase):
+
+    def test_init(self):
+        reporter = Reporter(10)
+        self.assertEqual(reporter.total, 0)
+        self.assertEqual(reporter.completed, 0)
+        self.assertEqual(reporter.details, {})
+        self.assertEqual(reporter.rate, 10)
+        self.assertFalse(reporter.aggregate)
+        self.assertFalse(reporter.pending)
+        self.assertEqual(reporter.due, None)
+        self.assertTrue(isinstance(reporter.flusher, Flusher))
+
+    def test_send(self):
+        reporter = Reporter()
+        self.assertRaises(NotImplementedError, reporter.send)
+
+    def test_configure(self):
+        reporter = Reporter(10)
+        reporter.configure(Options(aggregate=True))
+        self.assertEqual(reporter.rate, 10)
+        self.assertTrue(reporter.aggregate)
+        reporter.configure(Options(rate=0))
+        self.assertEqual(reporter.rate, 0)
+        self.assertTrue(reporter.aggregate)
+
+    def test_report(self):
+        reporter = Reporter()
+        reporter.send = Mock()
+        for n in range(3):
+            self.assertTrue(reporter.report())
+        self.assertEqual(reporter.send.call_count, 3)
+
+    @patch(MODULE + '.time')
+    def test_report_coalesced(self, _time):
+        _time.side_effect = [100, 100.1, 100.1, 100.4, 100.5]
+        reporter = Reporter(2)
+        reporter.flusher = Mock()
+        reporter.send = Mock()
+
+        # test
+        sent = [reporter.report() for n in range(4)]
+
+        # validation
+        self.assertEqual(sent, [True, False, False, True])
+        self.assertEqual(reporter.send.call_count, 2)
+        self.assertFalse(reporter.pending)
+        self.assertEqual(reporter.flusher.add.call_count, 1)
+        self.assertEqual(reporter.flusher.add.call_args[0][0], reporter)
+        self.assertAlmostEqual(reporter.flusher.add.call_args[0][1], 100.5)
+        self.assertEqual(reporter.due, None)
+
+    @patch(MODULE + '.IDLE', 0.01)
+    def test_report_flushed(self):
+        reporter = Reporter(20)
+        reporter.flusher = Flusher()
+        reporter.send = Mock()
+
+        # test
+        reporter.report()
+        reporter.report()
+        thread = reporter.flusher.thread
+        thread.join(0.5)
+        thread.abort()
+        thread.join()
+
+        # validation
+        self.assertEqual(reporter.send.call_count, 2)
+        self.assertFalse(reporter.pending)
+        self.assertEqual(reporter.due, None)
+
+    @patch(MODULE + '.time')
+    def test_flush(self, _time):
+        _time.side_effect = [100, 100.1, 100.1, 100.2]
+        reporter = Reporter(2)
+        reporter.flusher = Mock()
+        reporter.send = Mock()
+
+        # test
+        reporter.report()
+        reporter.report()
+        reporter.flush()
+        reporter.flush()
+
+        # validation
+        self.assertEqual(reporter.send.call_count, 2)
+        self.assertFalse(reporter.pending)
+        self.assertEqual(reporter.sent, 100.2)
+        self.assertEqual(reporter.due, None)
+
+    def test_flush_cancelled(self):
+        reporter = Reporter(2)
+        reporter.flusher = Mock()
+        reporter.send = Mock()
+        reporter.pending = True
+
+        # test
+        reporter.schedule(10)
+        due = reporter.due
+        reporter.cancel()
+        reporter.flush(due)
+
+        # validation
+        self.assertTrue(reporter.pending)
+        self.assertFalse(reporter.send.called)
+
+    @patch(MODULE + '.time')
+    def test_drain(self, _time):
+        _time.side_effect = [100, 100.1, 100.1, 100.2]
+        reporter = Reporter(2)
+        reporter.flusher = Mock()
+        reporter.send = Mock()
+
+        # test
+        reporter.report()
+        reporter.report()
+        drained = [reporter.drain(), reporter.drain()]
+
+        # validation
+        self.assertEqual(drained, [True, False])
+        self.assertEqual(reporter.send.call_count, 1)
+        self.assertFalse(reporter.pending)
+        self.assertEqual(reporter.sent, 100.2)
+        self.assertEqual(reporter.due, None)
+
+
+class TestFlusher(TestCase):
+
+    @patch(MODULE + '.Thread')
+    def test_add(self, thread):
+        thread.return_value.isAlive.return_value = True
+        reporter = Mock()
+        flusher = Flusher()
+        flusher.add(reporter, 20)
+        flusher.add(reporter, 10)
+        thread.assert_called_once_with(target=flusher.run, name='progress-flusher')
+        thread.return_value.setDaemon.assert_called_once_with(True)
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual([d for d, k, r in sorted(flusher.scheduled)], [10, 20])
+
+    @patch(MODULE + '.time')
+    def test_next(self, _time):
+        _time.return_value = 100
+        reporter = Mock()
+        flusher = Flusher()
+        flusher.scheduled = [(99, 0, reporter)]
+        self.assertEqual(flusher.next(), (99, reporter))
+        self.assertEqual(flusher.scheduled, [])
+
+    @patch(MODULE + '.time')
+    def test_next_not_due(self, _time):
+        _time.return_value = 100
+        flusher = Flusher()
+        flusher.scheduled = [(100.01, 0, Mock())]
+        self.assertEqual(flusher.next(), None)
+        self.assertEqual(len(flusher.scheduled), 1)
+
+    @patch(MODULE + '.IDLE', 0.01)
+    def test_next_idle(self):
+        flusher = Flusher()
+        self.assertEqual(flusher.next(), None)
+
+    @patch(MODULE + '.Thread')
+    def test_run(self, thread):
+        thread.aborted.side_effect = [False, False, True]
+        reporter = Mock()
+        reporter.flush.side_effect = ValueError
+        flusher = Flusher()
+        flusher.next = Mock(side_effect=[None, (10, reporter)])
+        flusher.run()
+        reporter.flush.assert_called_once_with(10)
+
+
 class TestProgress(TestCase):
 
     def test_report(self):
@@ -82,6 +256,20 @@ class TestProgress(TestCase):
         # validation
         self.assertFalse(producer.send.called)
 
+    def test_report_locked(self):
+        request = Mock(sn=1, data=2, replyto=3)
+        lock = MagicMock()
+        producer = Mock()
+        producer.send.side_effect = lambda *a, **k: lock.__enter__.assert_called_once_with()
+        progress = Progress(request, producer, 0, lock)
+
+        # test
+        progress.report()
+
+        # validation
+        self.assertTrue(producer.send.called)
+        self.assertTrue(lock.__exit__.called)
+
 
 class TestCancelled(TestCase):
 
@@ -11,6 +11,144 @@
 
 from unittest import TestCase
 
+from mock import patch, Mock
+
+from gofer.common import json, Options
+from gofer.decorators import remote, progress
+from gofer.messaging import Document
+from gofer.messaging.codec import JSON
+from gofer.rmi.dispatcher import Reply, Return, Stream, RMI
+
+
+class Dog(object):
+
+    @remote
+    def bark(self):
+        return 'woof'
+
+    @remote
+    @progress(rate=2, aggregate=True)
+    def howl(self):
+        return 'howl'
+
+    @remote(stream=True)
+    def growl(self):
+        yield 'grr'
+
 
 class Test(TestCase):
-    pass
\ No newline at end of file
+    pass
+
+
+class TestReturn(TestCase):
+
+    def test_succeed(self):
+        retval = {'A': 1}
+        inst = Return.succeed(retval)
+        self.assertEqual(inst.retval, retval)
+        self.assertEqual(inst.encoded.codec, JSON)
+        self.assertEqual(json.loads(inst.encoded.content), {'retval': retval})
+        self.assertFalse('encoded' in inst)
+
+    def test_succeed_not_serializable(self):
+        self.assertRaises(TypeError, Return.succeed, object())
+
+    def test_exception(self):
+        try:
+            raise ValueError('bad')
+        except ValueError:
+            inst = Return.exception()
+        self.assertTrue(inst.failed())
+        self.assertEqual(inst.xclass, 'ValueError')
+        self.assertEqual(json.loads(inst.encoded.content)['xargs'], ['bad'])
+        self.assertFalse('encoded' in inst)
+
+    def test_spliced(self):
+        inst = Return.succeed([1, 2])
+        document = Document(sn=1, result=inst.encoded)
+        self.assertEqual(
+            json.loads(document.dump()),
+            {'sn': 1, 'result': {'retval': [1, 2]}})
+
+    def test_not_encoded(self):
+        self.assertEqual(Return(retval=1).encoded, None)
+
+class TestReply(TestCase):
+
+    def test_partial(self):
+        self.assertTrue(Reply(status='partial').partial())
+        self.assertFalse(Reply(status='progress').partial())
+
+
+class TestStream(TestCase):
+
+    def test_iter(self):
+        stream = Stream(iter(['a', 'b']))
+        partials = list(stream)
+        self.assertEqual([p.retval for p in partials], ['a', 'b'])
+        self.assertEqual(json.loads(partials[0].encoded.content), {'retval': 'a'})
+        self.assertEqual(stream.count, 2)
+        self.assertEqual(stream.result.retval, 2)
+        self.assertEqual(stream.result.partials, 2)
+
+    def test_iter_failed(self):
+        def generator():
+            yield 'a'
+            raise ValueError('bad')
+        stream = Stream(generator())
+        self.assertEqual(len(list(stream)), 1)
+        self.assertTrue(stream.result.failed())
+        self.assertEqual(stream.result.xclass, 'ValueError')
+
+    def test_not_iterable(self):
+        stream = Stream(None)
+        self.assertEqual(list(stream), [])
+        self.assertTrue(stream.result.failed())
+
+    def test_not_serializable(self):
+        stream = Stream([object()])
+        self.assertEqual(list(stream), [])
+        self.assertTrue(stream.result.failed())
+
+    def test_collect(self):
+        stream = Stream(iter(['a', 'b']))
+        result = stream.collect()
+        self.assertEqual(result.retval, ['a', 'b'])
+        self.assertEqual(result.partials, None)
+
+    def test_collect_failed(self):
+        def generator():
+            yield 'a'
+            raise ValueError('bad')
+        result = Stream(generator()).collect()
+        self.assertTrue(result.failed())
+        self.assertEqual(result.xclass, 'ValueError')
+
+
+class TestRMI(TestCase):
+
+    def request(self, method):
+        return Options(classname='Dog', method=method, args=[], kws={})
+
+    @patch('gofer.rmi.dispatcher.Context.current')
+    def test_call(self, current):
+        method = RMI(self.request('bark'), Options(), dict(Dog=Dog))
+        result = method()
+        self.assertEqual(result.retval, 'woof')
+        self.assertFalse(current.return_value.progress.configure.called)
+
+    @patch('gofer.rmi.dispatcher.Context.current')
+    def test_call_progress(self, current):
+        method = RMI(self.request('howl'), Options(), dict(Dog=Dog))
+        result = method()
+        self.assertEqual(result.retval, 'howl')
+        options = current.return_value.progress.configure.call_args[0][0]
+        self.assertEqual(options.rate, 2)
+        self.assertTrue(options.aggregate)
+
+    @patch('gofer.rmi.dispatcher.Context.current', Mock(return_value=None))
+    def test_call_stream(self):
+        method = RMI(self.request('growl'), Options(), dict(Dog=Dog))
+        result = method()
+        self.assertTrue(isinstance(result, Stream))
+        self.assertEqual([p.retval for p in result], ['grr'])
@@ -10,8 +10,20 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 
+from threading import Timer
+from time import time
 from unittest import TestCase
-from gofer.rmi.policy import Timeout
+
+from mock import patch, Mock
+
+from gofer.common import Options
+from gofer.messaging import Document, DocumentError
+from gofer.messaging.model import VERSION
+from gofer.rmi.policy import Timeout, Policy, Trigger, Future, RequestTimeout
+from gofer.rmi.policy import wait_any, wait_all
+from gofer.messaging.compression import CODECS
+from gofer.messaging.auth import FORMATS
+from gofer.messaging.session import SessionAuthenticator
 
 
 class TimeoutTests(TestCase):
@@ -91,3 +103,482 @@ class TimeoutTests(TestCase):
         self.assertRaises(ValueError, Timeout, 'x')
         self.assertRaises(ValueError, Timeout, '10x')
         self.assertRaises(ValueError, Timeout, '')
+
+
+class TestPolicy(TestCase):
+
+    def test_compression(self):
+        self.assertEqual(Policy('', '', Options()).compression, 0)
+        self.assertEqual(Policy('', '', Options(compression='1024')).compression, 1024)
+
+    def test_header(self):
+        self.assertFalse(Policy('', '', Options()).header)
+        self.assertTrue(Policy('', '', Options(header=True)).header)
+
+    def test_authenticator(self):
+        authenticator = Mock()
+        self.assertEqual(Policy('', '', Options()).authenticator, None)
+        policy = Policy('', '', Options(authenticator=authenticator))
+        self.assertEqual(policy.authenticator, authenticator)
+
+    def test_session(self):
+        authenticator = Mock()
+        policy = Policy('', '', Options(authenticator=authenticator, session='60'))
+        session = policy.authenticator
+        self.assertTrue(isinstance(session, SessionAuthenticator))
+        self.assertEqual(session.authenticator, authenticator)
+        self.assertEqual(session.lifetime, 60)
+        self.assertEqual(policy.authenticator, session)
+        self.assertEqual(Policy('', '', Options(session=60)).authenticator, None)
+
+    def test_streaming(self):
+        self.assertFalse(Policy('', '', Options()).streaming)
+        self.assertTrue(Policy('', '', Options(streaming=True)).streaming)
+
+    @patch('gofer.rmi.policy.Trigger')
+    def test_call(self, trigger):
+        policy = Policy('', '', Options())
+        retval = policy('request')
+        trigger.assert_called_once_with(policy, 'request')
+        self.assertEqual(retval, trigger.return_value.return_value)
+
+    @patch('gofer.rmi.policy.Trigger')
+    def test_call_manual(self, trigger):
+        trigger.MANUAL = Trigger.MANUAL
+        policy = Policy('', '', Options(trigger=Trigger.MANUAL))
+        retval = policy('request')
+        self.assertEqual(retval, trigger.return_value)
+        self.assertFalse(trigger.return_value.called)
+
+    @patch('gofer.rmi.policy.Trigger')
+    def test_call_future(self, trigger):
+        trigger.MANUAL = Trigger.MANUAL
+        trigger.FUTURE = Trigger.FUTURE
+        policy = Policy('', '', Options(trigger=Trigger.FUTURE))
+        retval = policy('request')
+        self.assertEqual(retval, trigger.return_value.submit.return_value)
+
+
+class TestFuture(TestCase):
+
+    def test_init(self):
+        policy = Mock()
+        future = Future(policy, '123')
+        self.assertEqual(future.sn, '123')
+        self.assertEqual(future._policy, policy)
+        self.assertFalse(future.done())
+        self.assertEqual(str(future), '123')
+
+    def test_put(self):
+        replies = [
+            Document(version=VERSION, sn='123', status='accepted'),
+            Document(version=VERSION, sn='123', status='started'),
+            Document(version=VERSION, sn='123', result=dict(retval=18))
+        ]
+        policy = Policy('', '', Options(wait=10))
+        future = Future(policy, '123')
+
+        # test
+        for reply in replies[:-1]:
+            future.put(reply.dump())
+            self.assertFalse(future.done())
+        future.put(replies[-1].dump())
+
+        # validation
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), 18)
+
+    def test_put_validated(self):
+        reply = Document(version=VERSION, sn='123', result=dict(retval=18))
+        authenticator = Mock()
+        policy = Policy('', '', Options(authenticator=authenticator))
+        future = Future(policy, '123')
+
+        # test
+        future.put(reply.dump())
+
+        # validation
+        self.assertTrue(authenticator.validate.called)
+        self.assertEqual(future.result(), 18)
+
+    def test_put_progress(self):
+        reply = Document(version=VERSION, sn='123', status='progress', total=10, completed=1)
+        reporter = Mock()
+        policy = Policy('', '', Options(progress=reporter))
+        future = Future(policy, '123')
+
+        # test
+        future.put(reply.dump())
+
+        # validation
+        self.assertEqual(reporter.call_count, 1)
+        self.assertFalse(future.done())
+
+    def test_put_rejected(self):
+        reply = Document(version=VERSION, sn='123', status='rejected', code='x', description='y')
+        policy = Policy('', '', Options())
+        future = Future(policy, '123')
+        future.put(reply.dump())
+        self.assertTrue(future.done())
+        self.assertRaises(DocumentError, future.result)
+
+    def test_put_invalid(self):
+        reply = Document(sn='123', result=dict(retval=18))
+        policy = Policy('', '', Options())
+        future = Future(policy, '123')
+        future.put(reply.dump())
+        self.assertRaises(DocumentError, future.result)
+
+    def test_put_partial(self):
+        replies = [
+            Document(version=VERSION, sn='123', status='partial', seq=1, result=dict(retval='b')),
+            Document(version=VERSION, sn='123', status='partial', seq=0, result=dict(retval='a')),
+            Document(version=VERSION, sn='123', result=dict(retval=2, partials=2)),
+        ]
+        policy = Policy('', '', Options())
+        future = Future(policy, '123')
+        self.assertFalse(future.ready(0))
+        self.assertFalse(future.streaming())
+
+        # test
+        future.put(replies[0].dump())
+        self.assertTrue(future.ready(0))
+        self.assertTrue(future.streaming())
+        self.assertFalse(future.done())
+        for reply in replies[1:]:
+            future.put(reply.dump())
+
+        # validation
+        self.assertEqual(list(future.stream(0)), ['a', 'b'])
+        self.assertEqual(future.result(), 2)
+
+    def test_put_partial_empty(self):
+        reply = Document(version=VERSION, sn='123', result=dict(retval=0, partials=0))
+        policy = Policy('', '', Options())
+        future = Future(policy, '123')
+        future.put(reply.dump())
+        self.assertTrue(future.streaming())
+        self.assertEqual(list(future.stream(0)), [])
+
+    def test_put_not_streaming(self):
+        reply = Document(version=VERSION, sn='123', result=dict(retval=18))
+        policy = Policy('', '', Options())
+        future = Future(policy, '123')
+        future.put(reply.dump())
+        self.assertTrue(future.ready(0))
+        self.assertFalse(future.streaming())
+
+    def test_stream_failed(self):
+        reply = Document(version=VERSION, sn='123', status='partial', seq=0, result=dict(retval='a'))
+        policy = Policy('', '', Options())
+        future = Future(policy, '123')
+        future.put(reply.dump())
+        future.set_exception(ValueError())
+        stream = future.stream(0)
+        self.assertEqual(stream.next(), 'a')
+        self.assertRaises(ValueError, stream.next)
+
+    @patch('gofer.rmi.policy.PARTIALS', 2)
+    def test_put_partial_full(self):
+        replies = [
+            Document(version=VERSION, sn='123', status='partial', seq=n, result=dict(retval=n))
+            for n in range(3)
+        ]
+        policy = Policy('', '', Options(wait=10))
+        future = Future(policy, '123')
+
+        # test
+        started = time()
+        for reply in replies:
+            future.put(reply.dump())
+
+        # validation
+        self.assertTrue(time() - started < 1)
+        self.assertTrue(future.done())
+        self.assertEqual(future._partials.qsize(), 2)
+        self.assertRaises(RequestTimeout, list, future.stream(0))
+
+    @patch('gofer.rmi.policy.PARTIALS', 2)
+    def test_stream_full_done(self):
+        replies = [
+            Document(version=VERSION, sn='123', status='partial', seq=n, result=dict(retval=n))
+            for n in range(2)
+        ]
+        replies.append(Document(version=VERSION, sn='123', result=dict(retval=2, partials=2)))
+        policy = Policy('', '', Options(wait=0.01))
+        future = Future(policy, '123')
+
+        # test
+        for reply in replies:
+            future.put(reply.dump())
+
+        # validation
+        self.assertTrue(future.done())
+        self.assertEqual(list(future.stream(10)), [0, 1])
+
+    def test_put_partial_done(self):
+        reply = Document(version=VERSION, sn='123', status='partial', seq=0, result=dict(retval='a'))
+        policy = Policy('', '', Options())
+        future = Future(policy, '123')
+        future.set_result(0)
+        future.put(reply.dump())
+        self.assertFalse(future.streaming())
+        self.assertEqual(future._partials.qsize(), 1)
+
+    def test_stream_timeout(self):
+        future = Future(Mock(), '123')
+        self.assertRaises(RequestTimeout, list, future.stream(0.01))
+        self.assertTrue(future.done())
+        self.assertRaises(RequestTimeout, future.result)
+
+    def test_result_timeout(self):
+        fn = Mock()
+        future = Future(Mock(), '123')
+        future.add_callback(fn)
+        self.assertRaises(RequestTimeout, future.result, 0.01)
+        self.assertTrue(future.done())
+        fn.assert_called_once_with(future)
+
+    def test_wait(self):
+        future = Future(Mock(), '123')
+        self.assertFalse(future.wait(0.01))
+        self.assertFalse(future.ready(0.01))
+        future.set_result(1)
+        self.assertTrue(future.wait(0.01))
+        self.assertTrue(future.ready(0.01))
+
+    @patch('gofer.rmi.policy.time')
+    def test_expired(self, _time):
+        _time.side_effect = [100, 105]
+        policy = Policy('', '', Options(wait=10))
+        future = Future(policy, '123')
+        self.assertFalse(future.expired(110))
+        self.assertTrue(future.expired(111))
+        future.put(Document(version=VERSION, sn='123', status='started').dump())
+        self.assertFalse(future.expired(111))
+        future.set_result(1)
+        self.assertFalse(future.expired(200))
+
+    def test_expire(self):
+        policy = Policy('', '', Options(wait=10))
+        future = Future(policy, '123')
+        future.expire()
+        self.assertTrue(future.done())
+        self.assertRaises(RequestTimeout, future.result)
+
+    def test_remove_callback(self):
+        fn = Mock()
+        future = Future(Mock(), '123')
+        future.add_callback(fn)
+        future.remove_callback(fn)
+        future.remove_callback(fn)
+        future.set_result(1)
+        self.assertFalse(fn.called)
+
+    def test_completed_once(self):
+        future = Future(Mock(), '123')
+        future.set_result(1)
+        future.set_exception(ValueError())
+        future.set_result(2)
+        self.assertEqual(future.result(), 1)
+
+    def test_callback(self):
+        fn = Mock()
+        future = Future(Mock(), '123')
+        future.add_callback(fn)
+        self.assertFalse(fn.called)
+        future.set_result(1)
+        fn.assert_called_once_with(future)
+        future.set_result(2)
+        fn.assert_called_once_with(future)
+
+    def test_callback_done(self):
+        fn = Mock()
+        future = Future(Mock(), '123')
+        future.set_exception(ValueError())
+        future.add_callback(fn)
+        fn.assert_called_once_with(future)
+
+    def test_callback_failed(self):
+        fn = Mock(side_effect=ValueError)
+        future = Future(Mock(), '123')
+        future.add_callback(fn)
+        future.set_result(1)
+        fn.assert_called_once_with(future)
+        self.assertEqual(future.result(), 1)
+
+
+class TestWait(TestCase):
+
+    def test_any(self):
+        futures = [Future(Mock(), str(n)) for n in range(3)]
+        futures[1].set_result(1)
+        done, pending = wait_any(futures)
+        self.assertEqual(done, [futures[1]])
+        self.assertEqual(pending, [futures[0], futures[2]])
+
+    def test_any_async(self):
+        futures = [Future(Mock(), str(n)) for n in range(3)]
+        timer = Timer(0.01, futures[2].set_result, [1])
+        timer.start()
+        done, pending = wait_any(futures, 10)
+        timer.join()
+        self.assertEqual(done, [futures[2]])
+
+    def test_any_timeout(self):
+        futures = [Future(Mock(), str(n)) for n in range(3)]
+        done, pending = wait_any(futures, 0.01)
+        self.assertEqual(done, [])
+        self.assertEqual(pending, futures)
+        for f in futures:
+            self.assertEqual(f._callbacks, [])
+
+    def test_all(self):
+        futures = [Future(Mock(), str(n)) for n in range(3)]
+        for f in futures:
+            f.set_result(1)
+        done, pending = wait_all(futures)
+        self.assertEqual(done, futures)
+        self.assertEqual(pending, [])
+
+    def test_all_timeout(self):
+        futures = [Future(Mock(), str(n)) for n in range(3)]
+        futures[0].set_result(1)
+        futures[2].set_result(1)
+        done, pending = wait_all(futures, 0.01)
+        self.assertEqual(done, [futures[0], futures[2]])
+        self.assertEqual(pending, [futures[1]])
+
+
+class TestTrigger(TestCase):
+
+    @patch('gofer.rmi.policy.RequestSender')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_submit(self, router, sender):
+        url = 'amqp://trigger'
+        authenticator = Mock(formats=())
+        router.return_value.address = 'replies'
+        options = Options(
+            wait=10,
+            ttl=20,
+            exchange='amq.direct',
+            authenticator=authenticator,
+            secret='xyz',
+            data=123)
+        policy = Policy(url, 'agent', options)
+
+        # test
+        trigger = Trigger(policy, 'request')
+        future = trigger.submit()
+
+        # validation
+        router.assert_called_once_with(url, 'amq.direct')
+        router.return_value.start.assert_called_once_with()
+        router.return_value.register.assert_called_once_with(future)
+        sender.assert_called_once_with(url)
+        sender.return_value.put.assert_called_once_with(
+            future,
+            policy,
+            sn=trigger.sn,
+            replyto='replies',
+            request='request',
+            secret='xyz',
+            pam=None,
+            data=123,
+            compression=CODECS,
+            signing=FORMATS,
+            streaming=True)
+        self.assertTrue(isinstance(future, Future))
+        self.assertEqual(future.sn, trigger.sn)
+        self.assertFalse(future.done())
+        future.set_result(1)
+        router.return_value.unregister.assert_called_once_with(future)
+        self.assertRaises(Exception, trigger.submit)
+
+    @patch('gofer.rmi.policy.Producer')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_call(self, router, producer):
+        policy = Policy('amqp://trigger', 'agent', Options(wait=10))
+        trigger = Trigger(policy, 'request')
+        future = Mock()
+        future.ready.return_value = True
+        future.streaming.return_value = False
+        trigger.submit = Mock(return_value=future)
+
+        # test
+        retval = trigger()
+
+        # validation
+        future.ready.assert_called_once_with(10)
+        future.result.assert_called_once_with()
+        self.assertEqual(retval, future.result.return_value)
+
+    @patch('gofer.rmi.policy.Producer')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_call_streaming(self, router, producer):
+        policy = Policy('amqp://trigger', 'agent', Options(wait=10))
+        trigger = Trigger(policy, 'request')
+        future = Mock()
+        future.ready.return_value = True
+        future.streaming.return_value = True
+        trigger.submit = Mock(return_value=future)
+
+        # test
+        retval = trigger()
+
+        # validation
+        future.stream.assert_called_once_with(10)
+        self.assertFalse(future.result.called)
+        self.assertEqual(retval, future.stream.return_value)
+
+    @patch('gofer.rmi.policy.Producer')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_call_timeout(self, router, producer):
+        policy = Policy('amqp://trigger', 'agent', Options(wait=10))
+        trigger = Trigger(policy, 'request')
+        future = Mock()
+        future.ready.return_value = False
+        trigger.submit = Mock(return_value=future)
+
+        # test
+        self.assertRaises(RequestTimeout, trigger)
+
+        # validation
+        exception = future.set_exception.call_args[0][0]
+        self.assertTrue(isinstance(exception, RequestTimeout))
+        self.assertEqual(exception.args, (trigger.sn, 10))
+
+    @patch('gofer.rmi.policy.Producer')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_asynchronous(self, router, producer):
+        policy = Policy('amqp://trigger', 'agent', Options(reply='q'))
+
+        # test
+        trigger = Trigger(policy, 'request')
+        retval = trigger()
+
+        # validation
+        self.assertFalse(router.called)
+        self.assertEqual(producer.return_value.compression, 0)
+        self.assertEqual(producer.return_value.header, False)
+        self.assertEqual(producer.return_value.send.call_args[1]['replyto'], 'q')
+        self.assertEqual(producer.return_value.send.call_args[1]['compression'], CODECS)
+        self.assertEqual(producer.return_value.send.call_args[1]['signing'], FORMATS)
+        self.assertEqual(producer.return_value.send.call_args[1]['streaming'], False)
+        self.assertEqual(retval, trigger.sn)
+        self.assertRaises(Exception, trigger)
+
+    @patch('gofer.rmi.policy.Producer')
+    @patch('gofer.rmi.policy.ReplyRouter')
+    def test_nowait(self, router, producer):
+        policy = Policy('amqp://trigger', 'agent', Options(wait=0))
+
+        # test
+        trigger = Trigger(policy, 'request')
+        future = trigger.submit()
+
+        # validation
+        self.assertFalse(router.called)
+        self.assertEqual(producer.return_value.send.call_args[1]['replyto'], None)
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), trigger.sn)
@@ -0,0 +1,339 @@
+# Copyright (c) 2014 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch, Mock
+
+from gofer.messaging import Document
+from gofer.messaging.compression import compress
+from gofer.rmi.router import RequestSender, ReplyRouter, EXPIRATION, DELAY, BATCH, EXPIRE
+
+
+class TestRequestSender(TestCase):
+
+    @patch('threading.Thread.setDaemon')
+    def test_init(self, set_daemon):
+        url = 'amqp://sender-init'
+        sender = RequestSender(url)
+        set_daemon.assert_called_once_with(True)
+        self.assertEqual(sender.url, url)
+        self.assertEqual(sender.getName(), 'requests:%s' % url)
+        self.assertEqual(sender.outbox.qsize(), 0)
+
+    def test_singleton(self):
+        url = 'amqp://sender-singleton'
+        self.assertTrue(RequestSender(url) is RequestSender(url))
+        self.assertFalse(RequestSender(url) is RequestSender(url + '2'))
+
+    @patch('gofer.rmi.router.RequestSender.start')
+    @patch('gofer.rmi.router.RequestSender.isAlive')
+    def test_put(self, is_alive, start):
+        is_alive.side_effect = [False, True]
+        future = Mock()
+        policy = Mock()
+        sender = RequestSender('amqp://sender-put')
+        sender.put(future, policy, sn=1)
+        sender.put(future, policy, sn=2)
+        start.assert_called_once_with()
+        self.assertEqual(sender.outbox.get(), (future, policy, {'sn': 1}))
+        self.assertEqual(sender.outbox.get(), (future, policy, {'sn': 2}))
+
+    def test_get(self):
+        sender = RequestSender('amqp://sender-get')
+        for n in range(BATCH + 1):
+            sender.outbox.put(n)
+
+        # test
+        batch = sender.get()
+
+        # validation
+        self.assertEqual(batch, range(BATCH))
+        self.assertEqual(sender.outbox.qsize(), 1)
+
+    def test_split(self):
+        policies = [
+            Mock(address='q1', ttl=10, compression=0, header=False),
+            Mock(address='q2', ttl=10, compression=0, header=False),
+        ]
+        policies.append(Mock(address='q2', ttl=10, compression=0, header=False))
+        policies[2].authenticator = policies[1].authenticator
+        policies.append(Mock(address='q2', ttl=10, compression=0, header=True))
+        policies[3].authenticator = policies[1].authenticator
+        batch = [
+            (1, policies[0], {}),
+            (2, policies[1], {}),
+            (3, policies[2], {}),
+            (4, policies[3], {}),
+            (5, policies[0], {}),
+        ]
+
+        # test
+        groups = RequestSender.split(batch)
+
+        # validation
+        self.assertEqual(groups, [batch[0:1], batch[1:3], batch[3:4], batch[4:5]])
+
+    @patch('gofer.common.Thread.aborted')
+    @patch('gofer.rmi.router.Producer')
+    def test_run(self, producer, aborted):
+        url = 'amqp://sender-run'
+        aborted.side_effect = [False, True]
+        future = Mock()
+        policies = [
+            Mock(address='q1', ttl=10, compression=0, header=False),
+            Mock(address='q2', ttl=None, compression=1024, header=True),
+        ]
+        producer.return_value.is_open.side_effect = [False, True]
+        sender = RequestSender(url)
+        sender.outbox.put((future, policies[0], {'sn': 1}))
+        sender.outbox.put((future, policies[1], {'sn': 2}))
+        sender.outbox.put((future, policies[1], {'sn': 3}))
+
+        # test
+        sender.run()
+
+        # validation
+        producer.assert_called_once_with(url)
+        producer.return_value.open.assert_called_once_with()
+        self.assertEqual(producer.return_value.authenticator, policies[1].authenticator)
+        self.assertEqual(producer.return_value.compression, 1024)
+        self.assertEqual(producer.return_value.header, True)
+        self.assertEqual(
+            producer.return_value.send_many.call_args_list,
+            [
+                (('q1', [{'sn': 1}], 10), {}),
+                (('q2', [{'sn': 2}, {'sn': 3}], None), {}),
+            ])
+        self.assertFalse(future.set_exception.called)
+
+    @patch('gofer.common.Thread.aborted')
+    @patch('gofer.rmi.router.Producer')
+    def test_run_failed(self, producer, aborted):
+        aborted.side_effect = [False, True]
+        futures = [Mock(), Mock()]
+        policy = Mock()
+        exception = ValueError()
+        producer.return_value.send_many.side_effect = exception
+        sender = RequestSender('amqp://sender-run-failed')
+        sender.outbox.put((futures[0], policy, {'sn': 1}))
+        sender.outbox.put((futures[1], policy, {'sn': 2}))
+
+        # test
+        sender.run()
+
+        # validation
+        futures[0].set_exception.assert_called_once_with(exception)
+        futures[1].set_exception.assert_called_once_with(exception)
+        producer.return_value.close.assert_called_once_with()
+
+
+class TestReplyRouter(TestCase):
+
+    @patch('threading.Thread.setDaemon')
+    def test_init(self, set_daemon):
+        url = 'amqp://router-init'
+        router = ReplyRouter(url)
+        set_daemon.assert_called_once_with(True)
+        self.assertEqual(router.url, url)
+        self.assertEqual(router.exchange, None)
+        self.assertEqual(router.pending, {})
+        self.assertEqual(router.getName(), 'replies:%s' % url)
+        self.assertFalse(router.node.durable)
+        self.assertTrue(router.node.auto_delete)
+        self.assertEqual(router.node.expiration, EXPIRATION)
+
+    def test_singleton(self):
+        url = 'amqp://router-singleton'
+        self.assertTrue(ReplyRouter(url) is ReplyRouter(url))
+        self.assertTrue(ReplyRouter(url) is ReplyRouter(url, None))
+        self.assertFalse(ReplyRouter(url) is ReplyRouter(url, 'amq.direct'))
+        self.assertFalse(ReplyRouter(url) is ReplyRouter(url + '2'))
+
+    def test_address(self):
+        router = ReplyRouter('amqp://router-address')
+        self.assertEqual(router.address, router.node.name)
+        router = ReplyRouter('amqp://router-address', 'amq.direct')
+        self.assertEqual(router.address, 'amq.direct/%s' % router.node.name)
+
+    @patch('gofer.rmi.router.ConsumerThread.start')
+    @patch('gofer.rmi.router.ReplyRouter.isAlive')
+    def test_start(self, is_alive, start):
+        is_alive.side_effect = [False, True]
+        url = 'amqp://router-start'
+        router = ReplyRouter(url)
+        router.node = Mock()
+
+        # test
+        router.start()
+        router.start()
+
+        # validation
+        router.node.declare.assert_called_once_with(url)
+        start.assert_called_once_with(router)
+
+    @patch('gofer.rmi.router.Exchange')
+    @patch('gofer.rmi.router.ConsumerThread.start')
+    @patch('gofer.rmi.router.ReplyRouter.isAlive')
+    def test_start_exchange(self, is_alive, start, exchange):
+        is_alive.return_value = False
+        url = 'amqp://router-start'
+        router = ReplyRouter(url, 'amq.direct')
+        router.node = Mock()
+
+        # test
+        router.start()
+
+        # validation
+        router.node.declare.assert_called_once_with(url)
+        exchange.assert_called_once_with('amq.direct')
+        exchange.return_value.bind.assert_called_once_with(router.node, url)
+        start.assert_called_once_with(router)
+
+    @patch('gofer.common.Thread.aborted')
+    @patch('gofer.rmi.router.sleep')
+    def test_open(self, sleep, aborted):
+        aborted.return_value = False
+        url = 'amqp://router-open'
+        router = ReplyRouter(url)
+        router.node = Mock()
+        router.node.declare.side_effect = [ValueError, None]
+        router.reader = Mock()
+
+        # test
+        router.open()
+
+        # validation
+        self.assertEqual(router.node.declare.call_count, 2)
+        router.node.declare.assert_called_with(url)
+        sleep.assert_called_once_with(DELAY)
+        router.reader.open.assert_called_once_with()
+
+    def test_register(self):
+        future = Mock(sn='123')
+        router = ReplyRouter('amqp://router-register')
+        router.register(future)
+        self.assertEqual(router.find('123'), future)
+        router.unregister(future)
+        self.assertEqual(router.find('123'), None)
+        router.unregister(future)
+
+    @patch('gofer.rmi.router.time')
+    def test_expire(self, _time):
+        _time.side_effect = [100, 100 + EXPIRE / 2.0, 100 + EXPIRE]
+        futures = [Mock(sn='1'), Mock(sn='2')]
+        futures[0].expired.return_value = False
+        futures[1].expired.return_value = True
+        router = ReplyRouter('amqp://router-expire')
+        for f in futures:
+            router.register(f)
+
+        # test
+        router.expire()
+        router.expire()
+        router.expire()
+
+        # validation
+        futures[0].expired.assert_called_with(100 + EXPIRE)
+        self.assertEqual(futures[0].expired.call_count, 2)
+        self.assertFalse(futures[0].expire.called)
+        self.assertEqual(futures[1].expire.call_count, 2)
+        for f in futures:
+            router.unregister(f)
+
+    def test_read(self):
+        message = Mock(body='{}')
+        router = ReplyRouter('amqp://router-read')
+        router.reader = Mock()
+        router.reader.get.return_value = message
+        router.route = Mock()
+
+        # test
+        router.read()
+
+        # validation
+        router.reader.get.assert_called_once_with(router.wait)
+        message.ack.assert_called_once_with()
+        router.route.assert_called_once_with(message.body)
+
+    @patch('gofer.rmi.router.sleep')
+    def test_read_route_failed(self, sleep):
+        message = Mock(body='{}')
+        router = ReplyRouter('amqp://router-read')
+        router.reader = Mock()
+        router.reader.get.return_value = message
+        router.route = Mock(side_effect=ValueError)
+        router.open = Mock()
+        router.close = Mock()
+
+        # test
+        router.read()
+
+        # validation
+        message.ack.assert_called_once_with()
+        self.assertFalse(sleep.called)
+        self.assertFalse(router.close.called)
+        self.assertFalse(router.open.called)
+
+    def test_read_nothing(self):
+        router = ReplyRouter('amqp://router-read')
+        router.reader = Mock()
+        router.reader.get.return_value = None
+        router.route = Mock()
+
+        # test
+        router.read()
+
+        # validation
+        self.assertFalse(router.route.called)
+
+    @patch('gofer.rmi.router.sleep')
+    def test_read_failed(self, sleep):
+        router = ReplyRouter('amqp://router-read')
+        router.reader = Mock()
+        router.reader.get.side_effect = ValueError
+        router.open = Mock()
+        router.close = Mock()
+
+        # test
+        router.read()
+
+        # validation
+        sleep.assert_called_once_with(DELAY)
+        router.close.assert_called_once_with()
+        router.open.assert_called_once_with()
+
+    def test_route(self):
+        future = Mock(sn='123')
+        router = ReplyRouter('amqp://router-route')
+        router.register(future)
+        message = Document(sn='123').dump()
+
+        # test
+        router.route(message)
+        router.route(Document(sn='456').dump())
+
+        # validation
+        future.put.assert_called_once_with(message)
+        router.unregister(future)
+
+    def test_route_compressed(self):
+        future = Mock(sn='123')
+        router = ReplyRouter('amqp://router-route')
+        router.register(future)
+        message = Document(sn='123', result='x' * 100).dump()
+
+        # test
+        router.route(compress(message, 10))
+
+        # validation
+        future.put.assert_called_once_with(message)
+        router.unregister(future)
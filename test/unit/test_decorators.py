@@ -14,7 +14,7 @@ from unittest import TestCase
 from mock import patch, Mock
 
 from gofer import NAME
-from gofer.decorators import options, remote, direct, fork, pam, user, action
+from gofer.decorators import options, remote, direct, fork, progress, pam, user, action
 from gofer.decorators import load, unload, initializer
 from gofer.decorators import DIRECT, FORK
 
@@ -93,6 +93,18 @@ class TestRemote(TestCase):
                 }))
         _remote.add.assert_called_once_with(fn)
 
+    @patch('gofer.decorators.Remote')
+    def test_stream(self, _remote):
+        def fn(): pass
+        remote(stream=True)(fn)
+        opt = getattr(fn, NAME)
+        self.assertEqual(opt.call.model, DIRECT)
+        self.assertTrue(opt.call.stream)
+        _remote.add.assert_called_once_with(fn)
+
+    def test_stream_forked(self):
+        self.assertRaises(ValueError, remote, stream=True, model=FORK)
+
 
 class TestDirect(TestCase):
 
@@ -121,6 +133,22 @@ class TestFork(TestCase):
                 'call': {'model': FORK}
                 }))
 
+    @patch('gofer.decorators.Remote')
+    def test_stream(self, _remote):
+        def fn(): pass
+        remote(stream=True)(fn)
+        self.assertRaises(ValueError, fork, fn)
+
+
+class TestProgress(TestCase):
+
+    def test_call(self):
+        def fn(): pass
+        progress(rate=2, aggregate=True)(fn)
+        opt = getattr(fn, NAME)
+        self.assertEqual(opt.progress.rate, 2)
+        self.assertTrue(opt.progress.aggregate)
+
 
 class TestPam(TestCase):
 